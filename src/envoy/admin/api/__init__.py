@@ -2,6 +2,7 @@
 
 from envoy.admin.api.aggregator import router as aggregator_router
 from envoy.admin.api.archive import router as archive_router
+from envoy.admin.api.billing import router as billing_router
 from envoy.admin.api.certificate import router as certificate_router
 from envoy.admin.api.config import router as config_router
 from envoy.admin.api.health import router as health_router
@@ -21,6 +22,7 @@ routers = [
     aggregator_router,
     site_reading_router,
     certificate_router,
+    billing_router,
 ]
 
 unsecured_routers = [health_router]
@@ -0,0 +1,59 @@
+import logging
+from collections.abc import AsyncIterator
+from datetime import datetime
+from http import HTTPStatus
+
+from fastapi import APIRouter, Path, Query
+from fastapi.responses import StreamingResponse
+from fastapi_async_sqlalchemy import db
+
+from envoy.admin.manager.billing import BillingExportFormat, BillingExportManager
+from envoy.server.api.error_handler import LoggedHttpException
+from envoy.server.exception import NotFoundError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Streamed billing export for all sites under an aggregator - see stream_aggregator_billing_export
+AGGREGATOR_BILLING_EXPORT_URI = "/aggregator/{aggregator_id}/billing/{tariff_id}/{period_start}/{period_end}/export"
+
+
+@router.get(AGGREGATOR_BILLING_EXPORT_URI, status_code=HTTPStatus.OK, response_class=StreamingResponse)
+async def stream_aggregator_billing_export(
+    aggregator_id: int,
+    tariff_id: int,
+    period_start: datetime = Path(),
+    period_end: datetime = Path(),
+    format: BillingExportFormat = Query(BillingExportFormat.NDJSON),
+) -> StreamingResponse:
+    """Streams the billing data (tariff rates, DOEs and Wh / W / varh readings) for every site under an aggregator.
+    Rows are ordered by site_id then time_period_start and are read from the database (and written out)
+    incrementally so memory use remains flat regardless of fleet size.
+
+    Path Params:
+        aggregator_id: The aggregator whose sites will be exported
+        tariff_id: Only rates from this tariff will be included
+        period_start: The (inclusive) start datetime that defines the start of the period (include timezone)
+        period_end: The (exclusive) end datetime that defines the end of the period (include timezone)
+
+    Query Params:
+        format: "ndjson" (default) for one JSON object per row or "csv" for a header row followed by one row per line
+
+    Returns:
+        StreamingResponse (application/x-ndjson or text/csv)
+    """
+    try:
+        await BillingExportManager.assert_aggregator_exists(db.session, aggregator_id)
+    except NotFoundError as exc:
+        raise LoggedHttpException(logger, exc, HTTPStatus.NOT_FOUND, exc.message) from exc
+
+    async def generate_chunks() -> AsyncIterator[str]:
+        # The request scoped db.session is closed once the response starts - the body needs its own session
+        async with db():
+            async for chunk in BillingExportManager.stream_aggregator_billing_export(
+                db.session, aggregator_id, tariff_id, period_start, period_end, format
+            ):
+                yield chunk
+
+    return StreamingResponse(generate_chunks(), media_type=format.media_type)
@@ -8,6 +8,8 @@ from fastapi.security import HTTPBasic, HTTPBasicCredentials
 app = FastAPI()
 security = HTTPBasic()
 
+CALCULATION_LOG_COMPACT_VARIABLE_VALUES_ATTR = "calculation_log_compact_variable_values"
+
 
 class AdminAuthDepends:
     """
@@ -44,3 +46,9 @@ class AdminAuthDepends:
 
         # If no valid creds are matched - bail out with
         raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED, detail="Unauthorized")
+
+
+def fetch_calculation_log_compact_variable_values_setting(request: Request) -> bool:
+    """Fetches the calculation_log_compact_variable_values setting from FastAPI app state under the expected attribute
+    name."""
+    return getattr(request.app.state, CALCULATION_LOG_COMPACT_VARIABLE_VALUES_ATTR, False)
@@ -1,20 +1,31 @@
 import logging
+from collections.abc import AsyncIterator
 from datetime import datetime
 from http import HTTPStatus
 
 from envoy_schema.admin.schema.log import CalculationLogListResponse, CalculationLogRequest, CalculationLogResponse
 from envoy_schema.admin.schema.uri import CalculationLogCreateUri, CalculationLogsForPeriod, CalculationLogUri
-from fastapi import APIRouter, HTTPException, Path, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi_async_sqlalchemy import db
 
+from envoy.admin.api.depends import fetch_calculation_log_compact_variable_values_setting
 from envoy.admin.manager.log import CalculationLogManager
+from envoy.server.api.error_handler import LoggedHttpException
 from envoy.server.api.request import extract_limit_from_paging_param, extract_start_from_paging_param
 from envoy.server.api.response import LOCATION_HEADER_NAME
+from envoy.server.exception import BadRequestError
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Streamed (NDJSON) equivalent of CalculationLogUri - see stream_calculation_log_by_id
+CALCULATION_LOG_STREAM_URI = "/calculation_log/{calculation_log_id}/stream"
+# Streamed (NDJSON) equivalent of CalculationLogCreateUri - see upload_calculation_log
+CALCULATION_LOG_UPLOAD_URI = "/calculation_log/upload"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 
 @router.get(CalculationLogsForPeriod, status_code=HTTPStatus.OK, response_model=CalculationLogListResponse)
 async def get_calculation_log_for_period(
@@ -48,7 +59,10 @@ async def get_calculation_log_for_period(
 
 
 @router.post(CalculationLogCreateUri, status_code=HTTPStatus.CREATED, response_model=None)
-async def create_calculation_log(calculation_log: CalculationLogRequest) -> Response:
+async def create_calculation_log(
+    calculation_log: CalculationLogRequest,
+    compact_variable_values: bool = Depends(fetch_calculation_log_compact_variable_values_setting),
+) -> Response:
     """Persists a new calculation_log. Returns the ID as a Location response header
 
     Body:
@@ -57,7 +71,44 @@ async def create_calculation_log(calculation_log: CalculationLogRequest) -> Resp
     Returns:
         None
     """
-    log_id = await CalculationLogManager.save_calculation_log(db.session, calculation_log)
+    try:
+        log_id = await CalculationLogManager.save_calculation_log(
+            db.session, calculation_log, compact_variable_values=compact_variable_values
+        )
+    except ValueError as exc:
+        raise LoggedHttpException(logger, exc, HTTPStatus.BAD_REQUEST, f"{exc}") from exc
+    location_href = CalculationLogUri.format(calculation_log_id=log_id)
+    return Response(status_code=HTTPStatus.CREATED, headers={LOCATION_HEADER_NAME: location_href})
+
+
+@router.post(CALCULATION_LOG_UPLOAD_URI, status_code=HTTPStatus.CREATED, response_model=None)
+async def upload_calculation_log(
+    request: Request,
+    compact_variable_values: bool = Depends(fetch_calculation_log_compact_variable_values_setting),
+) -> Response:
+    """Streamed equivalent of create_calculation_log for very large calculation logs. The body is validated and
+    loaded incrementally (one line at a time) - it's never held in memory. Returns the ID as a Location response header
+
+    Body (application/x-ndjson) - the same format returned by stream_calculation_log_by_id:
+        The first line is the CalculationLogRequest (variable_values / label_values can be null)
+        Subsequent lines are {"variable_values": CalculationLogVariableValues} chunks
+        or {"label_values": CalculationLogLabelValues} chunks
+
+    Returns:
+        None
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != NDJSON_MEDIA_TYPE:
+        raise LoggedHttpException(
+            logger, None, HTTPStatus.UNSUPPORTED_MEDIA_TYPE, f"Content-Type must be {NDJSON_MEDIA_TYPE}"
+        )
+
+    try:
+        log_id = await CalculationLogManager.save_calculation_log_upload(
+            db.session, request.stream(), compact_variable_values=compact_variable_values
+        )
+    except BadRequestError as exc:
+        raise LoggedHttpException(logger, exc, HTTPStatus.BAD_REQUEST, exc.message) from exc
     location_href = CalculationLogUri.format(calculation_log_id=log_id)
     return Response(status_code=HTTPStatus.CREATED, headers={LOCATION_HEADER_NAME: location_href})
 
@@ -90,3 +141,44 @@ async def get_calculation_log_by_id(
         raise HTTPException(HTTPStatus.NOT_FOUND, f"Calculation log with ID {calculation_log_id} not found")
 
     return log
+
+
+@router.get(CALCULATION_LOG_STREAM_URI, status_code=HTTPStatus.OK, response_class=StreamingResponse)
+async def stream_calculation_log_by_id(
+    calculation_log_id: int,
+    include_variables: bool = Query(False, alias="include_variables"),
+    include_labels: bool = Query(False, alias="include_labels"),
+) -> StreamingResponse:
+    """Streaming equivalent of get_calculation_log_by_id for very large calculation logs. The response is NDJSON where:
+
+        The first line is the CalculationLogResponse (with variable_values / label_values always set to null)
+        Subsequent lines are {"variable_values": CalculationLogVariableValues} chunks (if include_variables)
+        Then {"label_values": CalculationLogLabelValues} chunks (if include_labels)
+
+    Concatenating the chunks in order yields the same values as get_calculation_log_by_id. Values are paged from the
+    database (and written out) incrementally so memory use remains flat regardless of log size.
+
+    Returns:
+        NDJSON StreamingResponse
+    """
+
+    header = await CalculationLogManager.get_calculation_log_header_by_id(
+        session=db.session,
+        calculation_log_id=calculation_log_id,
+        include_variables=include_variables,
+        include_labels=include_labels,
+    )
+    if header is None:
+        raise HTTPException(HTTPStatus.NOT_FOUND, f"Calculation log with ID {calculation_log_id} not found")
+
+    async def generate_lines() -> AsyncIterator[str]:
+        yield header.model_dump_json() + "\n"
+
+        # The request scoped db.session is closed once the response starts - the body needs its own session
+        async with db():
+            async for line in CalculationLogManager.stream_calculation_log_values(
+                db.session, calculation_log_id, include_variables, include_labels
+            ):
+                yield line
+
+    return StreamingResponse(generate_lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -20,11 +20,15 @@ from envoy_schema.admin.schema.uri import (
     SiteControlRangeUri,
     SiteControlUri,
 )
-from fastapi import APIRouter, Query, Response
+from fastapi import APIRouter, Query, Request, Response
 from fastapi_async_sqlalchemy import db
 from sqlalchemy.exc import IntegrityError
 
-from envoy.admin.manager.site_control import SiteControlGroupManager, SiteControlListManager
+from envoy.admin.manager.site_control import (
+    SiteControlGroupManager,
+    SiteControlListManager,
+    SiteControlUploadFormat,
+)
 from envoy.server.api.error_handler import LoggedHttpException
 from envoy.server.api.request import extract_limit_from_paging_param, extract_start_from_paging_param
 from envoy.server.api.response import LOCATION_HEADER_NAME
@@ -34,6 +38,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Streamed (bulk) upload of site controls - see upload_site_controls
+SITE_CONTROL_UPLOAD_URI = "/site_control_group/{group_id}/controls/upload"
+
 
 @router.post(SiteControlGroupListUri, status_code=HTTPStatus.CREATED, response_model=None)
 async def create_site_control_group(site_control_group: SiteControlGroupRequest) -> Response:
@@ -133,6 +140,48 @@ async def create_site_controls(group_id: int, control_list: list[SiteControlRequ
         raise LoggedHttpException(logger, exc, HTTPStatus.BAD_REQUEST, "site_id not found") from exc
 
 
+@router.post(SITE_CONTROL_UPLOAD_URI, status_code=HTTPStatus.NO_CONTENT, response_model=None)
+async def upload_site_controls(group_id: int, request: Request, cancel_existing: bool = Query(False)) -> None:
+    """Streamed bulk creation of 'Site Controls' under a site control group. Intended for very large uploads where
+    create_site_controls would be too slow / memory intensive. The body is validated and loaded incrementally - it's
+    never held in memory. The upload is all or nothing - any invalid row will fail the entire request.
+
+    Body (identified by Content-Type):
+        application/x-ndjson: One SiteControlRequest JSON object per line
+        text/csv: A header row of SiteControlRequest field names and then one control per row (empty cell = null)
+
+    Query Param:
+        cancel_existing: If True - existing controls for the same site/start time are cancelled (deleted) instead of
+                         the default behaviour of superseding any overlapping controls.
+
+    Returns:
+        None
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        upload_format = SiteControlUploadFormat(content_type)
+    except ValueError as exc:
+        raise LoggedHttpException(
+            logger,
+            exc,
+            HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+            f"Content-Type must be one of {[f.value for f in SiteControlUploadFormat]}",
+        ) from exc
+
+    try:
+        inserted_count = await SiteControlListManager.upload_site_controls(
+            db.session, group_id, upload_format, request.stream(), cancel_existing
+        )
+    except BadRequestError as exc:
+        raise LoggedHttpException(logger, exc, HTTPStatus.BAD_REQUEST, exc.message) from exc
+    except NotFoundError as exc:
+        raise LoggedHttpException(logger, exc, HTTPStatus.NOT_FOUND, exc.message) from exc
+    except IntegrityError as exc:
+        raise LoggedHttpException(logger, exc, HTTPStatus.BAD_REQUEST, "site_id not found") from exc
+
+    logger.info(f"Uploaded {inserted_count} site controls to group {group_id}")
+
+
 @router.get(SiteControlUri, status_code=HTTPStatus.OK, response_model=SiteControlPageResponse)
 async def get_all_site_controls(
     group_id: int,
@@ -1,18 +1,22 @@
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Sequence
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from enum import StrEnum
 from itertools import chain
+from typing import Any, cast
 
 from envoy_schema.server.schema.sep2.types import UomType
-from sqlalchemy import select
+from sqlalchemy import VARCHAR, ColumnElement, Row, Select, literal, null, select, union_all
+from sqlalchemy import cast as sql_cast
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import InstrumentedAttribute, joinedload
 
 from envoy.server.model.aggregator import Aggregator
 from envoy.server.model.doe import DynamicOperatingEnvelope
 from envoy.server.model.log import CalculationLog
+from envoy.server.model.site import Site
 from envoy.server.model.site_reading import SiteReading, SiteReadingType
-from envoy.server.model.tariff import TariffGeneratedRate
+from envoy.server.model.tariff import TariffComponent, TariffGeneratedRate
 
 
 @dataclass
@@ -24,6 +28,165 @@ class BillingData:
     active_does: Sequence[DynamicOperatingEnvelope]
 
 
+class BillingExportSource(StrEnum):
+    """Identifies the entity that a billing export row was sourced from"""
+
+    TARIFF_RATE = "tariff_rate"  # TariffGeneratedRate
+    DOE = "doe"  # DynamicOperatingEnvelope
+    WH_READING = "wh_reading"  # SiteReading with uom REAL_ENERGY_WATT_HOURS
+    WATT_READING = "watt_reading"  # SiteReading with uom REAL_POWER_WATT
+    VARH_READING = "varh_reading"  # SiteReading with uom REACTIVE_ENERGY_VARH
+
+
+# The columns (in order) of every row yielded by stream_aggregator_billing_rows. Columns that don't apply to a row's
+# source will be None
+BILLING_EXPORT_COLUMNS = [
+    "site_id",
+    "time_period_start",
+    "duration_seconds",
+    "source",
+    "tariff_component_id",  # TARIFF_RATE only
+    "price_pow10_encoded",  # TARIFF_RATE only
+    "block_1_start_pow10_encoded",  # TARIFF_RATE only
+    "price_pow10_encoded_block_1",  # TARIFF_RATE only
+    "import_limit_active_watts",  # DOE only
+    "export_limit_watts",  # DOE only
+    "site_reading_type_id",  # *_READING only
+    "flow_direction",  # *_READING only
+    "power_of_ten_multiplier",  # *_READING only
+    "value",  # *_READING only
+]
+
+# Used for typing the NULL placeholders of the columns that don't apply to a particular source
+_BILLING_EXPORT_NULL_TYPES = {
+    "tariff_component_id": TariffGeneratedRate.tariff_component_id.type,
+    "price_pow10_encoded": TariffGeneratedRate.price_pow10_encoded.type,
+    "block_1_start_pow10_encoded": TariffGeneratedRate.block_1_start_pow10_encoded.type,
+    "price_pow10_encoded_block_1": TariffGeneratedRate.price_pow10_encoded_block_1.type,
+    "import_limit_active_watts": DynamicOperatingEnvelope.import_limit_active_watts.type,
+    "export_limit_watts": DynamicOperatingEnvelope.export_limit_watts.type,
+    "site_reading_type_id": SiteReadingType.site_reading_type_id.type,
+    "flow_direction": SiteReadingType.flow_direction.type,
+    "power_of_ten_multiplier": SiteReadingType.power_of_ten_multiplier.type,
+    "value": SiteReading.value.type,
+}
+
+
+def _billing_export_select(
+    source: BillingExportSource, **columns: ColumnElement[Any] | InstrumentedAttribute[Any]
+) -> Select:
+    """Generates a select of BILLING_EXPORT_COLUMNS (suitable for a UNION) from columns - any column not specified
+    will be a (typed) NULL"""
+    selected: list[ColumnElement] = []
+    for name in BILLING_EXPORT_COLUMNS:
+        if name == "source":
+            column: ColumnElement[Any] | InstrumentedAttribute[Any] = literal(source.value, VARCHAR)
+        elif name in columns:
+            column = columns[name]
+        else:
+            column = sql_cast(null(), _BILLING_EXPORT_NULL_TYPES[name])
+        selected.append(column.label(name))
+    return select(*selected)
+
+
+def _reading_billing_export_select(
+    source: BillingExportSource, uom: UomType, site_ids: Select, period_start: datetime, period_end: datetime
+) -> Select:
+    return (
+        _billing_export_select(
+            source,
+            site_id=SiteReadingType.site_id,
+            time_period_start=SiteReading.time_period_start,
+            duration_seconds=SiteReading.time_period_seconds,
+            site_reading_type_id=SiteReadingType.site_reading_type_id,
+            flow_direction=SiteReadingType.flow_direction,
+            power_of_ten_multiplier=SiteReadingType.power_of_ten_multiplier,
+            value=SiteReading.value,
+        )
+        .select_from(SiteReading)
+        .join(SiteReadingType)
+        .where(
+            (SiteReadingType.site_id.in_(site_ids))
+            & (SiteReading.time_period_start >= period_start)
+            & (SiteReading.time_period_start < period_end)
+            & (SiteReadingType.uom == uom)
+        )
+    )
+
+
+async def stream_aggregator_billing_rows(
+    session: AsyncSession,
+    aggregator_id: int,
+    tariff_id: int,
+    period_start: datetime,
+    period_end: datetime,
+    chunk_size: int,
+) -> AsyncIterator[Sequence[Row]]:
+    """Streaming alternative to fetch_sites_billing_data for every site belonging to aggregator_id. The rates, DOEs
+    and Wh / W / varh readings are merged (by the DB) into a single result ordered by site_id, time_period_start then
+    source and read via a server side cursor. Yields chunks of at most chunk_size rows (matching
+    BILLING_EXPORT_COLUMNS) - only a single chunk will ever be held in memory.
+
+    Entities are filtered on start time (period_start is inclusive, period_end is exclusive).
+
+    The session must remain open (and not be used for anything else) until iteration completes"""
+
+    aggregator_site_ids = select(Site.site_id).where(Site.aggregator_id == aggregator_id)
+
+    rates = _billing_export_select(
+        BillingExportSource.TARIFF_RATE,
+        site_id=TariffGeneratedRate.site_id,
+        time_period_start=TariffGeneratedRate.start_time,
+        duration_seconds=TariffGeneratedRate.duration_seconds,
+        tariff_component_id=TariffGeneratedRate.tariff_component_id,
+        price_pow10_encoded=TariffGeneratedRate.price_pow10_encoded,
+        block_1_start_pow10_encoded=TariffGeneratedRate.block_1_start_pow10_encoded,
+        price_pow10_encoded_block_1=TariffGeneratedRate.price_pow10_encoded_block_1,
+    ).where(
+        (TariffGeneratedRate.tariff_id == tariff_id)
+        & (TariffGeneratedRate.site_id.in_(aggregator_site_ids))
+        & (TariffGeneratedRate.start_time >= period_start)
+        & (TariffGeneratedRate.start_time < period_end)
+    )
+
+    does = _billing_export_select(
+        BillingExportSource.DOE,
+        site_id=DynamicOperatingEnvelope.site_id,
+        time_period_start=DynamicOperatingEnvelope.start_time,
+        duration_seconds=DynamicOperatingEnvelope.duration_seconds,
+        import_limit_active_watts=DynamicOperatingEnvelope.import_limit_active_watts,
+        export_limit_watts=DynamicOperatingEnvelope.export_limit_watts,
+    ).where(
+        (DynamicOperatingEnvelope.site_id.in_(aggregator_site_ids))
+        & (DynamicOperatingEnvelope.start_time >= period_start)
+        & (DynamicOperatingEnvelope.start_time < period_end)
+    )
+
+    readings = [
+        _reading_billing_export_select(source, uom, aggregator_site_ids, period_start, period_end)
+        for source, uom in [
+            (BillingExportSource.WH_READING, UomType.REAL_ENERGY_WATT_HOURS),
+            (BillingExportSource.WATT_READING, UomType.REAL_POWER_WATT),
+            (BillingExportSource.VARH_READING, UomType.REACTIVE_ENERGY_VARH),
+        ]
+    ]
+
+    combined = union_all(rates, does, *readings).subquery()
+    result = await session.stream(
+        select(*(combined.c[name] for name in BILLING_EXPORT_COLUMNS))
+        .order_by(
+            combined.c.site_id,
+            combined.c.time_period_start,
+            combined.c.source,
+            combined.c.tariff_component_id,
+            combined.c.site_reading_type_id,
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+    async for partition in result.partitions(chunk_size):
+        yield cast(Sequence[Row], partition)
+
+
 async def fetch_calculation_log_billing_data(
     session: AsyncSession, calculation_log: CalculationLog, tariff_id: int
 ) -> BillingData:
@@ -213,6 +376,16 @@ async def fetch_sites_billing_data(
     )
 
 
+async def fetch_tariff_components(session: AsyncSession, tariff_id: int) -> Sequence[TariffComponent]:
+    """Fetches every TariffComponent under tariff_id (ordered by tariff_component_id)"""
+    result = await session.execute(
+        select(TariffComponent)
+        .where(TariffComponent.tariff_id == tariff_id)
+        .order_by(TariffComponent.tariff_component_id)
+    )
+    return result.scalars().all()
+
+
 async def fetch_aggregator(session: AsyncSession, aggregator_id: int) -> Aggregator | None:
     """Fetches a particular Aggregator by its ID"""
     result = await session.execute(select(Aggregator).where(Aggregator.aggregator_id == aggregator_id))
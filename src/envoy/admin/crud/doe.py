@@ -1,10 +1,32 @@
-from collections.abc import Callable, Iterable, Sequence
-from dataclasses import dataclass
+from collections.abc import AsyncIterable, Callable, Iterable, Sequence
+from dataclasses import dataclass, fields
 from datetime import UTC, datetime
-from typing import cast
+from decimal import Decimal
+from typing import NamedTuple, cast
 
 from intervaltree import Interval, IntervalTree
-from sqlalchemy import Delete, and_, func, insert, or_, select, update
+from sqlalchemy import (
+    BOOLEAN,
+    INTEGER,
+    CursorResult,
+    DateTime,
+    Delete,
+    FromClause,
+    and_,
+    column,
+    exists,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    table,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy import cast as sql_cast
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.server.crud.archive import copy_rows_into_archive, delete_rows_into_archive
@@ -133,23 +155,8 @@ async def supersede_then_insert_does(
     if len(doe_list) == 0:
         return []
 
-    # start by fetching all SiteControlGroup IDs - we need them to use our indexes in the later DERControl lookups
-    all_site_control_group_ids = (await session.execute(select(SiteControlGroup.site_control_group_id))).scalars().all()
-
-    # Organise the incoming DOE's by site_id to better chunk the lookups (and utilise existing indexes)
-    does_by_site_id: dict[int, list[DynamicOperatingEnvelope]] = {}
-    for doe in doe_list:
-        existing = does_by_site_id.get(doe.site_id, None)
-        if existing is None:
-            does_by_site_id[doe.site_id] = [doe]
-        else:
-            existing.append(doe)
-
-    # Start making the requests to the database to update the existing DOEs as superseded
-    for site_id, site_doe_list in does_by_site_id.items():
-        await supersede_matching_does_for_site(
-            session, site_doe_list, site_id, all_site_control_group_ids, changed_time
-        )
+    # Update the existing DOEs as superseded (across all sites in one pass)
+    await supersede_matching_does(session, doe_list, changed_time)
 
     # Now we can do the inserts
     table = DynamicOperatingEnvelope.__table__
@@ -163,6 +170,227 @@ async def supersede_then_insert_does(
     return insert_ids.scalars().all()
 
 
+async def supersede_matching_does(
+    session: AsyncSession, doe_list: list[DynamicOperatingEnvelope], changed_time: datetime
+) -> None:
+    """Marks existing DynamicOperatingEnvelopes in the db as superseded if they are overlapped by any value in doe_list
+    (for the same site and site control group) AND they have conflicting control fields (as per
+    DOEFieldSet.conflicts_with).
+
+    This is the set based equivalent of calling supersede_matching_does_for_site for every site in doe_list. The
+    incoming controls are sent to the database as a single set of arrays (via unnest) so that all sites are matched,
+    archived and updated in a fixed number of statements, regardless of how many sites are in doe_list.
+
+    changed_time: Will be applied to all existing DOE's that are updated
+
+    This will appropriately archive all updated records
+
+    This will NOT insert doe_list to the database"""
+
+    if len(doe_list) == 0:
+        return
+
+    # The incoming controls are passed as one array per column - this keeps the parameter count constant
+    incoming_columns = [
+        ("site_id", INTEGER(), [doe.site_id for doe in doe_list]),
+        ("site_control_group_id", INTEGER(), [doe.site_control_group_id for doe in doe_list]),
+        ("start_time", DateTime(timezone=True), [doe.start_time for doe in doe_list]),
+        ("end_time", DateTime(timezone=True), [doe.end_time for doe in doe_list]),
+    ]
+    incoming_field_sets = [DOEFieldSet.from_doe(doe) for doe in doe_list]
+    incoming_columns.extend(
+        (f.name, BOOLEAN(), [getattr(fs, f.name) for fs in incoming_field_sets]) for f in fields(DOEFieldSet)
+    )
+    incoming = (
+        func.unnest(*[sql_cast(values, ARRAY(col_type)) for _, col_type, values in incoming_columns])
+        .table_valued(*[name for name, _, _ in incoming_columns])
+        .render_derived(name="incoming")
+    )
+
+    await _supersede_does_matching_incoming(session, incoming, changed_time)
+
+
+async def _supersede_does_matching_incoming(
+    session: AsyncSession, incoming: FromClause, changed_time: datetime
+) -> None:
+    """Shared implementation of supersede_matching_does. incoming must expose the columns site_id,
+    site_control_group_id, start_time, end_time and a boolean column for every field in DOEFieldSet"""
+
+    # An existing DOE is superseded if ANY incoming DOE overlaps it in time (for the same site / site control group)
+    # and shares a control field (mirrors DOEFieldSet.conflicts_with)
+    existing = DynamicOperatingEnvelope
+    superseded_doe_ids = select(existing.dynamic_operating_envelope_id).where(
+        existing.superseded.is_(False),  # Can't supersede something twice
+        existing.start_time < existing.end_time,  # Zero length controls can't be overlapped
+        exists().where(
+            incoming.c.site_id == existing.site_id,
+            incoming.c.site_control_group_id == existing.site_control_group_id,
+            incoming.c.start_time < existing.end_time,
+            incoming.c.end_time > existing.start_time,
+            or_(
+                incoming.c.has_import_limit & existing.import_limit_active_watts.is_not(None),
+                incoming.c.has_export_limit & existing.export_limit_watts.is_not(None),
+                incoming.c.has_generation_limit & existing.generation_limit_active_watts.is_not(None),
+                incoming.c.has_load_limit & existing.load_limit_active_watts.is_not(None),
+                incoming.c.has_set_energized & existing.set_energized.is_not(None),
+                incoming.c.has_set_connected & existing.set_connected.is_not(None),
+                incoming.c.has_set_point_percentage & existing.set_point_percentage.is_not(None),
+            ),
+        ),
+    )
+
+    await copy_rows_into_archive(
+        session,
+        DynamicOperatingEnvelope,
+        ArchiveDynamicOperatingEnvelope,
+        lambda q: q.where(DynamicOperatingEnvelope.dynamic_operating_envelope_id.in_(superseded_doe_ids)),
+    )
+
+    await session.execute(
+        update(DynamicOperatingEnvelope)
+        .where(DynamicOperatingEnvelope.dynamic_operating_envelope_id.in_(superseded_doe_ids))
+        .values(superseded=True, changed_time=changed_time)
+    )
+
+
+class StagedSiteControl(NamedTuple):
+    """A single row in the site control staging table (see copy_site_controls_into_staging). Field order matches the
+    staging table columns"""
+
+    site_id: int
+    calculation_log_id: int | None
+    start_time: datetime
+    duration_seconds: int
+    end_time: datetime
+    randomize_start_seconds: int | None
+    import_limit_active_watts: Decimal | None
+    export_limit_watts: Decimal | None
+    generation_limit_active_watts: Decimal | None
+    load_limit_active_watts: Decimal | None
+    set_energized: bool | None
+    set_connected: bool | None
+    set_point_percentage: Decimal | None
+    ramp_time_seconds: Decimal | None
+    display_id: int | None
+    storage_target_active_watts: Decimal | None
+
+
+SITE_CONTROL_STAGING_TABLE_NAME = "site_control_staging"
+SITE_CONTROL_STAGING_COLUMNS = list(StagedSiteControl._fields)
+site_control_staging = table(SITE_CONTROL_STAGING_TABLE_NAME, *[column(c) for c in SITE_CONTROL_STAGING_COLUMNS])
+
+
+async def copy_site_controls_into_staging(
+    session: AsyncSession, staged_controls: Iterable[StagedSiteControl] | AsyncIterable[StagedSiteControl]
+) -> None:
+    """Streams staged_controls (via COPY) into a temporary staging table (scoped to the current connection and emptied
+    at the end of every transaction). staged_controls is consumed incrementally - it's never materialised in memory.
+
+    Follow up with cancel_then_insert_staged_does or supersede_then_insert_staged_does (in the same transaction)"""
+
+    await session.execute(
+        text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {SITE_CONTROL_STAGING_TABLE_NAME} ("
+            "site_id INTEGER NOT NULL, "
+            "calculation_log_id INTEGER NULL, "
+            "start_time TIMESTAMP WITH TIME ZONE NOT NULL, "
+            "duration_seconds INTEGER NOT NULL, "
+            "end_time TIMESTAMP WITH TIME ZONE NOT NULL, "
+            "randomize_start_seconds INTEGER NULL, "
+            "import_limit_active_watts NUMERIC NULL, "
+            "export_limit_watts NUMERIC NULL, "
+            "generation_limit_active_watts NUMERIC NULL, "
+            "load_limit_active_watts NUMERIC NULL, "
+            "set_energized BOOLEAN NULL, "
+            "set_connected BOOLEAN NULL, "
+            "set_point_percentage NUMERIC NULL, "
+            "ramp_time_seconds NUMERIC NULL, "
+            "display_id BIGINT NULL, "
+            "storage_target_active_watts NUMERIC NULL"
+            ") ON COMMIT DELETE ROWS"
+        )
+    )
+    await session.execute(text(f"TRUNCATE {SITE_CONTROL_STAGING_TABLE_NAME}"))
+
+    # Stream the controls into the staging table (on the same connection/transaction as session)
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if driver_connection is None:
+        raise ValueError("session connection has no underlying asyncpg connection")
+    await driver_connection.copy_records_to_table(
+        SITE_CONTROL_STAGING_TABLE_NAME, records=staged_controls, columns=SITE_CONTROL_STAGING_COLUMNS
+    )
+
+
+async def _insert_staged_does(session: AsyncSession, site_control_group_id: int, changed_time: datetime) -> int:
+    """Inserts every staged control as a new DynamicOperatingEnvelope under site_control_group_id. Returns the
+    number of inserted rows"""
+    resp = await session.execute(
+        insert(DynamicOperatingEnvelope).from_select(
+            ["site_control_group_id", "changed_time", "superseded"] + SITE_CONTROL_STAGING_COLUMNS,
+            select(
+                literal(site_control_group_id, INTEGER()),
+                literal(changed_time, DateTime(timezone=True)),
+                literal(False, BOOLEAN()),
+                *[site_control_staging.c[c] for c in SITE_CONTROL_STAGING_COLUMNS],
+            ),
+        )
+    )
+    return cast(CursorResult, resp).rowcount
+
+
+async def cancel_then_insert_staged_does(
+    session: AsyncSession, site_control_group_id: int, deleted_time: datetime
+) -> int:
+    """Set based equivalent of cancel_then_insert_does for the controls in the staging table (see
+    copy_site_controls_into_staging). Existing DOEs that match a staged control on site/start time are archived and
+    deleted before the staged controls are inserted under site_control_group_id.
+
+    Returns the number of inserted controls"""
+
+    staged_keys = select(site_control_staging.c.site_id, site_control_staging.c.start_time)
+    await delete_rows_into_archive(
+        session,
+        DynamicOperatingEnvelope,
+        ArchiveDynamicOperatingEnvelope,
+        deleted_time,
+        lambda q: q.where(
+            tuple_(DynamicOperatingEnvelope.site_id, DynamicOperatingEnvelope.start_time).in_(staged_keys)
+        ),
+    )
+
+    return await _insert_staged_does(session, site_control_group_id, deleted_time)
+
+
+async def supersede_then_insert_staged_does(
+    session: AsyncSession, site_control_group_id: int, changed_time: datetime
+) -> int:
+    """Set based equivalent of supersede_then_insert_does for the controls in the staging table (see
+    copy_site_controls_into_staging). Existing DOEs overlapped by a staged control (with a conflicting field) will be
+    archived and marked as superseded before the staged controls are inserted under site_control_group_id.
+
+    Returns the number of inserted controls"""
+
+    staged = site_control_staging.c
+    incoming = select(
+        staged.site_id,
+        literal(site_control_group_id, INTEGER()).label("site_control_group_id"),
+        staged.start_time,
+        staged.end_time,
+        staged.import_limit_active_watts.is_not(None).label("has_import_limit"),
+        staged.export_limit_watts.is_not(None).label("has_export_limit"),
+        staged.generation_limit_active_watts.is_not(None).label("has_generation_limit"),
+        staged.load_limit_active_watts.is_not(None).label("has_load_limit"),
+        staged.set_energized.is_not(None).label("has_set_energized"),
+        staged.set_connected.is_not(None).label("has_set_connected"),
+        staged.set_point_percentage.is_not(None).label("has_set_point_percentage"),
+    ).subquery("incoming")
+    await _supersede_does_matching_incoming(session, incoming, changed_time)
+
+    return await _insert_staged_does(session, site_control_group_id, changed_time)
+
+
 async def supersede_matching_does_for_site(
     session: AsyncSession,
     doe_list: list[DynamicOperatingEnvelope],
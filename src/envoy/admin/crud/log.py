@@ -1,52 +1,68 @@
-from collections.abc import Sequence
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Sequence
 from datetime import datetime
 from typing import cast
 
-from sqlalchemy import Select, func, select
+from sqlalchemy import Row, Select, delete, func, insert, literal, select, true, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import noload, selectinload
 
-from envoy.server.model.log import CalculationLog
+from envoy.server.model.log import (
+    CalculationLog,
+    CalculationLogLabelValue,
+    CalculationLogVariableSeries,
+    CalculationLogVariableValue,
+)
+
+# Column order for the records passed to copy_calculation_log_variable_values
+CALCULATION_LOG_VARIABLE_VALUE_COLUMNS = [
+    "calculation_log_id",
+    "variable_id",
+    "site_id_snapshot",
+    "interval_period",
+    "value",
+]
+
+# Column order for the records passed to copy_calculation_log_variable_series
+CALCULATION_LOG_VARIABLE_SERIES_COLUMNS = ["calculation_log_id", "variable_id", "site_id_snapshot", "interval_values"]
+
+# Column order for the records passed to copy_calculation_log_label_values
+CALCULATION_LOG_LABEL_VALUE_COLUMNS = ["calculation_log_id", "label_id", "site_id_snapshot", "label"]
 
 
 async def select_calculation_log_by_id(
-    session: AsyncSession, calculation_log_id: int, include_variables: bool, include_labels: bool
+    session: AsyncSession,
+    calculation_log_id: int,
+    include_variables: bool,
+    include_labels: bool,
+    include_values: bool = True,
 ) -> CalculationLog | None:
     """Admin fetching of a calculation log by ID - returns the log with (optionally) child entities included
 
-    include_variables - If set, variable_metadata and variable_values will be populated. Otherwise will be set to []
+    include_variables - If set, variable_metadata, variable_values and variable_series will be populated. Otherwise
+                        will be set to []
     include_labels - If set, label_metadata and label_values will be populated. Otherwise will be set to []
+    include_values - If False, variable_values, variable_series and label_values will ALWAYS be set to [] (only
+                     metadata will be populated). Useful when the values will be streamed separately (see
+                     stream_variable_values)
     """
     stmt = select(CalculationLog).where(CalculationLog.calculation_log_id == calculation_log_id)
 
-    if include_variables and include_labels:
-        stmt = stmt.options(
-            selectinload(CalculationLog.variable_metadata),
-            selectinload(CalculationLog.variable_values),
-            selectinload(CalculationLog.label_metadata),
-            selectinload(CalculationLog.label_values),
-        )
-    elif include_variables:
-        stmt = stmt.options(
-            selectinload(CalculationLog.variable_metadata),
-            selectinload(CalculationLog.variable_values),
-            noload(CalculationLog.label_metadata),
-            noload(CalculationLog.label_values),
-        )
-    elif include_labels:
-        stmt = stmt.options(
-            noload(CalculationLog.variable_metadata),
-            noload(CalculationLog.variable_values),
-            selectinload(CalculationLog.label_metadata),
-            selectinload(CalculationLog.label_values),
-        )
-    else:
-        stmt = stmt.options(
-            noload(CalculationLog.variable_metadata),
-            noload(CalculationLog.variable_values),
-            noload(CalculationLog.label_metadata),
-            noload(CalculationLog.label_values),
-        )
+    include_variable_values = include_variables and include_values
+    include_label_values = include_labels and include_values
+    stmt = stmt.options(
+        selectinload(CalculationLog.variable_metadata)
+        if include_variables
+        else noload(CalculationLog.variable_metadata),
+        selectinload(CalculationLog.variable_values)
+        if include_variable_values
+        else noload(CalculationLog.variable_values),
+        selectinload(CalculationLog.variable_series)
+        if include_variable_values
+        else noload(CalculationLog.variable_series),
+        selectinload(CalculationLog.label_metadata) if include_labels else noload(CalculationLog.label_metadata),
+        selectinload(CalculationLog.label_values) if include_label_values else noload(CalculationLog.label_values),
+    )
 
     resp = await session.execute(stmt)
     return resp.scalars().one_or_none()
@@ -88,6 +104,7 @@ async def _calculation_logs_for_period(
         stmt = stmt.order_by(CalculationLog.calculation_log_id).options(
             noload(CalculationLog.variable_metadata),
             noload(CalculationLog.variable_values),
+            noload(CalculationLog.variable_series),
             noload(CalculationLog.label_metadata),
             noload(CalculationLog.label_values),
         )
@@ -115,3 +132,225 @@ async def select_calculation_logs_for_period(
         Sequence[CalculationLog],
         await _calculation_logs_for_period(False, session, period_start, period_end, start, limit),
     )
+
+
+async def _copy_records(
+    session: AsyncSession, table_name: str, columns: list[str], records: Iterable[tuple] | AsyncIterable[tuple]
+) -> None:
+    # COPY on the same connection/transaction as session. records are consumed (and sent) incrementally
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if driver_connection is None:
+        raise ValueError("session connection has no underlying asyncpg connection")
+    await driver_connection.copy_records_to_table(table_name, records=records, columns=columns)
+
+
+async def copy_calculation_log_variable_values(
+    session: AsyncSession, records: Iterable[tuple[int, int, int, int, float]]
+) -> None:
+    """Bulk inserts (via COPY) calculation_log_variable_value rows. Each record is a tuple matching
+    CALCULATION_LOG_VARIABLE_VALUE_COLUMNS. records are streamed - they will never be materialised in memory.
+
+    The parent CalculationLog must already exist (in the current transaction). Duplicate rows will raise an error"""
+    await _copy_records(
+        session,
+        CalculationLogVariableValue.__tablename__,
+        CALCULATION_LOG_VARIABLE_VALUE_COLUMNS,
+        records,
+    )
+
+
+async def copy_calculation_log_variable_series(
+    session: AsyncSession, records: Iterable[tuple[int, int, int, list[float | None]]]
+) -> None:
+    """Bulk inserts (via COPY) calculation_log_variable_series rows. Each record is a tuple matching
+    CALCULATION_LOG_VARIABLE_SERIES_COLUMNS.
+
+    The parent CalculationLog must already exist (in the current transaction). Duplicate rows will raise an error"""
+    await _copy_records(
+        session,
+        CalculationLogVariableSeries.__tablename__,
+        CALCULATION_LOG_VARIABLE_SERIES_COLUMNS,
+        records,
+    )
+
+
+async def copy_calculation_log_label_values(
+    session: AsyncSession, records: Iterable[tuple[int, int, int, str]]
+) -> None:
+    """Bulk inserts (via COPY) calculation_log_label_value rows. Each record is a tuple matching
+    CALCULATION_LOG_LABEL_VALUE_COLUMNS. records are streamed - they will never be materialised in memory.
+
+    The parent CalculationLog must already exist (in the current transaction). Duplicate rows will raise an error"""
+    await _copy_records(session, CalculationLogLabelValue.__tablename__, CALCULATION_LOG_LABEL_VALUE_COLUMNS, records)
+
+
+async def compact_calculation_log_variable_values(
+    session: AsyncSession, calculation_log_id: int, min_density: float
+) -> None:
+    """Set based (in DB) equivalent of CalculationLogMapper.map_to_variable_series for values that have already been
+    written as calculation_log_variable_value rows. Every variable_id / site_id_snapshot with at least min_density of
+    its series populated (and no negative interval_period) is moved into a single calculation_log_variable_series row
+    (interval_values[N] is interval_period N - NULL for any gaps). Everything else is left as individual values.
+
+    Nothing is loaded into memory - this is for values that were too large to group client side"""
+    dense_keys = (
+        select(
+            CalculationLogVariableValue.variable_id,
+            CalculationLogVariableValue.site_id_snapshot,
+            func.max(CalculationLogVariableValue.interval_period).label("max_interval_period"),
+        )
+        .where(CalculationLogVariableValue.calculation_log_id == calculation_log_id)
+        .group_by(CalculationLogVariableValue.variable_id, CalculationLogVariableValue.site_id_snapshot)
+        .having(func.min(CalculationLogVariableValue.interval_period) >= 0)
+        .having(func.count() >= (func.max(CalculationLogVariableValue.interval_period) + 1) * min_density)
+        .cte("dense_keys")
+    )
+
+    # Pad each series out to max_interval_period with NULLs by left joining the values onto every interval_period
+    interval_period = (
+        func.generate_series(0, dense_keys.c.max_interval_period)
+        .table_valued("interval_period")
+        .render_derived()
+        .lateral()
+    )
+    series_values = (
+        select(
+            literal(calculation_log_id),
+            dense_keys.c.variable_id,
+            dense_keys.c.site_id_snapshot,
+            func.array_agg(aggregate_order_by(CalculationLogVariableValue.value, interval_period.c.interval_period)),
+        )
+        .select_from(dense_keys)
+        .join(interval_period, true())
+        .outerjoin(
+            CalculationLogVariableValue,
+            (CalculationLogVariableValue.calculation_log_id == calculation_log_id)
+            & (CalculationLogVariableValue.variable_id == dense_keys.c.variable_id)
+            & (CalculationLogVariableValue.site_id_snapshot == dense_keys.c.site_id_snapshot)
+            & (CalculationLogVariableValue.interval_period == interval_period.c.interval_period),
+        )
+        .group_by(dense_keys.c.variable_id, dense_keys.c.site_id_snapshot)
+    )
+    await session.execute(
+        insert(CalculationLogVariableSeries).from_select(CALCULATION_LOG_VARIABLE_SERIES_COLUMNS, series_values)
+    )
+
+    await session.execute(
+        delete(CalculationLogVariableValue).where(
+            (CalculationLogVariableValue.calculation_log_id == calculation_log_id)
+            & tuple_(CalculationLogVariableValue.variable_id, CalculationLogVariableValue.site_id_snapshot).in_(
+                select(CalculationLogVariableSeries.variable_id, CalculationLogVariableSeries.site_id_snapshot).where(
+                    CalculationLogVariableSeries.calculation_log_id == calculation_log_id
+                )
+            )
+        )
+    )
+
+
+async def _merge_ordered_rows(
+    first: AsyncIterator[Row[tuple[int, int, int, float]]],
+    second: AsyncIterator[Row[tuple[int, int, int, float]]],
+    chunk_size: int,
+) -> AsyncIterator[list[Row[tuple[int, int, int, float]]]]:
+    """Merges two row iterators (each already ordered by their first 3 columns) in a single pass. Yields chunks of at
+    most chunk_size rows that maintain that same ordering"""
+    next_first = await anext(first, None)
+    next_second = await anext(second, None)
+    chunk: list[Row[tuple[int, int, int, float]]] = []
+    while next_first is not None or next_second is not None:
+        if next_first is not None and (
+            next_second is None
+            or (next_first[0], next_first[1], next_first[2]) <= (next_second[0], next_second[1], next_second[2])
+        ):
+            chunk.append(next_first)
+            next_first = await anext(first, None)
+        elif next_second is not None:
+            chunk.append(next_second)
+            next_second = await anext(second, None)
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+async def stream_variable_values(
+    session: AsyncSession, calculation_log_id: int, chunk_size: int
+) -> AsyncIterator[Sequence[Row[tuple[int, int, int, float]]]]:
+    """Pages through the variable values of a calculation log (ordered by variable_id, site_id_snapshot,
+    interval_period) using server side cursors. Yields chunks of at most chunk_size
+    (variable_id, site_id_snapshot, interval_period, value) rows - only a single chunk will ever be held in memory.
+
+    Values stored in the compact CalculationLogVariableSeries form are expanded by the DB (via unnest) and will be
+    included as if they were individual CalculationLogVariableValue rows. Each storage is read as its own stream in an
+    order that its PK already provides (no sort of the combined values) and the two streams are merged here.
+
+    The session must remain open (and not be used for anything else) until iteration completes"""
+    individual_values = await session.stream(
+        select(
+            CalculationLogVariableValue.variable_id,
+            CalculationLogVariableValue.site_id_snapshot,
+            CalculationLogVariableValue.interval_period,
+            CalculationLogVariableValue.value,
+        )
+        .where(CalculationLogVariableValue.calculation_log_id == calculation_log_id)
+        .order_by(
+            CalculationLogVariableValue.variable_id,
+            CalculationLogVariableValue.site_id_snapshot,
+            CalculationLogVariableValue.interval_period,
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+
+    # interval_values[N] (0 based) is interval_period N - WITH ORDINALITY is 1 based (and follows the array order)
+    series_element = (
+        func.unnest(CalculationLogVariableSeries.interval_values)
+        .table_valued("value", with_ordinality="ordinality")
+        .render_derived()
+    )
+    series_values = await session.stream(
+        select(
+            CalculationLogVariableSeries.variable_id,
+            CalculationLogVariableSeries.site_id_snapshot,
+            (series_element.c.ordinality - 1).label("interval_period"),
+            series_element.c.value,
+        )
+        .select_from(CalculationLogVariableSeries)
+        .join(series_element, true())
+        .where(CalculationLogVariableSeries.calculation_log_id == calculation_log_id)
+        .where(series_element.c.value.is_not(None))
+        .order_by(
+            CalculationLogVariableSeries.variable_id,
+            CalculationLogVariableSeries.site_id_snapshot,
+            series_element.c.ordinality,
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+
+    async for chunk in _merge_ordered_rows(individual_values, series_values, chunk_size):
+        yield chunk
+
+
+async def stream_label_values(
+    session: AsyncSession, calculation_log_id: int, chunk_size: int
+) -> AsyncIterator[Sequence[Row[tuple[int, int, str]]]]:
+    """Pages through the label values of a calculation log (ordered by PK) using a server side cursor. Yields chunks
+    of at most chunk_size (label_id, site_id_snapshot, label) rows - only a single chunk will ever be held in memory.
+
+    The session must remain open (and not be used for anything else) until iteration completes"""
+    result = await session.stream(
+        select(
+            CalculationLogLabelValue.label_id,
+            CalculationLogLabelValue.site_id_snapshot,
+            CalculationLogLabelValue.label,
+        )
+        .where(CalculationLogLabelValue.calculation_log_id == calculation_log_id)
+        .order_by(CalculationLogLabelValue.label_id, CalculationLogLabelValue.site_id_snapshot)
+        .execution_options(yield_per=chunk_size)
+    )
+    async for partition in result.partitions(chunk_size):
+        yield partition
@@ -15,7 +15,10 @@ async def count_site_readings_for_site_and_time(
     start_time: datetime,
     end_time: datetime,
 ) -> int:
-    """Count total site readings for a sequence of site_type_ids within a time range."""
+    """Count total site readings for a sequence of site_type_ids within a time range.
+
+    The time_period_start range filter is applied directly to SiteReading so only the overlapping monthly partitions
+    are scanned."""
 
     # Return 0 immediately if no site_type_ids provided
     if not site_type_ids:
@@ -61,7 +64,9 @@ async def select_site_readings_for_site_and_time(
     start: int = 0,
     limit: int = 500,
 ) -> Sequence[SiteReading]:
-    """Admin function to retrieve site readings for a sequence of site_type_ids within a time range."""
+    """Admin function to retrieve site readings for a sequence of site_type_ids within a time range.
+
+    As with count_site_readings_for_site_and_time, the time range will prune the scanned SiteReading partitions."""
 
     # Return empty list immediately if no site_type_ids provided
     if not site_type_ids:
@@ -1,15 +1,17 @@
 import logging
+from functools import partial
 
 import uvicorn
 from fastapi import Depends, FastAPI
 from fastapi_async_sqlalchemy import SQLAlchemyMiddleware
 
 from envoy.admin.api import routers, unsecured_routers
-from envoy.admin.api.depends import AdminAuthDepends
+from envoy.admin.api.depends import CALCULATION_LOG_COMPACT_VARIABLE_VALUES_ATTR, AdminAuthDepends
 from envoy.admin.settings import AppSettings, settings
 from envoy.notification.handler import enable_notification_client
-from envoy.server.database import enable_dynamic_azure_ad_database_credentials
+from envoy.server.database import enable_dynamic_azure_ad_database_credentials, enable_partition_maintenance
 from envoy.server.lifespan import generate_combined_lifespan_manager
+from envoy.server.manager.partition import SiteReadingPartitionManager
 
 # Setup logs
 logging.basicConfig(style="{", level=logging.INFO)
@@ -42,6 +44,20 @@ def generate_app(new_settings: AppSettings) -> FastAPI:
             )
         )
 
+    if new_settings.site_reading_partition_maintenance_enabled:
+        lifespan_managers.append(
+            enable_partition_maintenance(
+                database_url=str(new_settings.database_url),
+                maintain_partitions=partial(
+                    SiteReadingPartitionManager.maintain_partitions,
+                    months_ahead=new_settings.site_reading_partition_months_ahead,
+                    retention_months=new_settings.site_reading_partition_retention_months,
+                    drop_expired=new_settings.site_reading_partition_drop_expired,
+                ),
+                frequency_seconds=new_settings.site_reading_partition_maintenance_secs,
+            )
+        )
+
     admin_auth = AdminAuthDepends(
         new_settings.admin_username,
         new_settings.admin_password,
@@ -55,6 +71,13 @@ def generate_app(new_settings: AppSettings) -> FastAPI:
     for router in unsecured_routers:
         new_app.include_router(router)
 
+    # Inject calculation log storage setting
+    setattr(
+        new_app.state,
+        CALCULATION_LOG_COMPACT_VARIABLE_VALUES_ATTR,
+        new_settings.calculation_log_compact_variable_values,
+    )
+
     return new_app
 
 
@@ -0,0 +1,383 @@
+from collections.abc import AsyncIterator, Iterable, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from enum import IntEnum, StrEnum
+
+import numpy as np
+from envoy_schema.server.schema.sep2.types import FlowDirectionType, UomType
+from numpy.typing import NDArray
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from envoy.admin.crud.billing import (
+    BillingData,
+    fetch_aggregator,
+    fetch_sites_billing_data,
+    fetch_tariff_components,
+    stream_aggregator_billing_rows,
+)
+from envoy.admin.mapper.billing import BillingExportMapper
+from envoy.server.crud.pricing import select_single_tariff
+from envoy.server.exception import NotFoundError
+from envoy.server.model.doe import DynamicOperatingEnvelope
+from envoy.server.model.site_reading import SiteReading
+from envoy.server.model.tariff import TariffComponent, TariffGeneratedRate
+
+# How many billing rows will be fetched (and emitted) at a time when streaming a billing export
+BILLING_EXPORT_STREAM_CHUNK_SIZE = 10000
+
+
+class BillingExportFormat(StrEnum):
+    """The supported formats for streamed billing exports.
+
+    NDJSON: One JSON object (keyed by BILLING_EXPORT_COLUMNS) per line
+    CSV: A header row of BILLING_EXPORT_COLUMNS followed by one billing row per line (empty cells are None)"""
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    @property
+    def media_type(self) -> str:
+        return "text/csv" if self == BillingExportFormat.CSV else "application/x-ndjson"
+
+
+class BillingExportManager:
+    @staticmethod
+    async def assert_aggregator_exists(session: AsyncSession, aggregator_id: int) -> None:
+        """Raises NotFoundError if aggregator_id doesn't exist"""
+        if await fetch_aggregator(session, aggregator_id) is None:
+            raise NotFoundError(f"Could not find an Aggregator with ID {aggregator_id}")
+
+    @staticmethod
+    async def stream_aggregator_billing_export(
+        session: AsyncSession,
+        aggregator_id: int,
+        tariff_id: int,
+        period_start: datetime,
+        period_end: datetime,
+        export_format: BillingExportFormat,
+        chunk_size: int = BILLING_EXPORT_STREAM_CHUNK_SIZE,
+    ) -> AsyncIterator[str]:
+        """Streams the rates (for tariff_id), DOEs and Wh / W / varh readings for every site under aggregator_id that
+        start within the specified period (period_start is inclusive, period_end is exclusive). Rows are ordered by
+        site_id then time_period_start.
+
+        Rows are paged from the DB with a server side cursor (and each chunk is emitted as a single string) so memory
+        use is bounded by chunk_size rather than the size of the fleet / period"""
+        if export_format == BillingExportFormat.CSV:
+            yield BillingExportMapper.map_to_csv_header()
+
+        async for rows in stream_aggregator_billing_rows(
+            session, aggregator_id, tariff_id, period_start, period_end, chunk_size
+        ):
+            if export_format == BillingExportFormat.CSV:
+                yield BillingExportMapper.map_to_csv_lines(rows)
+            else:
+                yield BillingExportMapper.map_to_ndjson_lines(rows)
+
+
+# Billing calculations encode (site_id, epoch seconds) as a single int64 key - site_id in the upper 32 bits and time
+# in the lower 32 bits. Sorting by this key orders by site then time so a single searchsorted can align the intervals
+# of every site in the fleet at once (a key can never align with an entity from a different site)
+_SITE_ID_KEY_SHIFT = 32
+
+
+class BillingRateRole(IntEnum):
+    """What a TariffComponent's rates are applied to when calculating billing totals"""
+
+    IMPORT_ENERGY = 1  # Wh flowing to the site (any flow direction other than REVERSE)
+    EXPORT_ENERGY = 2  # Wh flowing from the site (REVERSE flow direction)
+    REACTIVE_ENERGY = 3  # varh (any flow direction)
+
+
+@dataclass
+class SiteBillingTotals:
+    """Billing totals for a single site over a billing period. Costs are in the Tariff's currency (i.e. have
+    Tariff.price_power_of_ten_multiplier applied)"""
+
+    site_id: int
+    import_wh: float  # Imported energy (W readings are used for intervals without a Wh reading)
+    export_wh: float  # Exported energy (W readings are used for intervals without a Wh reading)
+    varh: float  # Absolute reactive energy
+    import_cost: float
+    export_cost: float
+    var_cost: float
+    doe_intervals: int  # How many energy intervals started while a DOE was active
+    doe_compliant_intervals: int  # How many of doe_intervals had an average power within the DOE limits
+
+
+@dataclass
+class _Intervals:
+    """Columnar representation of a set of readings"""
+
+    site_ids: NDArray[np.int64]
+    keys: NDArray[np.int64]  # See _SITE_ID_KEY_SHIFT
+    seconds: NDArray[np.int64]
+    values: NDArray[np.float64]  # Value with the power of ten multiplier applied
+    is_export: NDArray[np.bool_]
+
+
+@dataclass
+class _Periods:
+    """Columnar representation of a set of rates / DOEs. Sorted by start_keys (ties keep their source order)"""
+
+    start_keys: NDArray[np.int64]  # See _SITE_ID_KEY_SHIFT
+    end_keys: NDArray[np.int64]  # Exclusive
+    values: list[NDArray[np.float64]]  # One array for each value associated with a period
+    # max_end_keys[p][i] is the max of end_keys[i - 2^p + 1 : i + 1] (clipped at index 0). See _lookup
+    max_end_keys: list[NDArray[np.int64]]
+
+
+def _keys(site_ids: NDArray[np.int64], times: Iterable[datetime], count: int) -> NDArray[np.int64]:
+    epoch_seconds = np.fromiter((int(t.timestamp()) for t in times), dtype=np.int64, count=count)
+    return (site_ids << _SITE_ID_KEY_SHIFT) + epoch_seconds
+
+
+def _to_intervals(readings: Sequence[SiteReading]) -> _Intervals:
+    count = len(readings)
+    types = [r.site_reading_type for r in readings]
+    site_ids = np.fromiter((t.site_id for t in types), dtype=np.int64, count=count)
+    multipliers = np.fromiter((t.power_of_ten_multiplier for t in types), dtype=np.float64, count=count)
+    return _Intervals(
+        site_ids=site_ids,
+        keys=_keys(site_ids, (r.time_period_start for r in readings), count),
+        seconds=np.fromiter((r.time_period_seconds for r in readings), dtype=np.int64, count=count),
+        values=np.fromiter((r.value for r in readings), dtype=np.float64, count=count) * np.power(10.0, multipliers),
+        is_export=np.fromiter(
+            (t.flow_direction == FlowDirectionType.REVERSE for t in types), dtype=np.bool_, count=count
+        ),
+    )
+
+
+def _select_intervals(intervals: _Intervals, mask: NDArray[np.bool_]) -> _Intervals:
+    return _Intervals(
+        site_ids=intervals.site_ids[mask],
+        keys=intervals.keys[mask],
+        seconds=intervals.seconds[mask],
+        values=intervals.values[mask],
+        is_export=intervals.is_export[mask],
+    )
+
+
+def _to_periods(
+    site_ids: Iterable[int],
+    start_times: Iterable[datetime],
+    end_times: Iterable[datetime],
+    values: list[NDArray[np.float64]],
+) -> _Periods:
+    count = len(values[0])
+    site_id_array = np.fromiter(site_ids, dtype=np.int64, count=count)
+    start_keys = _keys(site_id_array, start_times, count)
+    end_keys = _keys(site_id_array, end_times, count)
+    order = np.argsort(start_keys, kind="stable")
+    end_keys = end_keys[order]
+
+    max_end_keys = [end_keys]
+    width = 1
+    while width < count:
+        previous = max_end_keys[-1]
+        level = previous.copy()
+        level[width:] = np.maximum(previous[width:], previous[:-width])
+        max_end_keys.append(level)
+        width *= 2
+
+    return _Periods(
+        start_keys=start_keys[order],
+        end_keys=end_keys,
+        values=[v[order] for v in values],
+        max_end_keys=max_end_keys,
+    )
+
+
+def _lookup(
+    periods: _Periods, keys: NDArray[np.int64], value_index: int, fill: float
+) -> tuple[NDArray[np.bool_], NDArray[np.float64]]:
+    """For each key - finds the period that contains it. Where several (overlapping) periods contain a key, the latest
+    starting period wins (and for the same start time, the one appearing last in the source data). Returns
+    (matched, values) where values is the period's values[value_index] (or fill if there is no matching period)"""
+    if len(periods.start_keys) == 0:
+        return np.zeros(len(keys), dtype=np.bool_), np.full(len(keys), fill, dtype=np.float64)
+
+    # The winning period is the last period (in sorted order) that starts at or before the key AND ends after it. Start
+    # with the last period starting at or before the key and walk backwards (with power of two jumps, largest first)
+    # over any run of periods whose max end doesn't exceed the key - none of those can contain it. A key that walks
+    # off the start has no containing period.
+    positions = np.searchsorted(periods.start_keys, keys, side="right") - 1
+    for level in reversed(range(len(periods.max_end_keys))):
+        candidates = np.flatnonzero(positions >= 0)
+        skip = periods.max_end_keys[level][positions[candidates]] <= keys[candidates]
+        positions[candidates[skip]] -= 1 << level
+
+    matched = positions >= 0
+    indexes = np.where(matched, positions, 0)
+    return matched, np.where(matched, periods.values[value_index][indexes], fill)
+
+
+def _rate_role(component: TariffComponent) -> BillingRateRole | None:
+    if component.uom == UomType.REAL_ENERGY_WATT_HOURS:
+        if component.flow_direction == FlowDirectionType.REVERSE:
+            return BillingRateRole.EXPORT_ENERGY
+        return BillingRateRole.IMPORT_ENERGY
+    elif component.uom == UomType.REACTIVE_ENERGY_VARH:
+        return BillingRateRole.REACTIVE_ENERGY
+    return None
+
+
+def _rate_periods(rates: Sequence[TariffGeneratedRate], price_multiplier_by_component_id: dict[int, float]) -> _Periods:
+    """Rate periods with a single value - the price per (Wh / varh)"""
+    count = len(rates)
+    encoded_prices = np.fromiter((r.price_pow10_encoded for r in rates), dtype=np.float64, count=count)
+    multipliers = np.fromiter(
+        (price_multiplier_by_component_id[r.tariff_component_id] for r in rates), dtype=np.float64, count=count
+    )
+    return _to_periods(
+        (r.site_id for r in rates),
+        (r.start_time for r in rates),
+        (r.end_time for r in rates),
+        [encoded_prices * multipliers],
+    )
+
+
+def _doe_periods(does: Sequence[DynamicOperatingEnvelope]) -> _Periods:
+    """DOE periods with two values - the absolute import / export limits (in watts). NaN if there is no limit"""
+    count = len(does)
+
+    def limits(values: Iterable[Decimal | None]) -> NDArray[np.float64]:
+        return np.abs(np.fromiter((np.nan if v is None else float(v) for v in values), dtype=np.float64, count=count))
+
+    return _to_periods(
+        (d.site_id for d in does),
+        (d.start_time for d in does),
+        (d.end_time for d in does),
+        [limits(d.import_limit_active_watts for d in does), limits(d.export_limit_watts for d in does)],
+    )
+
+
+def _energy_intervals(billing_data: BillingData) -> _Intervals:
+    """Merges the Wh readings with the W readings (converted to Wh) for any interval without a Wh reading in the
+    same flow direction"""
+    wh = _to_intervals(billing_data.wh_readings)
+    watts = _to_intervals(billing_data.watt_readings)
+
+    covered = np.zeros(len(watts.keys), dtype=np.bool_)
+    for is_export in (False, True):
+        watt_mask = watts.is_export == is_export
+        covered[watt_mask] = np.isin(watts.keys[watt_mask], wh.keys[wh.is_export == is_export])
+    watts = _select_intervals(watts, ~covered)
+    watts.values = watts.values * watts.seconds / 3600.0
+
+    return _Intervals(
+        site_ids=np.concatenate([wh.site_ids, watts.site_ids]),
+        keys=np.concatenate([wh.keys, watts.keys]),
+        seconds=np.concatenate([wh.seconds, watts.seconds]),
+        values=np.concatenate([wh.values, watts.values]),
+        is_export=np.concatenate([wh.is_export, watts.is_export]),
+    )
+
+
+def calculate_site_billing_totals(
+    billing_data: BillingData,
+    tariff_components: Sequence[TariffComponent],
+    price_power_of_ten_multiplier: int,
+) -> list[SiteBillingTotals]:
+    """Calculates per site billing totals for billing_data using vectorised (numpy) operations. Every reading, rate
+    and DOE for the entire fleet is converted to arrays and aligned on interval start in a single pass (rather than
+    iterating each site / reading).
+
+    tariff_components: The components of the tariff that billing_data's rates belong to. Determines what each rate
+        is priced against (see BillingRateRole). A component's power_of_ten_multiplier scales the priced unit (eg 3 for
+        a per kWh price). Rates for any other component uom are ignored.
+    price_power_of_ten_multiplier: The Tariff.price_power_of_ten_multiplier for decoding TariffGeneratedRate prices
+
+    Readings are priced by the rate (of the matching role) whose period contains the reading's start. Block 1 prices
+    are not applied. Where rates (or DOEs) overlap, the latest starting one applies (see _lookup). Returns totals for
+    every site referenced in billing_data ordered by site_id."""
+    rates_by_role: dict[BillingRateRole, list[TariffGeneratedRate]] = {role: [] for role in BillingRateRole}
+    price_multiplier_by_component_id: dict[int, float] = {}
+    role_by_component_id: dict[int, BillingRateRole | None] = {}
+    for component in tariff_components:
+        role_by_component_id[component.tariff_component_id] = _rate_role(component)
+        price_multiplier_by_component_id[component.tariff_component_id] = 10.0 ** (
+            price_power_of_ten_multiplier - (component.power_of_ten_multiplier or 0)
+        )
+    for rate in billing_data.active_tariffs:
+        role = role_by_component_id.get(rate.tariff_component_id, None)
+        if role is not None:
+            rates_by_role[role].append(rate)
+    rate_periods = {
+        role: _rate_periods(rates, price_multiplier_by_component_id) for role, rates in rates_by_role.items()
+    }
+
+    energy = _energy_intervals(billing_data)
+    reactive = _to_intervals(billing_data.varh_readings)
+    reactive.values = np.abs(reactive.values)
+
+    # Price every interval
+    _, import_prices = _lookup(rate_periods[BillingRateRole.IMPORT_ENERGY], energy.keys, 0, 0.0)
+    _, export_prices = _lookup(rate_periods[BillingRateRole.EXPORT_ENERGY], energy.keys, 0, 0.0)
+    energy_prices = np.where(energy.is_export, export_prices, import_prices)
+    _, reactive_prices = _lookup(rate_periods[BillingRateRole.REACTIVE_ENERGY], reactive.keys, 0, 0.0)
+
+    # DOE compliance - compare average power over each energy interval with the DOE active at the interval start
+    does = _doe_periods(billing_data.active_does)
+    doe_matched, import_limits = _lookup(does, energy.keys, 0, np.nan)
+    _, export_limits = _lookup(does, energy.keys, 1, np.nan)
+    limits = np.where(energy.is_export, export_limits, import_limits)
+    average_watts = np.abs(energy.values) * 3600.0 / np.maximum(energy.seconds, 1)
+    doe_compliant = doe_matched & (np.isnan(limits) | (average_watts <= limits))
+
+    # Aggregate per site
+    rate_site_ids = np.fromiter((r.site_id for r in billing_data.active_tariffs), dtype=np.int64)
+    doe_site_ids = np.fromiter((d.site_id for d in billing_data.active_does), dtype=np.int64)
+    site_ids = np.unique(np.concatenate([energy.site_ids, reactive.site_ids, rate_site_ids, doe_site_ids]))
+    energy_site = np.searchsorted(site_ids, energy.site_ids)
+    reactive_site = np.searchsorted(site_ids, reactive.site_ids)
+    site_count = len(site_ids)
+
+    def per_site(weights: NDArray, mask: NDArray[np.bool_] | None = None) -> NDArray[np.float64]:
+        if mask is not None:
+            weights = np.where(mask, weights, 0)
+        # bincount is typed as returning integers - with weights it's always float64
+        return np.bincount(energy_site, weights=weights, minlength=site_count).astype(np.float64, copy=False)
+
+    energy_costs = energy.values * energy_prices
+    import_wh = per_site(energy.values, ~energy.is_export)
+    export_wh = per_site(energy.values, energy.is_export)
+    import_cost = per_site(energy_costs, ~energy.is_export)
+    export_cost = per_site(energy_costs, energy.is_export)
+    doe_intervals = per_site(doe_matched.astype(np.float64))
+    doe_compliant_intervals = per_site(doe_compliant.astype(np.float64))
+    varh = np.bincount(reactive_site, weights=reactive.values, minlength=site_count)
+    var_cost = np.bincount(reactive_site, weights=reactive.values * reactive_prices, minlength=site_count)
+
+    return [
+        SiteBillingTotals(
+            site_id=int(site_ids[i]),
+            import_wh=float(import_wh[i]),
+            export_wh=float(export_wh[i]),
+            varh=float(varh[i]),
+            import_cost=float(import_cost[i]),
+            export_cost=float(export_cost[i]),
+            var_cost=float(var_cost[i]),
+            doe_intervals=int(doe_intervals[i]),
+            doe_compliant_intervals=int(doe_compliant_intervals[i]),
+        )
+        for i in range(site_count)
+    ]
+
+
+class BillingCalculationManager:
+    @staticmethod
+    async def calculate_sites_billing(
+        session: AsyncSession, site_ids: list[int], tariff_id: int, period_start: datetime, period_end: datetime
+    ) -> list[SiteBillingTotals]:
+        """Fetches the billing data for site_ids over the specified period (see fetch_sites_billing_data) and
+        calculates the per site totals (see calculate_site_billing_totals). Raises NotFoundError if tariff_id doesn't
+        exist"""
+        tariff = await select_single_tariff(session, tariff_id)
+        if tariff is None:
+            raise NotFoundError(f"Could not find a Tariff with ID {tariff_id}")
+
+        tariff_components = await fetch_tariff_components(session, tariff_id)
+        billing_data = await fetch_sites_billing_data(session, site_ids, tariff_id, period_start, period_end)
+        return calculate_site_billing_totals(billing_data, tariff_components, tariff.price_power_of_ten_multiplier or 0)
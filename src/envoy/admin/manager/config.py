@@ -4,8 +4,8 @@ from envoy_schema.admin.schema.config import RuntimeServerConfigRequest, Runtime
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.notification.manager.notification import NotificationManager
-from envoy.server.crud.server import select_server_config
-from envoy.server.manager.server import _map_server_config
+from envoy.server.crud.server import notify_server_config_changed, select_server_config
+from envoy.server.manager.server import RUNTIME_SERVER_CONFIG_CHANNEL, RuntimeServerConfigManager, _map_server_config
 from envoy.server.manager.time import utc_now
 from envoy.server.model.server import RuntimeServerConfig as ConfigEntity
 from envoy.server.model.subscription import SubscriptionResource
@@ -64,7 +64,10 @@ class ConfigManager:
         if updated_values.disable_edev_registration is not None:
             existing_db_config.disable_edev_registration = updated_values.disable_edev_registration
 
+        # Any process caching the config will be told to drop their cache once this commits
+        await notify_server_config_changed(session, RUNTIME_SERVER_CONFIG_CHANNEL)
         await session.commit()
+        await RuntimeServerConfigManager.invalidate_cache()
 
         if changed_fsal_pollrate:
             await NotificationManager.notify_changed_deleted_entities(
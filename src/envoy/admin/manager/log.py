@@ -1,16 +1,74 @@
+import json
+from collections.abc import AsyncIterable, AsyncIterator
 from datetime import datetime
 
-from envoy_schema.admin.schema.log import CalculationLogListResponse, CalculationLogRequest, CalculationLogResponse
+from envoy_schema.admin.schema.log import (
+    CalculationLogLabelValues,
+    CalculationLogListResponse,
+    CalculationLogRequest,
+    CalculationLogResponse,
+    CalculationLogVariableValues,
+)
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.admin.crud.log import (
+    compact_calculation_log_variable_values,
+    copy_calculation_log_label_values,
+    copy_calculation_log_variable_series,
+    copy_calculation_log_variable_values,
     count_calculation_logs_for_period,
     select_calculation_log_by_id,
     select_calculation_logs_for_period,
+    stream_label_values,
+    stream_variable_values,
 )
-from envoy.admin.mapper.log import CalculationLogMapper
+from envoy.admin.manager.upload import iterate_lines
+from envoy.admin.mapper.log import VARIABLE_SERIES_MIN_DENSITY, CalculationLogMapper
+from envoy.server.exception import BadRequestError
 from envoy.server.manager.time import utc_now
 
+# How many variable/label values will be fetched (and emitted) at a time when streaming a calculation log
+CALCULATION_LOG_STREAM_CHUNK_SIZE = 10000
+
+
+async def parse_calculation_log_upload(
+    chunks: AsyncIterable[bytes],
+) -> AsyncIterator[CalculationLogRequest | CalculationLogVariableValues | CalculationLogLabelValues]:
+    """Incrementally parses/validates a streamed NDJSON calculation log upload. This is the same format produced by
+    stream_calculation_log_by_id:
+
+        The first line is the CalculationLogRequest (variable_values / label_values can be null)
+        Subsequent lines are {"variable_values": CalculationLogVariableValues}
+            or {"label_values": CalculationLogLabelValues}
+
+    The CalculationLogRequest will always be yielded first - followed by each of the values chunks (one at a time).
+
+    Raises BadRequestError (identifying the offending line) on the first malformed/invalid line"""
+    is_first_line = True
+    try:
+        async for line_number, line in iterate_lines(chunks):
+            try:
+                if is_first_line:
+                    is_first_line = False
+                    yield CalculationLogRequest.model_validate_json(line)
+                    continue
+
+                values_chunk = json.loads(line)
+                if not isinstance(values_chunk, dict) or len(values_chunk) != 1:
+                    raise BadRequestError(f"Line {line_number}: expected a single variable_values or label_values key")
+
+                if "variable_values" in values_chunk:
+                    yield CalculationLogVariableValues.model_validate(values_chunk["variable_values"])
+                elif "label_values" in values_chunk:
+                    yield CalculationLogLabelValues.model_validate(values_chunk["label_values"])
+                else:
+                    raise BadRequestError(f"Line {line_number}: expected a single variable_values or label_values key")
+            except (ValidationError, ValueError) as exc:
+                raise BadRequestError(f"Line {line_number}: {exc}") from exc
+    except UnicodeDecodeError as exc:
+        raise BadRequestError(f"Upload is not valid UTF-8: {exc}") from exc
+
 
 class CalculationLogManager:
     @staticmethod
@@ -26,6 +84,47 @@ class CalculationLogManager:
             return log
         return CalculationLogMapper.map_to_response(log)
 
+    @staticmethod
+    async def get_calculation_log_header_by_id(
+        session: AsyncSession, calculation_log_id: int, include_variables: bool, include_labels: bool
+    ) -> CalculationLogResponse | None:
+        """Similar to get_calculation_log_by_id but will only include the variable/label metadata - variable_values and
+        label_values will always be None. The values should be fetched via stream_calculation_log_values"""
+        log = await select_calculation_log_by_id(
+            session,
+            calculation_log_id,
+            include_variables=include_variables,
+            include_labels=include_labels,
+            include_values=False,
+        )
+        if log is None:
+            return log
+        return CalculationLogMapper.map_to_response(log)
+
+    @staticmethod
+    async def stream_calculation_log_values(
+        session: AsyncSession,
+        calculation_log_id: int,
+        include_variables: bool,
+        include_labels: bool,
+        chunk_size: int = CALCULATION_LOG_STREAM_CHUNK_SIZE,
+    ) -> AsyncIterator[str]:
+        """Streams the variable values and then the label values of a calculation log as NDJSON lines. Each line will
+        be a JSON object with a single "variable_values" or "label_values" key whose value is a chunk (of up to
+        chunk_size entries) in the same columnar form as CalculationLogResponse. Concatenating the chunks (in order)
+        will yield the equivalent CalculationLogResponse values.
+
+        Values are paged from the DB with a server side cursor so memory use is bounded by chunk_size"""
+        if include_variables:
+            async for variable_rows in stream_variable_values(session, calculation_log_id, chunk_size):
+                chunk = CalculationLogMapper.map_to_variable_values_chunk(variable_rows)
+                yield '{"variable_values":' + chunk.model_dump_json() + "}\n"
+
+        if include_labels:
+            async for label_rows in stream_label_values(session, calculation_log_id, chunk_size):
+                label_chunk = CalculationLogMapper.map_to_label_values_chunk(label_rows)
+                yield '{"label_values":' + label_chunk.model_dump_json() + "}\n"
+
     @staticmethod
     async def get_calculation_logs_by_period(
         session: AsyncSession, period_start: datetime, period_end: datetime, start: int, limit: int
@@ -37,12 +136,106 @@ class CalculationLogManager:
         return CalculationLogMapper.map_to_list_response(logs, count, start, limit)
 
     @staticmethod
-    async def save_calculation_log(session: AsyncSession, calculation_log: CalculationLogRequest) -> int:
-        """Saves the specified calculation_log into the database"""
+    async def save_calculation_log(
+        session: AsyncSession, calculation_log: CalculationLogRequest, compact_variable_values: bool = False
+    ) -> int:
+        """Saves the specified calculation_log into the database. The parent log (and metadata) are inserted first to
+        generate the calculation_log_id and then the (potentially very large) variable / label values are written via
+        COPY - they are never mapped into ORM instances. calculation_log itself is already fully parsed in memory - see
+        save_calculation_log_upload for logs that are too large for that.
+
+        compact_variable_values: If True, variable values will be stored as one CalculationLogVariableSeries per
+        variable_id / site_id instead of one CalculationLogVariableValue per value (sparse variable_id / site_id
+        combinations will still be stored as CalculationLogVariableValue). Raises ValueError if the values can't be
+        encoded this way (negative or duplicated interval_period)"""
         changed_time = utc_now()
-        new_log = CalculationLogMapper.map_from_request(changed_time, calculation_log)
+        new_log = CalculationLogMapper.map_from_request_without_values(changed_time, calculation_log)
+
+        # The series encoding must be fully grouped before it can be written - do it first so bad values fail fast
+        compact_values = (
+            CalculationLogMapper.map_to_variable_series(calculation_log.variable_values)
+            if compact_variable_values
+            else None
+        )
+
+        session.add(new_log)
+        await session.flush()
+        calculation_log_id = new_log.calculation_log_id
+
+        if compact_values is not None:
+            variable_series, sparse_values = compact_values
+            await copy_calculation_log_variable_series(
+                session,
+                ((calculation_log_id, var_id, site_id, values) for var_id, site_id, values in variable_series),
+            )
+            await copy_calculation_log_variable_values(
+                session,
+                (
+                    (calculation_log_id, var_id, site_id, interval_period, value)
+                    for var_id, site_id, interval_period, value in sparse_values
+                ),
+            )
+        elif calculation_log.variable_values is not None:
+            await copy_calculation_log_variable_values(
+                session,
+                CalculationLogMapper.map_to_variable_value_records(calculation_log_id, calculation_log.variable_values),
+            )
+        if calculation_log.label_values is not None:
+            await copy_calculation_log_label_values(
+                session,
+                CalculationLogMapper.map_to_label_value_records(calculation_log_id, calculation_log.label_values),
+            )
+        await session.commit()
+
+        return calculation_log_id
+
+    @staticmethod
+    async def save_calculation_log_upload(
+        session: AsyncSession, chunks: AsyncIterable[bytes], compact_variable_values: bool = False
+    ) -> int:
+        """Streaming equivalent of save_calculation_log for very large calculation logs. chunks is parsed/validated
+        incrementally (see parse_calculation_log_upload) and each values chunk is written via COPY as it arrives, so
+        memory use is bounded by the largest line of the upload rather than the size of the calculation log.
+
+        compact_variable_values: The same as save_calculation_log except the grouping into series happens in the DB
+        once every value has been written (see compact_calculation_log_variable_values). A variable_id / site_id with a
+        negative interval_period is kept as individual values rather than raising an error.
 
+        Raises BadRequestError if chunks is malformed/invalid"""
+        uploaded = parse_calculation_log_upload(chunks)
+        calculation_log = await anext(uploaded, None)
+        if not isinstance(calculation_log, CalculationLogRequest):
+            raise BadRequestError("Upload must start with a CalculationLogRequest line")
+
+        new_log = CalculationLogMapper.map_from_request_without_values(utc_now(), calculation_log)
         session.add(new_log)
+        await session.flush()
+        calculation_log_id = new_log.calculation_log_id
+
+        # The first line can include values too - they are written first (in the same way as every subsequent chunk)
+        if calculation_log.variable_values is not None:
+            await copy_calculation_log_variable_values(
+                session,
+                CalculationLogMapper.map_to_variable_value_records(calculation_log_id, calculation_log.variable_values),
+            )
+        if calculation_log.label_values is not None:
+            await copy_calculation_log_label_values(
+                session,
+                CalculationLogMapper.map_to_label_value_records(calculation_log_id, calculation_log.label_values),
+            )
+
+        async for values_chunk in uploaded:
+            if isinstance(values_chunk, CalculationLogVariableValues):
+                await copy_calculation_log_variable_values(
+                    session, CalculationLogMapper.map_to_variable_value_records(calculation_log_id, values_chunk)
+                )
+            elif isinstance(values_chunk, CalculationLogLabelValues):
+                await copy_calculation_log_label_values(
+                    session, CalculationLogMapper.map_to_label_value_records(calculation_log_id, values_chunk)
+                )
+
+        if compact_variable_values:
+            await compact_calculation_log_variable_values(session, calculation_log_id, VARIABLE_SERIES_MIN_DENSITY)
         await session.commit()
 
-        return new_log.calculation_log_id
+        return calculation_log_id
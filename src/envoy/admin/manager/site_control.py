@@ -1,5 +1,8 @@
+import csv
+from collections.abc import AsyncIterable, AsyncIterator
 from datetime import datetime
 from decimal import Decimal
+from enum import StrEnum
 from typing import cast
 
 from envoy_schema.admin.schema.base import BatchCreateResponse
@@ -12,9 +15,12 @@ from envoy_schema.admin.schema.site_control import (
     SiteControlPageResponse,
     SiteControlRequest,
 )
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.admin.crud.doe import (
+    cancel_then_insert_staged_does,
+    copy_site_controls_into_staging,
     count_all_does,
     count_all_site_control_groups,
     delete_all_site_control_groups_into_archive,
@@ -22,7 +28,9 @@ from envoy.admin.crud.doe import (
     select_all_does,
     select_all_site_control_groups,
     supersede_then_insert_does,
+    supersede_then_insert_staged_does,
 )
+from envoy.admin.manager.upload import iterate_lines
 from envoy.admin.mapper.site_control import SiteControlGroupListMapper, SiteControlListMapper
 from envoy.notification.manager.notification import NotificationManager
 from envoy.server.crud.archive import copy_rows_into_archive
@@ -34,6 +42,47 @@ from envoy.server.model.doe import SiteControlGroup, SiteControlGroupDefault
 from envoy.server.model.subscription import SubscriptionResource
 
 
+class SiteControlUploadFormat(StrEnum):
+    """The supported body formats for streamed (bulk) site control uploads. Values are the corresponding Content-Type.
+
+    NDJSON: One SiteControlRequest JSON object per line
+    CSV: A header row of SiteControlRequest field names followed by one control per row (empty cells are None)"""
+
+    NDJSON = "application/x-ndjson"
+    CSV = "text/csv"
+
+
+async def parse_site_control_upload(
+    upload_format: SiteControlUploadFormat, chunks: AsyncIterable[bytes]
+) -> AsyncIterator[SiteControlRequest]:
+    """Incrementally parses/validates a streamed upload body into SiteControlRequest instances (one at a time).
+
+    Raises BadRequestError (identifying the offending line) on the first malformed/invalid row"""
+    header: list[str] | None = None
+    try:
+        async for line_number, line in iterate_lines(chunks):
+            try:
+                if upload_format == SiteControlUploadFormat.NDJSON:
+                    control = SiteControlRequest.model_validate_json(line)
+                else:
+                    values = next(csv.reader([line]))
+                    if header is None:
+                        header = values
+                        continue
+                    if len(values) != len(header):
+                        raise BadRequestError(f"Line {line_number}: expected {len(header)} values, got {len(values)}")
+                    # An empty cell is an explicit None for that column (not an omitted value)
+                    control = SiteControlRequest.model_validate(
+                        {k: (None if v == "" else v) for k, v in zip(header, values, strict=True)}
+                    )
+            except ValidationError as exc:
+                raise BadRequestError(f"Line {line_number}: {exc}") from exc
+
+            yield control
+    except UnicodeDecodeError as exc:
+        raise BadRequestError(f"Upload is not valid UTF-8: {exc}") from exc
+
+
 class SiteControlGroupManager:
     @staticmethod
     async def create_site_control_group(session: AsyncSession, request: SiteControlGroupRequest) -> int:
@@ -297,6 +346,44 @@ class SiteControlListManager:
 
         return BatchCreateResponse(ids=cast(list[int], inserted_ids))
 
+    @staticmethod
+    async def upload_site_controls(
+        session: AsyncSession,
+        site_control_group_id: int,
+        upload_format: SiteControlUploadFormat,
+        chunks: AsyncIterable[bytes],
+        cancel_existing: bool,
+    ) -> int:
+        """Streaming equivalent of add_many_site_control for very large uploads. chunks is parsed/validated
+        incrementally and streamed (via COPY) into a staging table before being inserted with set based statements.
+        Neither the raw body nor the parsed controls are held in memory.
+
+        cancel_existing: If True - existing controls matching an uploaded control on site/start time will be cancelled
+                         (deleted). Otherwise overlapping controls will be superseded (as per add_many_site_control)
+
+        Returns the number of inserted controls. Raises NotFoundError / BadRequestError"""
+
+        changed_time = utc_now()
+        if await select_site_control_group_by_id(session, site_control_group_id) is None:
+            raise NotFoundError(f"Could not find a SiteControlGroup with ID {site_control_group_id}")
+
+        await copy_site_controls_into_staging(
+            session,
+            (SiteControlListMapper.map_to_staged(c) async for c in parse_site_control_upload(upload_format, chunks)),
+        )
+        if cancel_existing:
+            inserted_count = await cancel_then_insert_staged_does(session, site_control_group_id, changed_time)
+        else:
+            inserted_count = await supersede_then_insert_staged_does(session, site_control_group_id, changed_time)
+        await session.commit()
+
+        if inserted_count:
+            await NotificationManager.notify_changed_deleted_entities(
+                SubscriptionResource.DYNAMIC_OPERATING_ENVELOPE, changed_time
+            )
+
+        return inserted_count
+
     @staticmethod
     async def get_all_site_controls(
         session: AsyncSession, site_control_group_id: int, start: int, limit: int, changed_after: datetime | None
@@ -0,0 +1,19 @@
+from collections.abc import AsyncIterable, AsyncIterator
+
+
+async def iterate_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, str]]:
+    """Splits a stream of (arbitrarily sized) byte chunks (eg a streamed request body) into (line_number, line) tuples.
+    Blank lines are skipped. Only a single line is ever buffered."""
+    line_number = 0
+    remainder = b""
+    async for chunk in chunks:
+        *lines, remainder = (remainder + chunk).split(b"\n")
+        for raw_line in lines:
+            line_number += 1
+            line = raw_line.decode("utf-8", errors="strict").strip()
+            if line:
+                yield line_number, line
+
+    line = remainder.decode("utf-8", errors="strict").strip()
+    if line:
+        yield line_number + 1, line
@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+from collections.abc import Sequence
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import Row
+
+from envoy.admin.crud.billing import BILLING_EXPORT_COLUMNS
+
+
+class BillingExportMapper:
+    @staticmethod
+    def _to_json_value(value: object) -> object:
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)  # Billing values must never lose precision to a float
+        return value
+
+    @staticmethod
+    def map_to_csv_header() -> str:
+        """The CSV header line (matching map_to_csv_lines) - includes the trailing newline"""
+        return ",".join(BILLING_EXPORT_COLUMNS) + "\n"
+
+    @staticmethod
+    def map_to_csv_lines(rows: Sequence[Row]) -> str:
+        """Maps rows (matching BILLING_EXPORT_COLUMNS) to CSV lines (one per row, None is an empty cell). Each line
+        includes a trailing newline"""
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerows((v.isoformat() if isinstance(v, datetime) else v for v in row) for row in rows)
+        return output.getvalue()
+
+    @staticmethod
+    def map_to_ndjson_lines(rows: Sequence[Row]) -> str:
+        """Maps rows (matching BILLING_EXPORT_COLUMNS) to NDJSON lines (one JSON object per row, keyed by column
+        name). Decimal values are encoded as JSON strings. Each line includes a trailing newline"""
+        lines: list[str] = []
+        for row in rows:
+            values = (BillingExportMapper._to_json_value(v) for v in row)
+            lines.append(json.dumps(dict(zip(BILLING_EXPORT_COLUMNS, values, strict=True))) + "\n")
+        return "".join(lines)
@@ -1,5 +1,7 @@
-from collections.abc import Sequence
+import heapq
+from collections.abc import Iterable, Iterator, Sequence
 from datetime import datetime
+from typing import Any
 
 from envoy_schema.admin.schema.log import CalculationLogLabelMetadata as PublicLabelMetadata
 from envoy_schema.admin.schema.log import CalculationLogLabelValues as PublicLabelValues
@@ -12,45 +14,73 @@ from envoy.server.model.log import (
     CalculationLogLabelMetadata,
     CalculationLogLabelValue,
     CalculationLogVariableMetadata,
+    CalculationLogVariableSeries,
     CalculationLogVariableValue,
 )
 
+# The minimum fraction of interval_values that must be populated for a variable_id / site_id to be stored as a
+# CalculationLogVariableSeries (see CalculationLogMapper.map_to_variable_series)
+VARIABLE_SERIES_MIN_DENSITY = 0.25
+
 
 class CalculationLogMapper:
     @staticmethod
-    def map_from_request(changed_time: datetime, calculation_log: CalculationLogRequest) -> CalculationLog:
+    def map_from_request(
+        changed_time: datetime, calculation_log: CalculationLogRequest, compact_variable_values: bool = False
+    ) -> CalculationLog:
+        """compact_variable_values: If True, variable values will be split between variable_series and variable_values
+        in the same way as CalculationLogManager.save_calculation_log (see map_to_variable_series). Otherwise every
+        value will be mapped to variable_values"""
+        new_log = CalculationLogMapper.map_from_request_without_values(changed_time, calculation_log)
 
-        var_vals = calculation_log.variable_values
-        if var_vals is None:
-            variable_values = []
-        else:
-            variable_values = [
-                CalculationLogVariableValue(
+        if compact_variable_values:
+            variable_series, variable_values = CalculationLogMapper.map_to_variable_series(
+                calculation_log.variable_values
+            )
+            new_log.variable_series = [
+                CalculationLogVariableSeries(
                     variable_id=variable_id,
-                    site_id_snapshot=0 if site_id is None else site_id,
-                    interval_period=interval_period,
-                    value=value,
-                )
-                for variable_id, site_id, interval_period, value in zip(
-                    var_vals.variable_ids, var_vals.site_ids, var_vals.interval_periods, var_vals.values, strict=False
+                    site_id_snapshot=site_id_snapshot,
+                    interval_values=interval_values,
                 )
+                for variable_id, site_id_snapshot, interval_values in variable_series
             ]
-
-        label_vals = calculation_log.label_values
-        if label_vals is None:
-            label_values = []
         else:
-            label_values = [
-                CalculationLogLabelValue(
-                    label_id=label_id,
-                    site_id_snapshot=0 if site_id is None else site_id,
-                    label=value,
-                )
-                for label_id, site_id, value in zip(
-                    label_vals.label_ids, label_vals.site_ids, label_vals.values, strict=False
+            variable_values = [
+                (variable_id, site_id_snapshot, interval_period, value)
+                for _, variable_id, site_id_snapshot, interval_period, value in (
+                    CalculationLogMapper.map_to_variable_value_records(0, calculation_log.variable_values)
                 )
             ]
 
+        new_log.variable_values = [
+            CalculationLogVariableValue(
+                variable_id=variable_id,
+                site_id_snapshot=site_id_snapshot,
+                interval_period=interval_period,
+                value=value,
+            )
+            for variable_id, site_id_snapshot, interval_period, value in variable_values
+        ]
+        new_log.label_values = [
+            CalculationLogLabelValue(
+                label_id=label_id,
+                site_id_snapshot=site_id_snapshot,
+                label=value,
+            )
+            for _, label_id, site_id_snapshot, value in (
+                CalculationLogMapper.map_to_label_value_records(0, calculation_log.label_values)
+            )
+        ]
+        return new_log
+
+    @staticmethod
+    def map_from_request_without_values(
+        changed_time: datetime, calculation_log: CalculationLogRequest
+    ) -> CalculationLog:
+        """Maps calculation_log (and its metadata) but leaves variable_values / label_values empty. The values are
+        expected to be persisted separately (see map_to_variable_value_records / map_to_variable_series /
+        map_to_label_value_records)"""
         return CalculationLog(
             created_time=changed_time,
             calculation_range_start=calculation_log.calculation_range_start,
@@ -71,7 +101,8 @@ class CalculationLogMapper:
                 )
                 for e in calculation_log.variable_metadata
             ],
-            variable_values=variable_values,
+            variable_values=[],
+            variable_series=[],
             label_metadata=[
                 CalculationLogLabelMetadata(
                     label_id=e.label_id,
@@ -80,9 +111,115 @@ class CalculationLogMapper:
                 )
                 for e in calculation_log.label_metadata
             ],
-            label_values=label_values,
+            label_values=[],
         )
 
+    @staticmethod
+    def map_to_variable_value_records(
+        calculation_log_id: int, var_vals: PublicVariableValues | None
+    ) -> Iterator[tuple[int, int, int, int, float]]:
+        """Lazily decodes the columnar var_vals into calculation_log_variable_value rows of the form:
+        (calculation_log_id, variable_id, site_id_snapshot, interval_period, value)"""
+        if var_vals is None:
+            return
+
+        for variable_id, site_id, interval_period, value in zip(
+            var_vals.variable_ids, var_vals.site_ids, var_vals.interval_periods, var_vals.values, strict=False
+        ):
+            yield (calculation_log_id, variable_id, 0 if site_id is None else site_id, interval_period, value)
+
+    @staticmethod
+    def map_to_variable_series(
+        var_vals: PublicVariableValues | None,
+    ) -> tuple[list[tuple[int, int, list[float | None]]], list[tuple[int, int, int, float]]]:
+        """Groups the columnar var_vals into series of the form (variable_id, site_id_snapshot, interval_values) - the
+        inverse of expand_variable_series. Series will be ordered by variable_id, site_id_snapshot. interval_values[N]
+        holds the value for interval_period N (None if there is no value).
+
+        Padding a sparse variable_id / site_id (eg a single value at a very large interval_period) into a series could
+        be arbitrarily large so any combination whose series would have less than VARIABLE_SERIES_MIN_DENSITY of its
+        interval_values populated is instead returned as individual (variable_id, site_id_snapshot, interval_period,
+        value) values (ordered the same as the series) to be stored as CalculationLogVariableValue.
+
+        Returns (series, sparse_values)
+
+        Raises ValueError if an interval_period is negative (it can't be an array index) or if the same
+        variable_id / site_id / interval_period is specified more than once"""
+        if var_vals is None:
+            return [], []
+
+        values_by_key: dict[tuple[int, int], dict[int, float]] = {}
+        for variable_id, site_id, interval_period, value in zip(
+            var_vals.variable_ids, var_vals.site_ids, var_vals.interval_periods, var_vals.values, strict=False
+        ):
+            if interval_period < 0:
+                raise ValueError(f"variable_id {variable_id} has a negative interval_period {interval_period}.")
+
+            values_by_period = values_by_key.setdefault((variable_id, 0 if site_id is None else site_id), {})
+            if interval_period in values_by_period:
+                raise ValueError(
+                    f"variable_id {variable_id} site_id {site_id} interval_period {interval_period} is duplicated."
+                )
+            values_by_period[interval_period] = value
+
+        series: list[tuple[int, int, list[float | None]]] = []
+        sparse_values: list[tuple[int, int, int, float]] = []
+        for (variable_id, site_id_snapshot), values_by_period in sorted(values_by_key.items()):
+            series_length = max(values_by_period) + 1
+            if len(values_by_period) < series_length * VARIABLE_SERIES_MIN_DENSITY:
+                sparse_values.extend(
+                    (variable_id, site_id_snapshot, interval_period, values_by_period[interval_period])
+                    for interval_period in sorted(values_by_period)
+                )
+                continue
+
+            interval_values: list[float | None] = [None] * series_length
+            for interval_period, value in values_by_period.items():
+                interval_values[interval_period] = value
+            series.append((variable_id, site_id_snapshot, interval_values))
+
+        return series, sparse_values
+
+    @staticmethod
+    def expand_variable_series(
+        series_rows: Iterable[tuple[int, int, list[float | None]]],
+    ) -> Iterator[tuple[int, int, int, float]]:
+        """Lazily expands (variable_id, site_id_snapshot, interval_values) series rows into individual
+        (variable_id, site_id_snapshot, interval_period, value) values - skipping any interval_period without a value.
+        The expanded values will maintain the order of series_rows (with ascending interval_period)"""
+        for variable_id, site_id_snapshot, interval_values in series_rows:
+            for interval_period, value in enumerate(interval_values):
+                if value is not None:
+                    yield (variable_id, site_id_snapshot, interval_period, value)
+
+    @staticmethod
+    def map_to_label_value_records(
+        calculation_log_id: int, label_vals: PublicLabelValues | None
+    ) -> Iterator[tuple[int, int, int, str]]:
+        """Lazily decodes the columnar label_vals into calculation_log_label_value rows of the form:
+        (calculation_log_id, label_id, site_id_snapshot, label)"""
+        if label_vals is None:
+            return
+
+        for label_id, site_id, value in zip(label_vals.label_ids, label_vals.site_ids, label_vals.values, strict=False):
+            yield (calculation_log_id, label_id, 0 if site_id is None else site_id, value)
+
+    @staticmethod
+    def _variable_values_sorted(calculation_log: CalculationLog) -> Iterator[tuple[int, int, int, float]]:
+        """Yields (variable_id, site_id_snapshot, interval_period, value) for every variable value in calculation_log,
+        regardless of whether it was stored as a CalculationLogVariableValue or CalculationLogVariableSeries. Both
+        relationships are already sorted so they can be merged in a single pass"""
+        values: Iterator[tuple[int, int, int, float]] = (
+            (v.variable_id, v.site_id_snapshot, v.interval_period, v.value) for v in calculation_log.variable_values
+        )
+        if not calculation_log.variable_series:
+            return values
+
+        series = CalculationLogMapper.expand_variable_series(
+            (s.variable_id, s.site_id_snapshot, s.interval_values) for s in calculation_log.variable_series
+        )
+        return heapq.merge(values, series)
+
     @staticmethod
     def map_to_response(calculation_log: CalculationLog) -> CalculationLogResponse:
 
@@ -96,11 +233,13 @@ class CalculationLogMapper:
         variable_site_ids: list[int | None] = []
         variable_interval_periods: list[int] = []
         variable_values: list[float] = []
-        for variable_val in calculation_log.variable_values:
-            variable_ids.append(variable_val.variable_id)
-            variable_site_ids.append(None if variable_val.site_id_snapshot == 0 else variable_val.site_id_snapshot)
-            variable_interval_periods.append(variable_val.interval_period)
-            variable_values.append(variable_val.value)
+        for variable_id, site_id_snapshot, interval_period, value in CalculationLogMapper._variable_values_sorted(
+            calculation_log
+        ):
+            variable_ids.append(variable_id)
+            variable_site_ids.append(None if site_id_snapshot == 0 else site_id_snapshot)
+            variable_interval_periods.append(interval_period)
+            variable_values.append(value)
 
         if len(variable_ids) == 0:
             variable_values_flat = None
@@ -150,6 +289,25 @@ class CalculationLogMapper:
             label_values=label_values_flat,
         )
 
+    @staticmethod
+    def map_to_variable_values_chunk(rows: Sequence[Sequence[Any]]) -> PublicVariableValues:
+        """Maps a chunk of (variable_id, site_id_snapshot, interval_period, value) rows to the public columnar model"""
+        return PublicVariableValues(
+            variable_ids=[r[0] for r in rows],
+            site_ids=[None if r[1] == 0 else r[1] for r in rows],
+            interval_periods=[r[2] for r in rows],
+            values=[r[3] for r in rows],
+        )
+
+    @staticmethod
+    def map_to_label_values_chunk(rows: Sequence[Sequence[Any]]) -> PublicLabelValues:
+        """Maps a chunk of (label_id, site_id_snapshot, label) rows to the public columnar model"""
+        return PublicLabelValues(
+            label_ids=[r[0] for r in rows],
+            site_ids=[None if r[1] == 0 else r[1] for r in rows],
+            values=[r[2] for r in rows],
+        )
+
     @staticmethod
     def map_to_list_response(
         calculation_logs: Sequence[CalculationLog], count: int, start: int, limit: int
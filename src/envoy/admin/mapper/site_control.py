@@ -10,6 +10,7 @@ from envoy_schema.admin.schema.site_control import (
     SiteControlResponse,
 )
 
+from envoy.admin.crud.doe import StagedSiteControl
 from envoy.server.model.doe import DynamicOperatingEnvelope, SiteControlGroup
 
 
@@ -80,6 +81,29 @@ class SiteControlListMapper:
             for c in control_list
         ]
 
+    @staticmethod
+    def map_to_staged(control: SiteControlRequest) -> StagedSiteControl:
+        """Lightweight alternative to map_from_request for bulk uploads - generates a staging table row instead of a
+        full ORM model"""
+        return StagedSiteControl(
+            site_id=control.site_id,
+            calculation_log_id=control.calculation_log_id,
+            start_time=control.start_time,
+            duration_seconds=control.duration_seconds,
+            end_time=control.start_time + timedelta(seconds=control.duration_seconds),
+            randomize_start_seconds=control.randomize_start_seconds,
+            import_limit_active_watts=control.import_limit_watts,
+            export_limit_watts=control.export_limit_watts,
+            generation_limit_active_watts=control.generation_limit_watts,
+            load_limit_active_watts=control.load_limit_watts,
+            set_energized=control.set_energized,
+            set_connected=control.set_connect,
+            set_point_percentage=control.set_point_percentage,
+            ramp_time_seconds=control.ramp_time_seconds,
+            display_id=control.display_id,
+            storage_target_active_watts=control.storage_target_watts,
+        )
+
     @staticmethod
     def map_to_response(control: DynamicOperatingEnvelope) -> SiteControlResponse:
         return SiteControlResponse(
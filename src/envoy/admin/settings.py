@@ -21,6 +21,16 @@ class AppSettings(CommonSettings):
     read_only_user: str = "rouser"
     read_only_keys: list[str] = []  # Passwords that match with read_only_user and grant access to GET endpoints
 
+    # Background maintenance of the (monthly) partitions of site_reading / archive_site_reading
+    site_reading_partition_maintenance_enabled: bool = True
+    site_reading_partition_maintenance_secs: int = 3600  # How frequently (in seconds) maintenance will run
+    site_reading_partition_months_ahead: int = 3  # How many future months will have a partition created in advance
+    site_reading_partition_retention_months: int | None = None  # Partitions older than this are removed (None = never)
+    site_reading_partition_drop_expired: bool = False  # True: drop expired partitions. False: detach them
+
+    # If True - new calculation log variable values are stored as one (float array) row per variable/site series
+    calculation_log_compact_variable_values: bool = False
+
     @property
     def fastapi_kwargs(self) -> dict[str, Any]:
         return {
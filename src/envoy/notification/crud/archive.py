@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.notification.crud.common import TArchiveResourceModel, TResourceModel
 from envoy.server.model.archive.base import ArchiveBase
-from envoy.server.model.base import Base
+from envoy.server.model.base import PARTITION_KEY_INFO, Base
 
 
 def extract_source_archive_pk_columns(
@@ -20,7 +20,11 @@ def extract_source_archive_pk_columns(
     if not hasattr(source_type.__table__.primary_key, "columns"):
         raise ValueError(f"Table {source_type} primary key has no configured columns")
 
-    archive_pk_cols: list[Column] = cast(list, source_type.__table__.primary_key.columns)
+    # Partitioned tables include their partition key in the PK - it's not a part of the logical identity of the row
+    partition_key = source_type.__table__.info.get(PARTITION_KEY_INFO, None)
+    archive_pk_cols: list[Column] = [
+        c for c in cast(list, source_type.__table__.primary_key.columns) if c.name != partition_key
+    ]
     if len(archive_pk_cols) != 1:
         raise Exception(f"source_type: {source_type} should only have a single primary key column defined,")
     source_pk_col: Column = archive_pk_cols[0]  # The archive type will have the same column - we can reuse this
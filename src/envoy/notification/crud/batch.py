@@ -3,7 +3,7 @@ from datetime import datetime
 from itertools import chain
 from typing import Any, Generic, cast
 
-from sqlalchemy import select
+from sqlalchemy import Row, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -46,6 +46,7 @@ from envoy.server.model.archive.site import (
     ArchiveSiteDERStatus,
 )
 from envoy.server.model.archive.site_reading import ArchiveSiteReading, ArchiveSiteReadingType
+from envoy.server.model.archive.subscription import ArchiveSubscription
 from envoy.server.model.archive.tariff import ArchiveTariff, ArchiveTariffComponent, ArchiveTariffGeneratedRate
 from envoy.server.model.doe import DynamicOperatingEnvelope, SiteControlGroup, SiteControlGroupDefault
 from envoy.server.model.site import Site, SiteDER, SiteDERAvailability, SiteDERRating, SiteDERSetting, SiteDERStatus
@@ -286,6 +287,99 @@ async def select_subscriptions_for_resource(
     return resp.scalars().all()
 
 
+async def select_subscriptions_changed_after(
+    session: AsyncSession, changed_after: datetime | None
+) -> Sequence[Subscription]:
+    """Fetches every subscription (across all aggregators / resources) with a changed_time >= changed_after. If
+    changed_after is None - ALL subscriptions will be returned.
+
+    Will populate the Subscription.conditions relationship"""
+
+    stmt = select(Subscription).options(selectinload(Subscription.conditions))
+    if changed_after is not None:
+        stmt = stmt.where(Subscription.changed_time >= changed_after)
+
+    resp = await session.execute(stmt)
+    return resp.scalars().all()
+
+
+async def select_subscription_ids_deleted_after(session: AsyncSession, deleted_after: datetime) -> Sequence[int]:
+    """Fetches the (distinct) subscription_id of every subscription that was deleted at/after deleted_after"""
+
+    stmt = (
+        select(ArchiveSubscription.subscription_id).where(ArchiveSubscription.deleted_time >= deleted_after).distinct()
+    )
+
+    resp = await session.execute(stmt)
+    return resp.scalars().all()
+
+
+async def select_subscribed_aggregator_site_ids(
+    session: AsyncSession, resource: SubscriptionResource
+) -> Sequence[Row[tuple[int, int | None]]]:
+    """Fetches the distinct (aggregator_id, scoped_site_id) for every Subscription of type resource. This is used for
+    resources that are "site agnostic" (eg Tariff) but must be notified under a site scoped href - rather than
+    expanding to every site in the database, we only expand to sites that could have something listening.
+
+    A subscription scoped to a specific site will yield (aggregator_id, site_id). A subscription that is aggregator
+    wide (i.e. no scoped_site_id) is NOT expanded here - it yields a single (aggregator_id, None) "all sites" marker.
+    See expand_subscribed_aggregator_site_ids for resolving these into individual sites.
+
+    Results will be ordered by aggregator_id, scoped_site_id (with the "all sites" marker first)"""
+
+    stmt = (
+        select(Subscription.aggregator_id, Subscription.scoped_site_id)
+        .where(Subscription.resource_type == resource)
+        .distinct()
+        .order_by(Subscription.aggregator_id, Subscription.scoped_site_id.asc().nulls_first())
+    )
+
+    resp = await session.execute(stmt)
+    return resp.all()
+
+
+async def expand_subscribed_aggregator_site_ids(
+    session: AsyncSession,
+    subscribed_aggregator_site_ids: Iterable[Row[tuple[int, int | None]] | tuple[int, int | None]],
+) -> list[tuple[int, int]]:
+    """Expands the output from select_subscribed_aggregator_site_ids into the (aggregator_id, site_id) of every
+    individual site that could be listening. This should only be called once there is at least one batch entity that
+    will need matching against these sites (to avoid loading sites for no reason).
+
+    An (aggregator_id, None) "all sites" marker will expand to every site belonging to that aggregator. An
+    (aggregator_id, site_id) will only be included if site_id still belongs to aggregator_id. Sites covered by multiple
+    entries will only be returned once.
+
+    Results will be ordered by site_id"""
+
+    all_sites_aggregator_ids: set[int] = set()
+    scoped_aggregator_site_ids: set[tuple[int, int]] = set()
+    for aggregator_id, site_id in subscribed_aggregator_site_ids:
+        if site_id is None:
+            all_sites_aggregator_ids.add(aggregator_id)
+        else:
+            scoped_aggregator_site_ids.add((aggregator_id, site_id))
+
+    if not all_sites_aggregator_ids and not scoped_aggregator_site_ids:
+        return []
+
+    stmt = (
+        select(Site.aggregator_id, Site.site_id)
+        .where(
+            Site.aggregator_id.in_(all_sites_aggregator_ids)
+            | Site.site_id.in_([site_id for _, site_id in scoped_aggregator_site_ids])
+        )
+        .order_by(Site.site_id)
+    )
+
+    resp = await session.execute(stmt)
+    return [
+        (aggregator_id, site_id)
+        for aggregator_id, site_id in resp.all()
+        if aggregator_id in all_sites_aggregator_ids or (aggregator_id, site_id) in scoped_aggregator_site_ids
+    ]
+
+
 async def fetch_sites_by_changed_at(
     session: AsyncSession, timestamp: datetime
 ) -> AggregatorBatchedEntities[Site, ArchiveSite]:
@@ -702,16 +796,19 @@ async def fetch_default_site_controls_by_changed_at(
     session: AsyncSession, timestamp: datetime
 ) -> AggregatorBatchedEntities[SiteScopedSiteControlGroupDefault, ArchiveSiteScopedSiteControlGroupDefault]:  # type: ignore # SiteScoped variables will work here - tests enforce it
     """Fetches all DefaultSiteControl instances matching the specified changed_at and returns them keyed by their
-    aggregator/site id
+    aggregator/site id. Only sites with a DEFAULT_SITE_CONTROL subscription will be included.
 
     Also fetches any site from the archive that was deleted at the specified timestamp"""
 
     active_defaults, deleted_defaults = await fetch_entities_with_archive_by_datetime(
         session, SiteControlGroupDefault, ArchiveSiteControlGroupDefault, timestamp
     )
+    if len(active_defaults) == 0 and len(deleted_defaults) == 0:
+        return AggregatorBatchedEntities(timestamp, SubscriptionResource.DEFAULT_SITE_CONTROL, [], [])
 
-    # We need to generate a notification per site ID - so fetch all of those
-    aggregator_site_ids = (await session.execute(select(Site.aggregator_id, Site.site_id).order_by(Site.site_id))).all()
+    # We need to generate a notification per subscribed site ID - so fetch all of those
+    subscribed_ids = await select_subscribed_aggregator_site_ids(session, SubscriptionResource.DEFAULT_SITE_CONTROL)
+    aggregator_site_ids = await expand_subscribed_aggregator_site_ids(session, subscribed_ids)
 
     scoped_actives = [
         SiteScopedSiteControlGroupDefault(agg_id, site_id, ad.site_control_group_id, ad)
@@ -736,7 +833,7 @@ async def fetch_fsa_by_changed_at(
     session: AsyncSession, timestamp: datetime
 ) -> AggregatorBatchedEntities[SiteScopedFunctionSetAssignment, ArchiveSiteScopedFunctionSetAssignment]:  # type: ignore # noqa: E501
     """Fetches all SiteScopedFunctionSetAssignment instances matching the specified changed_at and returns them keyed
-    by their aggregator/site id"""
+    by their aggregator/site id. Only sites with a FUNCTION_SET_ASSIGNMENTS subscription will be included."""
 
     # Two things can trigger a FSA Notification - a change in pollrate...
     runtime_cfg = await select_server_config(session)
@@ -754,8 +851,9 @@ async def fetch_fsa_by_changed_at(
     if new_poll_rate is None and not new_fsa_ids:
         return AggregatorBatchedEntities(timestamp, SubscriptionResource.FUNCTION_SET_ASSIGNMENTS, [], [])
 
-    # The fsa update will need to vary per Site so we generate an instance per site_id
-    aggregator_site_ids = (await session.execute(select(Site.aggregator_id, Site.site_id).order_by(Site.site_id))).all()
+    # The fsa update will need to vary per Site so we generate an instance per subscribed site_id
+    subscribed_ids = await select_subscribed_aggregator_site_ids(session, SubscriptionResource.FUNCTION_SET_ASSIGNMENTS)
+    aggregator_site_ids = await expand_subscribed_aggregator_site_ids(session, subscribed_ids)
 
     site_scoped_cfgs = [
         SiteScopedFunctionSetAssignment(agg_id, site_id, new_fsa_ids, new_poll_rate)
@@ -768,8 +866,8 @@ async def fetch_fsa_by_changed_at(
 async def fetch_site_control_groups_by_changed_at(
     session: AsyncSession, timestamp: datetime
 ) -> AggregatorBatchedEntities[SiteScopedSiteControlGroup, ArchiveSiteScopedSiteControlGroup]:  # type: ignore # SiteScoped variables will work here - tests enforce it
-    """Fetches all SiteControlGroup instances matching the specified changed_at and returns them keyed by all existing
-    site IDs
+    """Fetches all SiteControlGroup instances matching the specified changed_at and returns them keyed by every site
+    ID with a SITE_CONTROL_GROUP subscription
 
     Also fetches any site control group from the archive that was deleted at the specified timestamp.
 
@@ -789,8 +887,9 @@ async def fetch_site_control_groups_by_changed_at(
     if len(active_groups) == 0 and len(deleted_groups) == 0:
         return AggregatorBatchedEntities(timestamp, SubscriptionResource.SITE_CONTROL_GROUP, [], [])
 
-    # The site control group update will need to vary per Site so we generate an instance per site_id
-    aggregator_site_ids = (await session.execute(select(Site.aggregator_id, Site.site_id).order_by(Site.site_id))).all()
+    # The site control group update will need to vary per Site so we generate an instance per subscribed site_id
+    subscribed_ids = await select_subscribed_aggregator_site_ids(session, SubscriptionResource.SITE_CONTROL_GROUP)
+    aggregator_site_ids = await expand_subscribed_aggregator_site_ids(session, subscribed_ids)
 
     site_scoped_active_groups: list[SiteScopedSiteControlGroup] = [
         SiteScopedSiteControlGroup(agg_id, site_id, active_group)
@@ -815,8 +914,8 @@ async def fetch_site_control_groups_by_changed_at(
 async def fetch_tariffs_by_changed_at(
     session: AsyncSession, timestamp: datetime
 ) -> AggregatorBatchedEntities[SiteScopedTariff, ArchiveSiteScopedTariff]:  # type: ignore # noqa: E501
-    """Fetches all Tariff instances matching the specified changed_at and returns them keyed by all existing
-    site IDs
+    """Fetches all Tariff instances matching the specified changed_at and returns them keyed by every site ID with a
+    TARIFF subscription
 
     Also fetches any tariff from the archive that was deleted at the specified timestamp"""
 
@@ -826,8 +925,9 @@ async def fetch_tariffs_by_changed_at(
     if len(active_tariffs) == 0 and len(deleted_tariffs) == 0:
         return AggregatorBatchedEntities(timestamp, SubscriptionResource.TARIFF, [], [])
 
-    # The tariff update will need to vary per Site so we generate an instance per site_id
-    aggregator_site_ids = (await session.execute(select(Site.aggregator_id, Site.site_id).order_by(Site.site_id))).all()
+    # The tariff update will need to vary per Site so we generate an instance per subscribed site_id
+    subscribed_ids = await select_subscribed_aggregator_site_ids(session, SubscriptionResource.TARIFF)
+    aggregator_site_ids = await expand_subscribed_aggregator_site_ids(session, subscribed_ids)
 
     site_scoped_active_tariffs = [
         SiteScopedTariff(agg_id, site_id, tariff)
@@ -852,8 +952,8 @@ async def fetch_tariffs_by_changed_at(
 async def fetch_tariff_components_by_changed_at(
     session: AsyncSession, timestamp: datetime
 ) -> AggregatorBatchedEntities[SiteScopedTariffComponent, ArchiveSiteScopedTariffComponent]:  # type: ignore # noqa: E501
-    """Fetches all TariffComponent instances matching the specified changed_at and returns them keyed by all existing
-    site IDs
+    """Fetches all TariffComponent instances matching the specified changed_at and returns them keyed by every site ID
+    with a TARIFF_COMPONENT subscription
 
     Also fetches any tariff from the archive that was deleted at the specified timestamp"""
 
@@ -863,8 +963,9 @@ async def fetch_tariff_components_by_changed_at(
     if len(active_comps) == 0 and len(deleted_comps) == 0:
         return AggregatorBatchedEntities(timestamp, SubscriptionResource.TARIFF_COMPONENT, [], [])
 
-    # The tariff component update will need to vary per Site so we generate an instance per site_id
-    aggregator_site_ids = (await session.execute(select(Site.aggregator_id, Site.site_id).order_by(Site.site_id))).all()
+    # The tariff component update will need to vary per Site so we generate an instance per subscribed site_id
+    subscribed_ids = await select_subscribed_aggregator_site_ids(session, SubscriptionResource.TARIFF_COMPONENT)
+    aggregator_site_ids = await expand_subscribed_aggregator_site_ids(session, subscribed_ids)
 
     site_scoped_active_comps = [
         SiteScopedTariffComponent(agg_id, site_id, tariff_component)
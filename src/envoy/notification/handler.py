@@ -4,11 +4,14 @@ from contextlib import _AsyncGeneratorContextManager, asynccontextmanager
 from typing import Annotated
 
 from fastapi import FastAPI
+from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from taskiq import AsyncBroker, Context, InMemoryBroker, SimpleRetryMiddleware, TaskiqDepends
 from taskiq.result_backends.dummy import DummyResultBackend
 from taskiq_aio_pika import AioPikaBroker
 
+from envoy.notification.subscription_index import SubscriptionIndex
+
 logger = logging.getLogger(__name__)
 
 # TaskIQ state key for a function that when executed will return a new AsyncSession
@@ -17,6 +20,14 @@ STATE_DB_SESSION_MAKER = "db_session_maker"
 STATE_HREF_PREFIX = "href_prefix"
 # TaskIQ state key for disabling TLS verification on outbound notification requests
 STATE_DISABLE_TLS_VERIFY = "disable_tls_verify"
+# TaskIQ state key for a long lived httpx.AsyncClient used for all outbound notification requests
+STATE_HTTP_CLIENT = "http_client"
+# TaskIQ state key for the max number of transmit tasks that will be concurrently published to the broker
+STATE_ENQUEUE_CONCURRENCY = "enqueue_concurrency"
+# TaskIQ state key for an optional (worker level) SubscriptionIndex used for matching entities to subscriptions
+STATE_SUBSCRIPTION_INDEX = "subscription_index"
+
+DEFAULT_ENQUEUE_CONCURRENCY = 50
 
 
 # Reference to the shared InMemoryBroker. Will be lazily instantiated
@@ -102,6 +113,18 @@ async def disable_tls_verify_dependency(context: Annotated[Context, TaskiqDepend
     return getattr(context.state, STATE_DISABLE_TLS_VERIFY, False)
 
 
+async def http_client_dependency(context: Annotated[Context, TaskiqDepends()]) -> AsyncClient | None:
+    return getattr(context.state, STATE_HTTP_CLIENT, None)
+
+
+async def enqueue_concurrency_dependency(context: Annotated[Context, TaskiqDepends()]) -> int:
+    return getattr(context.state, STATE_ENQUEUE_CONCURRENCY, DEFAULT_ENQUEUE_CONCURRENCY)
+
+
+async def subscription_index_dependency(context: Annotated[Context, TaskiqDepends()]) -> SubscriptionIndex | None:
+    return getattr(context.state, STATE_SUBSCRIPTION_INDEX, None)
+
+
 async def session_dependency(context: Annotated[Context, TaskiqDepends()]) -> AsyncGenerator[AsyncSession, None]:
     """Yields a session from TaskIq context session maker (maker created during WORKER_STARTUP event) and
     then closes it after shutdown"""
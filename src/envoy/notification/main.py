@@ -10,12 +10,25 @@ from envoy.notification.exception import NotificationError
 from envoy.notification.handler import (
     STATE_DB_SESSION_MAKER,
     STATE_DISABLE_TLS_VERIFY,
+    STATE_ENQUEUE_CONCURRENCY,
     STATE_HREF_PREFIX,
+    STATE_HTTP_CLIENT,
+    STATE_SUBSCRIPTION_INDEX,
     generate_broker,
 )
 from envoy.notification.settings import generate_settings
+from envoy.notification.subscription_index import SubscriptionIndex
+from envoy.notification.task.transmit import create_transmit_client
 from envoy.server.api.auth.azure import AzureADResourceTokenConfig
-from envoy.server.database import HandlerDetails, install_handler, remove_handler
+from envoy.server.database import (
+    HandlerDetails,
+    NotifyListenerDetails,
+    install_handler,
+    install_notify_listener,
+    remove_handler,
+    remove_notify_listener,
+)
+from envoy.server.manager.server import RUNTIME_SERVER_CONFIG_CHANNEL, RuntimeServerConfigManager
 
 # Force the loading of a LOG_CONFIG environment variable - it will be expecting a JSON encoded file
 logging_config_file = os.environ.get("LOG_CONFIG", None)
@@ -39,11 +52,12 @@ broker = generate_broker(settings.rabbit_mq_broker_url)
 
 # Now setup the lifecycle events for the worker
 azure_ad_handler_details: HandlerDetails | None = None
+config_listener_details: NotifyListenerDetails | None = None
 
 
 @broker.on_event(TaskiqEvents.WORKER_STARTUP)
 async def startup(state: TaskiqState) -> None:
-    global azure_ad_handler_details
+    global azure_ad_handler_details, config_listener_details
 
     # Setup the AzureAD handler (if configured)
     if azure_ad_handler_details is not None:
@@ -59,19 +73,57 @@ async def startup(state: TaskiqState) -> None:
         )
         azure_ad_handler_details = await install_handler(ad_config, settings.azure_ad_db_refresh_secs)
 
-    # Setup the database session maker
     db_cfg = settings.db_middleware_kwargs
     engine_args = db_cfg["engine_args"] if "engine_args" in db_cfg else {}
+
+    # Cache the runtime server config (invalidated via Postgres LISTEN/NOTIFY)
+    if settings.runtime_server_config_cache_enabled and config_listener_details is None:
+        config_listener_details = await install_notify_listener(
+            db_cfg["db_url"],
+            channel=RUNTIME_SERVER_CONFIG_CHANNEL,
+            on_notify=RuntimeServerConfigManager.invalidate_cache,
+            on_listening=RuntimeServerConfigManager.enable_cache,
+            on_lost=RuntimeServerConfigManager.disable_cache,
+            engine_args=engine_args,
+        )
+
+    # Setup the database session maker
     db_engine = create_async_engine(db_cfg["db_url"], **engine_args)
     setattr(state, STATE_DB_SESSION_MAKER, async_sessionmaker(db_engine, expire_on_commit=False))
     setattr(state, STATE_HREF_PREFIX, settings.href_prefix)
     setattr(state, STATE_DISABLE_TLS_VERIFY, settings.notification_disable_tls_verify)
+    setattr(state, STATE_ENQUEUE_CONCURRENCY, settings.notification_enqueue_concurrency)
+    if settings.notification_subscription_index_enabled:
+        setattr(
+            state,
+            STATE_SUBSCRIPTION_INDEX,
+            SubscriptionIndex(full_reload_seconds=settings.notification_subscription_index_full_reload_seconds),
+        )
+
+    # Setup the shared HTTP client for outgoing notifications (keeps connections alive between notifications)
+    http_client = create_transmit_client(
+        disable_tls_verify=settings.notification_disable_tls_verify,
+        max_connections=settings.notification_max_connections,
+        max_keepalive_connections=settings.notification_max_keepalive_connections,
+        keepalive_expiry_seconds=settings.notification_keepalive_expiry_seconds,
+        http2=settings.notification_http2,
+    )
+    setattr(state, STATE_HTTP_CLIENT, http_client)
 
 
 @broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
 async def shutdown(state: TaskiqState) -> None:
-    global azure_ad_handler_details
+    global azure_ad_handler_details, config_listener_details
+
+    if config_listener_details is not None:
+        await remove_notify_listener(config_listener_details)
+        config_listener_details = None
 
     if azure_ad_handler_details is not None:
         await remove_handler(azure_ad_handler_details)
         azure_ad_handler_details = None
+
+    http_client = getattr(state, STATE_HTTP_CLIENT, None)
+    if http_client is not None:
+        await http_client.aclose()
+        setattr(state, STATE_HTTP_CLIENT, None)
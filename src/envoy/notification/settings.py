@@ -10,6 +10,13 @@ class AppSettings(CommonSettings):
     version: str = importlib.metadata.version("envoy")
 
     notification_disable_tls_verify: bool = False  # Disable TLS cert verification for outbound notifications
+    notification_max_connections: int = 100  # Max concurrent outbound notification connections (across all hosts)
+    notification_max_keepalive_connections: int = 20  # Max idle outbound connections that will be kept alive
+    notification_keepalive_expiry_seconds: float = 30  # How long an idle outbound connection will be kept alive for
+    notification_http2: bool = False  # Enable HTTP/2 for outbound notifications
+    notification_enqueue_concurrency: int = 50  # Max transmit tasks being published to the broker at any one time
+    notification_subscription_index_enabled: bool = True  # Match subscriptions via a worker level (cached) index
+    notification_subscription_index_full_reload_seconds: float = 3600  # How often the index is completely reloaded
 
 
 def generate_settings() -> AppSettings:
@@ -0,0 +1,195 @@
+import logging
+from asyncio import Lock
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import cast
+
+from envoy_schema.server.schema.sep2.pub_sub import ConditionAttributeIdentifier
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from envoy.notification.crud.batch import (
+    get_site_id,
+    get_subscription_filter_id,
+    select_subscription_ids_deleted_after,
+    select_subscriptions_changed_after,
+)
+from envoy.notification.crud.common import TResourceModel
+from envoy.server.manager.time import utc_now
+from envoy.server.model.site_reading import SiteReading
+from envoy.server.model.subscription import Subscription, SubscriptionResource
+
+logger = logging.getLogger(__name__)
+
+# (aggregator_id, resource_type, scoped_site_id, resource_id) - Subscriptions that apply to "all" sites / resources
+# will have a None scoped_site_id / resource_id
+SubscriptionIndexKey = tuple[int, SubscriptionResource, int | None, int | None]
+
+DEFAULT_FULL_RELOAD_SECONDS = 3600
+DEFAULT_LOOKBACK_SECONDS = 60
+
+
+def subscription_conditions_matched(sub: Subscription, resource: SubscriptionResource, entity: TResourceModel) -> bool:
+    """Returns True if entity satisfies all of the conditions on sub (if any). Conditions only apply to some resource
+    types - for all others this will always be True"""
+    if resource != SubscriptionResource.READING:
+        return True
+
+    for c in sub.conditions:
+        if c.attribute == ConditionAttributeIdentifier.READING_VALUE:
+            # If the reading is within the condition thresholds - don't include it
+            # (we only want values out of range)
+            reading_value = cast(SiteReading, entity).value
+            low_range = c.lower_threshold is None or reading_value < c.lower_threshold
+            high_range = c.upper_threshold is None or reading_value > c.upper_threshold
+
+            if c.lower_threshold is not None and c.upper_threshold is not None:
+                conditions_matched = low_range or high_range
+            else:
+                conditions_matched = low_range and high_range
+
+            if not conditions_matched:
+                return False
+
+    return True
+
+
+class SubscriptionIndex:
+    """A worker level, in memory index of every Subscription keyed by SubscriptionIndexKey. This allows the
+    subscriptions that apply to an entity to be found with a handful of dictionary lookups rather than checking every
+    entity against every subscription for an aggregator.
+
+    The index is kept up to date via refresh - which will incrementally fetch subscriptions whose changed_time (or
+    deleted_time) falls after the previous refresh. Subscription changed_time is set by the writer (not at commit) so
+    every incremental refresh will look back an additional lookback_seconds to catch slow commits. The whole index is
+    reloaded every full_reload_seconds as a backstop.
+
+    This index is 'async safe' (refreshes are serialised and the lookup dicts are swapped atomically) but not thread
+    safe."""
+
+    _subscriptions: dict[int, Subscription]  # All indexed subscriptions keyed by subscription_id
+    _by_key: dict[SubscriptionIndexKey, list[Subscription]]
+    _by_aggregator_resource: dict[tuple[int, SubscriptionResource], list[Subscription]]
+    _last_refresh: datetime | None  # When the last (successful) refresh started
+    _last_full_reload: datetime | None  # When the last (successful) full reload started
+    _full_reload: timedelta
+    _lookback: timedelta
+    _refresh_lock: Lock
+
+    def __init__(
+        self,
+        full_reload_seconds: float = DEFAULT_FULL_RELOAD_SECONDS,
+        lookback_seconds: float = DEFAULT_LOOKBACK_SECONDS,
+    ) -> None:
+        """full_reload_seconds: How often the entire index will be reloaded (instead of incrementally refreshed)
+        lookback_seconds: How far before the previous refresh that an incremental refresh will look for changes"""
+        super().__init__()
+        self._subscriptions = {}
+        self._by_key = {}
+        self._by_aggregator_resource = {}
+        self._last_refresh = None
+        self._last_full_reload = None
+        self._full_reload = timedelta(seconds=full_reload_seconds)
+        self._lookback = timedelta(seconds=lookback_seconds)
+        self._refresh_lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def clear(self) -> None:
+        """Removes everything from the index - the next refresh will be a full reload"""
+        self._subscriptions = {}
+        self._by_key = {}
+        self._by_aggregator_resource = {}
+        self._last_refresh = None
+        self._last_full_reload = None
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """Brings this index up to date with the subscriptions in the database. Will be a full reload on first use
+        (or every full_reload_seconds) and will otherwise only fetch the subscriptions that have changed/deleted since
+        the last refresh. Loaded subscriptions will be expunged from session"""
+        async with self._refresh_lock:
+            now = utc_now()
+            full_reload = (
+                self._last_refresh is None
+                or self._last_full_reload is None
+                or (now - self._last_full_reload) >= self._full_reload
+            )
+
+            if full_reload:
+                subscriptions: dict[int, Subscription] = {}
+                changed_subs = await select_subscriptions_changed_after(session, None)
+                deleted_sub_ids: Sequence[int] = []
+            else:
+                since = cast(datetime, self._last_refresh) - self._lookback
+                subscriptions = self._subscriptions
+                changed_subs = await select_subscriptions_changed_after(session, since)
+                deleted_sub_ids = await select_subscription_ids_deleted_after(session, since)
+
+            changed = full_reload
+            for sub_id in deleted_sub_ids:
+                if subscriptions.pop(sub_id, None) is not None:
+                    changed = True
+
+            for sub in changed_subs:
+                session.expunge(sub)  # These will outlive this session
+                subscriptions[sub.subscription_id] = sub
+                changed = True
+
+            if changed:
+                self._rebuild(subscriptions)
+
+            self._last_refresh = now
+            if full_reload:
+                self._last_full_reload = now
+                logger.info(f"SubscriptionIndex fully reloaded with {len(subscriptions)} subscriptions")
+
+    def _rebuild(self, subscriptions: dict[int, Subscription]) -> None:
+        by_key: dict[SubscriptionIndexKey, list[Subscription]] = {}
+        by_aggregator_resource: dict[tuple[int, SubscriptionResource], list[Subscription]] = {}
+        for sub in sorted(subscriptions.values(), key=lambda s: s.subscription_id):
+            resource = SubscriptionResource(sub.resource_type)
+            by_key.setdefault((sub.aggregator_id, resource, sub.scoped_site_id, sub.resource_id), []).append(sub)
+            by_aggregator_resource.setdefault((sub.aggregator_id, resource), []).append(sub)
+
+        self._subscriptions = subscriptions
+        self._by_key = by_key
+        self._by_aggregator_resource = by_aggregator_resource
+
+    def subscriptions_for_resource(self, aggregator_id: int, resource: SubscriptionResource) -> list[Subscription]:
+        """All indexed subscriptions for aggregator_id that are subscribed to resource (ordered by subscription_id).
+        This is the indexed equivalent of select_subscriptions_for_resource"""
+        return self._by_aggregator_resource.get((aggregator_id, resource), [])
+
+    def entities_by_subscription(
+        self, aggregator_id: int, resource: SubscriptionResource, entities: Iterable[TResourceModel]
+    ) -> list[tuple[Subscription, list[TResourceModel]]]:
+        """Groups entities (belonging to aggregator_id) by the subscription(s) that service them. This is the indexed
+        equivalent of calling entities_serviced_by_subscription for every subscription for aggregator_id/resource.
+
+        Subscriptions servicing no entities will NOT be returned. Results are ordered by subscription_id and the
+        entities will maintain their relative order."""
+        if (aggregator_id, resource) not in self._by_aggregator_resource:
+            return []
+
+        by_key = self._by_key
+        entities_by_sub_id: dict[int, tuple[Subscription, list[TResourceModel]]] = {}
+        for e in entities:
+            site_id = get_site_id(resource, e)
+            filter_id = get_subscription_filter_id(resource, e)
+            for key in (
+                (aggregator_id, resource, site_id, filter_id),
+                (aggregator_id, resource, site_id, None),
+                (aggregator_id, resource, None, filter_id),
+                (aggregator_id, resource, None, None),
+            ):
+                for sub in by_key.get(key, []):
+                    if not subscription_conditions_matched(sub, resource, e):
+                        continue
+
+                    match = entities_by_sub_id.get(sub.subscription_id, None)
+                    if match is None:
+                        entities_by_sub_id[sub.subscription_id] = (sub, [e])
+                    else:
+                        match[1].append(e)
+
+        return [entities_by_sub_id[sub_id] for sub_id in sorted(entities_by_sub_id.keys())]
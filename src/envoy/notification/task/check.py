@@ -1,12 +1,13 @@
 import logging
+from asyncio import Semaphore, Task, create_task, gather, sleep
 from collections.abc import Generator, Iterable, Sequence
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from itertools import islice
+from time import perf_counter
 from typing import Annotated, Generic, TypeVar, cast
 from uuid import UUID, uuid4
 
-from envoy_schema.server.schema.sep2.pub_sub import ConditionAttributeIdentifier
 from envoy_schema.server.schema.sep2.pub_sub import Notification as Sep2Notification
 from sqlalchemy.ext.asyncio import AsyncSession
 from taskiq import AsyncBroker, TaskiqDepends, async_shared_broker
@@ -40,7 +41,15 @@ from envoy.notification.crud.common import (
     TResourceModel,
 )
 from envoy.notification.exception import NotificationError
-from envoy.notification.handler import broker_dependency, href_prefix_dependency, session_dependency
+from envoy.notification.handler import (
+    DEFAULT_ENQUEUE_CONCURRENCY,
+    broker_dependency,
+    enqueue_concurrency_dependency,
+    href_prefix_dependency,
+    session_dependency,
+    subscription_index_dependency,
+)
+from envoy.notification.subscription_index import SubscriptionIndex, subscription_conditions_matched
 from envoy.notification.task.transmit import transmit_notification
 from envoy.server.crud.site import VIRTUAL_END_DEVICE_SITE_ID
 from envoy.server.manager.server import RuntimeServerConfigManager, _map_server_config
@@ -110,6 +119,26 @@ def batched(iterable: Iterable[T], chunk_size: int) -> Generator[list[T], None,
         yield chunk
 
 
+def notification_page_size(sub: Subscription) -> int:
+    """The max number of entities to include in a single notification for sub"""
+    entity_limit = sub.entity_limit if sub.entity_limit > 0 else 1
+    if entity_limit > MAX_NOTIFICATION_PAGE_SIZE:
+        entity_limit = MAX_NOTIFICATION_PAGE_SIZE
+    return entity_limit
+
+
+def list_notification(sub: Subscription, batch_key: tuple) -> NotificationEntities:
+    """Generates an (entity-less) notification for when the parent List has changed but none of its child list items
+    have (eg pollRate has changed)"""
+    return NotificationEntities(
+        entities=[],  # No entities - we're just wanting the parent List to notify as empty
+        subscription=sub,
+        notification_id=uuid4(),
+        notification_type=NotificationType.ENTITY_CHANGED,
+        batch_key=batch_key,
+    )
+
+
 def get_entity_pages(
     resource: SubscriptionResource,
     sub: Subscription,
@@ -155,25 +184,7 @@ def entities_serviced_by_subscription(
             continue
 
         # Check conditions (which will vary depending on the type of resource)
-        conditions_matched = True
-        if resource == SubscriptionResource.READING:
-            for c in sub.conditions:
-                if not conditions_matched:
-                    break
-
-                if c.attribute == ConditionAttributeIdentifier.READING_VALUE:
-                    # If the reading is within the condition thresholds - don't include it
-                    # (we only want values out of range)
-                    reading_value = cast(SiteReading, e).value
-                    low_range = c.lower_threshold is None or reading_value < c.lower_threshold
-                    high_range = c.upper_threshold is None or reading_value > c.upper_threshold
-
-                    if c.lower_threshold is not None and c.upper_threshold is not None:
-                        conditions_matched = low_range or high_range
-                    else:
-                        conditions_matched = low_range and high_range
-
-        if not conditions_matched:
+        if not subscription_conditions_matched(sub, resource, e):
             continue
 
         yield e
@@ -391,14 +402,46 @@ async def fetch_batched_entities(
 
 
 async def handle_batch(
-    session: AsyncSession, batch: AggregatorBatchedEntities, href_prefix: str | None, broker: AsyncBroker
+    session: AsyncSession,
+    batch: AggregatorBatchedEntities,
+    href_prefix: str | None,
+    broker: AsyncBroker,
+    enqueue_concurrency: int = DEFAULT_ENQUEUE_CONCURRENCY,
+    subscription_index: SubscriptionIndex | None = None,
 ) -> None:
-    """Given a batch of entities for a subscription type - turn those entities into a series of notifications"""
+    """Given a batch of entities for a subscription type - turn those entities into a series of notifications
+
+    enqueue_concurrency: The max number of transmit tasks that will be concurrently published to broker
+    subscription_index: If set - subscriptions will be matched to entities via this (refreshed) index instead of being
+                        fetched per aggregator and checked against every entity"""
     all_notifications: list[NotificationEntities] = []
     aggregator_subs_cache: dict[int, Sequence[Subscription]] = {}  # keyed by aggregator_id
+    if subscription_index is not None:
+        await subscription_index.refresh(session)
+
     for batch_key, agg_id, entities, notification_type in all_entity_batches(
         batch.models_by_batch_key, batch.deleted_by_batch_key
     ):
+        if subscription_index is not None:
+            if entities:
+                for sub, sub_entities in subscription_index.entities_by_subscription(agg_id, batch.resource, entities):
+                    all_notifications.extend(
+                        get_entity_pages(
+                            batch.resource,
+                            sub,
+                            batch_key,
+                            notification_page_size(sub),
+                            sub_entities,
+                            notification_type,
+                        )
+                    )
+            else:
+                all_notifications.extend(
+                    list_notification(sub, batch_key)
+                    for sub in subscription_index.subscriptions_for_resource(agg_id, batch.resource)
+                )
+            continue
+
         # We enumerate by aggregator ID at the top level (as a way of minimising the size of entities)
         # We also cache the per aggregator subscriptions to minimise round trips to the db
         candidate_subscriptions = aggregator_subs_cache.get(agg_id, None)
@@ -407,18 +450,19 @@ async def handle_batch(
             aggregator_subs_cache[agg_id] = candidate_subscriptions
 
         for sub in candidate_subscriptions:
-            # Break the entities that apply to this subscription down into "pages" according to
-            # the definition of the subscription
-            entity_limit = sub.entity_limit if sub.entity_limit > 0 else 1
-            if entity_limit > MAX_NOTIFICATION_PAGE_SIZE:
-                entity_limit = MAX_NOTIFICATION_PAGE_SIZE
-
             if entities:
                 # Normally we're going to have a batch of entities that should be sent out via notifications
+                # Break the entities that apply to this subscription down into "pages" according to
+                # the definition of the subscription
                 entities_to_notify = entities_serviced_by_subscription(sub, batch.resource, entities)
                 all_notifications.extend(
                     get_entity_pages(
-                        batch.resource, sub, batch_key, entity_limit, entities_to_notify, notification_type
+                        batch.resource,
+                        sub,
+                        batch_key,
+                        notification_page_size(sub),
+                        entities_to_notify,
+                        notification_type,
                     )
                 )
             else:
@@ -426,15 +470,7 @@ async def handle_batch(
                 # changed (eg pollRate) - i.e. there are no child list items to indicate as changed - JUST the list.
                 if sub.resource_type == batch.resource:
                     # All we need is a match on the type of subscription to generate the subscription
-                    all_notifications.append(
-                        NotificationEntities(
-                            entities=[],  # No entities - we're just wanting the parent List to notify as empty
-                            subscription=sub,
-                            notification_id=uuid4(),
-                            notification_type=NotificationType.ENTITY_CHANGED,
-                            batch_key=batch_key,
-                        )
-                    )
+                    all_notifications.append(list_notification(sub, batch_key))
 
     # Finally time to enqueue the outgoing notifications
     logger.info(
@@ -447,23 +483,14 @@ async def handle_batch(
     # fetch runtime server config
     config = await RuntimeServerConfigManager.fetch_current_config(session)
 
-    for n in all_notifications:
-        content = entities_to_notification(
-            batch.resource,
-            n.subscription,
-            n.batch_key,
-            href_prefix,
-            n.notification_type,
-            n.entities,
-            config,
-        ).to_xml(skip_empty=False, exclude_none=True, exclude_unset=True)
-        if isinstance(content, bytes):
-            content = content.decode()
-
-        agg_id = n.batch_key[0]  # Aggregator ID is ALWAYS the first element of the batch_key
-        scope = scope_for_subscription(n.subscription, href_prefix)
+    # Publishing is pipelined - each notification is rendered while earlier notifications are still being published
+    # (bounded by enqueue_concurrency) so that the broker round trips don't happen one at a time
+    publish_slots = Semaphore(max(enqueue_concurrency, 1))
+    pending_publishes: list[Task] = []
 
+    async def publish(n: NotificationEntities, content: str) -> None:
         try:
+            scope = scope_for_subscription(n.subscription, href_prefix)
             await (
                 transmit_notification.kicker()
                 .with_broker(broker)
@@ -478,6 +505,35 @@ async def handle_batch(
             )
         except Exception as ex:
             logger.error("Error adding transmission task", exc_info=ex)
+        finally:
+            publish_slots.release()
+
+    publish_start = perf_counter()
+    for n in all_notifications:
+        content = entities_to_notification(
+            batch.resource,
+            n.subscription,
+            n.batch_key,
+            href_prefix,
+            n.notification_type,
+            n.entities,
+            config,
+        ).to_xml(skip_empty=False, exclude_none=True, exclude_unset=True)
+        if isinstance(content, bytes):
+            content = content.decode()
+
+        await publish_slots.acquire()
+        pending_publishes.append(create_task(publish(n, content)))
+        await sleep(0)  # Let the publish start before we render the next notification
+
+    await gather(*pending_publishes)
+    logger.info(
+        "check_db_change_or_delete for resource %s at timestamp %s enqueued %d notifications in %.3f seconds",
+        batch.resource,
+        batch.timestamp,
+        len(all_notifications),
+        perf_counter() - publish_start,
+    )
 
 
 @async_shared_broker.task()
@@ -487,6 +543,10 @@ async def check_db_change_or_delete(
     href_prefix: Annotated[str | None, TaskiqDepends(href_prefix_dependency)] = TaskiqDepends(),
     session: Annotated[AsyncSession, TaskiqDepends(session_dependency)] = TaskiqDepends(),
     broker: Annotated[AsyncBroker, TaskiqDepends(broker_dependency)] = TaskiqDepends(),
+    enqueue_concurrency: Annotated[int, TaskiqDepends(enqueue_concurrency_dependency)] = TaskiqDepends(),
+    subscription_index: Annotated[
+        SubscriptionIndex | None, TaskiqDepends(subscription_index_dependency)
+    ] = TaskiqDepends(),
 ) -> None:
     """Call this to notify that a particular timestamp within a particular named resource
     has had a batch of inserts/updates/deletes such that requesting all records with that changed_at timestamp
@@ -502,4 +562,4 @@ async def check_db_change_or_delete(
 
     batched_entities = await fetch_batched_entities(session, resource, timestamp)
     for batch in batched_entities:
-        await handle_batch(session, batch, href_prefix, broker)
+        await handle_batch(session, batch, href_prefix, broker, enqueue_concurrency, subscription_index)
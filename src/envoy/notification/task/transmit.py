@@ -3,12 +3,17 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Annotated
 
-from httpx import AsyncClient
+from httpx import AsyncClient, Limits
 from sqlalchemy.ext.asyncio import AsyncSession
 from taskiq import AsyncBroker, TaskiqDepends, async_shared_broker
 
 from envoy.notification.exception import NotificationTransmitError
-from envoy.notification.handler import broker_dependency, disable_tls_verify_dependency, session_dependency
+from envoy.notification.handler import (
+    broker_dependency,
+    disable_tls_verify_dependency,
+    http_client_dependency,
+    session_dependency,
+)
 from envoy.server.api.response import SEP_XML_MIME
 from envoy.server.manager.time import utc_now
 from envoy.server.model.subscription import TransmitNotificationLog
@@ -119,92 +124,137 @@ async def schedule_retry_transmission(
         )
 
 
-async def do_transmit_notification(
+def create_transmit_client(
+    disable_tls_verify: bool,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry_seconds: float,
+    http2: bool,
+) -> AsyncClient:
+    """Creates a long lived AsyncClient suitable for sharing across every outgoing notification (for a single worker).
+
+    The client will maintain a pool of keep alive connections (per remote host) and a single SSL context so that
+    bursts of notifications to the same remote host don't need to renegotiate a new TCP/TLS connection per request.
+
+    The caller is responsible for closing the client (via aclose()) when it's no longer required"""
+    return AsyncClient(
+        timeout=TRANSMIT_TIMEOUT_SECONDS,
+        verify=not disable_tls_verify,
+        limits=Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry_seconds,
+        ),
+        http2=http2,
+    )
+
+
+async def post_notification(
+    client: AsyncClient,
     remote_uri: str,
     content: str,
     subscription_href: str,
     notification_id: str,
     attempt: int,
-    disable_tls_verify: bool = False,
 ) -> TransmitResult:
-    """Internal method for transmitting the notification - Raises a NotificationTransmitError if the request fails and
-    needs retrying otherwise returns TransmitResult indicating the final result"""
+    """Internal method for POSTing the notification via client - Raises a NotificationTransmitError if the request
+    fails and needs retrying otherwise returns TransmitResult indicating the final result"""
+    logger.debug(
+        "Attempting to send notification %s of size %d to %s (attempt %d)",
+        notification_id,
+        len(content),
+        remote_uri,
+        attempt,
+    )
 
-    # Big scary gotcha - There is no way (within the app layer) for a recipient of a notification
-    # to validate that it's coming from our utility server. The ONLY thing keeping us safe
-    # is the fact that CSIP recommends the use of mutual TLS which basically requires us to share our server
-    # cert with the listener. This is all handled out of band and will be noted in the client docs
-    # but I've put this message here for devs who read this code and get terrified. Good job on your keen security eye!
-    async with AsyncClient(timeout=TRANSMIT_TIMEOUT_SECONDS, verify=not disable_tls_verify) as client:
-        logger.debug(
-            "Attempting to send notification %s of size %d to %s (attempt %d)",
+    headers = {
+        HEADER_SUBSCRIPTION_ID: subscription_href,
+        HEADER_NOTIFICATION_ID: notification_id,
+        HEADER_CONTENT_TYPE: SEP_XML_MIME,
+    }
+
+    transmit_start = utc_now()
+    try:
+        response = await client.post(url=remote_uri, content=content, headers=headers)
+
+    except Exception as ex:
+        logger.error(
+            f"Exception {ex} sending notification {notification_id} of size {len(content)} to {remote_uri} (attempt {attempt})",  # noqa e501
+            exc_info=ex,
+        )
+        # This is retryable - fire a NotificationTransmitError
+        raise NotificationTransmitError(
+            f"Exception {ex} sending notification {notification_id}",
+            transmit_start=transmit_start,
+            transmit_end=utc_now(),
+            http_status_code=None,
+        ) from ex
+
+    transmit_end = utc_now()
+
+    # Future work: Log these events in an audit log
+    if response.status_code >= 200 and response.status_code < 299:
+        # Success
+        return TransmitResult(
+            success=True,
+            transmit_start=transmit_start,
+            transmit_end=transmit_end,
+            http_status_code=response.status_code,
+        )
+
+    if response.status_code >= 300 and response.status_code < 499:
+        # On a 3XX or 4XX error - don't retry - we're either being redirected OR rejected for whatever reason
+        logger.error(
+            "Received HTTP %d sending notification %s of size %d to %s (attempt %d). No future retries",
+            response.status_code,
             notification_id,
             len(content),
             remote_uri,
             attempt,
         )
+        return TransmitResult(
+            success=False,
+            transmit_start=transmit_start,
+            transmit_end=transmit_end,
+            http_status_code=response.status_code,
+        )
 
-        headers = {
-            HEADER_SUBSCRIPTION_ID: subscription_href,
-            HEADER_NOTIFICATION_ID: notification_id,
-            HEADER_CONTENT_TYPE: SEP_XML_MIME,
-        }
+    # At this point it's likely an intermittent error - raise an exception that can potentially enable a retry
+    msg = f"HTTP {response.status_code} sending notification {notification_id} of size {len(content)} to {remote_uri} (attempt {attempt})"  # noqa e501
+    logger.error(msg)
+    raise NotificationTransmitError(
+        msg,
+        transmit_start=transmit_start,
+        transmit_end=utc_now(),
+        http_status_code=response.status_code,
+    )
 
-        transmit_start = utc_now()
-        try:
-            response = await client.post(url=remote_uri, content=content, headers=headers)
 
-        except Exception as ex:
-            logger.error(
-                f"Exception {ex} sending notification {notification_id} of size {len(content)} to {remote_uri} (attempt {attempt})",  # noqa e501
-                exc_info=ex,
-            )
-            # This is retryable - fire a NotificationTransmitError
-            raise NotificationTransmitError(
-                f"Exception {ex} sending notification {notification_id}",
-                transmit_start=transmit_start,
-                transmit_end=utc_now(),
-                http_status_code=None,
-            ) from ex
-
-        transmit_end = utc_now()
-
-        # Future work: Log these events in an audit log
-        if response.status_code >= 200 and response.status_code < 299:
-            # Success
-            return TransmitResult(
-                success=True,
-                transmit_start=transmit_start,
-                transmit_end=transmit_end,
-                http_status_code=response.status_code,
-            )
+async def do_transmit_notification(
+    remote_uri: str,
+    content: str,
+    subscription_href: str,
+    notification_id: str,
+    attempt: int,
+    disable_tls_verify: bool = False,
+    client: AsyncClient | None = None,
+) -> TransmitResult:
+    """Internal method for transmitting the notification - Raises a NotificationTransmitError if the request fails and
+    needs retrying otherwise returns TransmitResult indicating the final result
 
-        if response.status_code >= 300 and response.status_code < 499:
-            # On a 3XX or 4XX error - don't retry - we're either being redirected OR rejected for whatever reason
-            logger.error(
-                "Received HTTP %d sending notification %s of size %d to %s (attempt %d). No future retries",
-                response.status_code,
-                notification_id,
-                len(content),
-                remote_uri,
-                attempt,
-            )
-            return TransmitResult(
-                success=False,
-                transmit_start=transmit_start,
-                transmit_end=transmit_end,
-                http_status_code=response.status_code,
-            )
+    client: If specified - this (long lived) client will be used for the request. Otherwise a one off client will be
+            created (and closed) for just this request (disable_tls_verify will only apply to this one off client)"""
 
-        # At this point it's likely an intermittent error - raise an exception that can potentially enable a retry
-        msg = f"HTTP {response.status_code} sending notification {notification_id} of size {len(content)} to {remote_uri} (attempt {attempt})"  # noqa e501
-        logger.error(msg)
-        raise NotificationTransmitError(
-            msg,
-            transmit_start=transmit_start,
-            transmit_end=utc_now(),
-            http_status_code=response.status_code,
-        )
+    # Big scary gotcha - There is no way (within the app layer) for a recipient of a notification
+    # to validate that it's coming from our utility server. The ONLY thing keeping us safe
+    # is the fact that CSIP recommends the use of mutual TLS which basically requires us to share our server
+    # cert with the listener. This is all handled out of band and will be noted in the client docs
+    # but I've put this message here for devs who read this code and get terrified. Good job on your keen security eye!
+    if client is not None:
+        return await post_notification(client, remote_uri, content, subscription_href, notification_id, attempt)
+
+    async with AsyncClient(timeout=TRANSMIT_TIMEOUT_SECONDS, verify=not disable_tls_verify) as one_off_client:
+        return await post_notification(one_off_client, remote_uri, content, subscription_href, notification_id, attempt)
 
 
 @async_shared_broker.task()
@@ -218,6 +268,7 @@ async def transmit_notification(
     broker: Annotated[AsyncBroker, TaskiqDepends(broker_dependency)] = TaskiqDepends(),
     session: Annotated[AsyncSession, TaskiqDepends(session_dependency)] = TaskiqDepends(),
     disable_tls_verify: Annotated[bool, TaskiqDepends(disable_tls_verify_dependency)] = TaskiqDepends(),
+    http_client: Annotated[AsyncClient | None, TaskiqDepends(http_client_dependency)] = TaskiqDepends(),
 ) -> None:
     """Call this to trigger an outgoing notification to be sent. If the notification fails it will be retried
     a few times (at a staggered cadence) before giving up.
@@ -236,6 +287,7 @@ async def transmit_notification(
             notification_id,
             attempt,
             disable_tls_verify=disable_tls_verify,
+            client=http_client,
         )
         await safely_log_transmit_result(
             session=session, result=transmit_result, attempt=attempt, subscription_id=subscription_id, content=content
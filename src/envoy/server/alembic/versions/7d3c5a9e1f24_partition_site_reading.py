@@ -0,0 +1,242 @@
+"""partition_site_reading
+
+Revision ID: 7d3c5a9e1f24
+Revises: 2b7e41c9d0a6
+Create Date: 2026-10-16 14:02:51.336417
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7d3c5a9e1f24"
+down_revision = "2b7e41c9d0a6"
+branch_labels = None
+depends_on = None
+
+# Monthly partitions will be created for existing data up to this far in the past. Anything older lands in the
+# DEFAULT partition (this is just to avoid creating thousands of partitions for a handful of outlier readings)
+MAX_PARTITION_HISTORY = "10 years"
+
+# How many months ahead (of the current month) will be created by this migration. The partition maintenance task
+# is responsible for keeping ahead of this after the migration is applied
+MONTHS_AHEAD = 3
+
+
+def _create_monthly_partitions(table: str, source_table: str) -> None:
+    """Creates a monthly range partition (named {table}_pYYYYMM) for every month (UTC) from the oldest
+    time_period_start in source_table until MONTHS_AHEAD months into the future. Also creates {table}_default"""
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT;")
+    op.execute(
+        f"""
+DO $$
+DECLARE
+    current_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC');
+    partition_month timestamp;
+BEGIN
+    SELECT date_trunc('month', min(time_period_start) AT TIME ZONE 'UTC') INTO partition_month FROM {source_table};
+    partition_month := GREATEST(
+        COALESCE(partition_month, current_month), current_month - interval '{MAX_PARTITION_HISTORY}'
+    );
+    WHILE partition_month <= current_month + interval '{MONTHS_AHEAD} months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+            '{table}_p' || to_char(partition_month, 'YYYYMM'),
+            partition_month AT TIME ZONE 'UTC',
+            (partition_month + interval '1 month') AT TIME ZONE 'UTC'
+        );
+        partition_month := partition_month + interval '1 month';
+    END LOOP;
+END;
+$$;
+"""  # noqa: S608
+    )
+
+
+def upgrade() -> None:
+    # The existing tables are moved out of the way (along with any relation names that would otherwise collide)
+    op.execute("ALTER TABLE site_reading RENAME TO site_reading_legacy;")
+    op.execute("ALTER INDEX site_reading_pkey RENAME TO site_reading_legacy_pkey;")
+    op.execute("ALTER INDEX site_reading_type_id_time_period_start_uc RENAME TO site_reading_legacy_uc;")
+    op.execute("ALTER INDEX ix_site_reading_changed_time RENAME TO ix_site_reading_legacy_changed_time;")
+    op.execute("ALTER SEQUENCE site_reading_site_reading_id_seq OWNED BY NONE;")
+    op.execute("ALTER TABLE archive_site_reading RENAME TO archive_site_reading_legacy;")
+    op.execute("ALTER INDEX archive_site_reading_pkey RENAME TO archive_site_reading_legacy_pkey;")
+    op.execute(
+        "ALTER INDEX ix_archive_site_reading_deleted_time RENAME TO ix_archive_site_reading_legacy_deleted_time;"
+    )
+    op.execute(
+        "ALTER INDEX ix_archive_site_reading_site_reading_id RENAME TO ix_archive_site_reading_legacy_site_reading_id;"
+    )
+    op.execute("ALTER SEQUENCE archive_site_reading_archive_id_seq OWNED BY NONE;")
+
+    # Partitioned tables require the partition key (time_period_start) to be a part of every unique constraint
+    op.create_table(
+        "site_reading",
+        sa.Column(
+            "site_reading_id",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('site_reading_site_reading_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("site_reading_type_id", sa.Integer(), nullable=False),
+        sa.Column("created_time", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("changed_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("local_id", sa.INTEGER(), nullable=True),
+        sa.Column("quality_flags", sa.INTEGER(), nullable=False),
+        sa.Column("time_period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("time_period_seconds", sa.INTEGER(), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["site_reading_type_id"],
+            ["site_reading_type.site_reading_type_id"],
+        ),
+        sa.PrimaryKeyConstraint("site_reading_id", "time_period_start"),
+        sa.UniqueConstraint(
+            "site_reading_type_id", "time_period_start", name="site_reading_type_id_time_period_start_uc"
+        ),
+        postgresql_partition_by="RANGE (time_period_start)",
+    )
+    op.create_index(op.f("ix_site_reading_changed_time"), "site_reading", ["changed_time"], unique=False)
+    op.execute("ALTER SEQUENCE site_reading_site_reading_id_seq OWNED BY site_reading.site_reading_id;")
+
+    op.create_table(
+        "archive_site_reading",
+        sa.Column("site_reading_id", sa.BigInteger(), nullable=False),
+        sa.Column("site_reading_type_id", sa.INTEGER(), nullable=False),
+        sa.Column("created_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("changed_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("local_id", sa.INTEGER(), nullable=True),
+        sa.Column("quality_flags", sa.INTEGER(), nullable=False),
+        sa.Column("time_period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("time_period_seconds", sa.INTEGER(), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "archive_id",
+            sa.Integer(),
+            server_default=sa.text("nextval('archive_site_reading_archive_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("archive_time", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("deleted_time", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("archive_id", "time_period_start"),
+        postgresql_partition_by="RANGE (time_period_start)",
+    )
+    op.create_index(
+        op.f("ix_archive_site_reading_deleted_time"), "archive_site_reading", ["deleted_time"], unique=False
+    )
+    op.create_index(
+        op.f("ix_archive_site_reading_site_reading_id"), "archive_site_reading", ["site_reading_id"], unique=False
+    )
+    op.execute("ALTER SEQUENCE archive_site_reading_archive_id_seq OWNED BY archive_site_reading.archive_id;")
+
+    _create_monthly_partitions("site_reading", "site_reading_legacy")
+    _create_monthly_partitions("archive_site_reading", "archive_site_reading_legacy")
+
+    op.execute(
+        "INSERT INTO site_reading (site_reading_id, site_reading_type_id, created_time, changed_time, local_id, "
+        "quality_flags, time_period_start, time_period_seconds, value) "
+        "SELECT site_reading_id, site_reading_type_id, created_time, changed_time, local_id, quality_flags, "
+        "time_period_start, time_period_seconds, value FROM site_reading_legacy;"
+    )
+    op.execute(
+        "INSERT INTO archive_site_reading (site_reading_id, site_reading_type_id, created_time, changed_time, local_id, "
+        "quality_flags, time_period_start, time_period_seconds, value, archive_id, archive_time, deleted_time) "
+        "SELECT site_reading_id, site_reading_type_id, created_time, changed_time, local_id, quality_flags, "
+        "time_period_start, time_period_seconds, value, archive_id, archive_time, deleted_time FROM archive_site_reading_legacy;"
+    )
+    op.drop_table("site_reading_legacy")
+    op.drop_table("archive_site_reading_legacy")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE site_reading RENAME TO site_reading_partitioned;")
+    op.execute("ALTER INDEX site_reading_pkey RENAME TO site_reading_partitioned_pkey;")
+    op.execute("ALTER INDEX site_reading_type_id_time_period_start_uc RENAME TO site_reading_partitioned_uc;")
+    op.execute("ALTER INDEX ix_site_reading_changed_time RENAME TO ix_site_reading_partitioned_changed_time;")
+    op.execute("ALTER SEQUENCE site_reading_site_reading_id_seq OWNED BY NONE;")
+    op.execute("ALTER TABLE archive_site_reading RENAME TO archive_site_reading_partitioned;")
+    op.execute("ALTER INDEX archive_site_reading_pkey RENAME TO archive_site_reading_partitioned_pkey;")
+    op.execute(
+        "ALTER INDEX ix_archive_site_reading_deleted_time RENAME TO ix_archive_site_reading_partitioned_deleted_time;"
+    )
+    op.execute(
+        "ALTER INDEX ix_archive_site_reading_site_reading_id "
+        "RENAME TO ix_archive_site_reading_partitioned_site_reading_id;"
+    )
+    op.execute("ALTER SEQUENCE archive_site_reading_archive_id_seq OWNED BY NONE;")
+
+    op.create_table(
+        "site_reading",
+        sa.Column(
+            "site_reading_id",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('site_reading_site_reading_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("site_reading_type_id", sa.Integer(), nullable=False),
+        sa.Column("created_time", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("changed_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("local_id", sa.INTEGER(), nullable=True),
+        sa.Column("quality_flags", sa.INTEGER(), nullable=False),
+        sa.Column("time_period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("time_period_seconds", sa.INTEGER(), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["site_reading_type_id"],
+            ["site_reading_type.site_reading_type_id"],
+        ),
+        sa.PrimaryKeyConstraint("site_reading_id"),
+        sa.UniqueConstraint(
+            "site_reading_type_id", "time_period_start", name="site_reading_type_id_time_period_start_uc"
+        ),
+    )
+    op.create_index(op.f("ix_site_reading_changed_time"), "site_reading", ["changed_time"], unique=False)
+    op.execute("ALTER SEQUENCE site_reading_site_reading_id_seq OWNED BY site_reading.site_reading_id;")
+
+    op.create_table(
+        "archive_site_reading",
+        sa.Column("site_reading_id", sa.BigInteger(), nullable=False),
+        sa.Column("site_reading_type_id", sa.INTEGER(), nullable=False),
+        sa.Column("created_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("changed_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("local_id", sa.INTEGER(), nullable=True),
+        sa.Column("quality_flags", sa.INTEGER(), nullable=False),
+        sa.Column("time_period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("time_period_seconds", sa.INTEGER(), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "archive_id",
+            sa.Integer(),
+            server_default=sa.text("nextval('archive_site_reading_archive_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("archive_time", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("deleted_time", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("archive_id"),
+    )
+    op.create_index(
+        op.f("ix_archive_site_reading_deleted_time"), "archive_site_reading", ["deleted_time"], unique=False
+    )
+    op.create_index(
+        op.f("ix_archive_site_reading_site_reading_id"), "archive_site_reading", ["site_reading_id"], unique=False
+    )
+    op.execute("ALTER SEQUENCE archive_site_reading_archive_id_seq OWNED BY archive_site_reading.archive_id;")
+
+    op.execute(
+        "INSERT INTO site_reading (site_reading_id, site_reading_type_id, created_time, changed_time, local_id, "
+        "quality_flags, time_period_start, time_period_seconds, value) "
+        "SELECT site_reading_id, site_reading_type_id, created_time, changed_time, local_id, quality_flags, "
+        "time_period_start, time_period_seconds, value FROM site_reading_partitioned;"
+    )
+    op.execute(
+        "INSERT INTO archive_site_reading (site_reading_id, site_reading_type_id, created_time, changed_time, local_id, "
+        "quality_flags, time_period_start, time_period_seconds, value, archive_id, archive_time, deleted_time) "
+        "SELECT site_reading_id, site_reading_type_id, created_time, changed_time, local_id, quality_flags, "
+        "time_period_start, time_period_seconds, value, archive_id, archive_time, deleted_time FROM archive_site_reading_partitioned;"
+    )
+
+    # Dropping the partitioned parent will also drop all partitions (but not any that were detached by maintenance)
+    op.drop_table("site_reading_partitioned")
+    op.drop_table("archive_site_reading_partitioned")
@@ -11,8 +11,13 @@ from fastapi import Request
 from fastapi_async_sqlalchemy import db
 
 from envoy.server.api.error_handler import LoggedHttpException
-from envoy.server.cache import AsyncCache, ExpiringValue
-from envoy.server.crud.auth import ClientIdDetails, select_all_client_id_details
+from envoy.server.cache import AsyncCache, ExpiringValue, LRUCache
+from envoy.server.cache.device_site import device_site_cache
+from envoy.server.crud.auth import (
+    ClientIdDetails,
+    select_all_client_id_details,
+    select_client_id_details_for_lfdi,
+)
 from envoy.server.crud.common import convert_lfdi_to_sfdi
 from envoy.server.crud.site import select_single_site_with_sfdi
 from envoy.server.model.aggregator import NULL_AGGREGATOR_ID
@@ -24,6 +29,11 @@ logger = logging.getLogger(__name__)
 class LFDIAuthError(Exception): ...  # noqa: E701
 
 
+DEFAULT_PEM_CACHE_MAX_ENTRIES = 10000  # How many distinct cert PEM header values will have their LFDI/SFDI cached
+CLIENT_ID_NEGATIVE_TTL_SECONDS = 30  # How long an LFDI that isn't an aggregator cert will be remembered as such
+CLIENT_ID_REFRESH_AFTER_SECONDS = 300  # How old the aggregator cert cache can get before a background reload
+
+
 # NOTE: The below `is_valid_x` functions are ONLY checking format validity, nothing else.
 def is_valid_lfdi(lfdi_str: str) -> bool:
     """Checks if string has valid lfdi format - 40 char long and hexadecimal (case-insensitive)"""
@@ -79,6 +89,16 @@ async def update_client_id_details_cache(_: object) -> dict[str, ExpiringValue[C
     return {cid.lfdi: ExpiringValue(expiry=cid.expiry, value=cid) for cid in client_ids}
 
 
+async def fetch_client_id_details(_: object, lfdi: str) -> ExpiringValue[ClientIdDetails] | None:
+    """To be called on cache miss (once the cache is populated). Fetches just the clientIdDetails for lfdi, returning
+    None if lfdi is not an aggregator certificate"""
+
+    # See update_client_id_details_cache for why a fresh session is used
+    async with db():
+        cid = await select_client_id_details_for_lfdi(db.session, lfdi)
+    return None if cid is None else ExpiringValue(expiry=cid.expiry, value=cid)
+
+
 class LFDIAuthDepends:
     """Dependency class for generating the Long Form Device Identifier (LFDI) from a client TLS
     certificate in Privacy-Enhanced Mail (PEM) format. The client certificate is expected to be
@@ -92,16 +112,43 @@ class LFDIAuthDepends:
     cert_header: str
     allow_device_registration: bool
     aggregator_cert_cache: AsyncCache[str, ClientIdDetails]
-
-    def __init__(self, cert_header: str, allow_device_registration: bool) -> None:
+    pem_cache: LRUCache[str, tuple[str, int]]  # (lfdi, sfdi) keyed by the raw (PEM) cert header value
+    device_site_cache: LRUCache[int, int]  # registered site_id keyed by device cert sfdi
+
+    def __init__(
+        self,
+        cert_header: str,
+        allow_device_registration: bool,
+        pem_cache_max_entries: int = DEFAULT_PEM_CACHE_MAX_ENTRIES,
+    ) -> None:
         # fastapi will always return headers in lowercase form
         self.cert_header = cert_header.lower()
         self.allow_device_registration = allow_device_registration
-        self.aggregator_cert_cache = AsyncCache(update_fn=update_client_id_details_cache)
+        self.aggregator_cert_cache = AsyncCache(
+            update_fn=update_client_id_details_cache,
+            fetch_fn=fetch_client_id_details,
+            negative_ttl_seconds=CLIENT_ID_NEGATIVE_TTL_SECONDS,
+            refresh_after_seconds=CLIENT_ID_REFRESH_AFTER_SECONDS,
+        )
+        self.pem_cache = LRUCache(max_entries=pem_cache_max_entries)
+        self.device_site_cache = device_site_cache
 
     async def __call__(self, request: Request) -> None:
-        # Try extracting the lfdi from either the PEM if we receive it directly or the fingerprint if we get that
+        # Parsing a PEM is expensive but the same certs are presented over and over - so the derived LFDI/SFDI
+        # are cached against the raw header value
         cert_header_val = request.headers.get(self.cert_header, None)
+        cached_ids = self.pem_cache.get(cert_header_val) if cert_header_val else None
+        if cached_ids is not None:
+            lfdi, sfdi = cached_ids
+        else:
+            lfdi, sfdi = self.lfdi_sfdi_from_header(cert_header_val)
+
+        await self.apply_client_identity(request, lfdi, sfdi)
+
+    def lfdi_sfdi_from_header(self, cert_header_val: str | None) -> tuple[str, int]:
+        """Validates and decodes cert_header_val (PEM, SHA256 fingerprint or LFDI) into a (lfdi, sfdi) tuple. Values
+        derived from a PEM will be stored in pem_cache. Raises LoggedHttpException if the value is invalid"""
+        # Try extracting the lfdi from either the PEM if we receive it directly or the fingerprint if we get that
         if not cert_header_val:
             raise LoggedHttpException(
                 logger,
@@ -112,7 +159,8 @@ class LFDIAuthDepends:
                 detail="Internal Server Error.",
             )
 
-        if is_valid_pem(cert_header_val):
+        is_pem = is_valid_pem(cert_header_val)
+        if is_pem:
             logger.debug(f"{self.cert_header} contains a valid PEM.")
             lfdi = LFDIAuthDepends.generate_lfdi_from_pem(cert_header_val)
         elif is_valid_sha256(cert_header_val):
@@ -141,6 +189,15 @@ class LFDIAuthDepends:
                 logger, exc=exc, status_code=HTTPStatus.BAD_REQUEST, detail="Unrecognised client certificate."
             ) from exc
 
+        if is_pem:
+            self.pem_cache.put(cert_header_val, (lfdi, sfdi))
+
+        return (lfdi, sfdi)
+
+    async def apply_client_identity(self, request: Request, lfdi: str, sfdi: int) -> None:
+        """Identifies the type of client (aggregator/device) from the already decoded lfdi/sfdi and populates
+        request.state accordingly. Raises LoggedHttpException if the client should not be permitted"""
+
         # get client id details from cache, will return None if expired or never existed.
         expirable_client_id = await self.aggregator_cert_cache.get_value_ignore_expiry(None, lfdi)
         site_id: int | None = None
@@ -164,10 +221,15 @@ class LFDIAuthDepends:
             # be routed through an aggregator (and their client cert)
             if self.allow_device_registration:
                 source = CertificateType.DEVICE_CERTIFICATE
-                async with db():
-                    site = await select_single_site_with_sfdi(db.session, sfdi=sfdi, aggregator_id=NULL_AGGREGATOR_ID)
+                site_id = self.device_site_cache.get(sfdi)
+                if site_id is None:
+                    async with db():
+                        site = await select_single_site_with_sfdi(
+                            db.session, sfdi=sfdi, aggregator_id=NULL_AGGREGATOR_ID
+                        )
                     if site is not None:
                         site_id = site.site_id
+                        self.device_site_cache.put(sfdi, site_id)
             else:
                 # Reject the attempted device cert request
                 raise LoggedHttpException(
@@ -0,0 +1,11 @@
+from fastapi import Request
+
+from envoy.server.model.aggregator import SiteCountStrategy
+
+SITE_COUNT_STRATEGY_ATTR = "site_count_strategy"
+DEFAULT_SITE_COUNT_STRATEGY = SiteCountStrategy.EXACT
+
+
+def fetch_site_count_strategy_setting(request: Request) -> SiteCountStrategy:
+    """Fetches the EndDeviceList SiteCountStrategy setting from FastAPI app state under the expected attribute name."""
+    return getattr(request.app.state, SITE_COUNT_STRATEGY_ATTR, DEFAULT_SITE_COUNT_STRATEGY)
@@ -1,13 +1,17 @@
+from collections.abc import Mapping
 from http import HTTPStatus
 from typing import Generic, TypeVar
 
 from fastapi import HTTPException, Request, Response
 from pydantic_xml import BaseXmlModel
 from pydantic_xml.errors import ParsingError
+from starlette.background import BackgroundTask
 
 SEP_XML_MIME: str = "application/sep+xml; csipaus=1.3-beta_storage"
 
 LOCATION_HEADER_NAME: str = "Location"
+ETAG_HEADER_NAME: str = "ETag"
+IF_NONE_MATCH_HEADER_NAME: str = "If-None-Match"
 
 TBaseXmlModel = TypeVar("TBaseXmlModel", bound=BaseXmlModel)
 
@@ -15,10 +19,45 @@ TBaseXmlModel = TypeVar("TBaseXmlModel", bound=BaseXmlModel)
 class XmlResponse(Response):
     media_type = SEP_XML_MIME
 
+    def __init__(
+        self,
+        content: BaseXmlModel | None = None,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        media_type: str | None = None,
+        background: BackgroundTask | None = None,
+        etag: str | None = None,
+    ) -> None:
+        """etag: If set - will be sent as the ETag header of this response (see is_not_modified)"""
+        if etag is not None:
+            headers = {**(headers or {}), ETAG_HEADER_NAME: etag}
+        super().__init__(content, status_code, headers, media_type, background)
+
     def render(self, content: BaseXmlModel) -> str | bytes:  # ty:ignore[invalid-method-override] # Base is too restrictive
         return content.to_xml(skip_empty=False, exclude_none=True, exclude_unset=True)
 
 
+class NotModifiedResponse(Response):
+    """A 304 Not Modified response (with no body) for a request whose If-None-Match matched the current ETag"""
+
+    def __init__(self, etag: str) -> None:
+        super().__init__(status_code=HTTPStatus.NOT_MODIFIED, headers={ETAG_HEADER_NAME: etag})
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Returns True if the request's If-None-Match header matches etag (i.e. the client already has the current
+    representation and a NotModifiedResponse can be returned). Weak comparison is used as per RFC 9110."""
+    if_none_match = request.headers.get(IF_NONE_MATCH_HEADER_NAME, None)
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+
 class XmlRequest(Generic[TBaseXmlModel]):
     """
     Create an XmlRequest object which is used by FastApi to parse the XML body of POST/PUT requests
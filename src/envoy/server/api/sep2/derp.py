@@ -12,9 +12,10 @@ from envoy.server.api.request import (
     extract_request_claims,
     extract_start_from_paging_param,
 )
-from envoy.server.api.response import XmlResponse
+from envoy.server.api.response import NotModifiedResponse, XmlResponse, is_not_modified
 from envoy.server.exception import BadRequestError, NotFoundError
 from envoy.server.manager.derp import DERControlManager, DERProgramManager
+from envoy.server.manager.etag import ETagDependency, ETagManager
 
 logger = logging.getLogger(__name__)
 
@@ -41,10 +42,17 @@ async def get_derprogram_list(
     Returns:
         fastapi.Response object.
     """
+    scope = extract_request_claims(request).to_site_request_scope(site_id)
+    etag = await ETagManager.fetch_etag_for_scope(
+        db.session, scope, str(request.url), ETagDependency.SITE_CONTROL_GROUPS | ETagDependency.SITE_DOES
+    )
+    if etag and is_not_modified(request, etag):
+        return NotModifiedResponse(etag)
+
     try:
         derp_list = await DERProgramManager.fetch_list_for_scope(
             db.session,
-            scope=extract_request_claims(request).to_site_request_scope(site_id),
+            scope=scope,
             start=extract_start_from_paging_param(start),
             changed_after=extract_datetime_from_paging_param(after),
             limit=extract_limit_from_paging_param(limit),
@@ -55,7 +63,7 @@ async def get_derprogram_list(
     except NotFoundError as ex:
         raise LoggedHttpException(logger, None, status_code=HTTPStatus.NOT_FOUND, detail="Not found") from ex
 
-    return XmlResponse(derp_list)
+    return XmlResponse(derp_list, etag=etag)
 
 
 @router.head(uri.DERProgramFSAListUri)
@@ -81,10 +89,17 @@ async def get_derprogram_list_fsa_scoped(
     Returns:
         fastapi.Response object.
     """
+    scope = extract_request_claims(request).to_site_request_scope(site_id)
+    etag = await ETagManager.fetch_etag_for_scope(
+        db.session, scope, str(request.url), ETagDependency.SITE_CONTROL_GROUPS | ETagDependency.SITE_DOES
+    )
+    if etag and is_not_modified(request, etag):
+        return NotModifiedResponse(etag)
+
     try:
         derp_list = await DERProgramManager.fetch_list_for_scope(
             db.session,
-            scope=extract_request_claims(request).to_site_request_scope(site_id),
+            scope=scope,
             start=extract_start_from_paging_param(start),
             changed_after=extract_datetime_from_paging_param(after),
             limit=extract_limit_from_paging_param(limit),
@@ -95,7 +110,7 @@ async def get_derprogram_list_fsa_scoped(
     except NotFoundError as ex:
         raise LoggedHttpException(logger, None, status_code=HTTPStatus.NOT_FOUND, detail="Not found") from ex
 
-    return XmlResponse(derp_list)
+    return XmlResponse(derp_list, etag=etag)
 
 
 @router.head(uri.DERProgramUri)
@@ -147,11 +162,15 @@ async def get_dercontrol_list(
     Returns:
         fastapi.Response object.
     """
+    scope = extract_request_claims(request).to_site_request_scope(site_id)
+    etag = await ETagManager.fetch_etag_for_scope(db.session, scope, str(request.url), ETagDependency.SITE_DOES)
+    if etag and is_not_modified(request, etag):
+        return NotModifiedResponse(etag)
 
     try:
         derc_list = await DERControlManager.fetch_doe_controls_for_scope(
             db.session,
-            scope=extract_request_claims(request).to_site_request_scope(site_id),
+            scope=scope,
             der_program_id=der_program_id,
             start=extract_start_from_paging_param(start),
             changed_after=extract_datetime_from_paging_param(after),
@@ -162,7 +181,7 @@ async def get_dercontrol_list(
     except NotFoundError as ex:
         raise LoggedHttpException(logger, None, status_code=HTTPStatus.NOT_FOUND, detail="Not found") from ex
 
-    return XmlResponse(derc_list)
+    return XmlResponse(derc_list, etag=etag)
 
 
 @router.head(uri.ActiveDERControlListUri)
@@ -188,11 +207,15 @@ async def get_active_dercontrol_list(
     Returns:
         fastapi.Response object.
     """
+    scope = extract_request_claims(request).to_site_request_scope(site_id)
+    etag = await ETagManager.fetch_etag_for_scope(db.session, scope, str(request.url), ETagDependency.SITE_DOES)
+    if etag and is_not_modified(request, etag):
+        return NotModifiedResponse(etag)
 
     try:
         derc_list = await DERControlManager.fetch_active_doe_controls_for_scope(
             db.session,
-            scope=extract_request_claims(request).to_site_request_scope(site_id),
+            scope=scope,
             der_program_id=der_program_id,
             start=extract_start_from_paging_param(start),
             changed_after=extract_datetime_from_paging_param(after),
@@ -203,7 +226,7 @@ async def get_active_dercontrol_list(
     except NotFoundError as ex:
         raise LoggedHttpException(logger, None, status_code=HTTPStatus.NOT_FOUND, detail="Not found") from ex
 
-    return XmlResponse(derc_list)
+    return XmlResponse(derc_list, etag=etag)
 
 
 @router.head(uri.DefaultDERControlUri)
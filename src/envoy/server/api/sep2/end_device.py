@@ -6,6 +6,7 @@ from envoy_schema.server.schema.sep2.end_device import EndDeviceRequest
 from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi_async_sqlalchemy import db
 
+from envoy.server.api.depends.site_count_strategy import fetch_site_count_strategy_setting
 from envoy.server.api.error_handler import LoggedHttpException
 from envoy.server.api.request import (
     extract_datetime_from_paging_param,
@@ -17,6 +18,7 @@ from envoy.server.api.response import LOCATION_HEADER_NAME, XmlRequest, XmlRespo
 from envoy.server.exception import BadRequestError, ConflictError, ForbiddenError, NotFoundError
 from envoy.server.manager.end_device import EndDeviceManager, RegistrationManager
 from envoy.server.mapper.common import generate_href
+from envoy.server.model.aggregator import SiteCountStrategy
 
 logger = logging.getLogger(__name__)
 
@@ -82,6 +84,7 @@ async def get_enddevice_list(
     start: list[int] = Query([0], alias="s"),
     after: list[int] = Query([0], alias="a"),
     limit: list[int] = Query([1], alias="l"),
+    count_strategy: SiteCountStrategy = Depends(fetch_site_count_strategy_setting),
 ) -> XmlResponse:
     """Responds with a EndDeviceList resource.
 
@@ -90,6 +93,7 @@ async def get_enddevice_list(
         start: list query parameter for the start index value. Default 0.
         after: list query parameter for lists with a datetime primary index. Default 0.
         limit: list query parameter for the maximum number of objects to return. Default 1.
+        count_strategy: (Injected) how the total count of EndDevices will be calculated.
 
     Returns:
         fastapi.Response object.
@@ -103,6 +107,7 @@ async def get_enddevice_list(
             start=extract_start_from_paging_param(start),
             after=extract_datetime_from_paging_param(after),
             limit=extract_limit_from_paging_param(limit),
+            count_strategy=count_strategy,
         )
     )
 
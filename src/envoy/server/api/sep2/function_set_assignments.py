@@ -2,7 +2,7 @@ import logging
 from http import HTTPStatus
 
 from envoy_schema.server.schema import uri
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
 from fastapi_async_sqlalchemy import db
 
 from envoy.server.api import query
@@ -13,7 +13,8 @@ from envoy.server.api.request import (
     extract_request_claims,
     extract_start_from_paging_param,
 )
-from envoy.server.api.response import XmlResponse
+from envoy.server.api.response import NotModifiedResponse, XmlResponse, is_not_modified
+from envoy.server.manager.etag import ETagDependency, ETagManager
 from envoy.server.manager.function_set_assignments import FunctionSetAssignmentsManager
 
 logger = logging.getLogger(__name__)
@@ -57,7 +58,7 @@ async def get_function_set_assignments_list(
     start: list[int] = query.StartQueryParameter,
     limit: list[int] = query.LimitQueryParameter,
     after: list[int] = query.AfterQueryParameter,
-) -> XmlResponse:
+) -> Response:
     """Responds with a FunctionSetAssignmentsList resource.
 
     Args:
@@ -68,10 +69,16 @@ async def get_function_set_assignments_list(
     Returns:
         fastapi.Response object.
     """
+    scope = extract_request_claims(request).to_site_request_scope(site_id)
+    etag = await ETagManager.fetch_etag_for_scope(
+        db.session, scope, str(request.url), ETagDependency.SITE_CONTROL_GROUPS | ETagDependency.TARIFFS
+    )
+    if etag and is_not_modified(request, etag):
+        return NotModifiedResponse(etag)
 
     function_set_assignments_list = await FunctionSetAssignmentsManager.fetch_function_set_assignments_list_for_scope(
         session=db.session,
-        scope=extract_request_claims(request).to_site_request_scope(site_id),
+        scope=scope,
         start=extract_start_from_paging_param(start),
         changed_after=extract_datetime_from_paging_param(after),
         limit=extract_limit_from_paging_param(limit),
@@ -79,4 +86,4 @@ async def get_function_set_assignments_list(
     if function_set_assignments_list is None:
         raise LoggedHttpException(logger, None, status_code=HTTPStatus.NOT_FOUND, detail="Not Found.")
     else:
-        return XmlResponse(function_set_assignments_list)
+        return XmlResponse(function_set_assignments_list, etag=etag)
@@ -2,7 +2,7 @@ import logging
 from http import HTTPStatus
 
 from envoy_schema.server.schema import uri
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, Query, Request, Response
 from fastapi_async_sqlalchemy import db
 
 from envoy.server.api.error_handler import LoggedHttpException
@@ -12,8 +12,9 @@ from envoy.server.api.request import (
     extract_request_claims,
     extract_start_from_paging_param,
 )
-from envoy.server.api.response import XmlResponse
+from envoy.server.api.response import NotModifiedResponse, XmlResponse, is_not_modified
 from envoy.server.exception import NotFoundError
+from envoy.server.manager.etag import ETagDependency, ETagManager
 from envoy.server.manager.pricing import (
     ConsumptionTariffIntervalManager,
     RateComponentManager,
@@ -58,7 +59,7 @@ async def get_tariffprofilelist_fsa_scoped(
     start: list[int] = Query([0], alias="s"),
     after: list[int] = Query([0], alias="a"),
     limit: list[int] = Query([1], alias="l"),
-) -> XmlResponse:
+) -> Response:
     """Responds with a paginated list of tariff profiles available to the current client. These tariffs
     will be scoped specifically to the specified site_id and function set assignment id
 
@@ -73,17 +74,23 @@ async def get_tariffprofilelist_fsa_scoped(
         fastapi.Response object.
 
     """
+    scope = extract_request_claims(request).to_site_request_scope(site_id)
+    etag = await ETagManager.fetch_etag_for_scope(
+        db.session, scope, str(request.url), ETagDependency.TARIFFS | ETagDependency.SITE_RATES
+    )
+    if etag and is_not_modified(request, etag):
+        return NotModifiedResponse(etag)
 
     tp_list = await TariffProfileManager.fetch_tariff_profile_list(
         db.session,
-        scope=extract_request_claims(request).to_site_request_scope(site_id),
+        scope=scope,
         start=extract_start_from_paging_param(start),
         changed_after=extract_datetime_from_paging_param(after),
         limit=extract_limit_from_paging_param(limit),
         fsa_id=fsa_id,
     )
 
-    return XmlResponse(tp_list)
+    return XmlResponse(tp_list, etag=etag)
 
 
 @router.head(uri.TariffProfileUri)
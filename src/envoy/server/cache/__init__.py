@@ -0,0 +1,362 @@
+import logging
+import threading
+from asyncio import Lock, Task, get_running_loop, run, sleep
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Generic, TypeVar
+
+from envoy.server.manager.time import utc_now
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+@dataclass
+class ExpiringValue(Generic[V]):
+    """Represents a generic value that's only valid up to a specified datetime"""
+
+    expiry: datetime | None  # if None - this value never expires
+    value: V  # The actual value being stored
+
+    def is_expired(self) -> bool:
+        """Returns True if this value is currently expired based on current datetime"""
+        if self.expiry:
+            return utc_now() >= self.expiry
+        else:
+            return False
+
+
+@dataclass
+class AsyncCacheStats:
+    """Running counters describing the effectiveness of an AsyncCache"""
+
+    hits: int = 0  # Lookups served from the cache (including negative entries)
+    misses: int = 0  # Lookups that required a fetch/update
+    negative_hits: int = 0  # Lookups served from a (cached) negative entry
+    key_fetches: int = 0  # Number of calls to fetch_fn
+    reloads: int = 0  # Number of successful (full) calls to update_fn
+    last_reload_seconds: float = 0.0  # How long the most recent full reload took
+    total_reload_seconds: float = 0.0  # Cumulative time spent in full reloads
+
+
+class AsyncCache(Generic[K, V]):
+    """A simple in memory cache that's 'async safe' but not thread safe. It allows an internal
+    cache to be maintained that can be automatically updated on a cache miss.
+
+    By default this cache is all or nothing - every miss will reload the entire cache via update_fn. Optionally:
+
+    fetch_fn: After the initial full load, misses will instead fetch ONLY the missing key
+    negative_ttl_seconds: Keys that fetch_fn can't find are remembered as missing for this long
+    refresh_after_seconds: Once the full load is this old, it's reloaded in the background while the existing
+                           (stale) values continue to be served"""
+
+    _cache: dict[K, ExpiringValue[V]]
+    _negative_cache: dict[K, datetime]  # Keys known NOT to exist - keyed to the expiry of that knowledge
+    _lock: Lock
+    _update_fn: Callable[[Any], Awaitable[dict[K, ExpiringValue[V]]]]  # Called when the cache is missed
+    _fetch_fn: Callable[[Any, K], Awaitable[ExpiringValue[V] | None]] | None  # Called when a single key is missed
+    _force_update_delay_seconds: float  # How long force_update should wait between attempts (in seconds)
+    _negative_ttl: timedelta | None
+    _refresh_after: timedelta | None
+    _loaded_time: datetime | None  # When the last full update completed (None if never)
+    _refresh_task: Task | None  # Any in progress background refresh
+    stats: AsyncCacheStats
+
+    def __init__(
+        self,
+        update_fn: Callable[[Any], Awaitable[dict[K, ExpiringValue[V]]]],
+        force_update_delay_seconds: float = 1.0,
+        fetch_fn: Callable[[Any, K], Awaitable[ExpiringValue[V] | None]] | None = None,
+        negative_ttl_seconds: float | None = None,
+        refresh_after_seconds: float | None = None,
+    ) -> None:
+        """update_fn will be called whenever a cache miss happens during get_value. The return value of this
+        function will form the new cache. Exceptions raised will abort the cache update and propagate up
+        through the call to get_value
+
+        fetch_fn (if specified) will be called (instead of update_fn) for a cache miss once the cache has been
+        fully loaded. It should return the value for the specified key or None if it DNE.
+        negative_ttl_seconds: How long a None result from fetch_fn will be cached for (None to not cache)
+        refresh_after_seconds: How old a full load can get before a background reload is triggered (None to disable)
+        """
+        super().__init__()
+        self._cache = {}
+        self._negative_cache = {}
+        self._lock = Lock()
+        self._update_fn = update_fn
+        self._fetch_fn = fetch_fn
+        self._force_update_delay_seconds = force_update_delay_seconds
+        self._negative_ttl = None if negative_ttl_seconds is None else timedelta(seconds=negative_ttl_seconds)
+        self._refresh_after = None if refresh_after_seconds is None else timedelta(seconds=refresh_after_seconds)
+        self._loaded_time = None
+        self._refresh_task = None
+        self.stats = AsyncCacheStats()
+
+    async def clear(self) -> None:
+        """Clears the internal cache - resetting it back to incomplete"""
+        async with self._lock:
+            self._cache = {}
+            self._negative_cache = {}
+            self._loaded_time = None
+
+    def _fetch_from_cache(self, key: K) -> tuple[V | None, ExpiringValue[V] | None]:
+        """Internal use only.
+        Fetches from cache (respecting expiry times). Returns None if the value DNE or has expired"""
+        expiring_value = self._cache.get(key, None)
+        if expiring_value and not expiring_value.is_expired():
+            return (expiring_value.value, expiring_value)
+        else:
+            return (None, expiring_value)
+
+    def _is_known_missing(self, key: K) -> bool:
+        """Internal use only. Returns True if key has a (non expired) negative cache entry"""
+        negative_expiry = self._negative_cache.get(key, None)
+        if negative_expiry is None:
+            return False
+
+        if utc_now() >= negative_expiry:
+            del self._negative_cache[key]
+            return False
+        return True
+
+    async def _full_update(self, update_arg: object) -> None:
+        """Internal use only. Replaces the internal cache with the result of update_fn. Caller must hold _lock"""
+        start = perf_counter()
+        new_cache = await self._update_fn(update_arg)
+        duration = perf_counter() - start
+
+        self._cache = new_cache
+        self._negative_cache = {k: e for k, e in self._negative_cache.items() if k not in new_cache}
+        self._loaded_time = utc_now()
+        self.stats.reloads += 1
+        self.stats.last_reload_seconds = duration
+        self.stats.total_reload_seconds += duration
+
+    async def _key_update(self, update_arg: object, key: K) -> None:
+        """Internal use only. Updates the internal cache for a single key via fetch_fn. Caller must hold _lock"""
+        if self._fetch_fn is None:
+            raise ValueError("fetch_fn is not set")
+
+        self.stats.key_fetches += 1
+        expiring_value = await self._fetch_fn(update_arg, key)
+        if expiring_value is None:
+            self._cache.pop(key, None)
+            if self._negative_ttl is not None:
+                self._negative_cache[key] = utc_now() + self._negative_ttl
+        else:
+            self._cache[key] = expiring_value
+            self._negative_cache.pop(key, None)
+
+    async def _background_refresh(self, update_arg: object) -> None:
+        """Internal use only. Performs a full update - logging (but not raising) any errors"""
+        try:
+            async with self._lock:
+                await self._full_update(update_arg)
+        except Exception as ex:
+            logger.error(f"Background cache refresh error: {ex}")
+
+    def _refresh_if_stale(self, update_arg: object) -> None:
+        """Internal use only. If the full load is older than refresh_after - schedule a background reload (existing
+        values will continue to be served in the meantime)"""
+        if self._refresh_after is None or self._loaded_time is None:
+            return
+
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return  # Already refreshing
+
+        if utc_now() - self._loaded_time < self._refresh_after:
+            return
+
+        self._refresh_task = get_running_loop().create_task(self._background_refresh(update_arg))
+
+    async def get_value_ignore_expiry(self, update_arg: object, key: K) -> ExpiringValue[V] | None:
+        """Attempts to fetch the specified value by key. The internal cache will be utilised
+        first and updated if the key is not found / has expired.
+
+        This function differs from get_value in that it will return the full ExpiringValue even if it's marked
+        as expired (but will attempt to update the cache BEFORE returning the expired value).
+
+        update_arg: Will be passed to the internal update function if a cache update is required
+        key: The key to lookup a value
+
+        Returns None if the key DNE, otherwise the value (expired or not) will be returned
+
+        Exceptions raised by the internal update_fn will not be caught and will abort the cache update"""
+
+        self._refresh_if_stale(update_arg)
+
+        # use cache first from outside the lock - the hope is that 99% of requests go this route
+        value, expiring_value = self._fetch_from_cache(key)
+        if value:
+            self.stats.hits += 1
+            return expiring_value
+
+        if self._is_known_missing(key):
+            self.stats.hits += 1
+            self.stats.negative_hits += 1
+            return None
+
+        # Otherwise acquire the async lock (it won't work with threads - only coroutines)
+        # to ensure only one coroutine is doing an update at a time
+        async with self._lock:
+            # Double check that the cache hasn't updated while we were waiting on the lock
+            value, expiring_value = self._fetch_from_cache(key)
+            if value:
+                self.stats.hits += 1
+                return expiring_value
+
+            if self._is_known_missing(key):
+                self.stats.hits += 1
+                self.stats.negative_hits += 1
+                return None
+
+            # Perform the cache update (only a single key if we've already done a full load)
+            self.stats.misses += 1
+            if self._fetch_fn is not None and self._loaded_time is not None:
+                await self._key_update(update_arg, key)
+            else:
+                await self._full_update(update_arg)
+
+            # Now it's the final attempt - either get it or raise an error
+            # we do this test from within the lock so we're sure that no other updates
+            # can occur - basically - if the ID DNE - it's 100% not in the set of valid public keys
+            value, expiring_value = self._fetch_from_cache(key)
+            return expiring_value
+
+    async def get_value(self, update_arg: object, key: K) -> V | None:
+        """Attempts to fetch the specified value by key. The internal cache will be utilised first and updated
+        if the key is not found / has expired.
+
+        update_arg: Will be passed to the internal update function if a cache update is required
+        key: The key to lookup a value
+
+        Returns None if the key DNE or its value has expired (and can't be updated)
+
+        Exceptions raised by the internal update_fn will not be caught and will abort the cache update"""
+
+        # use cache first from outside the lock - the hope is that 99% of requests go this route
+        expiring_value = await self.get_value_ignore_expiry(update_arg, key)
+        if expiring_value is None or expiring_value.is_expired():
+            return None
+
+        return expiring_value.value
+
+    async def force_update(self, update_arg: object) -> None:
+        """Forces an update to occur - will hold the internal cache lock and repeatedly attempt
+        to update the cache until successful. Exceptions will be caught and logged but will not be raised.
+
+        This is a highly aggressive update method - it's designed to run until successful"""
+        async with self._lock:
+            while True:
+                try:
+                    await self._full_update(update_arg)
+                    return  # Try until successful
+                except Exception as ex:
+                    logger.error(f"force_update error. Retry : {ex}")
+                    await sleep(self._force_update_delay_seconds)
+
+    def get_value_sync(self, update_arg: object, key: K) -> V | None:
+        """Similar to get_value but without the async. This will ONLY utilise the internal cache, in the event
+        of a cache miss/expired value None will be returned but force_update will be triggered in a background
+        async task on the current asyncio event loop
+
+        update_arg: Will be passed to the internal update function if a cache update is required
+        key: The key to lookup a value
+
+        Exceptions raised by force_update will not propagate upwards"""
+
+        value, _ = self._fetch_from_cache(key)
+        if value:
+            return value
+
+        # At this point we need a cache update - we can't wait for the update so we fire and forget a call
+        # to force_update which "should" guarantee an eventual update
+
+        # Adapted from
+        # https://stackoverflow.com/questions/55409641/asyncio-run-cannot-be-called-from-a-running-event-loop-when-using-jupyter-no  # noqa e501
+        try:
+            loop = get_running_loop()
+        except RuntimeError:  # 'RuntimeError: There is no current event loop...'
+            loop = None
+
+        if loop and loop.is_running():
+            logger.info("Async event loop already running. Adding force_update coroutine to the event loop.")
+            loop.create_task(self.force_update(update_arg))
+        else:
+            logger.info("Starting new event loop to execute force_update")
+            run(self.force_update(update_arg))
+
+        return None
+
+
+class LRUCache(Generic[K, V]):
+    """A simple bounded (least recently used) in memory cache for values that are expensive to derive. Unlike
+    AsyncCache there is no update function - callers are expected to put values on a miss. Values can optionally
+    expire after a fixed TTL. This cache is thread safe.
+
+    Hit/miss counts are tracked to allow the effectiveness of the cache to be monitored."""
+
+    _cache: OrderedDict[K, ExpiringValue[V]]
+    _lock: threading.Lock
+    _max_entries: int
+    _ttl: timedelta | None
+    hits: int  # Number of calls to get that returned a value
+    misses: int  # Number of calls to get that returned None
+
+    def __init__(self, max_entries: int, ttl_seconds: float | None = None) -> None:
+        """max_entries: The maximum number of values to hold before the least recently used is evicted
+        ttl_seconds: How long a value is valid for after being stored (None for no expiry)"""
+        super().__init__()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._ttl = None if ttl_seconds is None else timedelta(seconds=ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        """Removes all values from this cache (hit/miss counts are NOT reset)"""
+        with self._lock:
+            self._cache.clear()
+
+    def get(self, key: K) -> V | None:
+        """Fetches the value for key (marking it as recently used). Returns None if key isn't in the cache (or has
+        expired)"""
+        with self._lock:
+            expiring_value = self._cache.get(key, None)
+            if expiring_value is not None and expiring_value.is_expired():
+                del self._cache[key]
+                expiring_value = None
+
+            if expiring_value is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return expiring_value.value
+
+    def put(self, key: K, value: V) -> None:
+        """Stores value against key. Evicts the least recently used value if this cache has exceeded max_entries"""
+        if self._max_entries <= 0:
+            return
+
+        expiry = None if self._ttl is None else utc_now() + self._ttl
+        with self._lock:
+            self._cache[key] = ExpiringValue(expiry, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+
+    def remove(self, key: K) -> None:
+        """Removes key from this cache (if it exists)"""
+        with self._lock:
+            self._cache.pop(key, None)
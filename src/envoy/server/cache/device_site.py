@@ -0,0 +1,13 @@
+from envoy.server.cache import LRUCache
+
+DEVICE_SITE_CACHE_TTL_SECONDS = 60
+DEVICE_SITE_CACHE_MAX_ENTRIES = 100000
+
+# Caches the site_id registered to a device certificate, keyed by the certificate SFDI. Only resolved sites are cached
+# (an unregistered device can register via any worker so "not found" must never be cached). This is shared between
+# the lfdi auth depends (which populates it) and the end device manager (which invalidates it whenever this process
+# registers/deletes a device certificate's site) - changes made elsewhere (eg admin) will be picked up once the TTL
+# expires
+device_site_cache: LRUCache[int, int] = LRUCache(
+    max_entries=DEVICE_SITE_CACHE_MAX_ENTRIES, ttl_seconds=DEVICE_SITE_CACHE_TTL_SECONDS
+)
@@ -14,6 +14,32 @@ class ClientIdDetails:
     expiry: datetime
 
 
+async def select_client_id_details_for_lfdi(session: AsyncSession, lfdi: str) -> ClientIdDetails | None:
+    """Query to retrieve the client id details for a single lfdi (sourced from the 'certificate' and
+    'aggregator_certificate_assignment' tables). Returns None if lfdi isn't an aggregator certificate.
+
+    Expired certificates WILL be returned by this function
+    """
+    stmt = (
+        select(
+            Certificate.lfdi,
+            AggregatorCertificateAssignment.aggregator_id,
+            Certificate.expiry,
+        )
+        .join(
+            AggregatorCertificateAssignment,
+            Certificate.certificate_id == AggregatorCertificateAssignment.certificate_id,
+        )
+        .where(Certificate.lfdi == lfdi)
+        .limit(1)
+    )
+
+    resp = await session.execute(stmt)
+
+    mapping = resp.mappings().one_or_none()
+    return None if mapping is None else ClientIdDetails(**mapping)
+
+
 async def select_all_client_id_details(session: AsyncSession) -> list[ClientIdDetails]:
     """Query to retrieve all client id details sourced from the 'certificate' and
     'aggregator_certificate_assignment' tables.
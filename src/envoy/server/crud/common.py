@@ -1,7 +1,9 @@
-from typing import TypeVar
+from collections.abc import Iterable
+from typing import Any, TypeVar
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import Row
+from sqlalchemy import CTE, ColumnElement, FromClause, Row, Select, and_, or_, select, union_all
+from sqlalchemy.orm import InstrumentedAttribute
 
 from envoy.server.model.archive.doe import ArchiveDynamicOperatingEnvelope
 from envoy.server.model.archive.tariff import ArchiveTariffGeneratedRate
@@ -14,6 +16,40 @@ EntityWithStartTime = TypeVar(
 )
 
 
+def select_start_changed_id_cursor(key_selects: Iterable[Select], index: int) -> CTE:
+    """Generates a CTE for the (start_time, changed_time, id) sort key of the row at index when the UNION ALL of
+    key_selects is ordered by the 2030.5 requirements for DERControl / TimeTariffInterval (start ASC, creation DESC,
+    id DESC). The CTE will have no rows if index is out of range.
+
+    Each of key_selects must select exactly start_time, changed_time and id columns (in that order)"""
+    keys = union_all(*key_selects).subquery()
+    return (
+        select(keys)
+        .order_by(keys.c.start_time.asc(), keys.c.changed_time.desc(), keys.c.id.desc())
+        .offset(index)
+        .limit(1)
+        .cte()
+    )
+
+
+def seek_after_start_changed_id(
+    start_col: ColumnElement[Any] | InstrumentedAttribute[Any],
+    changed_col: ColumnElement[Any] | InstrumentedAttribute[Any],
+    id_col: ColumnElement[Any] | InstrumentedAttribute[Any],
+    cursor: FromClause,
+) -> ColumnElement[bool]:
+    """Generates a keyset "seek" filter that will match all rows that sort AFTER the (single) row in cursor (see
+    select_start_changed_id_cursor) when ordered by start_col ASC, changed_col DESC, id_col DESC. The mixed sort
+    directions prevent the use of a simple row value comparison."""
+    return or_(
+        start_col > cursor.c.start_time,
+        and_(
+            start_col == cursor.c.start_time,
+            or_(changed_col < cursor.c.changed_time, and_(changed_col == cursor.c.changed_time, id_col < cursor.c.id)),
+        ),
+    )
+
+
 def localize_start_time_for_entity(entity: EntityWithStartTime, tz_name: str) -> EntityWithStartTime:
     """Localizes a entity.start_time to be in the local timezone passed in as the second
     element in the tuple. Returns the Entity (it will be modified in place)"""
@@ -1,15 +1,21 @@
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
 from datetime import datetime
-from typing import cast
+from typing import Any, cast
 
-from sqlalchemy import Select, func, literal_column, select
+from sqlalchemy import Select, func, literal_column, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from envoy.server.crud.common import localize_start_time, localize_start_time_for_entity
+from envoy.server.crud.common import (
+    localize_start_time,
+    localize_start_time_for_entity,
+    seek_after_start_changed_id,
+    select_start_changed_id_cursor,
+)
 from envoy.server.model.archive.doe import ArchiveDynamicOperatingEnvelope as ArchiveDOE
+from envoy.server.model.archive.doe import ArchiveSiteControlGroup, ArchiveSiteControlGroupDefault
 from envoy.server.model.doe import DynamicOperatingEnvelope as DOE
-from envoy.server.model.doe import SiteControlGroup
+from envoy.server.model.doe import SiteControlGroup, SiteControlGroupDefault
 from envoy.server.model.site import Site
 
 
@@ -58,6 +64,66 @@ async def select_doe_include_deleted(
     return None
 
 
+async def select_does_include_deleted(
+    session: AsyncSession,
+    aggregator_id: int,
+    site_id: int,
+    doe_ids: Iterable[int],
+) -> dict[int, DOE | ArchiveDOE]:
+    """Batch equivalent of select_doe_include_deleted - fetches every DOE in doe_ids (scoped to a particular
+    aggregator/site), returning them keyed by their DOE id. The archive table will be checked (in a single query) for
+    any ids not found in the primary table (of which the most recent deletion will be matched).
+
+    DOE ids that can't be found (or if the site isn't accessible to aggregator_id) will not be in the result.
+
+    aggregator_id: The aggregator id to constrain the lookup to
+    site_id: the query will apply a filter on site_id using this value"""
+
+    distinct_doe_ids = set(doe_ids)
+    if not distinct_doe_ids:
+        return {}
+
+    # Start by confirming the referenced site_id exists within the specified aggregator.
+    site_timezone_id = (
+        await session.execute(
+            select(Site.timezone_id).where((Site.site_id == site_id) & (Site.aggregator_id == aggregator_id))
+        )
+    ).scalar_one_or_none()
+    if not site_timezone_id:
+        return {}
+
+    # Check primary table first
+    does_by_id: dict[int, DOE | ArchiveDOE] = {}
+    primary_table_does = (
+        await session.execute(
+            select(DOE).where((DOE.dynamic_operating_envelope_id.in_(distinct_doe_ids)) & (DOE.site_id == site_id))
+        )
+    ).scalars()
+    for doe in primary_table_does:
+        does_by_id[doe.dynamic_operating_envelope_id] = localize_start_time_for_entity(doe, site_timezone_id)
+
+    # Check archive for anything remaining
+    missing_doe_ids = distinct_doe_ids.difference(does_by_id.keys())
+    if missing_doe_ids:
+        archive_table_does = (
+            await session.execute(
+                select(ArchiveDOE)
+                .where(
+                    (ArchiveDOE.dynamic_operating_envelope_id.in_(missing_doe_ids))
+                    & (ArchiveDOE.deleted_time.is_not(None))
+                )
+                .distinct(ArchiveDOE.dynamic_operating_envelope_id)
+                .order_by(ArchiveDOE.dynamic_operating_envelope_id, ArchiveDOE.deleted_time.desc())
+            )
+        ).scalars()
+        for archive_doe in archive_table_does:
+            does_by_id[archive_doe.dynamic_operating_envelope_id] = localize_start_time_for_entity(
+                archive_doe, site_timezone_id
+            )
+
+    return does_by_id
+
+
 async def select_doe_by_display_id_include_deleted(
     session: AsyncSession,
     aggregator_id: int,
@@ -202,6 +268,52 @@ async def count_active_does_include_deleted(
     return count_active + count_archive
 
 
+async def count_active_does_include_deleted_by_groups(
+    session: AsyncSession,
+    site_control_group_ids: Iterable[int],
+    site: Site,
+    now: datetime,
+    changed_after: datetime,
+) -> dict[int, int]:
+    """Grouped equivalent of count_active_does_include_deleted. Counts the active/deleted DOEs for each of
+    site_control_group_ids in a single query (UNION ALL of the active/archive table then GROUP BY).
+
+    Returns a dictionary keyed by site_control_group_id with the count as the value. Every site_control_group_id will
+    be present in the result.
+
+    site_control_group_ids: The SiteControlGroups to count doe's for
+    site: The site that the counted DOE's will be all be scoped from
+    now: The timestamp that excludes any DOE whose end_time precedes this (i.e. they are expired and no longer relevant)
+    changed_after: Only DOE's modified after this time will be counted."""
+
+    counts = {group_id: 0 for group_id in site_control_group_ids}
+    if not counts:
+        return counts
+
+    select_active_does = select(DOE.site_control_group_id.label("group_id")).where(
+        (DOE.site_control_group_id.in_(list(counts))) & (DOE.end_time > now) & (DOE.site_id == site.site_id)
+    )
+    select_archive_does = select(ArchiveDOE.site_control_group_id.label("group_id")).where(
+        (ArchiveDOE.site_control_group_id.in_(list(counts)))
+        & (ArchiveDOE.end_time > now)
+        & (ArchiveDOE.site_id == site.site_id)
+        & (ArchiveDOE.deleted_time.is_not(None))
+    )
+
+    if changed_after != datetime.min:
+        # The "changed_time" for archives is actually the "deleted_time"
+        select_active_does = select_active_does.where(DOE.changed_time >= changed_after)
+        select_archive_does = select_archive_does.where(ArchiveDOE.deleted_time >= changed_after)
+
+    all_does = union_all(select_active_does, select_archive_does).subquery()
+    stmt = select(all_does.c.group_id, func.count()).group_by(all_does.c.group_id)
+
+    resp = await session.execute(stmt)
+    for group_id, count in resp.all():
+        counts[group_id] = count
+    return counts
+
+
 async def select_active_does_include_deleted(
     session: AsyncSession,
     site_control_group_id: int,
@@ -289,6 +401,34 @@ async def select_active_does_include_deleted(
         select_active_does = select_active_does.where(DOE.changed_time >= changed_after)
         select_archive_does = select_archive_does.where(ArchiveDOE.deleted_time >= changed_after)
 
+    if start > 0:
+        # Rather than an OFFSET (that fully reads and unions every skipped DOE) - find the sort key of the DOE at
+        # index start - 1 with a narrow, key only query and have each half of the union seek past it
+        cursor = select_start_changed_id_cursor(
+            [
+                select_active_does.with_only_columns(
+                    DOE.start_time, DOE.changed_time, DOE.dynamic_operating_envelope_id.label("id")
+                ),
+                select_archive_does.with_only_columns(
+                    ArchiveDOE.start_time,
+                    ArchiveDOE.deleted_time.label("changed_time"),
+                    ArchiveDOE.dynamic_operating_envelope_id.label("id"),
+                ),
+            ],
+            start - 1,
+        )
+        select_active_does = select_active_does.join(
+            cursor,
+            seek_after_start_changed_id(DOE.start_time, DOE.changed_time, DOE.dynamic_operating_envelope_id, cursor),
+        )
+        select_archive_does = select_archive_does.join(
+            cursor,
+            seek_after_start_changed_id(
+                ArchiveDOE.start_time, ArchiveDOE.deleted_time, ArchiveDOE.dynamic_operating_envelope_id, cursor
+            ),
+        )
+        start = 0
+
     stmt = (
         select_active_does.union_all(select_archive_does)
         .limit(limit)
@@ -528,3 +668,41 @@ async def select_site_control_group_fsa_ids(session: AsyncSession, changed_after
 
     resp = await session.execute(stmt)
     return resp.scalars().all()
+
+
+async def select_site_control_group_version(session: AsyncSession) -> tuple[Any, ...]:
+    """Fetches a cheap "version" of ALL SiteControlGroup / SiteControlGroupDefault records. Any insert/update/delete
+    of these records will result in a different value being returned (as updates/deletes will populate the archive).
+
+    Returns a tuple of (group_count, max_group_changed_time, max_group_archive_time, max_default_changed_time,
+    max_default_archive_time)"""
+    stmt = select(
+        select(func.count()).select_from(SiteControlGroup).scalar_subquery(),
+        select(func.max(SiteControlGroup.changed_time)).scalar_subquery(),
+        select(func.max(ArchiveSiteControlGroup.archive_time)).scalar_subquery(),
+        select(func.max(SiteControlGroupDefault.changed_time)).scalar_subquery(),
+        select(func.max(ArchiveSiteControlGroupDefault.archive_time)).scalar_subquery(),
+    )
+    resp = await session.execute(stmt)
+    return tuple(resp.one())
+
+
+async def select_site_doe_version(session: AsyncSession, site_id: int, now: datetime) -> tuple[Any, ...]:
+    """Fetches a cheap "version" of the (non expired) DOEs (and deleted DOEs) for a specific site. Any
+    insert/update/delete of these DOEs will result in a different value being returned. The value will also change as
+    DOEs start or expire relative to now.
+
+    Returns a tuple of (active_count, started_count, max_changed_time, archive_deleted_count, max_archive_time)"""
+    select_active = select(
+        func.count(),
+        func.count().filter(DOE.start_time <= now),
+        func.max(DOE.changed_time),
+    ).where((DOE.site_id == site_id) & (DOE.end_time > now))
+    select_archive = select(
+        func.count().filter(ArchiveDOE.deleted_time.is_not(None)),
+        func.max(ArchiveDOE.archive_time),
+    ).where((ArchiveDOE.site_id == site_id) & (ArchiveDOE.end_time > now))
+
+    active = (await session.execute(select_active)).one()
+    archive = (await session.execute(select_archive)).one()
+    return (*active, *archive)
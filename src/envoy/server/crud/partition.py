@@ -0,0 +1,133 @@
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Arbitrary (but constant) key for the transaction level advisory lock that serialises partition maintenance
+PARTITION_MAINTENANCE_LOCK_KEY = 0x5349544552454144  # "SITEREAD"
+
+# Matches the output of pg_get_expr for a range partition bound eg:
+# FOR VALUES FROM ('2024-01-01 00:00:00+00') TO ('2024-02-01 00:00:00+00')
+RANGE_PARTITION_BOUND_PATTERN = re.compile(r"FOR VALUES FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True)
+class RangePartition:
+    """A single (non default) range partition attached to a partitioned table"""
+
+    partition_name: str
+    lower: datetime  # inclusive
+    upper: datetime  # exclusive
+
+
+def month_start(dt: datetime) -> datetime:
+    """Returns the start of the (UTC) month that dt falls within"""
+    dt = dt.astimezone(UTC)
+    return datetime(dt.year, dt.month, 1, tzinfo=UTC)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Adds months (can be negative) to a month_start datetime"""
+    month_index = month.year * 12 + (month.month - 1) + months
+    return datetime(month_index // 12, (month_index % 12) + 1, 1, tzinfo=UTC)
+
+
+def monthly_partition_name(table_name: str, month: datetime) -> str:
+    """The name of the partition of table_name holding the month starting at month. Matches the naming used by the
+    partition_site_reading migration"""
+    return f"{table_name}_p{month.year:04d}{month.month:02d}"
+
+
+def default_partition_name(table_name: str) -> str:
+    """The name of the DEFAULT partition of table_name (receives any rows that don't match a range partition)"""
+    return f"{table_name}_default"
+
+
+def _quote_ident(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _timestamp_literal(dt: datetime) -> str:
+    # Partition bounds can't be bound parameters - they must be literals. These are always generated from datetimes
+    return f"'{dt.isoformat()}'"
+
+
+async def try_lock_partition_maintenance(session: AsyncSession) -> bool:
+    """Attempts to acquire the (transaction scoped) partition maintenance advisory lock. Returns True if acquired or
+    False if another transaction is already performing maintenance. The lock is released on commit/rollback"""
+    resp = await session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": PARTITION_MAINTENANCE_LOCK_KEY}
+    )
+    return bool(resp.scalar_one())
+
+
+async def select_range_partitions(session: AsyncSession, table_name: str) -> list[RangePartition]:
+    """Fetches the range partitions currently attached to the partitioned table_name, ordered by lower bound. The
+    DEFAULT partition (and any partition with a bound that isn't a simple FROM/TO range) will NOT be included"""
+    resp = await session.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "INNER JOIN pg_class c ON c.oid = i.inhrelid "
+            "INNER JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table_name"
+        ),
+        {"table_name": table_name},
+    )
+
+    partitions: list[RangePartition] = []
+    for partition_name, bound in resp.tuples().all():
+        match = RANGE_PARTITION_BOUND_PATTERN.fullmatch(bound or "")
+        if match is None:
+            continue
+        partitions.append(
+            RangePartition(
+                partition_name=partition_name,
+                lower=datetime.fromisoformat(match.group(1)),
+                upper=datetime.fromisoformat(match.group(2)),
+            )
+        )
+    return sorted(partitions, key=lambda p: p.lower)
+
+
+async def create_range_partition(
+    session: AsyncSession, table_name: str, partition_name: str, partition_column: str, lower: datetime, upper: datetime
+) -> None:
+    """Creates and attaches a new partition of table_name for the range [lower, upper).
+
+    Attaching a range that overlaps rows already sitting in the DEFAULT partition would fail so those rows are moved
+    into the new partition (which is populated BEFORE being attached) as a part of this operation."""
+    parent = _quote_ident(table_name)
+    partition = _quote_ident(partition_name)
+    column = _quote_ident(partition_column)
+
+    await session.execute(text(f"CREATE TABLE {partition} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    # All identifiers are quoted and the range values are bound parameters
+    await session.execute(
+        text(
+            f"WITH moved_rows AS (DELETE FROM {_quote_ident(default_partition_name(table_name))} "  # noqa: S608
+            f"WHERE {column} >= :lower AND {column} < :upper RETURNING *) "
+            f"INSERT INTO {partition} SELECT * FROM moved_rows"
+        ),
+        {"lower": lower, "upper": upper},
+    )
+    await session.execute(
+        text(
+            f"ALTER TABLE {parent} ATTACH PARTITION {partition} "
+            f"FOR VALUES FROM ({_timestamp_literal(lower)}) TO ({_timestamp_literal(upper)})"
+        )
+    )
+
+
+async def detach_partition(session: AsyncSession, table_name: str, partition_name: str) -> None:
+    """Detaches partition_name from table_name. The partition (and its data) will remain as a standalone table"""
+    await session.execute(
+        text(f"ALTER TABLE {_quote_ident(table_name)} DETACH PARTITION {_quote_ident(partition_name)}")
+    )
+
+
+async def drop_partition(session: AsyncSession, table_name: str, partition_name: str) -> None:
+    """Detaches and then drops partition_name (permanently deleting its data)"""
+    await detach_partition(session, table_name, partition_name)
+    await session.execute(text(f"DROP TABLE {_quote_ident(partition_name)}"))
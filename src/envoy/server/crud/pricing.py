@@ -1,11 +1,17 @@
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
 from datetime import datetime
+from typing import Any
 
-from sqlalchemy import func, literal_column, select
+from sqlalchemy import func, literal_column, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from envoy.server.crud.common import localize_start_time, localize_start_time_for_entity
-from envoy.server.model.archive.tariff import ArchiveTariffGeneratedRate
+from envoy.server.crud.common import (
+    localize_start_time,
+    localize_start_time_for_entity,
+    seek_after_start_changed_id,
+    select_start_changed_id_cursor,
+)
+from envoy.server.model.archive.tariff import ArchiveTariff, ArchiveTariffComponent, ArchiveTariffGeneratedRate
 from envoy.server.model.site import Site
 from envoy.server.model.tariff import Tariff, TariffComponent, TariffGeneratedRate
 
@@ -184,6 +190,126 @@ async def count_tariff_components_by_tariff(
     return resp.scalar_one()
 
 
+async def count_tariff_components_by_tariffs(
+    session: AsyncSession,
+    tariff_ids: Iterable[int],
+    changed_after: datetime | None,
+) -> dict[int, int]:
+    """Grouped equivalent of count_tariff_components_by_tariff - counts all TariffComponents underneath each of the
+    specified tariff_ids in a single query.
+
+    Returns a dictionary keyed by tariff_id with the count as the value. Every tariff_id will be present in the result
+    (tariff_ids without any TariffComponents will be 0)
+
+    changed_after: Only count records created/modified on/after this time"""
+
+    counts = {tariff_id: 0 for tariff_id in tariff_ids}
+    if not counts:
+        return counts
+
+    stmt = (
+        select(TariffComponent.tariff_id, func.count())
+        .where(TariffComponent.tariff_id.in_(list(counts)))
+        .group_by(TariffComponent.tariff_id)
+    )
+    if changed_after is not None:
+        stmt = stmt.where(TariffComponent.changed_time >= changed_after)
+
+    resp = await session.execute(stmt)
+    for tariff_id, count in resp.all():
+        counts[tariff_id] = count
+    return counts
+
+
+async def _count_active_rates_include_deleted_grouped(
+    session: AsyncSession,
+    group_by_tariff_component: bool,
+    group_ids: Iterable[int],
+    site_id: int,
+    now: datetime,
+    changed_after: datetime | None,
+) -> dict[int, int]:
+    """Internal implementation for the grouped equivalent of count_active_rates_include_deleted. Counts the active and
+    archived rates for every group id in a single query (UNION ALL of the active/archive table then GROUP BY).
+
+    group_by_tariff_component: If True - group_ids are tariff_component_id values, otherwise tariff_id values"""
+
+    counts = {group_id: 0 for group_id in group_ids}
+    if not counts:
+        return counts
+
+    if group_by_tariff_component:
+        active_group_col = TariffGeneratedRate.tariff_component_id
+        archive_group_col = ArchiveTariffGeneratedRate.tariff_component_id
+    else:
+        active_group_col = TariffGeneratedRate.tariff_id
+        archive_group_col = ArchiveTariffGeneratedRate.tariff_id
+
+    select_active_rates = select(active_group_col.label("group_id")).where(
+        (TariffGeneratedRate.end_time > now)
+        & (TariffGeneratedRate.site_id == site_id)
+        & (active_group_col.in_(list(counts)))
+    )
+    select_archive_rates = select(archive_group_col.label("group_id")).where(
+        (ArchiveTariffGeneratedRate.end_time > now)
+        & (ArchiveTariffGeneratedRate.site_id == site_id)
+        & (ArchiveTariffGeneratedRate.deleted_time.is_not(None))
+        & (archive_group_col.in_(list(counts)))
+    )
+
+    if changed_after is not None and changed_after != datetime.min:
+        # The "changed_time" for archives is actually the "deleted_time"
+        select_active_rates = select_active_rates.where(TariffGeneratedRate.changed_time >= changed_after)
+        select_archive_rates = select_archive_rates.where(ArchiveTariffGeneratedRate.deleted_time >= changed_after)
+
+    all_rates = union_all(select_active_rates, select_archive_rates).subquery()
+    stmt = select(all_rates.c.group_id, func.count()).group_by(all_rates.c.group_id)
+
+    resp = await session.execute(stmt)
+    for group_id, count in resp.all():
+        counts[group_id] = count
+    return counts
+
+
+async def count_active_rates_include_deleted_by_tariffs(
+    session: AsyncSession,
+    tariff_ids: Iterable[int],
+    site_id: int,
+    now: datetime,
+    changed_after: datetime | None,
+) -> dict[int, int]:
+    """Grouped equivalent of count_active_rates_include_deleted (with tariff_component_id set to None). Counts the
+    active/deleted rates for each of tariff_ids in a single query.
+
+    Returns a dictionary keyed by tariff_id with the count as the value. Every tariff_id will be present in the result.
+
+    site_id: The site that the counted rates will be all be scoped from
+    now: The timestamp that excludes any rate whose end_time precedes this (they are expired and no longer relevant)
+    changed_after: Only rates modified after this time will be counted."""
+    return await _count_active_rates_include_deleted_grouped(session, False, tariff_ids, site_id, now, changed_after)
+
+
+async def count_active_rates_include_deleted_by_tariff_components(
+    session: AsyncSession,
+    tariff_component_ids: Iterable[int],
+    site_id: int,
+    now: datetime,
+    changed_after: datetime | None,
+) -> dict[int, int]:
+    """Grouped equivalent of count_active_rates_include_deleted (with tariff_component_id set). Counts the
+    active/deleted rates for each of tariff_component_ids in a single query.
+
+    Returns a dictionary keyed by tariff_component_id with the count as the value. Every tariff_component_id will be
+    present in the result.
+
+    site_id: The site that the counted rates will be all be scoped from
+    now: The timestamp that excludes any rate whose end_time precedes this (they are expired and no longer relevant)
+    changed_after: Only rates modified after this time will be counted."""
+    return await _count_active_rates_include_deleted_grouped(
+        session, True, tariff_component_ids, site_id, now, changed_after
+    )
+
+
 async def count_active_rates_include_deleted(
     session: AsyncSession,
     tariff_id: int,
@@ -324,6 +450,45 @@ async def select_active_rates_include_deleted(
         select_active_rates = select_active_rates.where(TariffGeneratedRate.changed_time >= changed_after)
         select_archive_rates = select_archive_rates.where(ArchiveTariffGeneratedRate.deleted_time >= changed_after)
 
+    if start > 0:
+        # Rather than an OFFSET (that fully reads and unions every skipped rate) - find the sort key of the rate at
+        # index start - 1 with a narrow, key only query and have each half of the union seek past it. The seek must be
+        # on the same columns that are projected (and ordered by) - for archives this is changed_time (NOT deleted_time)
+        cursor = select_start_changed_id_cursor(
+            [
+                select_active_rates.with_only_columns(
+                    TariffGeneratedRate.start_time,
+                    TariffGeneratedRate.changed_time,
+                    TariffGeneratedRate.tariff_generated_rate_id.label("id"),
+                ),
+                select_archive_rates.with_only_columns(
+                    ArchiveTariffGeneratedRate.start_time,
+                    ArchiveTariffGeneratedRate.changed_time,
+                    ArchiveTariffGeneratedRate.tariff_generated_rate_id.label("id"),
+                ),
+            ],
+            start - 1,
+        )
+        select_active_rates = select_active_rates.join(
+            cursor,
+            seek_after_start_changed_id(
+                TariffGeneratedRate.start_time,
+                TariffGeneratedRate.changed_time,
+                TariffGeneratedRate.tariff_generated_rate_id,
+                cursor,
+            ),
+        )
+        select_archive_rates = select_archive_rates.join(
+            cursor,
+            seek_after_start_changed_id(
+                ArchiveTariffGeneratedRate.start_time,
+                ArchiveTariffGeneratedRate.changed_time,
+                ArchiveTariffGeneratedRate.tariff_generated_rate_id,
+                cursor,
+            ),
+        )
+        start = 0
+
     stmt = (
         select_active_rates.union_all(select_archive_rates)
         .limit(limit)
@@ -384,3 +549,42 @@ async def select_active_rates_include_deleted(
         )
         for t in resp.all()
     ]
+
+
+async def select_tariff_version(session: AsyncSession) -> tuple[Any, ...]:
+    """Fetches a cheap "version" of ALL Tariff / TariffComponent records. Any insert/update/delete of these records will
+    result in a different value being returned (as updates/deletes will populate the archive).
+
+    Returns a tuple of (tariff_count, max_tariff_changed_time, max_tariff_archive_time, component_count,
+    max_component_changed_time, max_component_archive_time)"""
+    stmt = select(
+        select(func.count()).select_from(Tariff).scalar_subquery(),
+        select(func.max(Tariff.changed_time)).scalar_subquery(),
+        select(func.max(ArchiveTariff.archive_time)).scalar_subquery(),
+        select(func.count()).select_from(TariffComponent).scalar_subquery(),
+        select(func.max(TariffComponent.changed_time)).scalar_subquery(),
+        select(func.max(ArchiveTariffComponent.archive_time)).scalar_subquery(),
+    )
+    resp = await session.execute(stmt)
+    return tuple(resp.one())
+
+
+async def select_site_rate_version(session: AsyncSession, site_id: int, now: datetime) -> tuple[Any, ...]:
+    """Fetches a cheap "version" of the (non expired) TariffGeneratedRates (and deleted rates) for a specific site. Any
+    insert/update/delete of these rates will result in a different value being returned. The value will also change as
+    rates start or expire relative to now.
+
+    Returns a tuple of (active_count, started_count, max_changed_time, archive_deleted_count, max_archive_time)"""
+    select_active = select(
+        func.count(),
+        func.count().filter(TariffGeneratedRate.start_time <= now),
+        func.max(TariffGeneratedRate.changed_time),
+    ).where((TariffGeneratedRate.site_id == site_id) & (TariffGeneratedRate.end_time > now))
+    select_archive = select(
+        func.count().filter(ArchiveTariffGeneratedRate.deleted_time.is_not(None)),
+        func.max(ArchiveTariffGeneratedRate.archive_time),
+    ).where((ArchiveTariffGeneratedRate.site_id == site_id) & (ArchiveTariffGeneratedRate.end_time > now))
+
+    active = (await session.execute(select_active)).one()
+    archive = (await session.execute(select_archive)).one()
+    return (*active, *archive)
@@ -1,4 +1,4 @@
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.server.model.server import RuntimeServerConfig
@@ -13,3 +13,9 @@ async def select_server_config(
 
     resp = await session.execute(stmt)
     return resp.scalar_one_or_none()
+
+
+async def notify_server_config_changed(session: AsyncSession, channel: str) -> None:
+    """Queues a Postgres NOTIFY on channel for the current transaction. Listeners will only receive it once the
+    current transaction commits (and not at all if it rolls back)"""
+    await session.execute(select(func.pg_notify(channel, "")))
@@ -3,7 +3,7 @@ from collections.abc import Sequence
 from datetime import datetime
 
 from envoy_schema.server.schema.sep2.types import DeviceCategory
-from sqlalchemy import delete, func, select
+from sqlalchemy import Select, delete, func, select
 from sqlalchemy.dialects.postgresql import insert as psql_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -11,7 +11,7 @@ from envoy.server.crud import common
 from envoy.server.crud.aggregator import select_aggregator
 from envoy.server.crud.archive import copy_rows_into_archive, delete_rows_into_archive
 from envoy.server.manager.time import utc_now
-from envoy.server.model.aggregator import Aggregator
+from envoy.server.model.aggregator import Aggregator, AggregatorSiteCount
 from envoy.server.model.archive.doe import ArchiveDynamicOperatingEnvelope
 from envoy.server.model.archive.site import (
     ArchiveSite,
@@ -60,6 +60,40 @@ async def select_aggregator_site_count(session: AsyncSession, aggregator_id: int
     return resp.scalar_one()
 
 
+async def select_aggregator_site_count_from_counter(session: AsyncSession, aggregator_id: int) -> int:
+    """Fetches the number of sites 'owned' by the specified aggregator from the trigger maintained
+    aggregator_site_count table. Unlike select_aggregator_site_count, this cannot be filtered by changed_time but it
+    is a single row lookup (rather than a scan of every site for the aggregator)"""
+    resp = await session.execute(
+        select(AggregatorSiteCount.site_count).where(AggregatorSiteCount.aggregator_id == aggregator_id)
+    )
+    return resp.scalar_one_or_none() or 0
+
+
+def _select_sites_with_aggregator_id_stmt(aggregator_id: int, start: int, after: datetime) -> Select[tuple[Site]]:
+    """Selects the sites for an aggregator (changed after "after") from index start onwards. Ordered by sep2 spec
+    which is changedTime then sfdi"""
+    site_filter = (Site.aggregator_id == aggregator_id) & (Site.changed_time >= after)
+    stmt = select(Site).where(site_filter)
+    if start > 0:
+        # Rather than an OFFSET (that fully reads every skipped site) - find the sort key of the site at index
+        # start - 1 with a narrow, key only query and seek past it
+        cursor = (
+            select(Site.changed_time, Site.sfdi)
+            .where(site_filter)
+            .order_by(Site.changed_time.desc(), Site.sfdi.asc())
+            .offset(start - 1)
+            .limit(1)
+            .subquery()
+        )
+        stmt = stmt.join(
+            cursor,
+            (Site.changed_time < cursor.c.changed_time)
+            | ((Site.changed_time == cursor.c.changed_time) & (Site.sfdi > cursor.c.sfdi)),
+        )
+    return stmt.order_by(Site.changed_time.desc(), Site.sfdi.asc())
+
+
 async def select_all_sites_with_aggregator_id(
     session: AsyncSession,
     aggregator_id: int,
@@ -70,19 +104,38 @@ async def select_all_sites_with_aggregator_id(
     """Selects sites for an aggregator with some basic pagination / filtering based on change time
 
     Results will be ordered according to sep2 spec which is changedTime then sfdi"""
+    stmt = _select_sites_with_aggregator_id_stmt(aggregator_id, start, after).limit(limit)
+
+    resp = await session.execute(stmt)
+    return resp.scalars().all()
+
+
+async def select_all_sites_with_aggregator_id_and_count(
+    session: AsyncSession,
+    aggregator_id: int,
+    start: int,
+    after: datetime,
+    limit: int,
+) -> tuple[Sequence[Site], int | None]:
+    """Identical to select_all_sites_with_aggregator_id but will also return the total number of sites that match the
+    after filter (ignoring pagination) using COUNT(*) OVER() in the same query.
+
+    The count will be None if the requested page is empty (there is no row to carry the window count) - callers
+    should fall back to select_aggregator_site_count"""
     stmt = (
-        select(Site)
-        .where((Site.aggregator_id == aggregator_id) & (Site.changed_time >= after))
-        .offset(start)
+        _select_sites_with_aggregator_id_stmt(aggregator_id, start, after)
+        .add_columns(func.count().over().label("total_count"))
         .limit(limit)
-        .order_by(
-            Site.changed_time.desc(),
-            Site.sfdi.asc(),
-        )
     )
 
     resp = await session.execute(stmt)
-    return resp.scalars().all()
+    rows = resp.all()
+    if not rows:
+        return ([], None)
+
+    # The window only counts sites after the seek. A non empty page means the seek found its cursor (i.e. exactly start
+    # sites were skipped)
+    return ([r[0] for r in rows], start + rows[0][1])
 
 
 async def get_virtual_site_for_aggregator(
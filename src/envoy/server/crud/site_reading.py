@@ -4,7 +4,24 @@ from datetime import datetime
 from typing import cast
 
 from envoy_schema.server.schema.sep2.types import RoleFlagsType
-from sqlalchemy import Select, and_, distinct, func, insert, or_, select
+from sqlalchemy import (
+    INTEGER,
+    VARCHAR,
+    Select,
+    and_,
+    any_,
+    column,
+    distinct,
+    func,
+    insert,
+    or_,
+    select,
+    table,
+    text,
+    tuple_,
+)
+from sqlalchemy import cast as sql_cast
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.server.crud.archive import delete_rows_into_archive
@@ -65,6 +82,35 @@ async def fetch_site_reading_types_for_group(
     return resp.scalars().all()
 
 
+async def fetch_site_reading_types_for_groups(
+    session: AsyncSession, aggregator_id: int, site_id: int | None, group_ids: list[int]
+) -> dict[int, list[SiteReadingType]]:
+    """Fetches all SiteReadingTypes for every group in group_ids (in a single query), returning them keyed by
+    group_id. Every requested group_id will be in the result (groups with no accessible SiteReadingTypes will map to
+    an empty list)
+
+    if site_id is None - it will not be included in the search filter"""
+    srts_by_group: dict[int, list[SiteReadingType]] = {group_id: [] for group_id in group_ids}
+    if not group_ids:
+        return srts_by_group
+
+    stmt = (
+        select(SiteReadingType)
+        .where(
+            (SiteReadingType.aggregator_id == aggregator_id)
+            & (SiteReadingType.group_id == any_(sql_cast(group_ids, ARRAY(INTEGER))))
+        )
+        .order_by(SiteReadingType.site_reading_type_id)
+    )
+    if site_id is not None:
+        stmt = stmt.where(SiteReadingType.site_id == site_id)
+
+    resp = await session.execute(stmt)
+    for srt in resp.scalars().all():
+        srts_by_group[srt.group_id].append(srt)
+    return srts_by_group
+
+
 async def fetch_site_reading_type_for_mrid(
     session: AsyncSession, aggregator_id: int, site_id: int, mrid: str
 ) -> SiteReadingType | None:
@@ -79,19 +125,43 @@ async def fetch_site_reading_type_for_mrid(
     return resp.scalar_one_or_none()
 
 
-async def fetch_any_site_reading_type_for_mrids_other_site(
-    session: AsyncSession, aggregator_id: int, site_id: int, mrids: list[str]
-) -> SiteReadingType | None:
-    """Returns the first SiteReadingType whose mrid is in mrids but belongs to a different site.
-    Returns None if all mrids are unowned or owned by site_id."""
+async def fetch_site_reading_types_for_mrids(
+    session: AsyncSession, aggregator_id: int, site_id: int | None, mrids: list[str]
+) -> Sequence[SiteReadingType]:
+    """Fetches every SiteReadingType (for the specified aggregator) whose mrid is in mrids. The mrids are sent as a
+    single array parameter so this is always a single query (with a stable statement) regardless of len(mrids)
+
+    if site_id is None - it will not be included in the search filter"""
     stmt = select(SiteReadingType).where(
         (SiteReadingType.aggregator_id == aggregator_id)
-        & (SiteReadingType.mrid.in_(mrids))
-        & (SiteReadingType.site_id != site_id)
+        & (SiteReadingType.mrid == any_(sql_cast(mrids, ARRAY(VARCHAR(length=32)))))
     )
+    if site_id is not None:
+        stmt = stmt.where(SiteReadingType.site_id == site_id)
 
     resp = await session.execute(stmt)
-    return resp.scalars().first()
+    return resp.scalars().all()
+
+
+async def insert_site_reading_types(
+    session: AsyncSession, site_reading_types: list[SiteReadingType]
+) -> Sequence[SiteReadingType]:
+    """Inserts all of site_reading_types in a single INSERT statement, returning the newly persisted (session
+    attached) SiteReadingType instances (with their primary keys). The supplied instances are NOT added to the session.
+
+    It's expected that the caller has already validated that none of the mrids exist for the site - conflicts will
+    raise an IntegrityError"""
+    if not site_reading_types:
+        return []
+
+    table = SiteReadingType.__table__
+    insert_cols = [c.name for c in table.c if c not in list(table.primary_key.columns) and not c.server_default]  # ty:ignore[unresolved-attribute]
+    resp = await session.execute(
+        insert(SiteReadingType)
+        .values([{k: getattr(srt, k) for k in insert_cols} for srt in site_reading_types])
+        .returning(SiteReadingType)
+    )
+    return resp.scalars().all()
 
 
 async def _fetch_site_reading_type_groups(
@@ -163,15 +233,110 @@ async def count_grouped_site_reading_details(
     )
 
 
+# Upserts with at least this many readings will be staged via COPY (see copy_upsert_site_readings)
+SITE_READING_COPY_THRESHOLD = 500
+
+# The columns that are staged (and then inserted into SiteReading) by copy_upsert_site_readings
+SITE_READING_STAGING_COLUMNS = [
+    "site_reading_type_id",
+    "changed_time",
+    "local_id",
+    "quality_flags",
+    "time_period_start",
+    "time_period_seconds",
+    "value",
+]
+SITE_READING_STAGING_TABLE_NAME = "site_reading_staging"
+site_reading_staging = table(SITE_READING_STAGING_TABLE_NAME, *[column(c) for c in SITE_READING_STAGING_COLUMNS])
+
+
+async def copy_upsert_site_readings(session: AsyncSession, now: datetime, site_readings: list[SiteReading]) -> None:
+    """Equivalent to upsert_site_readings but optimised for large numbers of readings. The readings are streamed
+    (via COPY) into a temporary staging table and then archived / inserted with set based statements. Unlike
+    upsert_site_readings, the size of the SQL statements will not grow with the number of readings.
+
+    now: The current changed_time to mark any updated (deleted and replaced) records with
+    site_readings: The readings to insert/update"""
+
+    # The staging table is scoped to this connection and is emptied at the end of every transaction
+    await session.execute(
+        text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {SITE_READING_STAGING_TABLE_NAME} ("
+            "site_reading_type_id INTEGER NOT NULL, "
+            "changed_time TIMESTAMP WITH TIME ZONE NOT NULL, "
+            "local_id INTEGER NULL, "
+            "quality_flags INTEGER NOT NULL, "
+            "time_period_start TIMESTAMP WITH TIME ZONE NOT NULL, "
+            "time_period_seconds INTEGER NOT NULL, "
+            "value BIGINT NOT NULL"
+            ") ON COMMIT DELETE ROWS"
+        )
+    )
+    await session.execute(text(f"TRUNCATE {SITE_READING_STAGING_TABLE_NAME}"))
+
+    # Stream the readings into the staging table (on the same connection/transaction as session)
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if driver_connection is None:
+        raise ValueError("session connection has no underlying asyncpg connection")
+    await driver_connection.copy_records_to_table(
+        SITE_READING_STAGING_TABLE_NAME,
+        records=(
+            (
+                sr.site_reading_type_id,
+                sr.changed_time,
+                sr.local_id,
+                int(sr.quality_flags),
+                sr.time_period_start,
+                sr.time_period_seconds,
+                sr.value,
+            )
+            for sr in site_readings
+        ),
+        columns=SITE_READING_STAGING_COLUMNS,
+    )
+
+    # Delete all conflicts (archiving them as we go). The explicit time_period_start bounds aren't required for
+    # correctness but they allow the planner to prune the SiteReading partitions that can't possibly conflict
+    staged_keys = select(site_reading_staging.c.site_reading_type_id, site_reading_staging.c.time_period_start)
+    earliest_start = min(sr.time_period_start for sr in site_readings)
+    latest_start = max(sr.time_period_start for sr in site_readings)
+    await delete_rows_into_archive(
+        session,
+        SiteReading,
+        ArchiveSiteReading,
+        now,
+        lambda q: q.where(
+            tuple_(SiteReading.site_reading_type_id, SiteReading.time_period_start).in_(staged_keys)
+            & (SiteReading.time_period_start >= earliest_start)
+            & (SiteReading.time_period_start <= latest_start)
+        ),
+    )
+
+    # Now we can do the inserts
+    await session.execute(
+        insert(SiteReading).from_select(
+            SITE_READING_STAGING_COLUMNS, select(*[site_reading_staging.c[c] for c in SITE_READING_STAGING_COLUMNS])
+        )
+    )
+
+
 async def upsert_site_readings(session: AsyncSession, now: datetime, site_readings: list[SiteReading]) -> None:
     """Creates or updates the specified site readings. It's assumed that each SiteReading will have
     been assigned a valid site_reading_type_id before calling this function. No validation will be made for ownership
 
     Conflicting readings will be deleted (and archived) before being re-inserted.
 
+    Large numbers of readings (at least SITE_READING_COPY_THRESHOLD) will be delegated to copy_upsert_site_readings
+
     now: The current changed_time to mark any updated (deleted and replaced) records with
     site_readings: The readings to insert/update"""
 
+    if len(site_readings) >= SITE_READING_COPY_THRESHOLD:
+        await copy_upsert_site_readings(session, now, site_readings)
+        return
+
     # Start by deleting all conflicts (archiving them as we go)
     where_clause_and_elements = (
         and_(
@@ -183,9 +348,9 @@ async def upsert_site_readings(session: AsyncSession, now: datetime, site_readin
     or_clause = or_(*where_clause_and_elements)
     await delete_rows_into_archive(session, SiteReading, ArchiveSiteReading, now, lambda q: q.where(or_clause))
 
-    # Now we can do the inserts
+    # Now we can do the inserts (time_period_start is part of the PK but it's the partition key, not a generated value)
     table = SiteReading.__table__
-    update_cols = [c.name for c in table.c if c not in list(table.primary_key.columns) and not c.server_default]  # ty:ignore[unresolved-attribute]
+    update_cols = [c.name for c in table.c if c is not table.c.site_reading_id and not c.server_default]
     await session.execute(
         insert(SiteReading).values([{k: getattr(sr, k) for k in update_cols} for sr in site_readings])
     )
@@ -1,13 +1,16 @@
 import logging
-from collections.abc import AsyncIterator, Callable
+from asyncio import Task, get_running_loop, sleep
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine
 from contextlib import _AsyncGeneratorContextManager, asynccontextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
 from typing import Any
 
 from fastapi import FastAPI
 from sqlalchemy import Dialect, event
 from sqlalchemy.engine import Engine
-from sqlalchemy.pool import ConnectionPoolEntry
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.pool import ConnectionPoolEntry, NullPool
 
 from envoy.server.api.auth.azure import AzureADResourceTokenConfig, update_azure_ad_token_cache
 from envoy.server.cache import AsyncCache
@@ -98,3 +101,199 @@ def enable_dynamic_azure_ad_database_credentials(
         await remove_handler(handler)
 
     return context_manager
+
+
+# Back-off (in seconds) between attempts to re-establish a lost notify listener connection
+NOTIFY_LISTENER_RECONNECT_MIN_SECONDS = 1.0
+NOTIFY_LISTENER_RECONNECT_MAX_SECONDS = 60.0
+
+
+@dataclass
+class NotifyListenerDetails:
+    engine: AsyncEngine
+    channel: str
+    on_notify: Callable[[], Coroutine[Any, Any, None]]
+    on_listening: Callable[[], None]
+    on_lost: Callable[[], None]
+    connection: AsyncConnection | None = None  # The currently listening connection (if any)
+    active: bool = True  # Once False, a lost connection will no longer be re-established
+    pending_tasks: set[Task] = field(default_factory=set)  # Keeps references to in flight notify/reconnect tasks
+
+
+def _track_task(details: NotifyListenerDetails, coro: Coroutine[Any, Any, None]) -> None:
+    task = get_running_loop().create_task(coro)
+    details.pending_tasks.add(task)
+    task.add_done_callback(details.pending_tasks.discard)
+
+
+async def _listen(details: NotifyListenerDetails) -> None:
+    """Opens a new connection that will LISTEN on details.channel. Calls details.on_listening once established"""
+    connection = await details.engine.connect()
+    try:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection  # The underlying asyncpg connection
+        if driver_connection is None:
+            raise ValueError("listener connection has no underlying asyncpg connection")
+
+        def on_notification(conn: object, pid: int, channel: str, payload: str) -> None:
+            _track_task(details, details.on_notify())
+
+        def on_connection_terminated(conn: object) -> None:
+            logger.error(f"Lost {details.channel} listener connection. Reconnecting.")
+            details.connection = None
+            details.on_lost()
+            if details.active:
+                _track_task(details, _reconnect(details, connection))
+
+        await driver_connection.add_listener(details.channel, on_notification)
+        driver_connection.add_termination_listener(on_connection_terminated)
+    except BaseException:
+        await connection.close()  # Don't leak the connection (even if cancelled)
+        raise
+
+    details.connection = connection
+    details.on_listening()
+    logger.info(f"Listening for notifications on {details.channel}")
+
+
+async def _reconnect(details: NotifyListenerDetails, lost_connection: AsyncConnection) -> None:
+    """Re-establishes the listener connection (with exponential back-off) until it succeeds or details is removed"""
+    try:
+        await lost_connection.invalidate()
+    except Exception as exc:
+        logger.debug(f"Error invalidating lost {details.channel} listener connection", exc_info=exc)
+
+    delay_seconds = NOTIFY_LISTENER_RECONNECT_MIN_SECONDS
+    while details.active:
+        try:
+            await _listen(details)
+            return
+        except Exception as exc:
+            logger.warning(
+                f"Failed to re-establish {details.channel} listener. Next attempt in {delay_seconds}s", exc_info=exc
+            )
+        await sleep(delay_seconds)
+        delay_seconds = min(delay_seconds * 2, NOTIFY_LISTENER_RECONNECT_MAX_SECONDS)
+
+
+async def install_notify_listener(
+    database_url: str,
+    channel: str,
+    on_notify: Callable[[], Coroutine[Any, Any, None]],
+    on_listening: Callable[[], None],
+    on_lost: Callable[[], None],
+    engine_args: dict[str, Any] | None = None,
+) -> NotifyListenerDetails:
+    """Opens a dedicated database connection that will LISTEN on channel and await on_notify for every notification.
+
+    on_listening is called whenever the connection starts listening and on_lost whenever it's lost (notifications may
+    be missed until on_listening is called again). A lost connection is re-established in the background (with
+    back-off) until remove_notify_listener is called.
+
+    database_url: The database to listen for notifications on
+    engine_args: The same SQLAlchemy engine args (eg connect_args for SSL) used for the main application engine"""
+    engine = create_async_engine(database_url, **(engine_args or {}))
+    details = NotifyListenerDetails(
+        engine=engine, channel=channel, on_notify=on_notify, on_listening=on_listening, on_lost=on_lost
+    )
+    await _listen(details)
+    return details
+
+
+async def remove_notify_listener(details: NotifyListenerDetails) -> None:
+    """Given the returned value from install_notify_listener: stop listening (calling on_lost) and close the
+    listening connection"""
+    details.active = False
+    for task in list(details.pending_tasks):
+        task.cancel()
+    details.on_lost()
+    if details.connection is not None:
+        await details.connection.close()
+        details.connection = None
+    await details.engine.dispose()
+
+
+def enable_notify_listener(
+    database_url: str,
+    channel: str,
+    on_notify: Callable[[], Coroutine[Any, Any, None]],
+    on_listening: Callable[[], None],
+    on_lost: Callable[[], None],
+    engine_args: dict[str, Any] | None = None,
+) -> Callable[[FastAPI], _AsyncGeneratorContextManager]:
+    """If executed - will generate a context manager (compatible with FastAPI lifetime managers) that will (on app
+    startup) LISTEN for notifications on channel. See install_notify_listener for details on the parameters."""
+
+    @asynccontextmanager
+    async def context_manager(app: FastAPI) -> AsyncIterator:
+        """This context manager will perform all setup before yield and teardown after yield"""
+
+        details = await install_notify_listener(database_url, channel, on_notify, on_listening, on_lost, engine_args)
+
+        yield  # Code after this will execute during app shutdown
+
+        await remove_notify_listener(details)
+
+    return context_manager
+
+
+@dataclass
+class PartitionMaintenanceDetails:
+    engine: AsyncEngine
+    active: bool = True  # Once False, any future scheduled maintenance will do nothing
+
+
+async def install_partition_maintenance(
+    database_url: str,
+    maintain_partitions: Callable[[AsyncSession, datetime], Awaitable[object]],
+    frequency_seconds: int,
+) -> PartitionMaintenanceDetails:
+    """Starts a background task that will await maintain_partitions(session, now) every frequency_seconds on a
+    dedicated engine. The first run is scheduled immediately."""
+    engine = create_async_engine(database_url, poolclass=NullPool)
+    details = PartitionMaintenanceDetails(engine=engine)
+
+    @repeat_every(seconds=frequency_seconds, logger=logger)
+    async def maintain_partitions_task() -> None:
+        if not details.active:
+            return
+
+        async with AsyncSession(engine) as session:
+            await maintain_partitions(session, datetime.now(tz=UTC))
+
+    await maintain_partitions_task()
+
+    return details
+
+
+async def remove_partition_maintenance(details: PartitionMaintenanceDetails) -> None:
+    """Given the returned value from install_partition_maintenance: stop any future maintenance runs"""
+    details.active = False
+    await details.engine.dispose()
+
+
+def enable_partition_maintenance(
+    database_url: str,
+    maintain_partitions: Callable[[AsyncSession, datetime], Awaitable[object]],
+    frequency_seconds: int,
+) -> Callable[[FastAPI], _AsyncGeneratorContextManager]:
+    """If executed - will generate a context manager (compatible with FastAPI lifetime managers) that will (on app
+    startup) periodically run maintain_partitions (eg create future partitions and detach/drop expired ones).
+
+    maintain_partitions must be safe to run from multiple instances simultaneously
+
+    database_url: The database to maintain
+    maintain_partitions: Performs the maintenance given a session and the current time
+    frequency_seconds: The time in seconds between maintenance runs"""
+
+    @asynccontextmanager
+    async def context_manager(app: FastAPI) -> AsyncIterator:
+        """This context manager will perform all setup before yield and teardown after yield"""
+
+        details = await install_partition_maintenance(database_url, maintain_partitions, frequency_seconds)
+
+        yield  # Code after this will execute during app shutdown
+
+        await remove_partition_maintenance(details)
+
+    return context_manager
@@ -13,6 +13,7 @@ from envoy.server.api.depends.azure_ad_auth import AzureADAuthDepends
 from envoy.server.api.depends.lfdi_auth import LFDIAuthDepends
 from envoy.server.api.depends.nmi_validator import NMI_VALIDATOR_ATTR
 from envoy.server.api.depends.request_state_settings import RequestStateSettingsDepends
+from envoy.server.api.depends.site_count_strategy import SITE_COUNT_STRATEGY_ATTR
 from envoy.server.api.error_handler import (
     general_exception_handler,
     http_exception_handler,
@@ -20,9 +21,10 @@ from envoy.server.api.error_handler import (
     xml_exception_handler,
 )
 from envoy.server.api.router import routers, unsecured_routers
-from envoy.server.database import enable_dynamic_azure_ad_database_credentials
+from envoy.server.database import enable_dynamic_azure_ad_database_credentials, enable_notify_listener
 from envoy.server.endpoint_exclusion import generate_routers_with_excluded_endpoints
 from envoy.server.lifespan import generate_combined_lifespan_manager
+from envoy.server.manager.server import RUNTIME_SERVER_CONFIG_CHANNEL, RuntimeServerConfigManager
 from envoy.server.settings import AppSettings, settings
 
 # Setup logs
@@ -72,6 +74,20 @@ def generate_app(new_settings: AppSettings) -> FastAPI:
                 )
             )
 
+    # Cache the runtime server config in process (must follow any dynamic database credentials)
+    if new_settings.runtime_server_config_cache_enabled:
+        db_cfg = new_settings.db_middleware_kwargs
+        lifespan_managers.append(
+            enable_notify_listener(
+                db_cfg["db_url"],
+                channel=RUNTIME_SERVER_CONFIG_CHANNEL,
+                on_notify=RuntimeServerConfigManager.invalidate_cache,
+                on_listening=RuntimeServerConfigManager.enable_cache,
+                on_lost=RuntimeServerConfigManager.disable_cache,
+                engine_args=db_cfg.get("engine_args"),
+            )
+        )
+
     new_app = FastAPI(**new_settings.fastapi_kwargs, lifespan=generate_combined_lifespan_manager(lifespan_managers))
     new_app.add_middleware(SQLAlchemyMiddleware, **new_settings.db_middleware_kwargs)
 
@@ -95,6 +111,9 @@ def generate_app(new_settings: AppSettings) -> FastAPI:
     # Inject allow nmi updates setting
     setattr(new_app.state, ALLOW_NMI_UPDATES_ATTR, new_settings.allow_nmi_updates)
 
+    # Inject EndDeviceList count strategy setting
+    setattr(new_app.state, SITE_COUNT_STRATEGY_ATTR, new_settings.enddevicelist_count_strategy)
+
     new_app.add_exception_handler(HTTPException, http_exception_handler)
     new_app.add_exception_handler(ValidationError, validation_exception_handler)
     new_app.add_exception_handler(XMLSyntaxError, xml_exception_handler)
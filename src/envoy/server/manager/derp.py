@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.server.crud.doe import (
     count_active_does_include_deleted,
+    count_active_does_include_deleted_by_groups,
     count_does_at_timestamp,
     count_site_control_groups,
     select_active_does_include_deleted,
@@ -60,20 +61,16 @@ class DERProgramManager:
             session, start=start, limit=limit, changed_after=changed_after, fsa_id=fsa_id, include_defaults=True
         )
         site_control_group_count = await count_site_control_groups(session, changed_after, fsa_id=fsa_id)
-        control_counts_by_group: list[tuple[SiteControlGroup, int]] = []
-        for group in site_control_groups:
-            control_counts_by_group.append(
-                (
-                    group,
-                    await count_active_does_include_deleted(
-                        session,
-                        site_control_group_id=group.site_control_group_id,
-                        site=site,
-                        now=now,
-                        changed_after=datetime.min,  # We want total count - don't reduce it based on changed_after
-                    ),
-                )
-            )
+        counts_by_group_id = await count_active_does_include_deleted_by_groups(
+            session,
+            site_control_group_ids=[g.site_control_group_id for g in site_control_groups],
+            site=site,
+            now=now,
+            changed_after=datetime.min,  # We want total count - don't reduce it based on changed_after
+        )
+        control_counts_by_group: list[tuple[SiteControlGroup, int]] = [
+            (group, counts_by_group_id[group.site_control_group_id]) for group in site_control_groups
+        ]
 
         return DERProgramMapper.doe_program_list_response(
             scope,
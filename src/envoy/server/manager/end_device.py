@@ -1,7 +1,7 @@
 import logging
 import os
 from collections.abc import Sequence
-from datetime import datetime
+from datetime import UTC, datetime
 from secrets import randbelow, token_bytes
 
 from envoy_schema.server.schema.csip_aus.connection_point import ConnectionPointResponse
@@ -15,13 +15,16 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.notification.manager.notification import NotificationManager
+from envoy.server.cache.device_site import device_site_cache
 from envoy.server.crud.archive import copy_rows_into_archive
 from envoy.server.crud.site import (
     delete_site_for_aggregator,
     get_virtual_site_for_aggregator,
     insert_site_for_aggregator,
     select_aggregator_site_count,
+    select_aggregator_site_count_from_counter,
     select_all_sites_with_aggregator_id,
+    select_all_sites_with_aggregator_id_and_count,
     select_single_site_with_lfdi,
     select_single_site_with_sfdi,
     select_single_site_with_site_id,
@@ -46,6 +49,7 @@ from envoy.server.mapper.sep2.end_device import (
     RegistrationMapper,
     VirtualEndDeviceMapper,
 )
+from envoy.server.model.aggregator import SiteCountStrategy
 from envoy.server.model.archive.site import ArchiveSite
 from envoy.server.model.site import Site
 from envoy.server.model.subscription import SubscriptionResource
@@ -61,18 +65,24 @@ MAX_REGISTRATION_PIN = 99999
 logger = logging.getLogger(__name__)
 
 
+# Any "after" filter at (or before) this time can't exclude any sites
+UNFILTERED_AFTER = datetime.fromtimestamp(0, tz=UTC)
+
+
 async def fetch_sites_and_count_for_claims(
     session: AsyncSession,
     scope: UnregisteredRequestScope,
     start: int,
     after: datetime,
     limit: int,
+    count_strategy: SiteCountStrategy = SiteCountStrategy.EXACT,
 ) -> tuple[Sequence[Site], int]:
+    """Fetches the page of sites visible to scope and the total number of sites (ignoring pagination).
 
+    count_strategy: How the total number of sites for an aggregator certificate should be calculated."""
     # Are we selecting all sites for an aggregator or are we scoped to a particular site
     if scope.source == CertificateType.DEVICE_CERTIFICATE:
         site_list: Sequence[Site] = []
-        site_count: int = 0
         site = await select_single_site_with_lfdi(
             session,
             scope.lfdi,
@@ -92,9 +102,36 @@ async def fetch_sites_and_count_for_claims(
             # If we are here - there either isn't a registered site OR it's been filtered by the query. Return empty
             return ([], 0)
     elif scope.source == CertificateType.AGGREGATOR_CERTIFICATE:
-        site_list = await select_all_sites_with_aggregator_id(session, scope.aggregator_id, start, after, limit)
-        site_count = await select_aggregator_site_count(session, scope.aggregator_id, after)
-        return (site_list, site_count)
+        # The counter table can only be used if there is no "after" filter - otherwise use the window count
+        if count_strategy == SiteCountStrategy.COUNTER and not (
+            after == datetime.min or (after.tzinfo is not None and after <= UNFILTERED_AFTER)
+        ):
+            count_strategy = SiteCountStrategy.WINDOW
+
+        total_count: int | None = None
+        if count_strategy == SiteCountStrategy.WINDOW:
+            site_list, total_count = await select_all_sites_with_aggregator_id_and_count(
+                session,
+                scope.aggregator_id,
+                start,
+                after,
+                limit,
+            )
+        else:
+            site_list = await select_all_sites_with_aggregator_id(
+                session,
+                scope.aggregator_id,
+                start,
+                after,
+                limit,
+            )
+            if count_strategy == SiteCountStrategy.COUNTER:
+                total_count = await select_aggregator_site_count_from_counter(session, scope.aggregator_id)
+
+        # The window count is unavailable for an empty page (and the EXACT strategy always needs a separate count)
+        if total_count is None:
+            total_count = await select_aggregator_site_count(session, scope.aggregator_id, after)
+        return (site_list, total_count)
     else:
         raise ValueError(f"Unsupported scope source: {scope.source}")
 
@@ -145,6 +182,9 @@ class EndDeviceManager:
         )
         await session.commit()
 
+        if scope.source == CertificateType.DEVICE_CERTIFICATE:
+            device_site_cache.remove(scope.sfdi)
+
         # We only notify the top level site deletion - all the child entities will be overwhelming
         await NotificationManager.notify_changed_deleted_entities(SubscriptionResource.SITE, delete_time)
 
@@ -232,6 +272,9 @@ class EndDeviceManager:
 
         await session.commit()
 
+        if is_device_cert:
+            device_site_cache.remove(scope.sfdi)
+
         await NotificationManager.notify_changed_deleted_entities(SubscriptionResource.SITE, changed_time)
 
         return result
@@ -295,10 +338,13 @@ class EndDeviceManager:
         start: int,
         after: datetime,
         limit: int,
+        count_strategy: SiteCountStrategy = SiteCountStrategy.EXACT,
     ) -> EndDeviceListResponse:
         """
         This uses the raw request scope, a device cert will ONLY see their device (if registered)
 
+        count_strategy: How the total number of sites (for an aggregator) will be calculated
+
         start = 0 return [virtual_site, site_1, site_2, site_3, ...]
         start = 1 return [site_1, site_2, site_3, ...]
         start = 2 return [site_2, site_3, ...]
@@ -330,7 +376,9 @@ class EndDeviceManager:
             start = max(0, start - 1)
 
         # Are we selecting all sites for an aggregator or are we scoped to a particular site
-        site_list, site_count = await fetch_sites_and_count_for_claims(session, scope, start, after, limit)
+        site_list, site_count = await fetch_sites_and_count_for_claims(
+            session, scope, start, after, limit, count_strategy=count_strategy
+        )
 
         # site_count should include the virtual site
         if includes_virtual_site:
@@ -0,0 +1,58 @@
+from dataclasses import astuple
+from enum import IntFlag, auto
+from hashlib import blake2b
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from envoy.server.crud.doe import select_site_control_group_version, select_site_doe_version
+from envoy.server.crud.pricing import select_site_rate_version, select_tariff_version
+from envoy.server.crud.site import select_single_site_with_site_id
+from envoy.server.manager.server import RuntimeServerConfigManager
+from envoy.server.manager.time import utc_now
+from envoy.server.request_scope import SiteRequestScope
+
+
+class ETagDependency(IntFlag):
+    """The underlying data that a sep2 resource is derived from. Changes to any of these will change the ETag"""
+
+    SITE_CONTROL_GROUPS = auto()  # All SiteControlGroup / SiteControlGroupDefault
+    SITE_DOES = auto()  # The DOEs for the scoped site (relative to now)
+    TARIFFS = auto()  # All Tariff / TariffComponent
+    SITE_RATES = auto()  # The TariffGeneratedRates for the scoped site (relative to now)
+
+
+def generate_etag(parts: list[Any]) -> str:
+    """Generates a (strong) ETag value by hashing the repr of parts"""
+    return '"' + blake2b(repr(parts).encode(), digest_size=16).hexdigest() + '"'
+
+
+class ETagManager:
+    @staticmethod
+    async def fetch_etag_for_scope(
+        session: AsyncSession, scope: SiteRequestScope, resource_key: str, dependencies: ETagDependency
+    ) -> str | None:
+        """Generates an ETag for a site scoped sep2 resource WITHOUT fetching/rendering the resource itself. The ETag
+        is derived from cheap aggregate "version" queries for each of dependencies, the scoped site, the runtime
+        server config and the scope itself.
+
+        resource_key: Uniquely identifies the resource representation (eg the request path + query)
+
+        Returns None if the site DNE / is inaccessible (no ETag should be generated)"""
+        site = await select_single_site_with_site_id(session, scope.site_id, scope.aggregator_id)
+        if site is None:
+            return None
+
+        now = utc_now()
+        config = await RuntimeServerConfigManager.fetch_current_config(session)
+        parts: list[Any] = [resource_key, scope, site.changed_time, site.timezone_id, astuple(config)]
+        if ETagDependency.SITE_CONTROL_GROUPS in dependencies:
+            parts.append(await select_site_control_group_version(session))
+        if ETagDependency.SITE_DOES in dependencies:
+            parts.append(await select_site_doe_version(session, site.site_id, now))
+        if ETagDependency.TARIFFS in dependencies:
+            parts.append(await select_tariff_version(session))
+        if ETagDependency.SITE_RATES in dependencies:
+            parts.append(await select_site_rate_version(session, site.site_id, now))
+
+        return generate_etag(parts)
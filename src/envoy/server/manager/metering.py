@@ -19,12 +19,13 @@ from envoy.server.crud.site_reading import (
     GroupedSiteReadingTypeDetails,
     count_grouped_site_reading_details,
     delete_site_reading_type_group,
-    fetch_any_site_reading_type_for_mrids_other_site,
     fetch_grouped_site_reading_details,
-    fetch_site_reading_type_for_mrid,
     fetch_site_reading_types_for_group,
     fetch_site_reading_types_for_group_mrid,
+    fetch_site_reading_types_for_groups,
+    fetch_site_reading_types_for_mrids,
     generate_site_reading_type_group_id,
+    insert_site_reading_types,
     upsert_site_readings,
 )
 from envoy.server.exception import BadRequestError, ForbiddenError, InvalidIdError, NotFoundError
@@ -85,44 +86,48 @@ class MirrorMeteringManager:
         )
         srts_by_mrid: CaseInsensitiveDict[SiteReadingType] = CaseInsensitiveDict((srt.mrid, srt) for srt in group_srts)
 
+        # Every new MMR mRID is resolved in a single lookup - they can't belong to another site and (for a new MUP)
+        # they can't already exist under a different MUP for this site
         new_mmr_mrids = [mmr.mRID for mmr in mup.mirrorMeterReadings if mmr.mRID not in srts_by_mrid]
-        if new_mmr_mrids and await fetch_any_site_reading_type_for_mrids_other_site(
-            session, scope.aggregator_id, site_id, new_mmr_mrids
-        ):
+        existing_srts = (
+            await fetch_site_reading_types_for_mrids(session, scope.aggregator_id, None, new_mmr_mrids)
+            if new_mmr_mrids
+            else []
+        )
+        if any(srt.site_id != site_id for srt in existing_srts):
             raise NotFoundError("One or more MirrorMeterReading mRIDs are owned by a different EndDevice")
 
         # If this is a new MUP mrid - we can insert it as is
         if not group_srts:
             created = True
-            group_id = await generate_site_reading_type_group_id(session)
 
-            # Check that none of the individual MMR mRIDs already exist under a different MUP for this site.
-            for mmr in mup.mirrorMeterReadings:
-                existing = await fetch_site_reading_type_for_mrid(
-                    session, aggregator_id=scope.aggregator_id, site_id=site_id, mrid=mmr.mRID
+            if existing_srts:
+                raise BadRequestError(
+                    f"MirrorMeterReading mRID {existing_srts[0].mrid} already exists under a different MirrorUsagePoint"
                 )
-                if existing is not None:
-                    raise BadRequestError(
-                        f"MirrorMeterReading mRID {mmr.mRID} already exists under a different MirrorUsagePoint"
-                    )
 
-            # Start by creating the site reading types and getting them in the database
-            for mmr in mup.mirrorMeterReadings:
-                srt = MirrorUsagePointMapper.map_from_request(
-                    mmr=mmr,
-                    aggregator_id=scope.aggregator_id,
-                    site_id=site_id,
-                    group_id=group_id,
-                    group_mrid=mup.mRID,
-                    group_description=mup.description,
-                    group_version=mup.version,
-                    group_status=mup.status,
-                    role_flags=role_flags,
-                    changed_time=changed_time,
-                )
-                session.add(srt)
+            # Start by creating the site reading types and getting them in the database (with a PK)
+            group_id = await generate_site_reading_type_group_id(session)
+            new_srts = await insert_site_reading_types(
+                session,
+                [
+                    MirrorUsagePointMapper.map_from_request(
+                        mmr=mmr,
+                        aggregator_id=scope.aggregator_id,
+                        site_id=site_id,
+                        group_id=group_id,
+                        group_mrid=mup.mRID,
+                        group_description=mup.description,
+                        group_version=mup.version,
+                        group_status=mup.status,
+                        role_flags=role_flags,
+                        changed_time=changed_time,
+                    )
+                    for mmr in mup.mirrorMeterReadings
+                ],
+            )
+            for srt in new_srts:
                 srts_by_mrid[srt.mrid] = srt
-            await session.flush()  # Flush to ensure all of our new SiteReadingTypes are in the database (and have a PK)
         else:
             created = False
             group_id = group_srts[0].group_id
@@ -316,13 +321,13 @@ class MirrorMeteringManager:
             session, aggregator_id=scope.aggregator_id, site_id=site_id, changed_after=changed_after
         )
 
-        # Now fetch the MirrorMeterReading data for the above groups
-        grouped_site_reading_types: list[tuple[GroupedSiteReadingTypeDetails, Sequence[SiteReadingType]]] = []
-        for group in groups:
-            srts = await fetch_site_reading_types_for_group(
-                session, aggregator_id=scope.aggregator_id, site_id=site_id, group_id=group.group_id
-            )
-            grouped_site_reading_types.append((group, srts))
+        # Now fetch the MirrorMeterReading data for the above groups (all at once)
+        srts_by_group = await fetch_site_reading_types_for_groups(
+            session, aggregator_id=scope.aggregator_id, site_id=site_id, group_ids=[g.group_id for g in groups]
+        )
+        grouped_site_reading_types: list[tuple[GroupedSiteReadingTypeDetails, Sequence[SiteReadingType]]] = [
+            (group, srts_by_group[group.group_id]) for group in groups
+        ]
 
         return MirrorUsagePointListMapper.map_to_list_response(
             scope, groups_count, grouped_site_reading_types, config.mup_postrate_seconds
@@ -367,6 +372,7 @@ class MirrorMeteringManager:
                     mmrs_to_update.append((mmr, matched_srt))  # Don't update unless we have a ReadingType
 
         # Start applying the changes to the updating MMRs
+        changed_srts: list[tuple[SiteReadingType, SiteReadingType]] = []
         for mmr, target_srt in mmrs_to_update:
             src_srt = MirrorUsagePointMapper.map_from_request(
                 mmr=mmr,
@@ -380,37 +386,45 @@ class MirrorMeteringManager:
                 group_status=group_status,
                 group_version=group_version,
             )
-
-            # We have to ensure we update in this order otherwise SQLALchemy will batch the operations in the wrong
-            # order (which stuffs up our archive of the current values)
             if not MirrorUsagePointMapper.are_site_reading_types_equivalent(target_srt, src_srt):
-                await copy_rows_into_archive(
-                    session,
-                    SiteReadingType,
-                    ArchiveSiteReadingType,
-                    lambda q: q.where(SiteReadingType.site_reading_type_id == target_srt.site_reading_type_id),  # noqa: B023 # Looks like a ruff issue
-                )
-                MirrorUsagePointMapper.merge_site_reading_type(target_srt, src_srt, changed_time)
-
-        # Start inserting/updating the new site reading types
-        for mmr in mmrs_to_insert:
-            new_srt = MirrorUsagePointMapper.map_from_request(
-                mmr=mmr,
-                aggregator_id=scope.aggregator_id,
-                site_id=site_id,
-                group_id=group_id,
-                group_mrid=group_mrid,
-                role_flags=role_flags,
-                changed_time=changed_time,
-                group_description=group_description,
-                group_status=group_status,
-                group_version=group_version,
+                changed_srts.append((target_srt, src_srt))
+
+        # We have to ensure we archive BEFORE merging otherwise SQLALchemy will batch the operations in the wrong
+        # order (which stuffs up our archive of the current values)
+        if changed_srts:
+            changed_srt_ids = [target_srt.site_reading_type_id for target_srt, _ in changed_srts]
+            await copy_rows_into_archive(
+                session,
+                SiteReadingType,
+                ArchiveSiteReadingType,
+                lambda q: q.where(SiteReadingType.site_reading_type_id.in_(changed_srt_ids)),
             )
-            session.add(new_srt)
-            srts_by_mrid[mmr.mRID] = new_srt  # Log this new site reading type
-        if mmrs_to_insert or mmrs_to_update:
+            for target_srt, src_srt in changed_srts:
+                MirrorUsagePointMapper.merge_site_reading_type(target_srt, src_srt, changed_time)
             await session.flush()
 
+        # Start inserting the new site reading types
+        new_srts = await insert_site_reading_types(
+            session,
+            [
+                MirrorUsagePointMapper.map_from_request(
+                    mmr=mmr,
+                    aggregator_id=scope.aggregator_id,
+                    site_id=site_id,
+                    group_id=group_id,
+                    group_mrid=group_mrid,
+                    role_flags=role_flags,
+                    changed_time=changed_time,
+                    group_description=group_description,
+                    group_status=group_status,
+                    group_version=group_version,
+                )
+                for mmr in mmrs_to_insert
+            ],
+        )
+        for new_srt in new_srts:
+            srts_by_mrid[new_srt.mrid] = new_srt  # Log this new site reading type
+
         # Finally generate any site readings from the MMR's push them to the DB
         site_readings = MirrorMeterReadingMapper.map_from_request(mmrs, srts_by_mrid, changed_time)
         if site_readings:
@@ -0,0 +1,95 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import cast
+
+from sqlalchemy import Table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from envoy.server.crud.partition import (
+    add_months,
+    create_range_partition,
+    detach_partition,
+    drop_partition,
+    month_start,
+    monthly_partition_name,
+    select_range_partitions,
+    try_lock_partition_maintenance,
+)
+from envoy.server.model.archive.site_reading import ArchiveSiteReading
+from envoy.server.model.base import PARTITION_KEY_INFO
+from envoy.server.model.site_reading import SiteReading
+
+logger = logging.getLogger(__name__)
+
+# These tables are range partitioned (monthly) by their PARTITION_KEY_INFO column
+SITE_READING_PARTITIONED_TABLES: list[Table] = [
+    cast(Table, SiteReading.__table__),
+    cast(Table, ArchiveSiteReading.__table__),
+]
+
+
+@dataclass
+class PartitionMaintenanceResult:
+    """Summary of the changes made by a single run of partition maintenance"""
+
+    created_partitions: list[str] = field(default_factory=list)
+    removed_partitions: list[str] = field(default_factory=list)  # Either detached or dropped (depending on config)
+
+
+class SiteReadingPartitionManager:
+    @staticmethod
+    async def maintain_partitions(
+        session: AsyncSession,
+        now: datetime,
+        months_ahead: int,
+        retention_months: int | None,
+        drop_expired: bool,
+    ) -> PartitionMaintenanceResult | None:
+        """Ensures that every partitioned SiteReading table has a monthly partition for the current month and the
+        following months_ahead months. Partitions that end on/before the start of the month retention_months prior to
+        the current month will be detached (or dropped if drop_expired is True). retention_months of None will never
+        remove partitions.
+
+        The session will be committed on completion. Returns None if maintenance is already running elsewhere"""
+        if not await try_lock_partition_maintenance(session):
+            logger.info("Skipping SiteReading partition maintenance - it's already running in another transaction")
+            return None
+
+        result = PartitionMaintenanceResult()
+        current_month = month_start(now)
+        for table in SITE_READING_PARTITIONED_TABLES:
+            partition_column: str = table.info[PARTITION_KEY_INFO]
+            existing = await select_range_partitions(session, table.name)
+
+            for months in range(months_ahead + 1):
+                lower = add_months(current_month, months)
+                upper = add_months(lower, 1)
+                if any(p.lower < upper and p.upper > lower for p in existing):
+                    continue  # Don't try and create anything overlapping a pre-existing partition
+
+                partition_name = monthly_partition_name(table.name, lower)
+                await create_range_partition(session, table.name, partition_name, partition_column, lower, upper)
+                result.created_partitions.append(partition_name)
+
+            if retention_months is None:
+                continue
+
+            retention_start = add_months(current_month, -retention_months)
+            for p in existing:
+                if p.upper > retention_start:
+                    continue
+
+                if drop_expired:
+                    await drop_partition(session, table.name, p.partition_name)
+                else:
+                    await detach_partition(session, table.name, p.partition_name)
+                result.removed_partitions.append(p.partition_name)
+
+        await session.commit()
+
+        logger.info(
+            f"SiteReading partition maintenance created {result.created_partitions} "
+            f"and {'dropped' if drop_expired else 'detached'} {result.removed_partitions}"
+        )
+        return result
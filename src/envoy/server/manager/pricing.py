@@ -15,7 +15,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.server.crud.pricing import (
     count_active_rates_include_deleted,
+    count_active_rates_include_deleted_by_tariff_components,
+    count_active_rates_include_deleted_by_tariffs,
     count_tariff_components_by_tariff,
+    count_tariff_components_by_tariffs,
     select_active_rates_include_deleted,
     select_all_tariffs,
     select_single_tariff,
@@ -74,18 +77,15 @@ class TariffProfileManager:
         tariffs = await select_all_tariffs(session, start, changed_after, limit, fsa_id)
         tariff_count = await select_tariff_count(session, changed_after, fsa_id)
 
-        # we need the component/rate counts associated with each Tariff+Site.
+        # we need the component/rate counts associated with each Tariff+Site (fetched for the whole page at once)
         now = utc_now()
-        tariff_rate_counts: list[int] = []
-        tariff_component_counts: list[int] = []
-        for tariff in tariffs:
-            total_components = await count_tariff_components_by_tariff(session, tariff.tariff_id, None)
-            tariff_component_counts.append(total_components)
-
-            total_rates = await count_active_rates_include_deleted(
-                session, tariff.tariff_id, None, scope.site_id, now, datetime.min
-            )
-            tariff_rate_counts.append(total_rates)
+        tariff_ids = [tariff.tariff_id for tariff in tariffs]
+        component_counts_by_tariff = await count_tariff_components_by_tariffs(session, tariff_ids, None)
+        rate_counts_by_tariff = await count_active_rates_include_deleted_by_tariffs(
+            session, tariff_ids, scope.site_id, now, datetime.min
+        )
+        tariff_component_counts = [component_counts_by_tariff[tariff_id] for tariff_id in tariff_ids]
+        tariff_rate_counts = [rate_counts_by_tariff[tariff_id] for tariff_id in tariff_ids]
 
         # fetch runtime server config
         config = await RuntimeServerConfigManager.fetch_current_config(session)
@@ -155,13 +155,10 @@ class RateComponentManager:
         tcs = await select_tariff_components_by_tariff(session, tariff_id, start, changed_after, limit)
         tc_count = await count_tariff_components_by_tariff(session, tariff_id, changed_after)
 
-        tcs_rate_counts: list[int] = []
-        for tc in tcs:
-            tcs_rate_counts.append(
-                await count_active_rates_include_deleted(
-                    session, tariff_id, tc.tariff_component_id, scope.site_id, now, changed_after
-                )
-            )
+        rate_counts_by_tc = await count_active_rates_include_deleted_by_tariff_components(
+            session, [tc.tariff_component_id for tc in tcs], scope.site_id, now, changed_after
+        )
+        tcs_rate_counts = [rate_counts_by_tc[tc.tariff_component_id] for tc in tcs]
 
         return RateComponentMapper.map_to_list_response(
             scope, tariff_id, list(zip(tcs, tcs_rate_counts, strict=False)), tc_count
@@ -13,7 +13,11 @@ from envoy_schema.server.schema.sep2.response import (
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from envoy.server.crud.doe import select_doe_by_display_id_include_deleted, select_doe_include_deleted
+from envoy.server.crud.doe import (
+    select_doe_by_display_id_include_deleted,
+    select_doe_include_deleted,
+    select_does_include_deleted,
+)
 from envoy.server.crud.pricing import select_tariff_generated_rate_include_deleted
 from envoy.server.crud.response import (
     count_doe_responses,
@@ -112,24 +116,21 @@ class ResponseManager:
                 limit=limit,
                 created_after=after,
             )
+            # The original DOEs (which may have since been deleted) are all fetched in a single batch
+            does_by_id: dict[int, DynamicOperatingEnvelope | ArchiveDynamicOperatingEnvelope] = {}
+            if scope.site_id is not None:
+                does_by_id = await select_does_include_deleted(
+                    session,
+                    scope.aggregator_id,
+                    scope.site_id,
+                    [r.dynamic_operating_envelope_id_snapshot for r in doe_responses],
+                )
             responses_and_does: list[
                 tuple[
                     DynamicOperatingEnvelopeResponse,
                     DynamicOperatingEnvelope | ArchiveDynamicOperatingEnvelope | None,
                 ]
-            ] = []
-
-            # This could be made more efficient via a batch select - but this list resource should not be receiving much
-            # (if any) traffic. If this changes - select_doe_include_deleted can absolutely be made into a batch select
-            # without too much work.
-            for doe_response in doe_responses:
-                if scope.site_id is not None:
-                    original_doe = await select_doe_include_deleted(
-                        session, scope.aggregator_id, scope.site_id, doe_response.dynamic_operating_envelope_id_snapshot
-                    )
-                else:
-                    original_doe = None
-                responses_and_does.append((doe_response, original_doe))
+            ] = [(r, does_by_id.get(r.dynamic_operating_envelope_id_snapshot, None)) for r in doe_responses]
             return ResponseListMapper.map_to_doe_response(scope, responses_and_does, total_doe_responses)
         elif response_set_type == ResponseSetType.TARIFF_GENERATED_RATES:
             total_rate_responses = await count_tariff_generated_rate_responses(
@@ -2,6 +2,7 @@ from dataclasses import asdict, replace
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from envoy.server.cache import AsyncCache, ExpiringValue
 from envoy.server.crud.server import select_server_config
 from envoy.server.model.config.server import RuntimeServerConfig
 from envoy.server.model.server import RuntimeServerConfig as ConfigEntity
@@ -9,6 +10,15 @@ from envoy.server.model.server import RuntimeServerConfig as ConfigEntity
 # reference default values
 default = RuntimeServerConfig()
 
+# The Postgres NOTIFY channel that will receive a (payload-less) notification whenever the runtime config changes
+RUNTIME_SERVER_CONFIG_CHANNEL = "envoy_runtime_server_config"
+
+CONFIG_CACHE_KEY = 1  # runtime_server_config is a single row table (id = 1)
+
+# The in process cache of the current config. This will ONLY be set while this process is listening for changes on
+# RUNTIME_SERVER_CONFIG_CHANNEL (otherwise every fetch will go to the database)
+_config_cache: AsyncCache[int, RuntimeServerConfig] | None = None
+
 
 # NOTE: Too simple so decided to skip mapping layer
 def _map_server_config(
@@ -28,8 +38,41 @@ def _map_server_config(
     return replace(default, **live_values)
 
 
+async def _update_config_cache(session: AsyncSession) -> dict[int, ExpiringValue[RuntimeServerConfig]]:
+    """AsyncCache update_fn for the runtime config cache. Values never expire - they will instead be cleared whenever
+    a change notification is received"""
+    return {CONFIG_CACHE_KEY: ExpiringValue(expiry=None, value=_map_server_config(await select_server_config(session)))}
+
+
 class RuntimeServerConfigManager:
     @staticmethod
     async def fetch_current_config(session: AsyncSession) -> RuntimeServerConfig:
-        """Fetches the current config (with any defaults applied for missing values)"""
+        """Fetches the current config (with any defaults applied for missing values). If the config cache is enabled
+        this will only hit the database on the first request after a change"""
+        cache = _config_cache
+        if cache is not None:
+            config = await cache.get_value(session, CONFIG_CACHE_KEY)
+            if config is not None:
+                return config
+
         return _map_server_config(await select_server_config(session))
+
+    @staticmethod
+    def enable_cache() -> None:
+        """Enables the in process config cache. This should ONLY be called once this process is listening for change
+        notifications on RUNTIME_SERVER_CONFIG_CHANNEL (which should call invalidate_cache)"""
+        global _config_cache
+        _config_cache = AsyncCache(update_fn=_update_config_cache)
+
+    @staticmethod
+    def disable_cache() -> None:
+        """Disables (and discards) the in process config cache - all subsequent fetches will go to the database"""
+        global _config_cache
+        _config_cache = None
+
+    @staticmethod
+    async def invalidate_cache() -> None:
+        """Clears the in process config cache (if enabled) so the next fetch will go to the database"""
+        cache = _config_cache
+        if cache is not None:
+            await cache.clear()
@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import StrEnum
 
 from sqlalchemy import VARCHAR, DateTime, ForeignKey, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -10,6 +11,16 @@ from envoy.server.model import Base
 NULL_AGGREGATOR_ID: int = 0
 
 
+class SiteCountStrategy(StrEnum):
+    """How the total number of sites for an aggregator is calculated when serving a list of EndDevices"""
+
+    EXACT = "exact"  # A separate COUNT(*) query over all of the aggregator's (filtered) sites
+    WINDOW = "window"  # COUNT(*) OVER() computed alongside the page query
+    COUNTER = (
+        "counter"  # Read from aggregator_site_count (only usable for unfiltered lists - else falls back to WINDOW)
+    )
+
+
 class Aggregator(Base):
     "Represents a Distributed Energy Resource (DER) aggregator"
 
@@ -61,3 +72,15 @@ class AggregatorDomain(Base):
     domain: Mapped[str] = mapped_column(VARCHAR(length=512), nullable=False)  # The whitelisted FQ domain name
 
     aggregator: Mapped["Aggregator"] = relationship(back_populates="domains", lazy="raise")
+
+
+class AggregatorSiteCount(Base):
+    """The number of sites currently 'owned' by an aggregator. This is maintained by triggers on the site table
+    (see the aggregator_site_count alembic migration) - it should NOT be written to by the application"""
+
+    __tablename__ = "aggregator_site_count"
+
+    aggregator_id: Mapped[int] = mapped_column(
+        ForeignKey("aggregator.aggregator_id", ondelete="CASCADE"), primary_key=True
+    )
+    site_count: Mapped[int] = mapped_column(nullable=False)
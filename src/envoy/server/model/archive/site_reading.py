@@ -17,6 +17,7 @@ from sqlalchemy.orm import Mapped, mapped_column
 import envoy.server.model as original_models
 from envoy.server.model.archive import ArchiveBase
 from envoy.server.model.archive.base import ARCHIVE_TABLE_PREFIX
+from envoy.server.model.base import PARTITION_KEY_INFO
 
 
 class ArchiveSiteReadingType(ArchiveBase):
@@ -59,8 +60,15 @@ class ArchiveSiteReading(ArchiveBase):
 
     local_id: Mapped[int | None] = mapped_column(INTEGER, nullable=True)
     quality_flags: Mapped[QualityFlagsType] = mapped_column(INTEGER)
-    time_period_start: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    time_period_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
+    )  # Partition key (so it must form part of the PK)
     time_period_seconds: Mapped[int] = mapped_column(INTEGER)  # Length of the reading in seconds
     value: Mapped[int] = mapped_column(
         BigInteger
     )  # actual reading value - type/power of ten are defined in the parent reading set
+
+    # Partitioned identically to SiteReading
+    __table_args__ = (
+        {"postgresql_partition_by": "RANGE (time_period_start)", "info": {PARTITION_KEY_INFO: "time_period_start"}},
+    )
@@ -3,6 +3,10 @@ from datetime import datetime
 import sqlalchemy as sa
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
+# Table.info key naming the partition key column of a partitioned table. Partitioned tables must include the partition
+# key in their primary key but it shouldn't be treated as part of the "logical" identity of a row
+PARTITION_KEY_INFO = "partition_key"
+
 
 class Base(DeclarativeBase):
     pass
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from sqlalchemy import DOUBLE_PRECISION, INTEGER, VARCHAR, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from envoy.server.model import Base
@@ -40,6 +41,33 @@ class CalculationLogVariableValue(Base):
     calculation_log: Mapped["CalculationLog"] = relationship(back_populates="variable_values", lazy="raise")
 
 
+class CalculationLogVariableSeries(Base):
+    """Compact (columnar) alternative to CalculationLogVariableValue. Represents ALL time series observations for a
+    single variable id / site_id combination within a calculation log as a single row (avoiding the per row / per
+    primary key overhead of storing each observation separately).
+
+    Logically equivalent to a CalculationLogVariableValue for every non None element of interval_values"""
+
+    __tablename__ = "calculation_log_variable_series"
+
+    # Id of the parent calculation log that owns this series
+    calculation_log_id: Mapped[int] = mapped_column(
+        ForeignKey("calculation_log.calculation_log_id", ondelete="CASCADE"), primary_key=True
+    )
+
+    # Same as CalculationLogVariableValue.variable_id
+    variable_id: Mapped[int] = mapped_column(INTEGER, primary_key=True)
+
+    # Same as CalculationLogVariableValue.site_id_snapshot (0 corresponds to a value of None in the public model)
+    site_id_snapshot: Mapped[int] = mapped_column(INTEGER, primary_key=True)
+
+    # The time series values indexed by interval_period (i.e. interval_values[N] is the value for interval_period N).
+    # Interval periods without a value are encoded as None
+    interval_values: Mapped[list[float | None]] = mapped_column(ARRAY(DOUBLE_PRECISION))
+
+    calculation_log: Mapped["CalculationLog"] = relationship(back_populates="variable_series", lazy="raise")
+
+
 class CalculationLogVariableMetadata(Base):
     """Human readable metadata for describing a variable with an ID associated with a CalculationLog"""
 
@@ -180,6 +208,18 @@ class CalculationLog(Base):
         ],
     )  # What variable values have been set in this calculation log
 
+    variable_series: Mapped[list["CalculationLogVariableSeries"]] = relationship(
+        back_populates="calculation_log",
+        lazy="raise",
+        cascade="all, delete",
+        passive_deletes=True,
+        order_by=[
+            CalculationLogVariableSeries.calculation_log_id,
+            CalculationLogVariableSeries.variable_id,
+            CalculationLogVariableSeries.site_id_snapshot,
+        ],
+    )  # Compact (see CalculationLogVariableSeries) alternative to variable_values
+
     label_values: Mapped[list["CalculationLogLabelValue"]] = relationship(
         back_populates="calculation_log",
         lazy="raise",
@@ -15,6 +15,7 @@ from sqlalchemy import INTEGER, VARCHAR, BigInteger, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from envoy.server.model import Base, Site
+from envoy.server.model.base import PARTITION_KEY_INFO
 
 # Used for creating unique values for SiteReadingType.group_id as required
 # We could've done this via a parent table group but it would just be unnecessary overhead
@@ -96,7 +97,7 @@ class SiteReading(Base):
 
     __tablename__ = "site_reading"
 
-    site_reading_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    site_reading_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     site_reading_type_id: Mapped[int] = mapped_column(ForeignKey("site_reading_type.site_reading_type_id"))
     created_time: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
@@ -107,7 +108,9 @@ class SiteReading(Base):
 
     local_id: Mapped[int | None] = mapped_column(INTEGER, nullable=True)  # Internal id assigned by aggregator
     quality_flags: Mapped[QualityFlagsType] = mapped_column(INTEGER)
-    time_period_start: Mapped[datetime] = mapped_column(DateTime(timezone=True))  # When the reading starts
+    time_period_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
+    )  # When the reading starts. Also the partition key (so it must form part of the PK)
     time_period_seconds: Mapped[int] = mapped_column(INTEGER)  # Length of the reading in seconds
     value: Mapped[int] = mapped_column(
         BigInteger
@@ -115,6 +118,8 @@ class SiteReading(Base):
 
     site_reading_type: Mapped["SiteReadingType"] = relationship(lazy="raise")
 
+    # The table is range partitioned (monthly) by time_period_start - see envoy.server.manager.partition
     __table_args__ = (
         UniqueConstraint("site_reading_type_id", "time_period_start", name="site_reading_type_id_time_period_start_uc"),
+        {"postgresql_partition_by": "RANGE (time_period_start)", "info": {PARTITION_KEY_INFO: "time_period_start"}},
     )
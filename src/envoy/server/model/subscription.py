@@ -67,6 +67,7 @@ class Subscription(Base):
 
     __table_args__ = (
         Index("ix_subscription_aggregator_id_resource_type", "aggregator_id", "resource_type", unique=False),
+        Index("ix_subscription_changed_time", "changed_time", unique=False),  # For incremental subscription indexing
     )
 
 
@@ -6,8 +6,10 @@ from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
 
 from envoy.server.api.depends.allow_nmi_updates import DEFAULT_ALLOW_NMI_UPDATES
+from envoy.server.api.depends.site_count_strategy import DEFAULT_SITE_COUNT_STRATEGY
 from envoy.server.endpoint_exclusion import EndpointExclusionSet
 from envoy.server.manager.nmi_validator import DNSPParticipantId, NmiValidator
+from envoy.server.model.aggregator import SiteCountStrategy
 from envoy.settings import CommonSettings
 
 
@@ -54,6 +56,9 @@ class AppSettings(CommonSettings):
     allow_nmi_updates: bool = DEFAULT_ALLOW_NMI_UPDATES
     exclude_endpoints: EndpointExclusionSet | None = None
 
+    # How EndDeviceList calculates the total site count for aggregators - see SiteCountStrategy
+    enddevicelist_count_strategy: SiteCountStrategy = DEFAULT_SITE_COUNT_STRATEGY
+
     @property
     def fastapi_kwargs(self) -> dict[str, Any]:
         return {
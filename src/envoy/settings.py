@@ -50,6 +50,9 @@ class CommonSettings(BaseSettings):
 
     sqlalchemy_engine_arguments: dict[str, str | int | float] | None = None
 
+    # If True - the runtime server config will be cached in process (invalidated via Postgres LISTEN/NOTIFY)
+    runtime_server_config_cache_enabled: bool = True
+
     @property
     def db_middleware_kwargs(self) -> dict[str, Any]:
         return generate_middleware_kwargs(
@@ -9,6 +9,7 @@ from assertical.fixtures.postgres import generate_async_conn_str_from_connection
 from psycopg import Connection
 
 from envoy.server.alembic import upgrade
+from envoy.server.cache.device_site import device_site_cache
 from tests.integration.conftest import READONLY_USER_KEY_1, READONLY_USER_KEY_2, READONLY_USER_NAME
 from tests.unit.jwt import DEFAULT_CLIENT_ID, DEFAULT_DATABASE_RESOURCE_ID, DEFAULT_ISSUER, DEFAULT_TENANT_ID
 
@@ -40,6 +41,9 @@ def pg_empty_config(
     # Load the default TEST_IANA_PEN into the IANA_PEN configuration
     os.environ["IANA_PEN"] = str(TEST_IANA_PEN)
 
+    # Partition maintenance runs in the background - it shouldn't be competing with tests for the test database
+    os.environ["SITE_READING_PARTITION_MAINTENANCE_ENABLED"] = "False"
+
     if "notifications_enabled" in request.fixturenames:
         os.environ["ENABLE_NOTIFICATIONS"] = "True"
 
@@ -89,6 +93,9 @@ def pg_empty_config(
     if exclude_endpoints_marker is not None:
         os.environ["exclude_endpoints"] = json.dumps(exclude_endpoints_marker.args[0])
 
+    # The process level device site cache must not leak values between test databases
+    device_site_cache.clear()
+
     # This will install all of the alembic migrations - DB is accessed from the DATABASE_URL env variable
     upgrade()
 
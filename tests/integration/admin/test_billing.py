@@ -0,0 +1,53 @@
+import csv
+import json
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+from envoy.admin.api.billing import AGGREGATOR_BILLING_EXPORT_URI
+from envoy.admin.crud.billing import BILLING_EXPORT_COLUMNS
+
+
+def export_uri(aggregator_id: int, tariff_id: int) -> str:
+    return AGGREGATOR_BILLING_EXPORT_URI.format(
+        aggregator_id=aggregator_id,
+        tariff_id=tariff_id,
+        period_start="2022-01-01T00:00:00Z",
+        period_end="2024-01-01T00:00:00Z",
+    )
+
+
+@pytest.mark.anyio
+async def test_stream_aggregator_billing_export(admin_client_auth: AsyncClient):
+    """The NDJSON and CSV exports should contain the same (ordered) rows"""
+    resp = await admin_client_auth.get(export_uri(1, 1))
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    ndjson_rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(ndjson_rows) > 0
+    assert all(list(r.keys()) == BILLING_EXPORT_COLUMNS for r in ndjson_rows)
+
+    rate_prices = [r["price_pow10_encoded"] for r in ndjson_rows if r["source"] == "tariff_rate"]
+    assert 1111 in rate_prices
+    assert 2222 in rate_prices
+
+    keys = [(r["site_id"], r["time_period_start"]) for r in ndjson_rows]
+    assert keys == sorted(keys)
+
+    resp = await admin_client_auth.get(export_uri(1, 1) + "?format=csv")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"].startswith("text/csv")
+    csv_rows = list(csv.reader(resp.text.splitlines()))
+    assert csv_rows[0] == BILLING_EXPORT_COLUMNS
+    assert len(csv_rows) == len(ndjson_rows) + 1
+    assert [(int(r[0]), r[3]) for r in csv_rows[1:]] == [(r["site_id"], r["source"]) for r in ndjson_rows]
+
+
+@pytest.mark.anyio
+async def test_stream_aggregator_billing_export_errors(admin_client_auth: AsyncClient):
+    resp = await admin_client_auth.get(export_uri(99, 1))
+    assert resp.status_code == HTTPStatus.NOT_FOUND
+
+    resp = await admin_client_auth.get(export_uri(1, 1) + "?format=xml")
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
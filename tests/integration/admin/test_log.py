@@ -1,3 +1,4 @@
+import json
 from datetime import UTC, datetime
 from http import HTTPStatus
 from itertools import product
@@ -19,6 +20,7 @@ from envoy_schema.admin.schema.log import (
 from envoy_schema.admin.schema.uri import CalculationLogCreateUri, CalculationLogsForPeriod, CalculationLogUri
 from httpx import AsyncClient
 
+from envoy.admin.api.log import CALCULATION_LOG_STREAM_URI
 from envoy.server.api.response import LOCATION_HEADER_NAME
 
 
@@ -218,3 +220,54 @@ async def test_get_calculation_logs_for_period(
     assert all([cl.variable_metadata == [] for cl in log_list.calculation_logs]), "No child logs in list endpoint"
     assert all([cl.variable_values is None for cl in log_list.calculation_logs]), "No child logs in list endpoint"
     assert [cl.calculation_log_id for cl in log_list.calculation_logs] == expected_ids
+
+
+@pytest.mark.parametrize("include_variables, include_labels", product([True, False], [True, False]))
+@pytest.mark.anyio
+async def test_stream_calculation_log_by_id(
+    admin_client_auth: AsyncClient, include_variables: bool, include_labels: bool
+):
+    """Reassembling the streamed chunks should yield the same log as the non streamed GET"""
+    query_string = f"?include_variables={include_variables}&include_labels={include_labels}"
+    resp = await admin_client_auth.get(CalculationLogUri.format(calculation_log_id=2) + query_string)
+    assert resp.status_code == HTTPStatus.OK
+    expected_log = CalculationLogResponse.model_validate_json(resp.content)
+
+    resp = await admin_client_auth.get(CALCULATION_LOG_STREAM_URI.format(calculation_log_id=2) + query_string)
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = resp.text.splitlines()
+
+    streamed_log = CalculationLogResponse.model_validate_json(lines[0])
+    assert streamed_log.variable_values is None
+    assert streamed_log.label_values is None
+    if include_variables:
+        streamed_log.variable_values = CalculationLogVariableValues(
+            variable_ids=[], site_ids=[], interval_periods=[], values=[]
+        )
+    if include_labels:
+        streamed_log.label_values = CalculationLogLabelValues(label_ids=[], site_ids=[], values=[])
+
+    for line in lines[1:]:
+        chunk = json.loads(line)
+        if "variable_values" in chunk:
+            assert streamed_log.variable_values is not None
+            var_chunk = CalculationLogVariableValues.model_validate(chunk["variable_values"])
+            streamed_log.variable_values.variable_ids.extend(var_chunk.variable_ids)
+            streamed_log.variable_values.site_ids.extend(var_chunk.site_ids)
+            streamed_log.variable_values.interval_periods.extend(var_chunk.interval_periods)
+            streamed_log.variable_values.values.extend(var_chunk.values)
+        else:
+            assert streamed_log.label_values is not None
+            label_chunk = CalculationLogLabelValues.model_validate(chunk["label_values"])
+            streamed_log.label_values.label_ids.extend(label_chunk.label_ids)
+            streamed_log.label_values.site_ids.extend(label_chunk.site_ids)
+            streamed_log.label_values.values.extend(label_chunk.values)
+
+    assert streamed_log == expected_log
+
+
+@pytest.mark.anyio
+async def test_stream_calculation_log_by_id_missing(admin_client_auth: AsyncClient):
+    resp = await admin_client_auth.get(CALCULATION_LOG_STREAM_URI.format(calculation_log_id=99))
+    assert resp.status_code == HTTPStatus.NOT_FOUND
@@ -28,6 +28,7 @@ from envoy_schema.admin.schema.uri import (
 from httpx import AsyncClient
 from sqlalchemy import func, select
 
+from envoy.admin.api.site_control import SITE_CONTROL_UPLOAD_URI
 from envoy.admin.crud.doe import count_all_does, count_all_site_control_groups
 from envoy.server.api.request import MAX_LIMIT
 from envoy.server.model.archive.doe import ArchiveDynamicOperatingEnvelope, ArchiveSiteControlGroup
@@ -228,6 +229,67 @@ async def test_create_site_controls_bad_group_id(admin_client_auth: AsyncClient)
     assert resp.status_code == HTTPStatus.BAD_REQUEST
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize("content_type", ["application/x-ndjson", "text/csv; charset=utf-8"])
+async def test_upload_site_controls(pg_base_config, admin_client_auth: AsyncClient, content_type: str):
+    control_1 = generate_class_instance(SiteControlRequest, seed=101, site_id=1, optional_is_none=True)
+    control_2 = generate_class_instance(SiteControlRequest, seed=202, site_id=2, optional_is_none=True)
+    if content_type.startswith("text/csv"):
+        rows = [f"{c.site_id},{c.start_time.isoformat()},{c.duration_seconds}" for c in [control_1, control_2]]
+        content = "\n".join(["site_id,start_time,duration_seconds"] + rows)
+    else:
+        content = f"{control_1.model_dump_json()}\n{control_2.model_dump_json()}\n"
+
+    async with generate_async_session(pg_base_config) as session:
+        initial_count = await count_all_does(session, 1, None)
+
+    resp = await admin_client_auth.post(
+        SITE_CONTROL_UPLOAD_URI.format(group_id=1), content=content, headers={"Content-Type": content_type}
+    )
+    assert resp.status_code == HTTPStatus.NO_CONTENT
+
+    async with generate_async_session(pg_base_config) as session:
+        assert (await count_all_does(session, 1, None)) == initial_count + 2
+        ids = (
+            (
+                await session.execute(
+                    select(DynamicOperatingEnvelope.dynamic_operating_envelope_id).order_by(
+                        DynamicOperatingEnvelope.dynamic_operating_envelope_id.desc()
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+        assert ids[:2] == [7, 6], "DB has counter set to start from 6 - so we know exactly what IDs to expect"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "group_id, content, content_type, expected_status",
+    [
+        (99, "", "application/x-ndjson", HTTPStatus.NOT_FOUND),
+        (1, "[]", "application/json", HTTPStatus.UNSUPPORTED_MEDIA_TYPE),
+        (1, '{"site_id": 1}', "application/x-ndjson", HTTPStatus.BAD_REQUEST),
+        (1, "site_id,start_time,duration_seconds\n999,2024-01-02T03:04:05Z,300", "text/csv", HTTPStatus.BAD_REQUEST),
+    ],
+)
+async def test_upload_site_controls_errors(
+    pg_base_config, admin_client_auth: AsyncClient, group_id: int, content: str, content_type: str, expected_status
+):
+    async with generate_async_session(pg_base_config) as session:
+        initial_count = (await session.execute(select(func.count()).select_from(DynamicOperatingEnvelope))).scalar_one()
+
+    resp = await admin_client_auth.post(
+        SITE_CONTROL_UPLOAD_URI.format(group_id=group_id), content=content, headers={"Content-Type": content_type}
+    )
+    assert resp.status_code == expected_status
+
+    async with generate_async_session(pg_base_config) as session:
+        after_count = (await session.execute(select(func.count()).select_from(DynamicOperatingEnvelope))).scalar_one()
+        assert after_count == initial_count, "Uploads are all or nothing"
+
+
 @pytest.mark.anyio
 async def test_supersede_site_control(pg_base_config, admin_client_auth: AsyncClient):
     """Checks that creating a new site control that overlaps at existing one (with priority) will mark the old
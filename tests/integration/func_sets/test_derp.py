@@ -805,3 +805,47 @@ async def test_large_power_value_fits_int16(
     assert actual_exp_watts == large_export_watts
     assert INT16_MIN <= large_control.DERControlBase_.opModExpLimW.value <= INT16_MAX
     assert INT16_MIN <= large_control.DERControlBase_.opModImpLimW.value <= INT16_MAX
+
+
+@pytest.mark.anyio
+@freeze_time("2010-01-01")  # This endpoint is sensitive to "now" and won't report on "old" DOEs
+async def test_get_dercontrol_list_conditional_get(
+    client: AsyncClient, pg_base_config, uri_derc_list_format, agg_1_headers
+):
+    """Tests that the DERControlList responds with 304 Not Modified when If-None-Match matches the current ETag and
+    that any change to the underlying DOEs will generate a new ETag"""
+
+    path = uri_derc_list_format.format(site_id=1, der_program_id=1) + build_paging_params(limit=99)
+    response = await client.get(path, headers=agg_1_headers)
+    assert_response_header(response, HTTPStatus.OK)
+    etag = response.headers["ETag"]
+    assert etag
+
+    # Repeated request with matching If-None-Match
+    response = await client.get(path, headers={**agg_1_headers, "If-None-Match": etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert len(response.content) == 0
+
+    # Non matching If-None-Match
+    response = await client.get(path, headers={**agg_1_headers, "If-None-Match": '"not-the-etag"'})
+    assert_response_header(response, HTTPStatus.OK)
+    assert response.headers["ETag"] == etag
+
+    # Different query params are a different representation
+    other_path = uri_derc_list_format.format(site_id=1, der_program_id=1) + build_paging_params(limit=1)
+    response = await client.get(other_path, headers={**agg_1_headers, "If-None-Match": etag})
+    assert_response_header(response, HTTPStatus.OK)
+    assert response.headers["ETag"] != etag
+
+    # Now update a DOE - the old ETag should no longer match
+    async with generate_async_session(pg_base_config) as session:
+        stmt = select(DynamicOperatingEnvelope).where(DynamicOperatingEnvelope.dynamic_operating_envelope_id == 1)
+        doe_to_edit = (await session.execute(stmt)).scalars().one()
+        doe_to_edit.export_limit_watts = Decimal("1.23")
+        doe_to_edit.changed_time = datetime(2025, 1, 1, tzinfo=UTC)
+        await session.commit()
+
+    response = await client.get(path, headers={**agg_1_headers, "If-None-Match": etag})
+    assert_response_header(response, HTTPStatus.OK)
+    assert response.headers["ETag"] != etag
@@ -7,10 +7,14 @@ from assertical.asserts.type import assert_list_type
 from assertical.fixtures.postgres import generate_async_session
 
 from envoy.admin.crud.billing import (
+    BILLING_EXPORT_COLUMNS,
     BillingData,
+    BillingExportSource,
     fetch_aggregator,
     fetch_calculation_log_billing_data,
     fetch_sites_billing_data,
+    fetch_tariff_components,
+    stream_aggregator_billing_rows,
 )
 from envoy.admin.crud.log import select_calculation_log_by_id
 from envoy.server.model.aggregator import Aggregator
@@ -360,3 +364,90 @@ async def test_fetch_aggregator(pg_base_config):
         assert agg_2.aggregator_id == 2
 
         assert (await fetch_aggregator(session, 99)) is None
+
+
+@pytest.mark.parametrize(
+    "aggregator_id, tariff_id, period_start, period_end, expected_by_source",
+    [
+        # Equivalent to fetch_sites_billing_data with site_ids [1, 2, 4] (all of aggregator 1's sites)
+        (
+            1,
+            1,
+            datetime(2023, 9, 11, tzinfo=aest),
+            datetime(2023, 9, 12, tzinfo=aest),
+            {
+                BillingExportSource.TARIFF_RATE: [14, 15],
+                BillingExportSource.DOE: [Decimal("3.11"), Decimal("4.11")],
+                BillingExportSource.WH_READING: [33, 44],
+                BillingExportSource.WATT_READING: [1111],
+                BillingExportSource.VARH_READING: [66],
+            },
+        ),
+        # Site 3 is the only billing site for aggregator 2
+        (
+            2,
+            1,
+            datetime(2023, 9, 10, tzinfo=aest),
+            datetime(2023, 9, 11, tzinfo=aest),
+            {
+                BillingExportSource.TARIFF_RATE: [17],
+                BillingExportSource.DOE: [Decimal("6.11")],
+                BillingExportSource.WH_READING: [88],
+            },
+        ),
+        (1, 2, datetime(2023, 9, 11, tzinfo=aest), datetime(2023, 9, 12, tzinfo=aest), None),  # Tariff mismatch
+        (1, 1, datetime(2023, 9, 9, tzinfo=aest), datetime(2023, 9, 10, tzinfo=aest), {}),  # Time mismatch
+        (99, 1, datetime(2023, 9, 11, tzinfo=aest), datetime(2023, 9, 12, tzinfo=aest), {}),  # Bad aggregator
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+@pytest.mark.anyio
+async def test_stream_aggregator_billing_rows(
+    pg_billing_data,
+    aggregator_id: int,
+    tariff_id: int,
+    period_start: datetime,
+    period_end: datetime,
+    expected_by_source: dict[BillingExportSource, list] | None,
+    chunk_size: int,
+):
+    """Streamed rows should be ordered/chunked correctly and contain the same data as fetch_sites_billing_data"""
+    async with generate_async_session(pg_billing_data) as session:
+        chunks = [
+            list(c)
+            async for c in stream_aggregator_billing_rows(
+                session, aggregator_id, tariff_id, period_start, period_end, chunk_size
+            )
+        ]
+
+    assert all(0 < len(c) <= chunk_size for c in chunks)
+    rows = [r._asdict() for c in chunks for r in c]
+    assert all(list(r.keys()) == BILLING_EXPORT_COLUMNS for r in rows)
+    assert all(period_start <= r["time_period_start"] < period_end for r in rows)
+
+    keys = [(r["site_id"], r["time_period_start"]) for r in rows]
+    assert keys == sorted(keys), "Rows should be merged in site_id, time_period_start order"
+
+    def source_values(source: BillingExportSource) -> list:
+        if source == BillingExportSource.TARIFF_RATE:
+            return [r["price_pow10_encoded"] for r in rows if r["source"] == source]
+        elif source == BillingExportSource.DOE:
+            return [r["import_limit_active_watts"] for r in rows if r["source"] == source]
+        else:
+            return [r["value"] for r in rows if r["source"] == source]
+
+    if expected_by_source is None:
+        # Only the rates should be missing
+        assert source_values(BillingExportSource.TARIFF_RATE) == []
+        assert len(source_values(BillingExportSource.DOE)) > 0
+    else:
+        for source in BillingExportSource:
+            assert source_values(source) == expected_by_source.get(source, []), source
+
+
+@pytest.mark.parametrize("tariff_id, expected_ids", [(1, [1, 2]), (2, [3, 4]), (99, [])])
+@pytest.mark.anyio
+async def test_fetch_tariff_components(pg_base_config, tariff_id: int, expected_ids: list[int]):
+    async with generate_async_session(pg_base_config) as session:
+        components = await fetch_tariff_components(session, tariff_id)
+        assert [c.tariff_component_id for c in components] == expected_ids
@@ -13,14 +13,19 @@ from assertical.fixtures.postgres import generate_async_session
 from sqlalchemy import func, select, update
 
 from envoy.admin.crud.doe import (
+    StagedSiteControl,
     cancel_then_insert_does,
+    cancel_then_insert_staged_does,
+    copy_site_controls_into_staging,
     count_all_does,
     count_all_site_control_groups,
     delete_does_with_start_time_in_range,
     select_all_does,
     select_all_site_control_groups,
+    supersede_matching_does,
     supersede_matching_does_for_site,
     supersede_then_insert_does,
+    supersede_then_insert_staged_does,
 )
 from envoy.server.model.archive.doe import ArchiveDynamicOperatingEnvelope
 from envoy.server.model.doe import DynamicOperatingEnvelope, SiteControlGroup
@@ -272,18 +277,120 @@ async def test_supersede_matching_does_for_site(
             assert doe.deleted_time is None, "Should be an update - not a delete"
 
 
-@mock.patch("envoy.admin.crud.doe.supersede_matching_does_for_site")
+def doe_fields(
+    start_time: datetime, end_time: datetime, site_id: int, scg_id: int = 1, **control_fields
+) -> DynamicOperatingEnvelope:
+    """Generates a doe with ONLY the specified control fields set (all others will be None)"""
+    all_control_fields = {
+        "import_limit_active_watts": None,
+        "export_limit_watts": None,
+        "generation_limit_active_watts": None,
+        "load_limit_active_watts": None,
+        "set_energized": None,
+        "set_connected": None,
+        "set_point_percentage": None,
+    }
+    all_control_fields.update(control_fields)
+    return generate_class_instance(
+        DynamicOperatingEnvelope,
+        dynamic_operating_envelope_id=None,
+        start_time=start_time,
+        end_time=end_time,
+        site_id=site_id,
+        site_control_group_id=scg_id,
+        **all_control_fields,
+    )
+
+
+EVERYTHING_START = datetime(2000, 1, 2, tzinfo=UTC)
+EVERYTHING_END = datetime(2025, 1, 2, tzinfo=UTC)
+
+
+@pytest.mark.parametrize(
+    "doe_list",
+    [
+        [],
+        [doe(datetime(1980, 1, 2, tzinfo=UTC), datetime(1999, 1, 2, tzinfo=UTC))],
+        [doe(EVERYTHING_START, EVERYTHING_END, site_id=site_id) for site_id in [1, 2, 3, 4]],
+        [doe(EVERYTHING_START, EVERYTHING_END, scg_id=scg_id, site_id=2) for scg_id in [1, 2, 3]],
+        [
+            doe(datetime(2022, 5, 7, 1, 2, 1, tzinfo=AEST), datetime(2022, 5, 7, 1, 2, 10, tzinfo=AEST)),
+            doe(EVERYTHING_START, EVERYTHING_END, site_id=2),
+            doe(EVERYTHING_START, EVERYTHING_END, site_id=3, scg_id=2),
+        ],
+        [
+            doe_fields(EVERYTHING_START, EVERYTHING_END, 1, import_limit_active_watts=Decimal("1.2")),
+            doe_fields(EVERYTHING_START, EVERYTHING_END, 2, set_connected=True),
+            doe_fields(EVERYTHING_START, EVERYTHING_END, 3, set_point_percentage=Decimal("50")),
+            doe_fields(EVERYTHING_START, EVERYTHING_END, 4),  # No control fields - nothing can conflict
+        ],
+        # Touching (but not overlapping) controls won't supersede
+        [
+            doe(
+                datetime(2022, 5, 7, 1, 2, 0, tzinfo=AEST) - timedelta(hours=1),
+                datetime(2022, 5, 7, 1, 2, 0, tzinfo=AEST),
+            )
+        ],
+    ],
+)
 @pytest.mark.anyio
-async def test_supersede_then_insert_does_many_sites(
-    mock_supersede_matching_does_for_site: mock.MagicMock, pg_base_config
-):
+async def test_supersede_matching_does_matches_per_site(pg_base_config, doe_list: list[DynamicOperatingEnvelope]):
+    """supersede_matching_does should be equivalent to running supersede_matching_does_for_site for each site"""
+    changed_time = datetime(2021, 11, 4, 2, 3, 4, tzinfo=UTC)
+
+    async def fetch_superseded(session) -> tuple[set[int], set[int]]:
+        superseded_ids = (
+            await session.execute(
+                select(DynamicOperatingEnvelope.dynamic_operating_envelope_id).where(
+                    DynamicOperatingEnvelope.superseded.is_(True)
+                    & (DynamicOperatingEnvelope.changed_time == changed_time)
+                )
+            )
+        ).scalars()
+        archived_ids = (
+            await session.execute(select(ArchiveDynamicOperatingEnvelope.dynamic_operating_envelope_id))
+        ).scalars()
+        return (set(superseded_ids), set(archived_ids))
+
+    # Run the per site implementation (rolling back afterwards)
+    async with generate_async_session(pg_base_config) as session:
+        all_site_control_group_ids = (
+            (await session.execute(select(SiteControlGroup.site_control_group_id))).scalars().all()
+        )
+        for site_id in set(d.site_id for d in doe_list):
+            await supersede_matching_does_for_site(
+                session,
+                [d for d in doe_list if d.site_id == site_id],
+                site_id,
+                all_site_control_group_ids,
+                changed_time,
+            )
+        expected_superseded, expected_archived = await fetch_superseded(session)
+        await session.rollback()
+
+    # Run the set based implementation
+    async with generate_async_session(pg_base_config) as session:
+        await supersede_matching_does(session, doe_list, changed_time)
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        actual_superseded, actual_archived = await fetch_superseded(session)
+
+    assert actual_superseded == expected_superseded
+    assert actual_archived == expected_archived
+    if len(doe_list) > 2:
+        assert len(actual_superseded) > 0, "Sanity check that we're testing something"
+
+
+@mock.patch("envoy.admin.crud.doe.supersede_matching_does")
+@pytest.mark.anyio
+async def test_supersede_then_insert_does_many_sites(mock_supersede_matching_does: mock.MagicMock, pg_base_config):
     async with generate_async_session(pg_base_config) as session:
         original_doe_count = (
             await session.execute(select(func.count()).select_from(DynamicOperatingEnvelope))
         ).scalar_one()
         await session.commit()
 
-    expected_site_control_group_ids = [1, 2, 3]
     changed_time = datetime(2021, 11, 4, 2, 3, 4, tzinfo=UTC)
     does = [
         generate_class_instance(
@@ -334,15 +441,8 @@ async def test_supersede_then_insert_does_many_sites(
 
         assert_list_type(int, returned_ids, count=len(does))
 
-        # Assert that each doe is grouped under the site and then processed in batches of that size
-        mock_supersede_matching_does_for_site.assert_has_calls(
-            [
-                mock.call(session, [does[0], does[1], does[3]], 1, expected_site_control_group_ids, changed_time),
-                mock.call(session, [does[2]], 2, expected_site_control_group_ids, changed_time),
-                mock.call(session, [does[4]], 3, expected_site_control_group_ids, changed_time),
-            ],
-            any_order=True,
-        )
+        # Assert that every site is superseded in a single pass
+        mock_supersede_matching_does.assert_called_once_with(session, does, changed_time)
 
     # check our records were inserted
     async with generate_async_session(pg_base_config) as session:
@@ -585,3 +685,100 @@ async def test_delete_does_with_start_time_in_range(
             )
         ).scalar_one()
         assert remaining_does_with_id == 0, "These IDs should've been deleted"
+
+
+def _staged(site_id: int, start_time: datetime, duration_seconds: int, import_watts: Decimal) -> StagedSiteControl:
+    return StagedSiteControl(
+        site_id=site_id,
+        calculation_log_id=None,
+        start_time=start_time,
+        duration_seconds=duration_seconds,
+        end_time=start_time + timedelta(seconds=duration_seconds),
+        randomize_start_seconds=None,
+        import_limit_active_watts=import_watts,
+        export_limit_watts=None,
+        generation_limit_active_watts=None,
+        load_limit_active_watts=None,
+        set_energized=None,
+        set_connected=None,
+        set_point_percentage=None,
+        ramp_time_seconds=None,
+        display_id=None,
+        storage_target_active_watts=None,
+    )
+
+
+async def _staged_controls():
+    # Matches DOE 1 on site/start time (and overlaps it) - the second is a brand new control for site 2
+    yield _staged(1, datetime(2022, 5, 7, 1, 2, tzinfo=AEST), 5, Decimal("9.87"))
+    yield _staged(2, datetime(2023, 1, 1, tzinfo=AEST), 60, Decimal("6.54"))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cancel_existing", [True, False])
+async def test_insert_staged_does(pg_base_config, cancel_existing: bool):
+    changed_time = datetime(2024, 2, 3, 4, 5, 6, tzinfo=UTC)
+    async with generate_async_session(pg_base_config) as session:
+        count_stmt = select(func.count()).select_from(DynamicOperatingEnvelope)
+        original_count = (await session.execute(count_stmt)).scalar_one()
+
+        await copy_site_controls_into_staging(session, _staged_controls())
+        if cancel_existing:
+            inserted = await cancel_then_insert_staged_does(session, 1, changed_time)
+        else:
+            inserted = await supersede_then_insert_staged_does(session, 1, changed_time)
+        await session.commit()
+        assert inserted == 2
+
+    async with generate_async_session(pg_base_config) as session:
+        new_does = (
+            (
+                await session.execute(
+                    select(DynamicOperatingEnvelope)
+                    .where(DynamicOperatingEnvelope.dynamic_operating_envelope_id > 5)
+                    .order_by(DynamicOperatingEnvelope.dynamic_operating_envelope_id)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        assert [(d.site_id, d.import_limit_active_watts) for d in new_does] == [
+            (1, Decimal("9.87")),
+            (2, Decimal("6.54")),
+        ]
+        assert all(d.site_control_group_id == 1 for d in new_does)
+        assert all(d.changed_time == changed_time for d in new_does)
+        assert all(not d.superseded for d in new_does)
+
+        doe_1 = (
+            await session.execute(
+                select(DynamicOperatingEnvelope).where(DynamicOperatingEnvelope.dynamic_operating_envelope_id == 1)
+            )
+        ).scalar_one_or_none()
+        archived_ids = (
+            (await session.execute(select(ArchiveDynamicOperatingEnvelope.dynamic_operating_envelope_id)))
+            .scalars()
+            .all()
+        )
+        after_count = (await session.execute(select(func.count()).select_from(DynamicOperatingEnvelope))).scalar_one()
+
+        if cancel_existing:
+            assert doe_1 is None, "Cancelled (deleted) as it matched on site/start time"
+            assert archived_ids == [1]
+            assert after_count == original_count + 1
+        else:
+            assert doe_1 is not None and doe_1.superseded, "Overlapped with a different import limit"
+            assert doe_1.changed_time == changed_time
+            assert archived_ids == [1], "The pre-superseded version is archived"
+            assert after_count == original_count + 2
+
+
+@pytest.mark.anyio
+async def test_copy_site_controls_into_staging_resets_per_transaction(pg_base_config):
+    """The staging table is emptied on commit - subsequent uploads shouldn't see old rows"""
+    async with generate_async_session(pg_base_config) as session:
+        await copy_site_controls_into_staging(session, _staged_controls())
+        await session.commit()
+
+        await copy_site_controls_into_staging(session, [])
+        assert (await supersede_then_insert_staged_does(session, 1, datetime(2024, 1, 1, tzinfo=UTC))) == 0
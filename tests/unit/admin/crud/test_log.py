@@ -1,3 +1,5 @@
+import logging
+import time
 from datetime import UTC, datetime
 from itertools import product
 from zoneinfo import ZoneInfo
@@ -6,20 +8,30 @@ import pytest
 from assertical.asserts.time import assert_datetime_equal
 from assertical.asserts.type import assert_iterable_type
 from assertical.fixtures.postgres import generate_async_session
+from sqlalchemy import text
 
 from envoy.admin.crud.log import (
+    compact_calculation_log_variable_values,
+    copy_calculation_log_label_values,
+    copy_calculation_log_variable_series,
+    copy_calculation_log_variable_values,
     count_calculation_logs_for_period,
     select_calculation_log_by_id,
     select_calculation_logs_for_period,
+    stream_label_values,
+    stream_variable_values,
 )
 from envoy.server.model.log import (
     CalculationLog,
     CalculationLogLabelMetadata,
     CalculationLogLabelValue,
     CalculationLogVariableMetadata,
+    CalculationLogVariableSeries,
     CalculationLogVariableValue,
 )
 
+logger = logging.getLogger(__name__)
+
 
 @pytest.mark.parametrize("id", [0, -1, 4])
 @pytest.mark.anyio
@@ -188,3 +200,216 @@ async def test_select_calculation_logs_for_period(
         assert all([len(log.label_metadata) == 0 for log in calc_logs])
 
         assert await count_calculation_logs_for_period(session, period_start, period_end) == expected_count
+
+
+@pytest.mark.anyio
+async def test_copy_calculation_log_values(pg_base_config):
+    """Calculation log 1 has no children - check values can be streamed in alongside it"""
+    async with generate_async_session(pg_base_config) as session:
+        await copy_calculation_log_variable_values(
+            session,
+            (
+                (1, variable_id, site_id, period, variable_id * 1.5)
+                for variable_id, site_id, period in product([1, 2], [0, 3], range(48))
+            ),
+        )
+        await copy_calculation_log_label_values(session, iter([(1, 1, 0, "label-1"), (1, 1, 3, "label-2")]))
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        calc_log_1 = await select_calculation_log_by_id(session, 1, True, True)
+        assert calc_log_1 is not None
+        assert len(calc_log_1.variable_values) == 2 * 2 * 48
+        assert [
+            (v.variable_id, v.site_id_snapshot, v.interval_period, v.value) for v in calc_log_1.variable_values[:2]
+        ] == [
+            (1, 0, 0, 1.5),
+            (1, 0, 1, 1.5),
+        ]
+        assert [(v.label_id, v.site_id_snapshot, v.label) for v in calc_log_1.label_values] == [
+            (1, 0, "label-1"),
+            (1, 3, "label-2"),
+        ]
+
+        # Calculation log 2 is unaffected
+        calc_log_2 = await select_calculation_log_by_id(session, 2, True, True)
+        assert calc_log_2 is not None
+        assert len(calc_log_2.variable_values) == 6
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk_size", [1, 4, 100])
+async def test_stream_values(pg_base_config, chunk_size: int):
+    """Streamed values (once reassembled) should match the values loaded via select_calculation_log_by_id"""
+    async with generate_async_session(pg_base_config) as session:
+        calc_log_2 = await select_calculation_log_by_id(session, 2, True, True)
+        assert calc_log_2 is not None
+        expected_vars = [
+            (v.variable_id, v.site_id_snapshot, v.interval_period, v.value) for v in calc_log_2.variable_values
+        ]
+        expected_labels = [(v.label_id, v.site_id_snapshot, v.label) for v in calc_log_2.label_values]
+
+    async with generate_async_session(pg_base_config) as session:
+        var_chunks = [list(c) async for c in stream_variable_values(session, 2, chunk_size)]
+        label_chunks = [list(c) async for c in stream_label_values(session, 2, chunk_size)]
+
+    assert all(0 < len(c) <= chunk_size for c in var_chunks)
+    assert all(0 < len(c) <= chunk_size for c in label_chunks)
+    assert [tuple(r) for c in var_chunks for r in c] == expected_vars
+    assert [tuple(r) for c in label_chunks for r in c] == expected_labels
+
+    async with generate_async_session(pg_base_config) as session:
+        assert [c async for c in stream_variable_values(session, 1, chunk_size)] == []
+        assert [c async for c in stream_label_values(session, 99, chunk_size)] == []
+
+
+@pytest.mark.anyio
+async def test_select_calculation_log_by_id_exclude_values(pg_base_config):
+    async with generate_async_session(pg_base_config) as session:
+        calc_log_2 = await select_calculation_log_by_id(session, 2, True, True, include_values=False)
+        assert calc_log_2 is not None
+        assert len(calc_log_2.variable_metadata) == 3
+        assert len(calc_log_2.label_metadata) == 2
+        assert calc_log_2.variable_values == []
+        assert calc_log_2.label_values == []
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+async def test_copy_and_stream_calculation_log_variable_series(pg_base_config, chunk_size: int):
+    """Calculation log 1 has no children - check series can be streamed in and are expanded (and merged with any
+    individual values) when streamed out"""
+    async with generate_async_session(pg_base_config) as session:
+        await copy_calculation_log_variable_series(
+            session,
+            iter(
+                [
+                    (1, 2, 0, [2.0, None, 2.2]),
+                    (1, 1, 3, [None, 1.1]),
+                    (1, 1, 0, [0.0]),
+                    (1, 3, 0, [None, None]),
+                ]
+            ),
+        )
+        await copy_calculation_log_variable_values(
+            session, iter([(1, 1, 2, 0, 1.2), (1, 2, 1, 4, 2.1), (1, 4, 0, 0, 4.0)])
+        )
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        calc_log_1 = await select_calculation_log_by_id(session, 1, True, True)
+        assert calc_log_1 is not None
+        assert len(calc_log_1.variable_values) == 3
+        assert_iterable_type(CalculationLogVariableSeries, calc_log_1.variable_series, count=4)
+        assert [(s.variable_id, s.site_id_snapshot, s.interval_values) for s in calc_log_1.variable_series] == [
+            (1, 0, [0.0]),
+            (1, 3, [None, 1.1]),
+            (2, 0, [2.0, None, 2.2]),
+            (3, 0, [None, None]),
+        ]
+
+        # Excluding values / variables should also exclude the series
+        calc_log_1 = await select_calculation_log_by_id(session, 1, True, True, include_values=False)
+        assert calc_log_1 is not None
+        assert calc_log_1.variable_series == []
+
+    async with generate_async_session(pg_base_config) as session:
+        var_chunks = [list(c) async for c in stream_variable_values(session, 1, chunk_size)]
+
+    assert all(0 < len(c) <= chunk_size for c in var_chunks)
+    # Individual values and expanded series are merged into a single ordering
+    assert [tuple(r) for c in var_chunks for r in c] == [
+        (1, 0, 0, 0.0),
+        (1, 2, 0, 1.2),
+        (1, 3, 1, 1.1),
+        (2, 0, 0, 2.0),
+        (2, 0, 2, 2.2),
+        (2, 1, 4, 2.1),
+        (4, 0, 0, 4.0),
+    ]
+
+
+@pytest.mark.anyio
+async def test_compact_calculation_log_variable_values(pg_base_config):
+    """Calculation log 1 has no children - check that only the dense variable_id / site_id combinations are moved
+    into series (padded with None) and everything else is left alone"""
+    async with generate_async_session(pg_base_config) as session:
+        await copy_calculation_log_variable_values(
+            session,
+            iter(
+                [
+                    (1, 1, 0, 0, 1.0),  # dense: 2 of 3 periods populated
+                    (1, 1, 0, 2, 1.2),
+                    (1, 1, 3, 0, 3.0),  # dense: single value at period 0
+                    (1, 2, 0, 100, 2.0),  # sparse: 1 of 101 periods populated
+                    (1, 3, 0, -1, -3.0),  # negative interval_period can't be an array index
+                    (1, 3, 0, 0, 3.3),
+                ]
+            ),
+        )
+        await compact_calculation_log_variable_values(session, 1, 0.25)
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        calc_log_1 = await select_calculation_log_by_id(session, 1, True, True)
+        assert calc_log_1 is not None
+        assert [(s.variable_id, s.site_id_snapshot, s.interval_values) for s in calc_log_1.variable_series] == [
+            (1, 0, [1.0, None, 1.2]),
+            (1, 3, [3.0]),
+        ]
+        assert [
+            (v.variable_id, v.site_id_snapshot, v.interval_period, v.value) for v in calc_log_1.variable_values
+        ] == [
+            (2, 0, 100, 2.0),
+            (3, 0, -1, -3.0),
+            (3, 0, 0, 3.3),
+        ]
+
+        # Calculation log 2 is unaffected
+        calc_log_2 = await select_calculation_log_by_id(session, 2, True, True)
+        assert calc_log_2 is not None
+        assert len(calc_log_2.variable_values) == 6
+        assert calc_log_2.variable_series == []
+
+
+@pytest.mark.anyio
+async def test_calculation_log_variable_series_storage_benchmark(pg_base_config):
+    """Writes the same values with each layout - compares throughput (logged only) and storage footprint"""
+    variable_ids = range(1, 11)
+    site_ids = range(1, 51)
+    interval_count = 288
+
+    async with generate_async_session(pg_base_config) as session:
+        start = time.perf_counter()
+        await copy_calculation_log_variable_values(
+            session,
+            (
+                (1, variable_id, site_id, period, variable_id + period / 1000)
+                for variable_id, site_id, period in product(variable_ids, site_ids, range(interval_count))
+            ),
+        )
+        await session.commit()
+        value_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await copy_calculation_log_variable_series(
+            session,
+            (
+                (2, variable_id, site_id, [variable_id + period / 1000 for period in range(interval_count)])
+                for variable_id, site_id in product(variable_ids, site_ids)
+            ),
+        )
+        await session.commit()
+        series_secs = time.perf_counter() - start
+
+        value_bytes = (
+            await session.execute(text("SELECT pg_total_relation_size('calculation_log_variable_value')"))
+        ).scalar_one()
+        series_bytes = (
+            await session.execute(text("SELECT pg_total_relation_size('calculation_log_variable_series')"))
+        ).scalar_one()
+
+    value_count = len(variable_ids) * len(site_ids) * interval_count
+    logger.info(f"{value_count} values as calculation_log_variable_value: {value_secs:.3f}s {value_bytes} bytes")
+    logger.info(f"{value_count} values as calculation_log_variable_series: {series_secs:.3f}s {series_bytes} bytes")
+    assert series_bytes * 2 < value_bytes
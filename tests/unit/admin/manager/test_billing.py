@@ -0,0 +1,367 @@
+import logging
+import random
+import time
+from bisect import bisect_right, insort
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from typing import Generic, TypeVar
+from zoneinfo import ZoneInfo
+
+import pytest
+from assertical.fixtures.postgres import generate_async_session
+from envoy_schema.server.schema.sep2.types import FlowDirectionType, UomType
+
+from envoy.admin.crud.billing import BillingData
+from envoy.admin.manager.billing import BillingCalculationManager, SiteBillingTotals, calculate_site_billing_totals
+from envoy.server.exception import NotFoundError
+from envoy.server.model.doe import DynamicOperatingEnvelope
+from envoy.server.model.site_reading import SiteReading, SiteReadingType
+from envoy.server.model.tariff import TariffComponent, TariffGeneratedRate
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+T0 = datetime(2023, 9, 11, tzinfo=UTC)
+PRICE_POW10 = -2
+
+IMPORT_COMPONENT_ID = 1
+EXPORT_COMPONENT_ID = 2
+VAR_COMPONENT_ID = 3
+COMPONENTS = [
+    TariffComponent(
+        tariff_component_id=IMPORT_COMPONENT_ID,
+        uom=UomType.REAL_ENERGY_WATT_HOURS,
+        flow_direction=FlowDirectionType.FORWARD,
+        power_of_ten_multiplier=3,
+    ),
+    TariffComponent(
+        tariff_component_id=EXPORT_COMPONENT_ID,
+        uom=UomType.REAL_ENERGY_WATT_HOURS,
+        flow_direction=FlowDirectionType.REVERSE,
+        power_of_ten_multiplier=3,
+    ),
+    TariffComponent(tariff_component_id=VAR_COMPONENT_ID, uom=UomType.REACTIVE_ENERGY_VARH, power_of_ten_multiplier=0),
+    TariffComponent(tariff_component_id=4, uom=UomType.REAL_POWER_WATT, power_of_ten_multiplier=0),  # Ignored
+]
+
+
+def reading_type(site_id: int, uom: UomType, flow: FlowDirectionType, pow10: int = 0) -> SiteReadingType:
+    return SiteReadingType(site_id=site_id, uom=uom, flow_direction=flow, power_of_ten_multiplier=pow10)
+
+
+def reading(srt: SiteReadingType, start: datetime, value: int, seconds: int = 300) -> SiteReading:
+    return SiteReading(site_reading_type=srt, time_period_start=start, time_period_seconds=seconds, value=value)
+
+
+def rate(site_id: int, component_id: int, start: datetime, seconds: int, price: int) -> TariffGeneratedRate:
+    return TariffGeneratedRate(
+        site_id=site_id,
+        tariff_component_id=component_id,
+        start_time=start,
+        duration_seconds=seconds,
+        end_time=start + timedelta(seconds=seconds),
+        price_pow10_encoded=price,
+    )
+
+
+def doe(
+    site_id: int, start: datetime, seconds: int, import_limit: Decimal | None, export_limit: Decimal | None
+) -> DynamicOperatingEnvelope:
+    return DynamicOperatingEnvelope(
+        site_id=site_id,
+        start_time=start,
+        duration_seconds=seconds,
+        end_time=start + timedelta(seconds=seconds),
+        import_limit_active_watts=import_limit,
+        export_limit_watts=export_limit,
+    )
+
+
+class IndexedPeriods(Generic[T]):
+    """Reference (one lookup at a time) index of rates / DOEs by (site_id, start). Each site's periods are kept sorted
+    by start so a lookup bisects to the last period starting at or before a time and then only scans back over the
+    periods that could still be active (started no earlier than the longest period)"""
+
+    def __init__(self) -> None:
+        self._by_site: dict[int, list[tuple[datetime, int, datetime, T]]] = {}
+        self._max_duration = timedelta(0)
+        self._count = 0
+
+    def add(self, site_id: int, start: datetime, end: datetime, value: T) -> None:
+        # Periods are ordered by (start, insertion order) - the index breaks ties in favour of the later period
+        insort(self._by_site.setdefault(site_id, []), (start, self._count, end, value), key=lambda p: (p[0], p[1]))
+        self._max_duration = max(self._max_duration, end - start)
+        self._count += 1
+
+    def find(self, site_id: int, time: datetime) -> T | None:
+        """Finds the value of the latest starting period (the last added for the same start) that contains time"""
+        periods = self._by_site.get(site_id, [])
+        i = bisect_right(periods, time, key=lambda p: p[0]) - 1
+        while i >= 0 and periods[i][0] > time - self._max_duration:
+            start, _, end, value = periods[i]
+            if start <= time < end:
+                return value
+            i -= 1
+        return None
+
+
+def reference_rate_key(component: TariffComponent) -> tuple[UomType | None, bool | None]:
+    """Rates are indexed by (uom, is_export) - is_export is None for varh (any flow direction)"""
+    if component.uom == UomType.REACTIVE_ENERGY_VARH:
+        return (component.uom, None)
+    return (component.uom, component.flow_direction == FlowDirectionType.REVERSE)
+
+
+def reference_rates(
+    billing_data: BillingData, components_by_id: dict[int, TariffComponent], price_pow10: int
+) -> dict[tuple[UomType | None, bool | None], IndexedPeriods[float]]:
+    """Indexes the (decoded) price per unit of every rate"""
+    rates: dict[tuple[UomType | None, bool | None], IndexedPeriods[float]] = {}
+    for r in billing_data.active_tariffs:
+        c = components_by_id[r.tariff_component_id]
+        price = r.price_pow10_encoded * 10.0 ** (price_pow10 - (c.power_of_ten_multiplier or 0))
+        rates.setdefault(reference_rate_key(c), IndexedPeriods()).add(r.site_id, r.start_time, r.end_time, price)
+    return rates
+
+
+def reference_does(billing_data: BillingData) -> IndexedPeriods[DynamicOperatingEnvelope]:
+    does: IndexedPeriods[DynamicOperatingEnvelope] = IndexedPeriods()
+    for d in billing_data.active_does:
+        does.add(d.site_id, d.start_time, d.end_time, d)
+    return does
+
+
+def reference_energy_intervals(billing_data: BillingData) -> list[tuple[int, datetime, int, float, bool]]:
+    """Returns (site_id, start, seconds, wh, is_export) for every energy interval. Wh readings take precedence over
+    watt readings for the same interval"""
+    energy: list[tuple[int, datetime, int, float, bool]] = []
+    wh_keys = set()
+    for r in billing_data.wh_readings:
+        srt = r.site_reading_type
+        is_export = srt.flow_direction == FlowDirectionType.REVERSE
+        wh_keys.add((srt.site_id, r.time_period_start, is_export))
+        wh = r.value * 10.0**srt.power_of_ten_multiplier
+        energy.append((srt.site_id, r.time_period_start, r.time_period_seconds, wh, is_export))
+    for r in billing_data.watt_readings:
+        srt = r.site_reading_type
+        is_export = srt.flow_direction == FlowDirectionType.REVERSE
+        if (srt.site_id, r.time_period_start, is_export) in wh_keys:
+            continue
+        wh = r.value * 10.0**srt.power_of_ten_multiplier * r.time_period_seconds / 3600
+        energy.append((srt.site_id, r.time_period_start, r.time_period_seconds, wh, is_export))
+    return energy
+
+
+def reference_site_billing_totals(
+    billing_data: BillingData, components: Sequence[TariffComponent], price_pow10: int
+) -> list[SiteBillingTotals]:
+    """Straightforward (one reading at a time) implementation of calculate_site_billing_totals. Rates / DOEs are
+    looked up via a (site_id, start) index rather than being scanned for every reading"""
+    components_by_id = {c.tariff_component_id: c for c in components}
+    rates = reference_rates(billing_data, components_by_id, price_pow10)
+    does = reference_does(billing_data)
+    no_rates: IndexedPeriods[float] = IndexedPeriods()
+    totals: dict[int, SiteBillingTotals] = {}
+
+    def site_totals(site_id: int) -> SiteBillingTotals:
+        if site_id not in totals:
+            totals[site_id] = SiteBillingTotals(site_id, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0, 0)
+        return totals[site_id]
+
+    for site_id, start, seconds, wh, is_export in reference_energy_intervals(billing_data):
+        t = site_totals(site_id)
+        price = rates.get((UomType.REAL_ENERGY_WATT_HOURS, is_export), no_rates).find(site_id, start)
+        cost = wh * (price or 0.0)
+        if is_export:
+            t.export_wh += wh
+            t.export_cost += cost
+        else:
+            t.import_wh += wh
+            t.import_cost += cost
+
+        d = does.find(site_id, start)
+        if d is not None:
+            t.doe_intervals += 1
+            limit = d.export_limit_watts if is_export else d.import_limit_active_watts
+            if limit is None or abs(wh) * 3600 / seconds <= abs(float(limit)):
+                t.doe_compliant_intervals += 1
+
+    for r in billing_data.varh_readings:
+        srt = r.site_reading_type
+        varh = abs(r.value * 10.0**srt.power_of_ten_multiplier)
+        t = site_totals(srt.site_id)
+        t.varh += varh
+        price = rates.get((UomType.REACTIVE_ENERGY_VARH, None), no_rates).find(srt.site_id, r.time_period_start)
+        t.var_cost += varh * (price or 0.0)
+
+    for e in billing_data.active_tariffs:
+        site_totals(e.site_id)
+    for e in billing_data.active_does:
+        site_totals(e.site_id)
+
+    return [totals[k] for k in sorted(totals.keys())]
+
+
+def assert_totals_equal(expected: list[SiteBillingTotals], actual: list[SiteBillingTotals]):
+    assert [t.site_id for t in actual] == [t.site_id for t in expected]
+    for e, a in zip(expected, actual, strict=True):
+        assert a.import_wh == pytest.approx(e.import_wh)
+        assert a.export_wh == pytest.approx(e.export_wh)
+        assert a.varh == pytest.approx(e.varh)
+        assert a.import_cost == pytest.approx(e.import_cost)
+        assert a.export_cost == pytest.approx(e.export_cost)
+        assert a.var_cost == pytest.approx(e.var_cost)
+        assert a.doe_intervals == e.doe_intervals
+        assert a.doe_compliant_intervals == e.doe_compliant_intervals
+
+
+def test_calculate_site_billing_totals():
+    wh_import = reading_type(1, UomType.REAL_ENERGY_WATT_HOURS, FlowDirectionType.FORWARD)
+    wh_export = reading_type(1, UomType.REAL_ENERGY_WATT_HOURS, FlowDirectionType.REVERSE)
+    w_import = reading_type(1, UomType.REAL_POWER_WATT, FlowDirectionType.FORWARD, pow10=3)
+    varh = reading_type(1, UomType.REACTIVE_ENERGY_VARH, FlowDirectionType.FORWARD, pow10=1)
+    m5 = timedelta(minutes=5)
+
+    billing_data = BillingData(
+        wh_readings=[reading(wh_import, T0, 1000), reading(wh_import, T0 + m5, 2000), reading(wh_export, T0, 500)],
+        watt_readings=[
+            reading(w_import, T0 + m5, 99),  # Ignored - there is a Wh reading for this interval
+            reading(w_import, T0 + 2 * m5, 12),  # 12kW for 5 minutes = 1000 Wh
+        ],
+        varh_readings=[reading(varh, T0, -4)],
+        active_tariffs=[
+            rate(1, IMPORT_COMPONENT_ID, T0, 600, 30),
+            rate(1, IMPORT_COMPONENT_ID, T0 + 2 * m5, 300, 50),
+            rate(1, EXPORT_COMPONENT_ID, T0, 900, 10),
+            rate(1, VAR_COMPONENT_ID, T0, 300, 2),
+            rate(1, 4, T0, 300, 999),
+        ],
+        active_does=[
+            doe(1, T0, 600, Decimal("15000"), Decimal("-10000")),
+            doe(2, T0, 600, Decimal("1"), None),
+        ],
+    )
+
+    totals = calculate_site_billing_totals(billing_data, COMPONENTS, PRICE_POW10)
+    assert_totals_equal(
+        [
+            SiteBillingTotals(
+                site_id=1,
+                import_wh=4000,
+                export_wh=500,
+                varh=40,
+                import_cost=1000 * 0.0003 + 2000 * 0.0003 + 1000 * 0.0005,
+                export_cost=500 * 0.0001,
+                var_cost=40 * 0.02,
+                doe_intervals=3,  # The 10 minute DOE covers the first two import intervals and the export interval
+                doe_compliant_intervals=2,  # 24kW import over the second interval exceeds the 15kW limit
+            ),
+            SiteBillingTotals(2, 0, 0, 0, 0, 0, 0, 0, 0),
+        ],
+        totals,
+    )
+    assert_totals_equal(reference_site_billing_totals(billing_data, COMPONENTS, PRICE_POW10), totals)
+
+
+def test_calculate_site_billing_totals_empty():
+    assert calculate_site_billing_totals(BillingData([], [], [], [], []), COMPONENTS, PRICE_POW10) == []
+
+
+def generate_fleet_billing_data(site_count: int, interval_count: int, seed: int) -> BillingData:
+    rng = random.Random(seed)  # noqa: S311
+    m5 = timedelta(minutes=5)
+    wh_readings: list[SiteReading] = []
+    watt_readings: list[SiteReading] = []
+    varh_readings: list[SiteReading] = []
+    active_tariffs: list[TariffGeneratedRate] = []
+    active_does: list[DynamicOperatingEnvelope] = []
+    for site_id in range(1, site_count + 1):
+        types = {
+            (uom, flow): reading_type(site_id, uom, flow, pow10=rng.randint(-1, 1))
+            for uom in [UomType.REAL_ENERGY_WATT_HOURS, UomType.REAL_POWER_WATT, UomType.REACTIVE_ENERGY_VARH]
+            for flow in [FlowDirectionType.FORWARD, FlowDirectionType.REVERSE]
+        }
+        for i in range(interval_count):
+            start = T0 + i * m5
+            for flow in [FlowDirectionType.FORWARD, FlowDirectionType.REVERSE]:
+                # Some Wh readings are missing - W readings will fill the gap
+                if rng.random() < 0.9:
+                    wh_readings.append(
+                        reading(types[(UomType.REAL_ENERGY_WATT_HOURS, flow)], start, rng.randint(0, 2000))
+                    )
+                watt_readings.append(reading(types[(UomType.REAL_POWER_WATT, flow)], start, rng.randint(0, 20000)))
+            varh_readings.append(
+                reading(types[(UomType.REACTIVE_ENERGY_VARH, FlowDirectionType.FORWARD)], start, rng.randint(-500, 500))
+            )
+            if rng.random() < 0.95:  # Some intervals are unpriced
+                active_tariffs.append(rate(site_id, IMPORT_COMPONENT_ID, start, 300, rng.randint(1, 50)))
+                active_tariffs.append(rate(site_id, EXPORT_COMPONENT_ID, start, 300, rng.randint(-5, 10)))
+                active_tariffs.append(rate(site_id, VAR_COMPONENT_ID, start, 300, rng.randint(0, 3)))
+            if rng.random() < 0.1:  # Overlapping rates - a longer (unaligned) rate and a rate with a duplicate start
+                active_tariffs.append(
+                    rate(site_id, IMPORT_COMPONENT_ID, start + timedelta(seconds=60), 1500, rng.randint(1, 50))
+                )
+                active_tariffs.append(rate(site_id, EXPORT_COMPONENT_ID, start, 600, rng.randint(-5, 10)))
+            if i % 12 == 0:
+                limit = Decimal(rng.randint(5000, 30000))
+                active_does.append(doe(site_id, start, 3600, limit, -limit))
+            elif i % 12 == 3:
+                # Overlaps the hourly DOE - once it ends, the hourly DOE applies again
+                limit = Decimal(rng.randint(5000, 30000))
+                active_does.append(doe(site_id, start, 600, limit, None))
+            elif rng.random() < 0.05:
+                active_does.append(doe(site_id, start, 7200, Decimal(rng.randint(5000, 30000)), None))
+    return BillingData(
+        varh_readings=varh_readings,
+        wh_readings=wh_readings,
+        watt_readings=watt_readings,
+        active_tariffs=active_tariffs,
+        active_does=active_does,
+    )
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_calculate_site_billing_totals_matches_reference(seed: int):
+    billing_data = generate_fleet_billing_data(site_count=5, interval_count=48, seed=seed)
+    assert_totals_equal(
+        reference_site_billing_totals(billing_data, COMPONENTS, PRICE_POW10),
+        calculate_site_billing_totals(billing_data, COMPONENTS, PRICE_POW10),
+    )
+
+
+def test_calculate_site_billing_totals_benchmark():
+    """Compares the vectorised calculation with the (indexed) reference loop over 8 hours of 5 minute data. Timings
+    are logged only - they are too machine dependent to assert on"""
+    billing_data = generate_fleet_billing_data(site_count=4, interval_count=96, seed=3)
+    reading_count = len(billing_data.wh_readings) + len(billing_data.watt_readings) + len(billing_data.varh_readings)
+
+    start = time.perf_counter()
+    expected = reference_site_billing_totals(billing_data, COMPONENTS, PRICE_POW10)
+    reference_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = calculate_site_billing_totals(billing_data, COMPONENTS, PRICE_POW10)
+    vectorised_secs = time.perf_counter() - start
+
+    logger.info(f"{reading_count} readings. reference: {reference_secs:.3f}s vectorised: {vectorised_secs:.3f}s")
+    assert_totals_equal(expected, actual)
+
+
+@pytest.mark.anyio
+async def test_calculate_sites_billing(pg_billing_data):
+    aest = ZoneInfo("Australia/Brisbane")
+    async with generate_async_session(pg_billing_data) as session:
+        totals = await BillingCalculationManager.calculate_sites_billing(
+            session, [1, 2, 4], 1, datetime(2023, 9, 11, tzinfo=aest), datetime(2023, 9, 12, tzinfo=aest)
+        )
+        assert [t.site_id for t in totals] == [1]
+        assert all(isinstance(t, SiteBillingTotals) for t in totals)
+        assert totals[0].import_wh > 0
+        assert totals[0].varh > 0
+
+        with pytest.raises(NotFoundError):
+            await BillingCalculationManager.calculate_sites_billing(
+                session, [1, 2, 4], 99, datetime(2023, 9, 11, tzinfo=aest), datetime(2023, 9, 12, tzinfo=aest)
+            )
@@ -0,0 +1,132 @@
+from datetime import UTC, datetime
+
+import pytest
+from assertical.fake.generator import generate_class_instance
+from assertical.fixtures.postgres import generate_async_session
+from envoy_schema.admin.schema.log import (
+    CalculationLogLabelValues,
+    CalculationLogRequest,
+    CalculationLogVariableMetadata,
+    CalculationLogVariableValues,
+)
+
+from envoy.admin.manager.log import CalculationLogManager, parse_calculation_log_upload
+from envoy.server.exception import BadRequestError
+
+
+async def _chunked(data: bytes, chunk_size: int):
+    for i in range(0, len(data), chunk_size):
+        yield data[i : i + chunk_size]
+
+
+def _upload_body(
+    calculation_log: CalculationLogRequest,
+    variable_chunks: list[CalculationLogVariableValues],
+    label_chunks: list[CalculationLogLabelValues],
+) -> bytes:
+    lines = [calculation_log.model_dump_json()]
+    lines.extend('{"variable_values":' + c.model_dump_json() + "}" for c in variable_chunks)
+    lines.extend('{"label_values":' + c.model_dump_json() + "}" for c in label_chunks)
+    return ("\n".join(lines) + "\n").encode()
+
+
+VARIABLE_CHUNKS = [
+    CalculationLogVariableValues(
+        variable_ids=[1, 1, 1], site_ids=[None, None, None], interval_periods=[0, 1, 3], values=[1.0, 1.1, 1.3]
+    ),
+    CalculationLogVariableValues(variable_ids=[2, 3], site_ids=[4, None], interval_periods=[0, 500], values=[2.0, 3.5]),
+]
+LABEL_CHUNKS = [
+    CalculationLogLabelValues(label_ids=[1], site_ids=[None], values=["label-1"]),
+    CalculationLogLabelValues(label_ids=[2, 2], site_ids=[1, 2], values=["label-2-1", "label-2-2"]),
+]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+async def test_parse_calculation_log_upload(chunk_size: int):
+    calc_log = generate_class_instance(CalculationLogRequest, optional_is_none=True)
+    calc_log.variable_values = None
+    calc_log.label_values = None
+    body = _upload_body(calc_log, VARIABLE_CHUNKS, LABEL_CHUNKS)
+
+    actual = [c async for c in parse_calculation_log_upload(_chunked(body, chunk_size))]
+    assert actual == [calc_log, *VARIABLE_CHUNKS, *LABEL_CHUNKS]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "body, expected_line",
+    [
+        (b'{"external_id": "abc"}', "Line 1"),
+        (
+            generate_class_instance(CalculationLogRequest).model_dump_json().encode() + b"\n\nnot json",
+            "Line 3",
+        ),
+        (generate_class_instance(CalculationLogRequest).model_dump_json().encode() + b"\n[1, 2]", "Line 2"),
+        (generate_class_instance(CalculationLogRequest).model_dump_json().encode() + b'\n{"other": {}}', "Line 2"),
+        (
+            generate_class_instance(CalculationLogRequest).model_dump_json().encode()
+            + b'\n{"variable_values": {"variable_ids": [1]}}',
+            "Line 2",
+        ),
+        (b"\xff\xfe", "UTF-8"),
+    ],
+)
+async def test_parse_calculation_log_upload_invalid(body: bytes, expected_line: str):
+    with pytest.raises(BadRequestError) as exc_info:
+        [c async for c in parse_calculation_log_upload(_chunked(body, 3))]
+    assert expected_line in exc_info.value.message
+
+
+@pytest.mark.anyio
+async def test_save_calculation_log_upload_empty(pg_base_config):
+    async with generate_async_session(pg_base_config) as session:
+        with pytest.raises(BadRequestError):
+            await CalculationLogManager.save_calculation_log_upload(session, _chunked(b"\n\n", 3))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("compact_variable_values", [True, False])
+async def test_save_calculation_log_upload(pg_base_config, compact_variable_values: bool):
+    """An uploaded log should read back identically to the same log saved via save_calculation_log (regardless of
+    how its values are stored)"""
+    calc_log = generate_class_instance(CalculationLogRequest, optional_is_none=True)
+    calc_log.calculation_range_start = datetime(2024, 5, 6, 7, 8, 9, tzinfo=UTC)
+    calc_log.variable_metadata = [generate_class_instance(CalculationLogVariableMetadata)]
+    calc_log.label_metadata = []
+    calc_log.variable_values = CalculationLogVariableValues(
+        variable_ids=[1], site_ids=[None], interval_periods=[2], values=[1.2]
+    )
+    calc_log.label_values = None
+    body = _upload_body(calc_log, VARIABLE_CHUNKS, LABEL_CHUNKS)
+
+    expected_log = calc_log.model_copy(deep=True)
+    expected_log.variable_values = CalculationLogVariableValues(
+        variable_ids=[1, 1, 1, 1, 2, 3],
+        site_ids=[None, None, None, None, 4, None],
+        interval_periods=[0, 1, 2, 3, 0, 500],
+        values=[1.0, 1.1, 1.2, 1.3, 2.0, 3.5],
+    )
+    expected_log.label_values = CalculationLogLabelValues(
+        label_ids=[1, 2, 2], site_ids=[None, 1, 2], values=["label-1", "label-2-1", "label-2-2"]
+    )
+
+    async with generate_async_session(pg_base_config) as session:
+        uploaded_id = await CalculationLogManager.save_calculation_log_upload(
+            session, _chunked(body, 13), compact_variable_values=compact_variable_values
+        )
+        expected_id = await CalculationLogManager.save_calculation_log(
+            session, expected_log, compact_variable_values=compact_variable_values
+        )
+
+    async with generate_async_session(pg_base_config) as session:
+        uploaded = await CalculationLogManager.get_calculation_log_by_id(session, uploaded_id, True, True)
+        expected = await CalculationLogManager.get_calculation_log_by_id(session, expected_id, True, True)
+
+    assert uploaded is not None and expected is not None
+    assert uploaded.variable_values == expected_log.variable_values
+    assert uploaded.label_values == expected_log.label_values
+    assert uploaded.model_dump(exclude={"calculation_log_id", "created_time"}) == expected.model_dump(
+        exclude={"calculation_log_id", "created_time"}
+    )
@@ -1,14 +1,28 @@
 import unittest.mock as mock
+from datetime import UTC, datetime
 from decimal import Decimal
 
 import pytest
+from assertical.fake.asyncio import create_async_result
+from assertical.fake.generator import generate_class_instance
+from assertical.fake.sqlalchemy import assert_mock_session, create_mock_session
 from assertical.fixtures.postgres import generate_async_session
-from envoy_schema.admin.schema.site_control import SiteControlGroupDefaultRequest, UpdateDefaultValue
+from envoy_schema.admin.schema.site_control import (
+    SiteControlGroupDefaultRequest,
+    SiteControlRequest,
+    UpdateDefaultValue,
+)
 from sqlalchemy import func, select
 
-from envoy.admin.manager.site_control import SiteControlGroupManager
+from envoy.admin.manager.site_control import (
+    SiteControlGroupManager,
+    SiteControlListManager,
+    SiteControlUploadFormat,
+    parse_site_control_upload,
+)
+from envoy.server.exception import BadRequestError, NotFoundError
 from envoy.server.model.archive.doe import ArchiveSiteControlGroupDefault
-from envoy.server.model.doe import SiteControlGroupDefault
+from envoy.server.model.doe import SiteControlGroup, SiteControlGroupDefault
 
 
 @pytest.mark.parametrize(
@@ -104,3 +118,122 @@ async def test_update_site_control_default_all_vals_update(
             ).scalar_one() == 1, "Old values should've been archived"
 
     mock_notify_changed_deleted_entities.assert_called_once()
+
+
+async def _chunked(data: bytes, chunk_size: int):
+    for i in range(0, len(data), chunk_size):
+        yield data[i : i + chunk_size]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+@pytest.mark.parametrize("upload_format", list(SiteControlUploadFormat))
+async def test_parse_site_control_upload(upload_format: SiteControlUploadFormat, chunk_size: int):
+    controls = [
+        SiteControlRequest(
+            site_id=1,
+            start_time=datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC),
+            duration_seconds=300,
+            calculation_log_id=None,
+            import_limit_watts=Decimal("1.5"),
+            export_limit_watts=None,
+        ),
+        SiteControlRequest(
+            site_id=2,
+            start_time=datetime(2024, 1, 2, 3, 9, 5, tzinfo=UTC),
+            duration_seconds=600,
+            calculation_log_id=3,
+            import_limit_watts=None,
+            export_limit_watts=Decimal("-2"),
+            set_energized=False,
+        ),
+    ]
+
+    if upload_format == SiteControlUploadFormat.NDJSON:
+        body = "\n".join(c.model_dump_json() for c in controls) + "\n\n"
+    else:
+        body = (
+            "site_id,start_time,duration_seconds,calculation_log_id,import_limit_watts,export_limit_watts,set_energized"
+            "\r\n1,2024-01-02T03:04:05Z,300,,1.5,,\r\n2,2024-01-02T03:09:05Z,600,3,,-2,false"
+        )
+
+    actual = [c async for c in parse_site_control_upload(upload_format, _chunked(body.encode(), chunk_size))]
+    assert actual == controls
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "upload_format, body, expected_line",
+    [
+        (SiteControlUploadFormat.NDJSON, b'{"site_id": 1}', "Line 1"),
+        (SiteControlUploadFormat.NDJSON, b"\n\nnot json", "Line 3"),
+        (SiteControlUploadFormat.CSV, b"site_id,start_time,duration_seconds\n1,2024-01-02T03:04:05Z", "Line 2"),
+        (SiteControlUploadFormat.CSV, b"site_id,start_time,duration_seconds\n1,abc,300", "Line 2"),
+        (SiteControlUploadFormat.NDJSON, b"\xff\xfe", "UTF-8"),
+    ],
+)
+async def test_parse_site_control_upload_invalid(upload_format: SiteControlUploadFormat, body: bytes, expected_line):
+    with pytest.raises(BadRequestError) as exc_info:
+        [c async for c in parse_site_control_upload(upload_format, _chunked(body, 3))]
+    assert expected_line in exc_info.value.message
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cancel_existing, inserted_count", [(True, 2), (False, 3), (False, 0)])
+@mock.patch("envoy.admin.manager.site_control.select_site_control_group_by_id")
+@mock.patch("envoy.admin.manager.site_control.copy_site_controls_into_staging")
+@mock.patch("envoy.admin.manager.site_control.cancel_then_insert_staged_does")
+@mock.patch("envoy.admin.manager.site_control.supersede_then_insert_staged_does")
+@mock.patch("envoy.admin.manager.site_control.NotificationManager")
+async def test_upload_site_controls(
+    mock_NotificationManager: mock.MagicMock,
+    mock_supersede_then_insert_staged_does: mock.MagicMock,
+    mock_cancel_then_insert_staged_does: mock.MagicMock,
+    mock_copy_site_controls_into_staging: mock.MagicMock,
+    mock_select_site_control_group_by_id: mock.MagicMock,
+    cancel_existing: bool,
+    inserted_count: int,
+):
+    mock_session = create_mock_session()
+    mock_select_site_control_group_by_id.return_value = generate_class_instance(SiteControlGroup)
+    mock_cancel_then_insert_staged_does.return_value = inserted_count
+    mock_supersede_then_insert_staged_does.return_value = inserted_count
+    mock_NotificationManager.notify_changed_deleted_entities = mock.Mock(return_value=create_async_result(True))
+
+    result = await SiteControlListManager.upload_site_controls(
+        mock_session, 11, SiteControlUploadFormat.NDJSON, _chunked(b"", 1), cancel_existing
+    )
+
+    assert result == inserted_count
+    mock_select_site_control_group_by_id.assert_called_once_with(mock_session, 11)
+    mock_copy_site_controls_into_staging.assert_called_once()
+    if cancel_existing:
+        mock_cancel_then_insert_staged_does.assert_called_once()
+        mock_supersede_then_insert_staged_does.assert_not_called()
+    else:
+        mock_supersede_then_insert_staged_does.assert_called_once()
+        mock_cancel_then_insert_staged_does.assert_not_called()
+    assert_mock_session(mock_session, committed=True)
+
+    if inserted_count:
+        mock_NotificationManager.notify_changed_deleted_entities.assert_called_once()
+    else:
+        mock_NotificationManager.notify_changed_deleted_entities.assert_not_called()
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.admin.manager.site_control.select_site_control_group_by_id")
+@mock.patch("envoy.admin.manager.site_control.copy_site_controls_into_staging")
+async def test_upload_site_controls_missing_group(
+    mock_copy_site_controls_into_staging: mock.MagicMock, mock_select_site_control_group_by_id: mock.MagicMock
+):
+    mock_session = create_mock_session()
+    mock_select_site_control_group_by_id.return_value = None
+
+    with pytest.raises(NotFoundError):
+        await SiteControlListManager.upload_site_controls(
+            mock_session, 11, SiteControlUploadFormat.CSV, _chunked(b"", 1), False
+        )
+
+    mock_copy_site_controls_into_staging.assert_not_called()
+    assert_mock_session(mock_session, committed=False)
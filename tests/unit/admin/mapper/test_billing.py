@@ -0,0 +1,52 @@
+import csv
+import json
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from envoy.admin.crud.billing import BILLING_EXPORT_COLUMNS, BillingExportSource
+from envoy.admin.mapper.billing import BillingExportMapper
+
+ROWS = [
+    (1, datetime(2023, 9, 11, 1, 2, tzinfo=UTC), 300, BillingExportSource.TARIFF_RATE.value, 2, 14, None, None)
+    + (None,) * 6,
+    (1, datetime(2023, 9, 11, 1, 2, tzinfo=UTC), 300, BillingExportSource.DOE.value)
+    + (None,) * 4
+    + (Decimal("3.11"), Decimal("-3.22"))
+    + (None,) * 4,
+    (2, datetime(2023, 9, 11, 1, 7, tzinfo=UTC), 300, BillingExportSource.WH_READING.value)
+    + (None,) * 6
+    + (1006, 1, -3, 33),
+]
+
+
+def test_map_to_csv_lines():
+    text = BillingExportMapper.map_to_csv_header() + BillingExportMapper.map_to_csv_lines(ROWS)
+    assert text.endswith("\n")
+
+    parsed = list(csv.reader(text.splitlines()))
+    assert parsed[0] == BILLING_EXPORT_COLUMNS
+    assert len(parsed) == len(ROWS) + 1
+    assert parsed[1][:6] == ["1", "2023-09-11T01:02:00+00:00", "300", "tariff_rate", "2", "14"]
+    assert parsed[1][6:] == [""] * 8, "None should be an empty cell"
+    assert parsed[2][8:10] == ["3.11", "-3.22"]
+    assert parsed[3][10:] == ["1006", "1", "-3", "33"]
+
+    assert BillingExportMapper.map_to_csv_lines([]) == ""
+
+
+def test_map_to_ndjson_lines():
+    text = BillingExportMapper.map_to_ndjson_lines(ROWS)
+    assert text.endswith("\n")
+
+    parsed = [json.loads(line) for line in text.splitlines()]
+    assert len(parsed) == len(ROWS)
+    assert all(list(p.keys()) == BILLING_EXPORT_COLUMNS for p in parsed)
+    assert parsed[0]["time_period_start"] == "2023-09-11T01:02:00+00:00"
+    assert parsed[0]["price_pow10_encoded"] == 14
+    assert parsed[0]["value"] is None
+    assert parsed[1]["import_limit_active_watts"] == "3.11"
+    assert parsed[1]["export_limit_watts"] == "-3.22"
+    assert parsed[2]["source"] == "wh_reading"
+    assert parsed[2]["value"] == 33
+
+    assert BillingExportMapper.map_to_ndjson_lines([]) == ""
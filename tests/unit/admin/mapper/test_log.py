@@ -14,6 +14,7 @@ from envoy.server.model.log import (
     CalculationLogLabelMetadata,
     CalculationLogLabelValue,
     CalculationLogVariableMetadata,
+    CalculationLogVariableSeries,
     CalculationLogVariableValue,
 )
 
@@ -90,7 +91,9 @@ def test_log_mapper_roundtrip(optional_as_none: bool):
     intermediate_model = CalculationLogMapper.map_to_response(original)
     assert isinstance(intermediate_model, CalculationLogResponse)
 
-    actual = CalculationLogMapper.map_from_request(changed_time, intermediate_model)
+    # The generated log has values stored both individually and as a series - so the request must be mapped back
+    # using the same (compact) encoding for the storage to roundtrip
+    actual = CalculationLogMapper.map_from_request(changed_time, intermediate_model, compact_variable_values=True)
     assert isinstance(actual, CalculationLog)
 
     # Assert top level object
@@ -116,6 +119,17 @@ def test_log_mapper_roundtrip(optional_as_none: bool):
             ignored_properties=set(["calculation_log_id"]),
         )
 
+    # Assert Variable Series (series without any values can't survive the roundtrip)
+    original_series = [s for s in original.variable_series if any(v is not None for v in s.interval_values)]
+    assert len(actual.variable_series) == len(original_series)
+    for actual_series, original_series_item in zip(actual.variable_series, original_series, strict=False):
+        assert_class_instance_equality(
+            CalculationLogVariableSeries,
+            original_series_item,
+            actual_series,
+            ignored_properties=set(["calculation_log_id"]),
+        )
+
     # Assert Label Metadata
     assert len(actual.label_metadata) == len(original.label_metadata)
     for actual_md, original_md in zip(actual.label_metadata, original.label_metadata, strict=False):
@@ -132,3 +146,144 @@ def test_log_mapper_roundtrip(optional_as_none: bool):
             actual_val,
             ignored_properties=set(["calculation_log_id"]),
         )
+
+
+def test_map_to_value_records():
+    var_vals = PublicVariableValues(variable_ids=[1, 2], site_ids=[None, 3], interval_periods=[4, 5], values=[6.6, 7.7])
+    label_vals = PublicLabelValues(label_ids=[3, 4], site_ids=[None, 5], values=["aa", "bb"])
+
+    assert list(CalculationLogMapper.map_to_variable_value_records(11, var_vals)) == [
+        (11, 1, 0, 4, 6.6),
+        (11, 2, 3, 5, 7.7),
+    ]
+    assert list(CalculationLogMapper.map_to_label_value_records(11, label_vals)) == [(11, 3, 0, "aa"), (11, 4, 5, "bb")]
+    assert list(CalculationLogMapper.map_to_variable_value_records(11, None)) == []
+    assert list(CalculationLogMapper.map_to_label_value_records(11, None)) == []
+
+
+def test_map_from_request_without_values():
+    request: CalculationLogRequest = generate_class_instance(CalculationLogRequest, seed=1001)
+    request.variable_values = PublicVariableValues(
+        variable_ids=[1, 2], site_ids=[None, 3], interval_periods=[4, 5], values=[6.6, 7.7]
+    )
+    request.label_values = PublicLabelValues(label_ids=[3, 4], site_ids=[None, 5], values=["aa", "bb"])
+
+    changed_time = datetime(2022, 3, 4, 5, 6, 7)
+    log = CalculationLogMapper.map_from_request_without_values(changed_time, request)
+    full_log = CalculationLogMapper.map_from_request(changed_time, request)
+
+    assert log.variable_values == []
+    assert log.label_values == []
+    assert len(full_log.variable_values) == 2
+    assert len(full_log.label_values) == 2
+    assert_class_instance_equality(
+        CalculationLog, full_log, log, ignored_properties={"variable_values", "label_values"}
+    )
+
+
+def test_map_to_values_chunk():
+    var_chunk = CalculationLogMapper.map_to_variable_values_chunk([(1, 0, 4, 6.6), (2, 3, 5, 7.7)])
+    assert var_chunk == PublicVariableValues(
+        variable_ids=[1, 2], site_ids=[None, 3], interval_periods=[4, 5], values=[6.6, 7.7]
+    )
+
+    label_chunk = CalculationLogMapper.map_to_label_values_chunk([(3, 0, "aa"), (4, 5, "bb")])
+    assert label_chunk == PublicLabelValues(label_ids=[3, 4], site_ids=[None, 5], values=["aa", "bb"])
+
+    assert CalculationLogMapper.map_to_variable_values_chunk([]).values == []
+    assert CalculationLogMapper.map_to_label_values_chunk([]).values == []
+
+
+def test_map_to_variable_series_roundtrip():
+    var_vals = PublicVariableValues(
+        variable_ids=[2, 1, 2, 1, 1, 3, 3],
+        site_ids=[None, 3, None, 3, None, 4, 4],
+        interval_periods=[2, 1, 0, 4, 0, 1000000, 9],
+        values=[2.2, 1.1, 2.0, 4.4, 0.0, 3.3, 3.0],
+    )
+
+    series, sparse_values = CalculationLogMapper.map_to_variable_series(var_vals)
+    assert series == [
+        (1, 0, [0.0]),
+        (1, 3, [None, 1.1, None, None, 4.4]),
+        (2, 0, [2.0, None, 2.2]),
+    ]
+    assert list(CalculationLogMapper.expand_variable_series(series)) == [
+        (1, 0, 0, 0.0),
+        (1, 3, 1, 1.1),
+        (1, 3, 4, 4.4),
+        (2, 0, 0, 2.0),
+        (2, 0, 2, 2.2),
+    ]
+
+    # Variable 3 is far too sparse to be padded into a series - it should fall back to individual values
+    assert sparse_values == [(3, 4, 9, 3.0), (3, 4, 1000000, 3.3)]
+
+    assert CalculationLogMapper.map_to_variable_series(None) == ([], [])
+
+
+@pytest.mark.parametrize(
+    "interval_periods, expected_series_count",
+    [
+        ([0, 1, 2, 3], 1),
+        ([0, 3], 1),  # 50% populated
+        ([4, 7], 1),  # 25% populated
+        ([4, 8], 0),  # < 25% populated
+        ([99], 0),
+    ],
+)
+def test_map_to_variable_series_density(interval_periods: list[int], expected_series_count: int):
+    """Only variable_id / site_id combinations with sufficiently populated interval_values become a series"""
+    var_vals = PublicVariableValues(
+        variable_ids=[1] * len(interval_periods),
+        site_ids=[None] * len(interval_periods),
+        interval_periods=interval_periods,
+        values=[float(p) for p in interval_periods],
+    )
+
+    series, sparse_values = CalculationLogMapper.map_to_variable_series(var_vals)
+    assert len(series) == expected_series_count
+    if expected_series_count:
+        assert sparse_values == []
+        assert list(CalculationLogMapper.expand_variable_series(series)) == [
+            (1, 0, p, float(p)) for p in interval_periods
+        ]
+    else:
+        assert sparse_values == [(1, 0, p, float(p)) for p in interval_periods]
+
+
+@pytest.mark.parametrize(
+    "interval_periods",
+    [
+        [0, -1],  # Negative
+        [1, 1],  # Duplicate
+    ],
+)
+def test_map_to_variable_series_invalid(interval_periods: list[int]):
+    var_vals = PublicVariableValues(
+        variable_ids=[1, 1], site_ids=[None, None], interval_periods=interval_periods, values=[1.1, 2.2]
+    )
+    with pytest.raises(ValueError):
+        CalculationLogMapper.map_to_variable_series(var_vals)
+
+
+def test_map_to_response_expands_variable_series():
+    """Series values should be transparently expanded (and merged in order with any individually stored values)"""
+    log: CalculationLog = generate_class_instance(CalculationLog, seed=1001)
+    log.variable_values = [
+        CalculationLogVariableValue(variable_id=1, site_id_snapshot=5, interval_period=1, value=1.5),
+        CalculationLogVariableValue(variable_id=3, site_id_snapshot=0, interval_period=0, value=3.0),
+    ]
+    log.variable_series = [
+        CalculationLogVariableSeries(variable_id=1, site_id_snapshot=0, interval_values=[None, 1.1, 1.2]),
+        CalculationLogVariableSeries(variable_id=2, site_id_snapshot=5, interval_values=[2.5]),
+    ]
+    log.label_values = []
+
+    response: CalculationLogResponse = CalculationLogMapper.map_to_response(log)
+    assert response.variable_values == PublicVariableValues(
+        variable_ids=[1, 1, 1, 2, 3],
+        site_ids=[None, None, 5, 5, None],
+        interval_periods=[1, 2, 1, 0, 0],
+        values=[1.1, 1.2, 1.5, 2.5, 3.0],
+    )
@@ -124,3 +124,15 @@ def test_site_control_mapper_to_paged_response():
     assert page_response.limit == limit
     assert page_response.start == start
     assert page_response.total_count == total_count
+
+
+@pytest.mark.parametrize("optional_is_none", [True, False])
+def test_site_control_mapper_to_staged(optional_is_none: bool):
+    req = generate_class_instance(SiteControlRequest, optional_is_none=optional_is_none)
+
+    staged = SiteControlListMapper.map_to_staged(req)
+    mdl = SiteControlListMapper.map_from_request(121, datetime(2021, 5, 6, 7, 8, 9), [req])[0]
+
+    # Staged rows should have identical values to the "regular" mapping (for the fields they share)
+    for field_name, value in staged._asdict().items():
+        assert value == getattr(mdl, field_name), field_name
@@ -10,10 +10,11 @@ from assertical.fake.generator import generate_class_instance
 from assertical.fixtures.postgres import generate_async_session
 from envoy_schema.server.schema.sep2.pub_sub import ConditionAttributeIdentifier
 from envoy_schema.server.schema.sep2.types import QualityFlagsType
-from sqlalchemy import select
+from sqlalchemy import insert, select
 
 from envoy.notification.crud.batch import (
     AggregatorBatchedEntities,
+    expand_subscribed_aggregator_site_ids,
     fetch_default_site_controls_by_changed_at,
     fetch_der_availability_by_changed_at,
     fetch_der_rating_by_changed_at,
@@ -30,6 +31,9 @@ from envoy.notification.crud.batch import (
     get_batch_key,
     get_site_id,
     get_subscription_filter_id,
+    select_subscribed_aggregator_site_ids,
+    select_subscription_ids_deleted_after,
+    select_subscriptions_changed_after,
     select_subscriptions_for_resource,
 )
 from envoy.notification.crud.common import (
@@ -64,6 +68,7 @@ from envoy.server.model.archive.site import (
     ArchiveSiteDERStatus,
 )
 from envoy.server.model.archive.site_reading import ArchiveSiteReading, ArchiveSiteReadingType
+from envoy.server.model.archive.subscription import ArchiveSubscription
 from envoy.server.model.archive.tariff import ArchiveTariff, ArchiveTariffComponent, ArchiveTariffGeneratedRate
 from envoy.server.model.base import Base
 from envoy.server.model.doe import DynamicOperatingEnvelope, SiteControlGroupDefault
@@ -186,6 +191,22 @@ def test_get_batch_key_invalid():
         get_batch_key(9999, generate_class_instance(Site))  # ty:ignore[invalid-argument-type]
 
 
+async def add_aggregator_wide_subscriptions(session, resource: SubscriptionResource, aggregator_ids: list[int]):
+    """Adds an aggregator wide (no scoped site) subscription to resource for each of aggregator_ids"""
+    for agg_id in aggregator_ids:
+        await session.execute(
+            insert(Subscription).values(
+                aggregator_id=agg_id,
+                changed_time=datetime(2024, 1, 1, tzinfo=UTC),
+                resource_type=resource,
+                resource_id=None,
+                scoped_site_id=None,
+                notification_uri="https://example.com/notify",
+                entity_limit=10,
+            )
+        )
+
+
 @pytest.mark.parametrize(
     "resource, entity, expected",
     [
@@ -547,6 +568,131 @@ async def test_select_subscriptions_for_resource_conditions(
             )
 
 
+@pytest.mark.parametrize(
+    "changed_after, expected_sub_ids",
+    [
+        (None, [1, 2, 3, 4, 5]),
+        (datetime(2024, 1, 2, 12, 50, tzinfo=UTC), [3, 4, 5]),
+        (datetime(2024, 1, 2, 13, 22, 33, 500000, tzinfo=UTC), [3, 4, 5]),  # Inclusive
+        (datetime(2024, 1, 3, tzinfo=UTC), []),
+    ],
+)
+@pytest.mark.anyio
+async def test_select_subscriptions_changed_after(
+    pg_base_config, changed_after: datetime | None, expected_sub_ids: list[int]
+):
+    async with generate_async_session(pg_base_config) as session:
+        actual_entities = await select_subscriptions_changed_after(session, changed_after)
+        assert sorted([e.subscription_id for e in actual_entities]) == expected_sub_ids
+
+        # conditions should be loaded
+        for e in actual_entities:
+            assert len(e.conditions) == (2 if e.subscription_id == 5 else 0)
+
+
+@pytest.mark.anyio
+async def test_select_subscription_ids_deleted_after(pg_base_config):
+    async with generate_async_session(pg_base_config) as session:
+        assert await select_subscription_ids_deleted_after(session, datetime(2000, 1, 1, tzinfo=UTC)) == []
+
+        for sub_id, deleted_time in [
+            (2, datetime(2024, 5, 1, tzinfo=UTC)),
+            (2, datetime(2024, 6, 1, tzinfo=UTC)),  # Duplicate deletes shouldn't duplicate results
+            (3, datetime(2024, 7, 1, tzinfo=UTC)),
+            (4, None),  # Not a deletion - just a copy of an updated subscription
+        ]:
+            session.add(
+                generate_class_instance(
+                    ArchiveSubscription, seed=sub_id, subscription_id=sub_id, deleted_time=deleted_time, archive_id=None
+                )
+            )
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        assert sorted(await select_subscription_ids_deleted_after(session, datetime(2024, 1, 1, tzinfo=UTC))) == [2, 3]
+        assert await select_subscription_ids_deleted_after(session, datetime(2024, 6, 2, tzinfo=UTC)) == [3]
+        assert await select_subscription_ids_deleted_after(session, datetime(2024, 7, 2, tzinfo=UTC)) == []
+
+
+@pytest.mark.parametrize(
+    "resource,expected_agg_site_ids",
+    [
+        (SubscriptionResource.SITE, [(1, None), (1, 4)]),  # sub 1 is agg wide, sub 4 overlaps with it
+        (SubscriptionResource.DYNAMIC_OPERATING_ENVELOPE, [(1, 2)]),
+        (SubscriptionResource.TARIFF_GENERATED_RATE, [(2, 3)]),
+        (SubscriptionResource.READING, [(1, None)]),
+        (SubscriptionResource.TARIFF, []),
+    ],
+)
+@pytest.mark.anyio
+async def test_select_subscribed_aggregator_site_ids(
+    pg_base_config, resource: SubscriptionResource, expected_agg_site_ids: list[tuple[int, int | None]]
+):
+    """Tests that aggregator wide subscriptions are returned as a single "all sites" marker rather than being expanded
+    (and that results are deduplicated/ordered)"""
+    async with generate_async_session(pg_base_config) as session:
+        actual = await select_subscribed_aggregator_site_ids(session, resource)
+        assert [(agg_id, site_id) for agg_id, site_id in actual] == expected_agg_site_ids
+
+
+@pytest.mark.parametrize(
+    "subscribed_agg_site_ids,expected_agg_site_ids",
+    [
+        ([], []),
+        ([(1, None)], [(1, 1), (1, 2), (1, 4)]),
+        ([(1, None), (1, 4)], [(1, 1), (1, 2), (1, 4)]),  # Site 4 is already covered by the "all sites" marker
+        ([(1, 2), (2, None)], [(1, 2), (2, 3)]),
+        ([(2, 1), (1, 4)], [(1, 4)]),  # Site 1 doesn't belong to aggregator 2
+        ([(99, None), (1, 99)], []),
+    ],
+)
+@pytest.mark.anyio
+async def test_expand_subscribed_aggregator_site_ids(
+    pg_base_config,
+    subscribed_agg_site_ids: list[tuple[int, int | None]],
+    expected_agg_site_ids: list[tuple[int, int]],
+):
+    """Tests that "all sites" markers are expanded into the sites of that aggregator"""
+    async with generate_async_session(pg_base_config) as session:
+        actual = await expand_subscribed_aggregator_site_ids(session, subscribed_agg_site_ids)
+        assert actual == expected_agg_site_ids
+
+
+@pytest.mark.anyio
+async def test_select_subscribed_aggregator_site_ids_mixed_scopes(pg_base_config):
+    """Tests a mix of site scoped and aggregator wide subscriptions only expand to the relevant sites"""
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.TARIFF, [2])
+
+        # Site scoped subscription for site 4
+        await session.execute(
+            insert(Subscription).values(
+                aggregator_id=1,
+                changed_time=datetime(2024, 1, 1, tzinfo=UTC),
+                resource_type=SubscriptionResource.TARIFF,
+                resource_id=None,
+                scoped_site_id=4,
+                notification_uri="https://example.com/notify",
+                entity_limit=10,
+            )
+        )
+
+        # This is for a different resource type and won't contribute
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.TARIFF_COMPONENT, [0, 1])
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        subscribed = await select_subscribed_aggregator_site_ids(session, SubscriptionResource.TARIFF)
+        assert [(agg_id, site_id) for agg_id, site_id in subscribed] == [(1, 4), (2, None)]
+
+        actual = await expand_subscribed_aggregator_site_ids(session, subscribed)
+        assert actual == [(2, 3), (1, 4)]
+
+        # Sanity check the expansion flows through to the site scoped entities
+        batch = await fetch_tariffs_by_changed_at(session, datetime(2023, 1, 2, 11, 1, 2, tzinfo=UTC))
+        assert set(batch.models_by_batch_key.keys()) == {(2, 3), (1, 4)}
+
+
 @pytest.mark.parametrize(
     "timestamp,expected_sites",
     [
@@ -2326,6 +2472,11 @@ async def test_fetch_default_site_controls_by_changed_at(
     """Tests that entities are filtered/returned correctly
 
     expected_agg_site_scg_ids should be a tuple of [agg_id, site_id, site_control_group_id]"""
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.DEFAULT_SITE_CONTROL, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Need to unroll the batching into a single list (batching is tested elsewhere)
         batch = await fetch_default_site_controls_by_changed_at(session, timestamp)
@@ -2361,6 +2512,11 @@ async def test_fetch_default_site_controls_by_timestamp_with_archive(pg_base_con
     expected_deleted_default_ids = [(0, 5, 21), (0, 6, 21), (1, 1, 21), (1, 2, 21), (1, 4, 21), (2, 3, 21)]
 
     # inject a bunch of archival data
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.DEFAULT_SITE_CONTROL, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Inject archive defaults (only most recent is used)
         session.add(
@@ -2471,7 +2627,11 @@ async def test_fetch_fsa_by_changed_at(pg_base_config):
         assert len(empty_batch.models_by_batch_key) == 0
         assert len(empty_batch.deleted_by_batch_key) == 0
 
-    # One for every site in the DB
+    # One for every site in the DB (each aggregator has a subscription)
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.FUNCTION_SET_ASSIGNMENTS, [0, 1, 2])
+        await session.commit()
+
     expected_agg_site_poll_rate = [
         (1, 1, 300),
         (1, 2, 300),
@@ -2516,6 +2676,11 @@ async def test_fetch_site_control_groups_by_changed_at(
     """Tests that entities are filtered/returned correctly and expand per site.
 
     expected_agg_site_group_ids: tuple of aggregator_id, site_id, site_control_group_id"""
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.SITE_CONTROL_GROUP, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Need to unroll the batching into a single list (batching is tested elsewhere)
         batch = await fetch_site_control_groups_by_changed_at(session, timestamp)
@@ -2547,6 +2712,11 @@ async def test_fetch_site_control_groups_by_timestamp_with_archive(pg_base_confi
     expected_site_agg_ids = [(1, 1), (1, 2), (2, 3), (1, 4), (0, 5), (0, 6)]
 
     # inject a bunch of archival data
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.SITE_CONTROL_GROUP, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Inject archive defaults (only most recent is used)
         session.add(
@@ -2702,6 +2872,11 @@ async def test_fetch_tariffs_by_changed_at(
     """Tests that entities are filtered/returned correctly and expand per site.
 
     expected_agg_site_tariff_ids: tuple of aggregator_id, site_id, tariff_id"""
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.TARIFF, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Need to unroll the batching into a single list (batching is tested elsewhere)
         batch = await fetch_tariffs_by_changed_at(session, timestamp)
@@ -2731,6 +2906,11 @@ async def test_fetch_tariff_by_timestamp_with_archive(pg_base_config):
     expected_site_agg_ids = [(1, 1), (1, 2), (2, 3), (1, 4), (0, 5), (0, 6)]
 
     # inject a bunch of archival data
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.TARIFF, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Inject archive defaults (only most recent is used)
         session.add(
@@ -2860,6 +3040,11 @@ async def test_fetch_tariff_components_by_changed_at(
     """Tests that entities are filtered/returned correctly and expand per site.
 
     expected_agg_site_component_ids: tuple of aggregator_id, site_id, tariff_component_id"""
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.TARIFF_COMPONENT, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Need to unroll the batching into a single list (batching is tested elsewhere)
         batch = await fetch_tariff_components_by_changed_at(session, timestamp)
@@ -2891,6 +3076,11 @@ async def test_fetch_tariff_component_by_timestamp_with_archive(pg_base_config):
     expected_site_agg_ids = [(1, 1), (1, 2), (2, 3), (1, 4), (0, 5), (0, 6)]
 
     # inject a bunch of archival data
+    # Every site will have a subscription via their aggregator
+    async with generate_async_session(pg_base_config) as session:
+        await add_aggregator_wide_subscriptions(session, SubscriptionResource.TARIFF_COMPONENT, [0, 1, 2])
+        await session.commit()
+
     async with generate_async_session(pg_base_config) as session:
         # Inject archive defaults (only most recent is used)
         session.add(
@@ -1,3 +1,4 @@
+import asyncio
 import unittest.mock as mock
 from datetime import UTC, datetime
 from typing import cast
@@ -23,6 +24,7 @@ from envoy.notification.crud.common import (
     TResourceModel,
 )
 from envoy.notification.exception import NotificationError
+from envoy.notification.subscription_index import SubscriptionIndex
 from envoy.notification.task.check import (
     NON_LIST_RESOURCES,
     NotificationEntities,
@@ -33,6 +35,7 @@ from envoy.notification.task.check import (
     entities_to_notification,
     fetch_batched_entities,
     get_entity_pages,
+    handle_batch,
     scope_for_subscription,
 )
 from envoy.server.crud.site import VIRTUAL_END_DEVICE_SITE_ID
@@ -828,6 +831,8 @@ async def test_check_db_change_or_delete(
         href_prefix=href_prefix,
         resource=resource,
         timestamp_epoch=timestamp.timestamp(),
+        enqueue_concurrency=3,
+        subscription_index=None,
     )
 
     #
@@ -900,6 +905,143 @@ async def test_check_db_change_or_delete(
     assert len(set([c for c in all_ids])) == len(all_ids), "All notification_id should be unique"
 
 
+@pytest.mark.anyio
+@mock.patch("envoy.notification.task.check.transmit_notification")
+@mock.patch("envoy.notification.task.check.select_subscriptions_for_resource")
+@mock.patch("envoy.notification.task.check.RuntimeServerConfigManager.fetch_current_config")
+async def test_handle_batch_subscription_index(
+    mock_fetch_current_config: mock.MagicMock,
+    mock_select_subscriptions_for_resource: mock.MagicMock,
+    mock_transmit_notification: mock.MagicMock,
+):
+    """Matching via a SubscriptionIndex should generate the same notifications as the (unindexed) linear scan"""
+    configure_mock_task(mock_transmit_notification)
+    mock_fetch_current_config.return_value = generate_class_instance(RuntimeServerConfig)
+    resource = SubscriptionResource.DYNAMIC_OPERATING_ENVELOPE
+    timestamp = datetime(2023, 2, 3, 4, 5, 6, tzinfo=UTC)
+
+    entities: list[DynamicOperatingEnvelope] = []
+    for seed, (site_id, group_id) in enumerate([(1, 1), (1, 2), (2, 1), (2, 2), (3, 1)], start=1):
+        doe: DynamicOperatingEnvelope = generate_class_instance(
+            DynamicOperatingEnvelope,
+            seed=seed * 101,
+            site_id=site_id,
+            site_control_group_id=group_id,
+            generate_relationships=True,
+        )
+        doe.site.site_id = site_id
+        doe.site.aggregator_id = 1
+        entities.append(doe)
+    batch = AggregatorBatchedEntities(timestamp, resource, entities, [])
+
+    subs: list[Subscription] = [
+        generate_class_instance(
+            Subscription,
+            seed=i,
+            subscription_id=i,
+            aggregator_id=1,
+            resource_type=resource,
+            scoped_site_id=site_id,
+            resource_id=group_id,
+            resource_parent_id=None,
+            entity_limit=2,
+            notification_uri=f"http://sub{i}/",
+            conditions=[],
+        )
+        for i, (site_id, group_id) in enumerate([(None, None), (1, None), (None, 2), (2, 1), (4, None)], start=1)
+    ]
+    mock_select_subscriptions_for_resource.return_value = subs
+
+    async def transmitted_notifications(subscription_index: SubscriptionIndex | None) -> list[tuple[str, str]]:
+        mock_transmit_notification.reset_mock()
+        configure_mock_task(mock_transmit_notification)
+        await handle_batch(create_mock_session(), batch, None, create_mock_broker(), 5, subscription_index)
+        kiq_args = get_mock_task_kicker_call_args(mock_transmit_notification)
+        return sorted((a.kwargs["remote_uri"], a.kwargs["content"]) for a in kiq_args)
+
+    expected = await transmitted_notifications(None)
+    assert len(expected) > 0, "Sanity check that we're testing something"
+
+    index = SubscriptionIndex()
+    with mock.patch.object(index, "refresh") as mock_refresh:
+        index._rebuild({sub.subscription_id: sub for sub in subs})
+        mock_select_subscriptions_for_resource.reset_mock()
+
+        actual = await transmitted_notifications(index)
+        mock_refresh.assert_called_once()
+        mock_select_subscriptions_for_resource.assert_not_called()
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize("enqueue_concurrency, expected_max_in_flight", [(1, 1), (3, 3), (0, 1), (100, 10)])
+@pytest.mark.anyio
+@mock.patch("envoy.notification.task.check.transmit_notification")
+@mock.patch("envoy.notification.task.check.select_subscriptions_for_resource")
+@mock.patch("envoy.notification.task.check.RuntimeServerConfigManager.fetch_current_config")
+async def test_handle_batch_bounded_enqueue(
+    mock_fetch_current_config: mock.MagicMock,
+    mock_select_subscriptions_for_resource: mock.MagicMock,
+    mock_transmit_notification: mock.MagicMock,
+    enqueue_concurrency: int,
+    expected_max_in_flight: int,
+):
+    """Checks that publishing to the broker is concurrent (but bounded) and that a failed publish doesn't stop
+    the remaining notifications from being enqueued"""
+    configure_mock_task(mock_transmit_notification)
+    in_flight = 0
+    max_in_flight = 0
+    published_uris: list[str] = []
+
+    # Every publish is held open until expected_max_in_flight publishes are simultaneously in flight. This ensures
+    # the peak concurrency is reached deterministically (rather than relying on publishes being "slow enough")
+    publish_gate = asyncio.Event()
+
+    async def kiq_side_effect(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        if in_flight == expected_max_in_flight:
+            publish_gate.set()
+        await publish_gate.wait()
+        in_flight -= 1
+        if kwargs["remote_uri"] == "http://fail/":
+            raise Exception("Mock publish failure")
+        published_uris.append(kwargs["remote_uri"])
+
+    mock_transmit_notification.kicker.return_value.kiq.side_effect = kiq_side_effect
+
+    mock_session = create_mock_session()
+    mock_broker = create_mock_broker()
+    resource = SubscriptionResource.SITE
+    timestamp = datetime(2023, 2, 3, 4, 5, 6, tzinfo=UTC)
+    batch = AggregatorBatchedEntities(timestamp, resource, [], [])
+
+    subs: list[Subscription] = [
+        generate_class_instance(
+            Subscription,
+            seed=i,
+            resource_type=resource,
+            notification_uri=f"http://sub{i}/" if i != 4 else "http://fail/",
+        )
+        for i in range(10)
+    ]
+    mock_select_subscriptions_for_resource.return_value = subs
+    mock_fetch_current_config.return_value = generate_class_instance(RuntimeServerConfig)
+
+    # No entities - just list level notifications (one per subscription)
+    list_batch = ((1,), 1, [], NotificationType.ENTITY_CHANGED)
+    with mock.patch("envoy.notification.task.check.all_entity_batches", return_value=[list_batch]):
+        # The timeout is only a safety net - if concurrency is bounded too low the gate never opens
+        await asyncio.wait_for(handle_batch(mock_session, batch, None, mock_broker, enqueue_concurrency), timeout=10)
+
+    assert_task_kicked_n_times(mock_transmit_notification, len(subs))
+    assert max_in_flight == expected_max_in_flight
+    assert in_flight == 0
+    assert published_uris == [s.notification_uri for s in subs if s.notification_uri != "http://fail/"]
+    assert_mock_session(mock_session, committed=False)
+
+
 @pytest.mark.anyio
 @mock.patch("envoy.notification.task.check.transmit_notification")
 @mock.patch("envoy.notification.task.check.entities_serviced_by_subscription")
@@ -962,6 +1104,8 @@ async def test_check_db_change_or_delete_rates(
         href_prefix=href_prefix,
         resource=resource,
         timestamp_epoch=timestamp.timestamp(),
+        enqueue_concurrency=3,
+        subscription_index=None,
     )
 
     #
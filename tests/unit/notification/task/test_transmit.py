@@ -18,6 +18,7 @@ from envoy.notification.task.transmit import (
     HEADER_SUBSCRIPTION_ID,
     TransmitResult,
     attempt_to_retry_delay,
+    create_transmit_client,
     create_transmit_notification_log,
     do_transmit_notification,
     safely_log_transmit_result,
@@ -226,6 +227,46 @@ async def test_do_transmit_notification_tls_verify(
     mock_AsyncClient.assert_called_once_with(timeout=mock.ANY, verify=expected_verify)
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize("disable_tls_verify, http2", [(False, False), (True, False), (False, True)])
+@mock.patch("envoy.notification.task.transmit.AsyncClient")
+async def test_create_transmit_client(mock_AsyncClient: mock.MagicMock, disable_tls_verify: bool, http2: bool):
+    """Tests that the connection pool settings are correctly passed through to AsyncClient"""
+    client = create_transmit_client(
+        disable_tls_verify=disable_tls_verify,
+        max_connections=11,
+        max_keepalive_connections=22,
+        keepalive_expiry_seconds=33.5,
+        http2=http2,
+    )
+
+    assert client is mock_AsyncClient.return_value
+    mock_AsyncClient.assert_called_once_with(
+        timeout=mock.ANY, verify=not disable_tls_verify, limits=mock.ANY, http2=http2
+    )
+    limits = mock_AsyncClient.call_args.kwargs["limits"]
+    assert limits.max_connections == 11
+    assert limits.max_keepalive_connections == 22
+    assert limits.keepalive_expiry == 33.5
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.notification.task.transmit.AsyncClient")
+async def test_do_transmit_notification_shared_client(mock_AsyncClient: mock.MagicMock):
+    """Tests that a supplied client is reused (and not closed) instead of creating a new client per notification"""
+    remote_uri = "http://foo.bar/example"
+    shared_client = MockedAsyncClient(Response(status_code=HTTPStatus.OK, content="Mock response content"))
+
+    for attempt in range(3):
+        transmit_result = await do_transmit_notification(
+            remote_uri, "content", "/sub/1", str(uuid4()), attempt, client=shared_client
+        )
+        assert transmit_result.success
+
+    mock_AsyncClient.assert_not_called()
+    assert shared_client.call_count_by_method_uri[(HTTPMethod.POST, remote_uri)] == 3
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "response_code",
@@ -412,6 +453,7 @@ async def test_transmit_notification_no_retry(
         broker,
         session,
         disable_tls_verify=False,
+        http_client=None,
     )
 
     mock_safely_log_transmit_result.assert_called_once()
@@ -422,6 +464,7 @@ async def test_transmit_notification_no_retry(
         notification_id,
         attempt,
         disable_tls_verify=False,
+        client=None,
     )
     mock_schedule_retry_transmission.assert_not_called()
     assert_mock_session(session)
@@ -462,6 +505,7 @@ async def test_transmit_notification_with_retry(
         broker,
         session,
         disable_tls_verify=False,
+        http_client=None,
     )
 
     mock_safely_log_transmit_result.assert_called_once()
@@ -472,6 +516,7 @@ async def test_transmit_notification_with_retry(
         notification_id,
         attempt,
         disable_tls_verify=False,
+        client=None,
     )
     mock_schedule_retry_transmission.assert_called_once_with(
         broker, remote_uri, content, subscription_href, subscription_id, notification_id, attempt
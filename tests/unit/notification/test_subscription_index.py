@@ -0,0 +1,193 @@
+import unittest.mock as mock
+from datetime import UTC, datetime, timedelta
+from itertools import product
+
+import pytest
+from assertical.fake.generator import generate_class_instance
+from assertical.fake.sqlalchemy import create_mock_session
+from envoy_schema.server.schema.sep2.pub_sub import ConditionAttributeIdentifier
+
+from envoy.notification.subscription_index import SubscriptionIndex, subscription_conditions_matched
+from envoy.notification.task.check import entities_serviced_by_subscription
+from envoy.server.model.doe import DynamicOperatingEnvelope
+from envoy.server.model.site import Site
+from envoy.server.model.site_reading import SiteReading, SiteReadingType
+from envoy.server.model.subscription import Subscription, SubscriptionCondition, SubscriptionResource
+
+
+def sub(
+    subscription_id: int,
+    aggregator_id: int,
+    resource: SubscriptionResource,
+    scoped_site_id: int | None = None,
+    resource_id: int | None = None,
+    conditions: list[SubscriptionCondition] | None = None,
+) -> Subscription:
+    return Subscription(
+        subscription_id=subscription_id,
+        aggregator_id=aggregator_id,
+        resource_type=resource,
+        scoped_site_id=scoped_site_id,
+        resource_id=resource_id,
+        conditions=conditions or [],
+    )
+
+
+@pytest.mark.parametrize(
+    "conditions, resource, value, expected",
+    [
+        ([], SubscriptionResource.READING, 5, True),
+        ([(None, 10)], SubscriptionResource.READING, 5, False),
+        ([(None, 10)], SubscriptionResource.READING, 15, True),
+        ([(0, 10)], SubscriptionResource.READING, 5, False),
+        ([(0, 10)], SubscriptionResource.READING, 11, True),
+        ([(0, 10), (20, None)], SubscriptionResource.READING, 15, True),
+        ([(0, 10), (20, None)], SubscriptionResource.READING, 25, False),
+        ([(0, 10)], SubscriptionResource.SITE, 5, True),  # Conditions only apply to readings
+    ],
+)
+def test_subscription_conditions_matched(
+    conditions: list[tuple[int | None, int | None]], resource: SubscriptionResource, value: int, expected: bool
+):
+    s = sub(
+        1,
+        1,
+        resource,
+        conditions=[
+            SubscriptionCondition(
+                attribute=ConditionAttributeIdentifier.READING_VALUE, lower_threshold=lower, upper_threshold=upper
+            )
+            for lower, upper in conditions
+        ],
+    )
+    assert subscription_conditions_matched(s, resource, SiteReading(value=value)) is expected
+
+
+def test_entities_by_subscription_matches_linear_scan():
+    """The indexed lookup should return exactly the same matches as checking every subscription against every
+    entity (for every combination of site / resource scoping)"""
+    resource = SubscriptionResource.DYNAMIC_OPERATING_ENVELOPE
+    subs = [
+        sub(sub_id, agg_id, r, site_id, resource_id)
+        for sub_id, (agg_id, r, site_id, resource_id) in enumerate(
+            product(
+                [1, 2],
+                [resource, SubscriptionResource.SITE],
+                [None, 11, 12],
+                [None, 101, 102],
+            ),
+            start=1,
+        )
+    ]
+    entities = [
+        generate_class_instance(DynamicOperatingEnvelope, seed=seed, site_id=site_id, site_control_group_id=group_id)
+        for seed, (site_id, group_id) in enumerate(product([11, 12, 13], [101, 102, 103]))
+    ]
+
+    index = SubscriptionIndex()
+    index._rebuild({s.subscription_id: s for s in subs})
+
+    for agg_id in [1, 2, 3]:
+        expected = []
+        for s in sorted(subs, key=lambda s: s.subscription_id):
+            if s.aggregator_id != agg_id:
+                continue
+            matched = list(entities_serviced_by_subscription(s, resource, entities))
+            if matched:
+                expected.append((s, matched))
+
+        actual = index.entities_by_subscription(agg_id, resource, entities)
+        assert [(s.subscription_id, e) for s, e in actual] == [(s.subscription_id, e) for s, e in expected]
+        if agg_id != 3:
+            assert len(actual) > 0, "Sanity check that we're testing something"
+
+        assert index.subscriptions_for_resource(agg_id, resource) == [
+            s for s in subs if s.aggregator_id == agg_id and s.resource_type == resource
+        ]
+
+
+def test_entities_by_subscription_conditions():
+    conditions = [
+        SubscriptionCondition(
+            attribute=ConditionAttributeIdentifier.READING_VALUE, lower_threshold=0, upper_threshold=10
+        )
+    ]
+    index = SubscriptionIndex()
+    index._rebuild(
+        {
+            1: sub(1, 1, SubscriptionResource.READING, conditions=conditions),
+            2: sub(2, 1, SubscriptionResource.READING, scoped_site_id=2),
+        }
+    )
+    r1 = SiteReading(site_reading_id=1, value=5, site_reading_type=SiteReadingType(site_id=2, group_id=1))
+    r2 = SiteReading(site_reading_id=2, value=50, site_reading_type=SiteReadingType(site_id=2, group_id=1))
+    r3 = SiteReading(site_reading_id=3, value=50, site_reading_type=SiteReadingType(site_id=3, group_id=1))
+
+    actual = index.entities_by_subscription(1, SubscriptionResource.READING, [r1, r2, r3])
+    assert [(s.subscription_id, e) for s, e in actual] == [(1, [r2, r3]), (2, [r1, r2])]
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.notification.subscription_index.utc_now")
+@mock.patch("envoy.notification.subscription_index.select_subscriptions_changed_after")
+@mock.patch("envoy.notification.subscription_index.select_subscription_ids_deleted_after")
+async def test_refresh(
+    mock_select_subscription_ids_deleted_after: mock.MagicMock,
+    mock_select_subscriptions_changed_after: mock.MagicMock,
+    mock_utc_now: mock.MagicMock,
+):
+    mock_session = create_mock_session()
+    index = SubscriptionIndex(full_reload_seconds=100, lookback_seconds=5)
+    t0 = datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+    site = SubscriptionResource.SITE
+
+    # Initial refresh is a full reload
+    mock_utc_now.return_value = t0
+    mock_select_subscriptions_changed_after.return_value = [sub(1, 1, site), sub(2, 1, site), sub(3, 2, site)]
+    await index.refresh(mock_session)
+    mock_select_subscriptions_changed_after.assert_called_once_with(mock_session, None)
+    mock_select_subscription_ids_deleted_after.assert_not_called()
+    assert len(index) == 3
+    assert [s.subscription_id for s in index.subscriptions_for_resource(1, site)] == [1, 2]
+    assert mock_session.expunge.call_count == 3
+
+    # Next refresh is incremental (looking back from the last refresh)
+    mock_select_subscriptions_changed_after.reset_mock()
+    mock_utc_now.return_value = t0 + timedelta(seconds=10)
+    mock_select_subscriptions_changed_after.return_value = [sub(2, 2, site), sub(4, 1, site)]
+    mock_select_subscription_ids_deleted_after.return_value = [1, 99]
+    await index.refresh(mock_session)
+    mock_select_subscriptions_changed_after.assert_called_once_with(mock_session, t0 - timedelta(seconds=5))
+    mock_select_subscription_ids_deleted_after.assert_called_once_with(mock_session, t0 - timedelta(seconds=5))
+    assert len(index) == 3
+    assert [s.subscription_id for s in index.subscriptions_for_resource(1, site)] == [4]
+    assert [s.subscription_id for s in index.subscriptions_for_resource(2, site)] == [2, 3]
+    assert index.subscriptions_for_resource(1, SubscriptionResource.READING) == []
+
+    # Once full_reload_seconds has elapsed - everything is reloaded (dropping anything not returned)
+    mock_select_subscriptions_changed_after.reset_mock()
+    mock_select_subscription_ids_deleted_after.reset_mock()
+    mock_utc_now.return_value = t0 + timedelta(seconds=100)
+    mock_select_subscriptions_changed_after.return_value = [sub(5, 1, site)]
+    await index.refresh(mock_session)
+    mock_select_subscriptions_changed_after.assert_called_once_with(mock_session, None)
+    mock_select_subscription_ids_deleted_after.assert_not_called()
+    assert len(index) == 1
+    assert [s.subscription_id for s in index.subscriptions_for_resource(1, site)] == [5]
+    assert index.subscriptions_for_resource(2, site) == []
+
+    # clear forces a full reload
+    index.clear()
+    assert len(index) == 0
+    mock_select_subscriptions_changed_after.reset_mock()
+    mock_utc_now.return_value = t0 + timedelta(seconds=101)
+    await index.refresh(mock_session)
+    mock_select_subscriptions_changed_after.assert_called_once_with(mock_session, None)
+
+
+def test_entities_by_subscription_unknown_aggregator():
+    index = SubscriptionIndex()
+    index._rebuild({1: sub(1, 1, SubscriptionResource.SITE)})
+    assert index.entities_by_subscription(2, SubscriptionResource.SITE, [Site(site_id=1)]) == []
+    assert index.entities_by_subscription(1, SubscriptionResource.READING, [Site(site_id=1)]) == []
+    assert [(s.subscription_id, e) for s, e in index.entities_by_subscription(1, SubscriptionResource.SITE, [])] == []
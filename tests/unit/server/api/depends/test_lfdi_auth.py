@@ -8,6 +8,7 @@ from fastapi import HTTPException, Request
 from starlette.datastructures import Headers
 
 from envoy.server.api.depends.lfdi_auth import LFDIAuthDepends, is_valid_lfdi, is_valid_pem, is_valid_sha256
+from envoy.server.cache.device_site import device_site_cache
 from envoy.server.crud.auth import ClientIdDetails
 from envoy.server.crud.common import convert_lfdi_to_sfdi
 from envoy.server.main import settings
@@ -21,6 +22,7 @@ from tests.data.certificates.certificate1 import TEST_CERTIFICATE_SFDI as TEST_C
 from tests.data.certificates.certificate2 import TEST_CERTIFICATE_FINGERPRINT as TEST_CERTIFICATE_FINGERPRINT_2
 from tests.data.certificates.certificate2 import TEST_CERTIFICATE_LFDI as TEST_CERTIFICATE_LFDI_2
 from tests.data.certificates.certificate2 import TEST_CERTIFICATE_PEM as TEST_CERTIFICATE_PEM_2
+from tests.data.certificates.certificate2 import TEST_CERTIFICATE_SFDI as TEST_CERTIFICATE_SFDI_2
 from tests.data.certificates.certificate3 import TEST_CERTIFICATE_FINGERPRINT as TEST_CERTIFICATE_FINGERPRINT_3
 from tests.data.certificates.certificate3 import TEST_CERTIFICATE_LFDI as TEST_CERTIFICATE_LFDI_3
 from tests.data.certificates.certificate3 import TEST_CERTIFICATE_PEM as TEST_CERTIFICATE_PEM_3
@@ -30,6 +32,13 @@ from tests.data.certificates.certificate4 import TEST_CERTIFICATE_PEM as TEST_CE
 from tests.integration.integration_server import cert_header
 
 
+@pytest.fixture(autouse=True)
+def clear_device_site_cache():
+    device_site_cache.clear()
+    yield
+    device_site_cache.clear()
+
+
 def test_generate_lfdi_from_fingerprint():
     """sep2 defines LFDI as the first 20 octets of the sha256 certificate hash. This test
     is pulled direct from an example in the standard"""
@@ -204,6 +213,111 @@ async def test_lfdiauthdepends_site_specific_cert(
     assert mock_select_single_site_with_sfdi.call_args_list[0].kwargs["aggregator_id"] == NULL_AGGREGATOR_ID
 
 
+@pytest.mark.anyio
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_single_site_with_sfdi")
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_client_id_details_for_lfdi")
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_all_client_id_details")
+@mock.patch("envoy.server.api.depends.lfdi_auth.db")
+async def test_lfdiauthdepends_pem_cached(
+    mock_db: mock.MagicMock,
+    mock_select_all_client_id_details: mock.MagicMock,
+    mock_select_client_id_details_for_lfdi: mock.MagicMock,
+    mock_select_single_site_with_sfdi: mock.MagicMock,
+):
+    """Repeated requests with the same PEM should only parse the certificate once"""
+
+    # Arrange
+    mock_select_all_client_id_details.return_value = []
+    mock_select_client_id_details_for_lfdi.return_value = None
+    mock_select_single_site_with_sfdi.return_value = None
+    lfdi_dep = LFDIAuthDepends(settings.cert_header, allow_device_registration=True, pem_cache_max_entries=1)
+
+    def pem_request(pem: bytes) -> Request:
+        return Request({"type": "http", "headers": Headers({cert_header: pem.decode("utf-8")}).raw})
+
+    # Act
+    with mock.patch.object(
+        LFDIAuthDepends, "generate_lfdi_from_pem", wraps=LFDIAuthDepends.generate_lfdi_from_pem
+    ) as mock_generate_lfdi_from_pem:
+        requests = [
+            pem_request(TEST_CERTIFICATE_PEM_1),
+            pem_request(TEST_CERTIFICATE_PEM_1),
+            pem_request(TEST_CERTIFICATE_PEM_2),  # Will evict PEM_1
+            pem_request(TEST_CERTIFICATE_PEM_1),
+        ]
+        for req in requests:
+            await lfdi_dep(req)
+
+    # Assert
+    assert [r.state.lfdi for r in requests] == [
+        TEST_CERTIFICATE_LFDI_1,
+        TEST_CERTIFICATE_LFDI_1,
+        TEST_CERTIFICATE_LFDI_2,
+        TEST_CERTIFICATE_LFDI_1,
+    ]
+    assert [r.state.sfdi for r in requests] == [
+        int(TEST_CERTIFICATE_SFDI_1),
+        int(TEST_CERTIFICATE_SFDI_1),
+        int(TEST_CERTIFICATE_SFDI_2),
+        int(TEST_CERTIFICATE_SFDI_1),
+    ]
+    assert all(r.state.source == CertificateType.DEVICE_CERTIFICATE for r in requests)
+    assert mock_generate_lfdi_from_pem.call_count == 3, "The second request should've been served from the cache"
+    assert lfdi_dep.pem_cache.hits == 1
+    assert lfdi_dep.pem_cache.misses == 3
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_single_site_with_sfdi")
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_client_id_details_for_lfdi")
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_all_client_id_details")
+@mock.patch("envoy.server.api.depends.lfdi_auth.db")
+async def test_lfdiauthdepends_device_site_cached(
+    mock_db: mock.MagicMock,
+    mock_select_all_client_id_details: mock.MagicMock,
+    mock_select_client_id_details_for_lfdi: mock.MagicMock,
+    mock_select_single_site_with_sfdi: mock.MagicMock,
+):
+    """Device cert site lookups should be cached once found but "not found" must never be cached (the device could
+    register via another worker)"""
+
+    # Arrange
+    mock_select_all_client_id_details.return_value = []
+    mock_select_client_id_details_for_lfdi.return_value = None
+    mock_select_single_site_with_sfdi.side_effect = [None, None, generate_class_instance(Site, site_id=123)]
+    lfdi_dep = LFDIAuthDepends(settings.cert_header, allow_device_registration=True)
+    sfdi = int(TEST_CERTIFICATE_SFDI_1)
+
+    def pem_request() -> Request:
+        return Request({"type": "http", "headers": Headers({cert_header: TEST_CERTIFICATE_PEM_1.decode("utf-8")}).raw})
+
+    # Act / Assert
+    req_unregistered_1 = pem_request()
+    req_unregistered_2 = pem_request()
+    await lfdi_dep(req_unregistered_1)
+    await lfdi_dep(req_unregistered_2)
+    assert req_unregistered_1.state.site_id is None
+    assert req_unregistered_2.state.site_id is None
+    assert mock_select_single_site_with_sfdi.call_count == 2  # The "not found" result is NOT cached
+    assert device_site_cache.get(sfdi) is None
+
+    req_registered_1 = pem_request()
+    req_registered_2 = pem_request()
+    await lfdi_dep(req_registered_1)
+    await lfdi_dep(req_registered_2)
+    assert req_registered_1.state.site_id == 123
+    assert req_registered_2.state.site_id == 123
+    assert mock_select_single_site_with_sfdi.call_count == 3  # The "found" result is cached
+    assert device_site_cache.get(sfdi) == 123
+
+    device_site_cache.remove(sfdi)  # Simulate a deregistration
+    mock_select_single_site_with_sfdi.side_effect = [None]
+    req_deregistered = pem_request()
+    await lfdi_dep(req_deregistered)
+    assert req_deregistered.state.site_id is None
+    assert mock_select_single_site_with_sfdi.call_count == 4
+
+
 @pytest.mark.anyio
 @mock.patch("envoy.server.api.depends.lfdi_auth.select_single_site_with_sfdi")
 @mock.patch("envoy.server.api.depends.lfdi_auth.select_all_client_id_details")
@@ -345,3 +459,50 @@ def test_cert_pem_to_cert_fingerprint(pem_bytes: bytes, sha256: str):
 )
 def test_is_valid_lfdi(lfdi_str, expected):
     assert is_valid_lfdi(lfdi_str) == expected
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_client_id_details_for_lfdi")
+@mock.patch("envoy.server.api.depends.lfdi_auth.select_all_client_id_details")
+@mock.patch("envoy.server.api.depends.lfdi_auth.db")
+async def test_lfdiauthdepends_aggregator_cert_cache_incremental(
+    mock_db: mock.MagicMock,
+    mock_select_all_client_id_details: mock.MagicMock,
+    mock_select_client_id_details_for_lfdi: mock.MagicMock,
+):
+    """Unknown LFDIs should only fetch that single LFDI (not reload every certificate) and then be negatively cached"""
+    AGG_ID = 7
+    mock_select_all_client_id_details.return_value = [
+        ClientIdDetails(TEST_CERTIFICATE_LFDI_1, AGG_ID, datetime.now(tz=UTC) + timedelta(hours=1))
+    ]
+    mock_select_client_id_details_for_lfdi.side_effect = lambda session, lfdi: (
+        ClientIdDetails(lfdi, AGG_ID, datetime.now(tz=UTC) + timedelta(hours=1))
+        if lfdi == TEST_CERTIFICATE_LFDI_3
+        else None
+    )
+    lfdi_dep = LFDIAuthDepends(settings.cert_header, allow_device_registration=False)
+
+    def lfdi_request(lfdi: str) -> Request:
+        return Request({"type": "http", "headers": Headers({cert_header: lfdi}).raw})
+
+    # Initial load pulls in every cert
+    await lfdi_dep(lfdi_request(TEST_CERTIFICATE_LFDI_1))
+    mock_select_all_client_id_details.assert_called_once()
+
+    # Unknown LFDI's will be fetched individually (and will be remembered as unknown)
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc:
+            await lfdi_dep(lfdi_request(TEST_CERTIFICATE_LFDI_2))
+        assert exc.value.status_code == 403
+    mock_select_client_id_details_for_lfdi.assert_called_once()
+
+    # Certificates added after the initial load will be found
+    req = lfdi_request(TEST_CERTIFICATE_LFDI_3)
+    await lfdi_dep(req)
+    assert req.state.aggregator_id == AGG_ID
+    assert req.state.source == CertificateType.AGGREGATOR_CERTIFICATE
+
+    mock_select_all_client_id_details.assert_called_once()
+    assert mock_select_client_id_details_for_lfdi.call_count == 2
+    assert lfdi_dep.aggregator_cert_cache.stats.reloads == 1
+    assert lfdi_dep.aggregator_cert_cache.stats.negative_hits == 2
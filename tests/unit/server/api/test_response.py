@@ -0,0 +1,61 @@
+from http import HTTPStatus
+
+import pytest
+from assertical.fake.generator import generate_class_instance
+from envoy_schema.server.schema.sep2.der import DERProgramResponse
+from starlette.requests import Request
+
+from envoy.server.api.response import (
+    ETAG_HEADER_NAME,
+    NotModifiedResponse,
+    XmlResponse,
+    is_not_modified,
+)
+
+
+def make_request(headers: dict[str, str]) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "if_none_match, etag, expected",
+    [
+        (None, '"abc"', False),
+        ("", '"abc"', False),
+        ('"abc"', '"abc"', True),
+        ('"abc"', '"abd"', False),
+        ('W/"abc"', '"abc"', True),
+        ('"def", "abc"', '"abc"', True),
+        ('"def","ghi"', '"abc"', False),
+        ("*", '"abc"', True),
+    ],
+)
+def test_is_not_modified(if_none_match: str | None, etag: str, expected: bool):
+    headers = {} if if_none_match is None else {"If-None-Match": if_none_match}
+    assert is_not_modified(make_request(headers), etag) == expected
+
+
+def test_xml_response_etag():
+    content = generate_class_instance(DERProgramResponse)
+
+    response = XmlResponse(content)
+    assert ETAG_HEADER_NAME.lower() not in response.headers
+
+    response = XmlResponse(content, etag='"abc"', headers={"X-Other": "val"})
+    assert response.headers[ETAG_HEADER_NAME] == '"abc"'
+    assert response.headers["X-Other"] == "val"
+    assert response.body == XmlResponse(content).body
+
+
+def test_not_modified_response():
+    response = NotModifiedResponse('"abc"')
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers[ETAG_HEADER_NAME] == '"abc"'
+    assert response.body == b""
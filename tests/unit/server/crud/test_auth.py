@@ -4,7 +4,11 @@ import pytest
 from assertical.asserts.type import assert_list_type
 from assertical.fixtures.postgres import generate_async_session
 
-from envoy.server.crud.auth import ClientIdDetails, select_all_client_id_details
+from envoy.server.crud.auth import (
+    ClientIdDetails,
+    select_all_client_id_details,
+    select_client_id_details_for_lfdi,
+)
 from tests.data.certificates.certificate1 import TEST_CERTIFICATE_LFDI as CERT1_LFDI
 from tests.data.certificates.certificate2 import TEST_CERTIFICATE_LFDI as CERT2_LFDI
 from tests.data.certificates.certificate3 import TEST_CERTIFICATE_LFDI as CERT3_LFDI
@@ -30,3 +34,20 @@ async def test_select_all_client_id_details(pg_base_config):
         datetime(2037, 1, 1, 1, 2, 3, tzinfo=UTC),
         datetime(2037, 1, 1, 1, 2, 3, tzinfo=UTC),
     ] == [r.expiry for r in result]
+
+
+@pytest.mark.parametrize(
+    "lfdi, expected",
+    [
+        (CERT1_LFDI, ClientIdDetails(CERT1_LFDI, 1, datetime(2037, 1, 1, 1, 2, 3, tzinfo=UTC))),
+        (CERT3_LFDI, ClientIdDetails(CERT3_LFDI, 1, datetime(2023, 1, 1, 1, 2, 4, tzinfo=UTC))),
+        (CERT4_LFDI, ClientIdDetails(CERT4_LFDI, 2, datetime(2037, 1, 1, 1, 2, 3, tzinfo=UTC))),
+        ("not-a-registered-lfdi", None),
+    ],
+)
+@pytest.mark.anyio
+async def test_select_client_id_details_for_lfdi(pg_base_config, lfdi: str, expected: ClientIdDetails | None):
+    async with generate_async_session(pg_base_config) as session:
+        result = await select_client_id_details_for_lfdi(session, lfdi)
+
+    assert result == expected
@@ -14,6 +14,7 @@ from sqlalchemy.exc import InvalidRequestError
 from envoy.admin.crud.doe import cancel_then_insert_does
 from envoy.server.crud.doe import (
     count_active_does_include_deleted,
+    count_active_does_include_deleted_by_groups,
     count_does_at_timestamp,
     count_site_control_groups,
     count_site_control_groups_by_fsa_id,
@@ -21,9 +22,12 @@ from envoy.server.crud.doe import (
     select_doe_by_display_id_include_deleted,
     select_doe_include_deleted,
     select_does_at_timestamp,
+    select_does_include_deleted,
     select_site_control_group_by_id,
     select_site_control_group_fsa_ids,
+    select_site_control_group_version,
     select_site_control_groups,
+    select_site_doe_version,
 )
 from envoy.server.crud.site import select_single_site_with_site_id
 from envoy.server.manager.time import utc_now
@@ -141,6 +145,35 @@ async def test_select_doe_include_deleted(
         assert_doe_for_id(expected_id, site_id, expected_dt, "Australia/Brisbane", actual, check_duration_seconds=False)
 
 
+@pytest.mark.parametrize(
+    "agg_id, site_id, doe_ids",
+    [
+        (1, 1, [5, 18, 19, 21, 1, 99]),
+        (2, 3, [15, 5, 18]),
+        (1, 3, [15]),
+        (1, 99, [5, 18]),
+        (1, 1, []),
+    ],
+)
+@pytest.mark.anyio
+async def test_select_does_include_deleted(pg_additional_does, agg_id: int, site_id: int, doe_ids: list[int]):
+    """The batch lookup should be equivalent to calling select_doe_include_deleted for each doe_id"""
+    async with generate_async_session(pg_additional_does) as session:
+        actual = await select_does_include_deleted(session, agg_id, site_id, doe_ids)
+
+    async with generate_async_session(pg_additional_does) as session:
+        for doe_id in doe_ids:
+            expected = await select_doe_include_deleted(session, agg_id, site_id, doe_id)
+            if expected is None:
+                assert doe_id not in actual
+            else:
+                assert type(actual[doe_id]) is type(expected)
+                assert_class_instance_equality(type(expected), expected, actual[doe_id])
+                assert actual[doe_id].start_time.tzname() == expected.start_time.tzname()
+
+    assert set(actual.keys()).issubset(doe_ids)
+
+
 @pytest.mark.parametrize(
     "agg_id, site_id, display_id, expected_dt",
     [
@@ -255,6 +288,41 @@ async def test_select_and_count_active_does_include_deleted_pagination(
             assert_doe_for_id(id, 1, None, None, doe, check_duration_seconds=False)
 
 
+@pytest.mark.parametrize(
+    "after, page_size",
+    [
+        (datetime.min, 1),
+        (datetime.min, 3),
+        (datetime(2023, 5, 6, 11, 22, 32, tzinfo=UTC), 2),
+    ],
+)
+@pytest.mark.anyio
+async def test_select_active_does_include_deleted_keyset_pagination(
+    pg_additional_does, after: datetime, page_size: int
+):
+    """Tests that walking the list a page at a time (each page seeking past the row at start - 1) returns identical
+    results (and ordering) to fetching everything at once"""
+    now = datetime(1970, 1, 1, 0, 0, 0)  # This is sufficiently in this past to allow everything to pass
+    site_control_group_id = 1
+
+    async with generate_async_session(pg_additional_does) as session:
+        existing_site = await select_single_site_with_site_id(session, 1, 1)
+        assert existing_site
+        all_does = await select_active_does_include_deleted(
+            session, site_control_group_id, existing_site, now, 0, after, 99
+        )
+        assert len(all_does) > page_size
+
+        paged_ids: list[int] = []
+        for start in range(0, len(all_does) + page_size, page_size):
+            page = await select_active_does_include_deleted(
+                session, site_control_group_id, existing_site, now, start, after, page_size
+            )
+            paged_ids.extend(d.dynamic_operating_envelope_id for d in page)
+
+        assert paged_ids == [d.dynamic_operating_envelope_id for d in all_does]
+
+
 @pytest.mark.parametrize(
     "expected_ids, site_control_group_id, agg_id, site_id, now",
     [
@@ -346,6 +414,47 @@ async def test_select_and_count_active_does_include_deleted_multiple_groups(
             assert doe.site_control_group_id == site_control_group_id
 
 
+@pytest.mark.parametrize(
+    "agg_id, site_id, now, changed_after",
+    [
+        (1, 1, datetime(2000, 1, 1, tzinfo=AEST), datetime.min),
+        (1, 2, datetime(2000, 1, 1, tzinfo=AEST), datetime.min),
+        (1, 1, datetime(2023, 5, 7, 1, 5, 0, tzinfo=AEST), datetime.min),
+        (1, 1, datetime(2000, 1, 1, tzinfo=AEST), datetime(2022, 5, 6, 12, 22, 33, tzinfo=AEST)),
+    ],
+)
+@pytest.mark.anyio
+async def test_count_active_does_include_deleted_by_groups(
+    pg_additional_does, agg_id: int, site_id: int, now: datetime, changed_after: datetime
+):
+    """Tests that the grouped count returns identical values to count_active_does_include_deleted for every group"""
+
+    # Split the DOEs across multiple groups
+    async with generate_async_session(pg_additional_does) as session:
+        await session.execute(update(DOE).values(site_control_group_id=2).where(DOE.dynamic_operating_envelope_id >= 5))
+        await session.execute(
+            update(ArchiveDOE).values(site_control_group_id=2).where(ArchiveDOE.dynamic_operating_envelope_id >= 5)
+        )
+        await session.commit()
+
+    site_control_group_ids = [2, 1, 99]
+    async with generate_async_session(pg_additional_does) as session:
+        existing_site = await select_single_site_with_site_id(session, site_id=site_id, aggregator_id=agg_id)
+        assert existing_site
+
+        counts = await count_active_does_include_deleted_by_groups(
+            session, site_control_group_ids, existing_site, now, changed_after
+        )
+        assert list(counts.keys()) == site_control_group_ids
+        for group_id in site_control_group_ids:
+            expected = await count_active_does_include_deleted(session, group_id, existing_site, now, changed_after)
+            assert counts[group_id] == expected, f"Mismatch on {group_id=}"
+        assert counts[99] == 0
+
+        # Empty groups should short circuit
+        assert await count_active_does_include_deleted_by_groups(session, [], existing_site, now, changed_after) == {}
+
+
 @pytest.mark.parametrize(
     "expected_id_and_starts, agg_id, site_id",
     [
@@ -861,3 +970,45 @@ async def test_select_site_control_group_fsa_ids(
         actual_ids = await select_site_control_group_fsa_ids(session, changed_after)
         assert_list_type(int, actual_ids, len(expected_fsa_ids))
         assert set(expected_fsa_ids) == set(actual_ids)
+
+
+@pytest.mark.anyio
+async def test_select_site_doe_version(pg_additional_does):
+    """Tests that the DOE version for a site changes as DOEs are updated / expire but not for other sites"""
+    now = datetime(1970, 1, 1, tzinfo=UTC)
+    async with generate_async_session(pg_additional_does) as session:
+        site_1_version = await select_site_doe_version(session, 1, now)
+        site_2_version = await select_site_doe_version(session, 2, now)
+        assert site_1_version == await select_site_doe_version(session, 1, now), "Should be stable"
+        assert site_1_version != site_2_version
+        assert site_1_version != await select_site_doe_version(session, 1, datetime(2023, 5, 7, 1, 5, 0, tzinfo=AEST))
+        assert (await select_site_doe_version(session, 99, now))[0] == 0
+
+        await session.execute(
+            update(DOE)
+            .values(export_limit_watts=Decimal("1.23"), changed_time=datetime(2030, 1, 1, tzinfo=UTC))
+            .where(DOE.dynamic_operating_envelope_id == 1)
+        )
+        await session.commit()
+
+    async with generate_async_session(pg_additional_does) as session:
+        assert site_1_version != await select_site_doe_version(session, 1, now)
+        assert site_2_version == await select_site_doe_version(session, 2, now)
+
+
+@pytest.mark.anyio
+async def test_select_site_control_group_version(pg_base_config):
+    """Tests that the site control group version changes as groups are updated"""
+    async with generate_async_session(pg_base_config) as session:
+        version = await select_site_control_group_version(session)
+        assert version == await select_site_control_group_version(session), "Should be stable"
+
+        await session.execute(
+            update(SiteControlGroup)
+            .values(changed_time=datetime(2030, 1, 1, tzinfo=UTC))
+            .where(SiteControlGroup.site_control_group_id == 1)
+        )
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        assert version != await select_site_control_group_version(session)
@@ -0,0 +1,162 @@
+from datetime import UTC, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from assertical.fixtures.postgres import generate_async_session
+from sqlalchemy import func, select, text
+
+from envoy.server.crud.partition import (
+    RangePartition,
+    add_months,
+    create_range_partition,
+    default_partition_name,
+    detach_partition,
+    drop_partition,
+    month_start,
+    monthly_partition_name,
+    select_range_partitions,
+    try_lock_partition_maintenance,
+)
+from envoy.server.model.site_reading import SiteReading
+
+
+@pytest.mark.parametrize(
+    "dt, expected",
+    [
+        (datetime(2024, 1, 1, tzinfo=UTC), datetime(2024, 1, 1, tzinfo=UTC)),
+        (datetime(2024, 2, 29, 23, 59, 59, tzinfo=UTC), datetime(2024, 2, 1, tzinfo=UTC)),
+        (datetime(2024, 3, 1, 5, tzinfo=ZoneInfo("Australia/Brisbane")), datetime(2024, 2, 1, tzinfo=UTC)),
+    ],
+)
+def test_month_start(dt: datetime, expected: datetime):
+    assert month_start(dt) == expected
+
+
+@pytest.mark.parametrize(
+    "month, months, expected",
+    [
+        (datetime(2024, 1, 1, tzinfo=UTC), 0, datetime(2024, 1, 1, tzinfo=UTC)),
+        (datetime(2024, 1, 1, tzinfo=UTC), 1, datetime(2024, 2, 1, tzinfo=UTC)),
+        (datetime(2024, 11, 1, tzinfo=UTC), 3, datetime(2025, 2, 1, tzinfo=UTC)),
+        (datetime(2024, 1, 1, tzinfo=UTC), -1, datetime(2023, 12, 1, tzinfo=UTC)),
+        (datetime(2024, 3, 1, tzinfo=UTC), -27, datetime(2021, 12, 1, tzinfo=UTC)),
+    ],
+)
+def test_add_months(month: datetime, months: int, expected: datetime):
+    assert add_months(month, months) == expected
+
+
+def test_partition_names():
+    assert monthly_partition_name("site_reading", datetime(2024, 3, 1, tzinfo=UTC)) == "site_reading_p202403"
+    assert monthly_partition_name("archive_site_reading", datetime(987, 11, 1, tzinfo=UTC)) == (
+        "archive_site_reading_p098711"
+    )
+    assert default_partition_name("site_reading") == "site_reading_default"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("table_name", ["site_reading", "archive_site_reading"])
+async def test_select_range_partitions_after_migration(pg_empty_config, table_name: str):
+    """The migration should create monthly partitions from the current month (the DB is empty) and a few months
+    ahead. The DEFAULT partition shouldn't be returned"""
+    current_month = month_start(datetime.now(tz=UTC))
+    async with generate_async_session(pg_empty_config) as session:
+        partitions = await select_range_partitions(session, table_name)
+
+    assert len(partitions) >= 2
+    assert all(isinstance(p, RangePartition) for p in partitions)
+    assert partitions[0].lower == current_month
+    assert partitions[0].partition_name == monthly_partition_name(table_name, current_month)
+    for prev, p in zip(partitions, partitions[1:], strict=False):
+        assert prev.upper == p.lower, "Partitions should be contiguous and ordered"
+        assert p.upper == add_months(p.lower, 1)
+    assert default_partition_name(table_name) not in [p.partition_name for p in partitions]
+
+
+@pytest.mark.anyio
+async def test_select_range_partitions_not_partitioned(pg_empty_config):
+    async with generate_async_session(pg_empty_config) as session:
+        assert await select_range_partitions(session, "site") == []
+
+
+@pytest.mark.anyio
+async def test_try_lock_partition_maintenance(pg_empty_config):
+    async with generate_async_session(pg_empty_config) as session1:
+        assert await try_lock_partition_maintenance(session1)
+        assert await try_lock_partition_maintenance(session1), "Reentrant for the same transaction"
+
+        async with generate_async_session(pg_empty_config) as session2:
+            assert not await try_lock_partition_maintenance(session2), "Held by session1"
+
+        await session1.rollback()
+
+        async with generate_async_session(pg_empty_config) as session2:
+            assert await try_lock_partition_maintenance(session2), "Released when session1 transaction ended"
+
+
+@pytest.mark.anyio
+async def test_create_range_partition_moves_default_rows(pg_base_config):
+    """The base_config readings are all in June 2022 which won't have a partition (so they sit in DEFAULT). Creating
+    a partition for that month should move the rows without changing what's visible through site_reading"""
+    lower = datetime(2022, 6, 1, tzinfo=UTC)
+    upper = datetime(2022, 7, 1, tzinfo=UTC)
+    async with generate_async_session(pg_base_config) as session:
+        before_count = (await session.execute(select(func.count()).select_from(SiteReading))).scalar_one()
+        assert before_count > 0
+        assert (await session.execute(text("SELECT count(*) FROM site_reading_default"))).scalar_one() == before_count
+
+        await create_range_partition(session, "site_reading", "site_reading_p202206", "time_period_start", lower, upper)
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        assert (await session.execute(select(func.count()).select_from(SiteReading))).scalar_one() == before_count
+        assert (await session.execute(text("SELECT count(*) FROM site_reading_default"))).scalar_one() == 0
+        assert (await session.execute(text("SELECT count(*) FROM site_reading_p202206"))).scalar_one() == before_count
+
+        partitions = await select_range_partitions(session, "site_reading")
+        assert RangePartition("site_reading_p202206", lower, upper) in partitions
+
+        # New readings in that month will now be routed to the new partition
+        session.add(
+            SiteReading(
+                site_reading_type_id=1,
+                changed_time=datetime(2022, 6, 8, tzinfo=UTC),
+                local_id=None,
+                quality_flags=0,
+                time_period_start=lower + timedelta(days=10),
+                time_period_seconds=300,
+                value=123,
+            )
+        )
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        assert (await session.execute(text("SELECT count(*) FROM site_reading_p202206"))).scalar_one() == (
+            before_count + 1
+        )
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("drop", [True, False])
+async def test_detach_drop_partition(pg_base_config, drop: bool):
+    lower = datetime(2022, 6, 1, tzinfo=UTC)
+    upper = datetime(2022, 7, 1, tzinfo=UTC)
+    async with generate_async_session(pg_base_config) as session:
+        await create_range_partition(session, "site_reading", "site_reading_p202206", "time_period_start", lower, upper)
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        if drop:
+            await drop_partition(session, "site_reading", "site_reading_p202206")
+        else:
+            await detach_partition(session, "site_reading", "site_reading_p202206")
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        assert (await session.execute(select(func.count()).select_from(SiteReading))).scalar_one() == 0
+        assert "site_reading_p202206" not in [
+            p.partition_name for p in await select_range_partitions(session, "site_reading")
+        ]
+
+        table_exists = (await session.execute(text("SELECT to_regclass('site_reading_p202206') IS NOT NULL"))).scalar()
+        assert table_exists != drop, "Detached partitions remain as a standalone table"
@@ -7,7 +7,10 @@ from assertical.fixtures.postgres import generate_async_session
 
 from envoy.server.crud.pricing import (
     count_active_rates_include_deleted,
+    count_active_rates_include_deleted_by_tariff_components,
+    count_active_rates_include_deleted_by_tariffs,
     count_tariff_components_by_tariff,
+    count_tariff_components_by_tariffs,
     select_active_rates_include_deleted,
     select_all_tariffs,
     select_single_tariff,
@@ -246,6 +249,30 @@ async def test_select_and_count_tariff_components_by_tariff(
             assert_tariff_component_for_id(expected_id, tc)
 
 
+@pytest.mark.parametrize(
+    "tariff_ids, changed_after, expected_counts",
+    [
+        ([1, 2, 3, 99], None, {1: 3, 2: 1, 3: 0, 99: 0}),
+        ([2], None, {2: 1}),
+        ([], None, {}),
+        ([1, 2], datetime(2022, 2, 1, 1, 30, 0, tzinfo=timezone(timedelta(hours=10))), {1: 2, 2: 1}),
+    ],
+)
+@pytest.mark.anyio
+async def test_count_tariff_components_by_tariffs(
+    pg_base_config, tariff_ids: list[int], changed_after: datetime | None, expected_counts: dict[int, int]
+):
+    """Tests the grouped counts match the individual count_tariff_components_by_tariff values"""
+    async with generate_async_session(pg_base_config) as session:
+        actual_counts = await count_tariff_components_by_tariffs(session, tariff_ids, changed_after)
+        assert actual_counts == expected_counts
+
+        for tariff_id in tariff_ids:
+            assert actual_counts[tariff_id] == await count_tariff_components_by_tariff(
+                session, tariff_id, changed_after
+            )
+
+
 def assert_rate_for_id(
     expected_rate_id: int | None,
     actual_rate: TariffGeneratedRate | ArchiveTariffGeneratedRate | None | None,
@@ -473,3 +500,87 @@ async def test_select_and_count_active_rates_include_deleted(
         )
         assert isinstance(actual_count, int)
         assert actual_count == expected_count
+
+
+@pytest.mark.parametrize(
+    "tariff_component_id, changed_after, page_size",
+    [
+        (None, datetime.min, 1),
+        (None, datetime.min, 4),
+        (1, datetime.min, 2),
+        (None, datetime(2022, 3, 4, 13, 22, 33, tzinfo=UTC), 1),
+    ],
+)
+@pytest.mark.anyio
+async def test_select_active_rates_include_deleted_keyset_pagination(
+    pg_additional_prices, tariff_component_id: int | None, changed_after: datetime, page_size: int
+):
+    """Tests that walking the list a page at a time (each page seeking past the row at start - 1) returns identical
+    results (and ordering) to fetching everything at once (including the archived rates)"""
+
+    async with generate_async_session(pg_additional_prices) as session:
+        existing_site = await select_single_site_with_site_id(session, 1, 1)
+        assert existing_site is not None, "This is a test definition issue if failing"
+
+        all_rates = await select_active_rates_include_deleted(
+            session, 1, tariff_component_id, existing_site, BASE, 0, changed_after, 99
+        )
+        assert len(all_rates) > page_size
+        assert any(isinstance(r, ArchiveTariffGeneratedRate) for r in all_rates), "Archive rates should be included"
+
+        paged_ids: list[int] = []
+        for start in range(0, len(all_rates) + page_size, page_size):
+            page = await select_active_rates_include_deleted(
+                session, 1, tariff_component_id, existing_site, BASE, start, changed_after, page_size
+            )
+            paged_ids.extend(r.tariff_generated_rate_id for r in page)
+
+        assert paged_ids == [r.tariff_generated_rate_id for r in all_rates]
+
+
+@pytest.mark.parametrize(
+    "site_id, now, changed_after",
+    [
+        (1, BASE, datetime.min),
+        (1, BASE, None),
+        (2, BASE, None),
+        (99, BASE, None),
+        (1, datetime(2022, 3, 5, 1, 0, 35, tzinfo=AEST), datetime.min),
+        (1, datetime(2025, 1, 1, 1, 1, 1, tzinfo=AEST), datetime.min),
+        (1, BASE, datetime(2022, 3, 4, 13, 22, 33, tzinfo=UTC)),
+        (1, BASE, datetime(2022, 3, 5, 1, 31, 0, tzinfo=UTC)),
+    ],
+)
+@pytest.mark.anyio
+async def test_count_active_rates_include_deleted_grouped(
+    pg_additional_prices, site_id: int, now: datetime, changed_after: datetime | None
+):
+    """Tests that the grouped count functions return identical values to count_active_rates_include_deleted for
+    every id in the group."""
+
+    tariff_ids = [1, 2, 3, 99]
+    tariff_component_ids = [1, 2, 3, 4, 99]
+    async with generate_async_session(pg_additional_prices) as session:
+        counts_by_tariff = await count_active_rates_include_deleted_by_tariffs(
+            session, tariff_ids, site_id, now, changed_after
+        )
+        assert list(counts_by_tariff.keys()) == tariff_ids
+        for tariff_id in tariff_ids:
+            expected = await count_active_rates_include_deleted(session, tariff_id, None, site_id, now, changed_after)
+            assert counts_by_tariff[tariff_id] == expected, f"Mismatch on {tariff_id=}"
+
+        counts_by_tc = await count_active_rates_include_deleted_by_tariff_components(
+            session, tariff_component_ids, site_id, now, changed_after
+        )
+        assert list(counts_by_tc.keys()) == tariff_component_ids
+        for tc_id in tariff_component_ids:
+            expected = await count_active_rates_include_deleted(session, -1, tc_id, site_id, now, changed_after)
+            assert counts_by_tc[tc_id] == expected, f"Mismatch on {tc_id=}"
+
+        # Sanity check on a known value (Site 1 - Tariff 1 has 6 active/deleted rates)
+        if site_id == 1 and now == BASE and not changed_after:
+            assert counts_by_tariff[1] == 6
+            assert counts_by_tc[1] == 5
+
+        # Empty groups should short circuit
+        assert await count_active_rates_include_deleted_by_tariffs(session, [], site_id, now, changed_after) == {}
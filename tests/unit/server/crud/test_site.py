@@ -10,7 +10,7 @@ from assertical.asserts.type import assert_list_type
 from assertical.fake.generator import clone_class_instance, generate_class_instance
 from assertical.fixtures.postgres import generate_async_session
 from envoy_schema.server.schema.sep2.types import DeviceCategory
-from sqlalchemy import Select, func, select
+from sqlalchemy import Select, delete, func, insert, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -19,7 +19,9 @@ from envoy.server.crud.site import (
     get_virtual_site_for_aggregator,
     insert_site_for_aggregator,
     select_aggregator_site_count,
+    select_aggregator_site_count_from_counter,
     select_all_sites_with_aggregator_id,
+    select_all_sites_with_aggregator_id_and_count,
     select_first_site_under_aggregator,
     select_single_site_with_lfdi,
     select_single_site_with_sfdi,
@@ -74,6 +76,84 @@ async def test_select_aggregator_site_count(
         assert await select_aggregator_site_count(session, aggregator_id, changed_after) == expected_count
 
 
+@pytest.mark.parametrize(
+    "aggregator_id, expected_count",
+    [(1, 3), (2, 1), (3, 0), (4, 0), (-1, 0)],
+)
+@pytest.mark.anyio
+async def test_select_aggregator_site_count_from_counter(pg_base_config, aggregator_id: int, expected_count: int):
+    """The trigger maintained counter should agree with a full count"""
+    async with generate_async_session(pg_base_config) as session:
+        assert await select_aggregator_site_count_from_counter(session, aggregator_id) == expected_count
+        assert await select_aggregator_site_count(session, aggregator_id, datetime.min) == expected_count
+
+
+@pytest.mark.anyio
+async def test_aggregator_site_count_maintained_by_triggers(pg_base_config):
+    """Tests the aggregator_site_count table tracks inserts / deletes / aggregator changes to the site table"""
+    async with generate_async_session(pg_base_config) as session:
+        await session.execute(
+            insert(Site).values(
+                [
+                    {
+                        "nmi": None,
+                        "aggregator_id": 3,
+                        "timezone_id": "Australia/Brisbane",
+                        "changed_time": datetime(2024, 1, 1, tzinfo=UTC),
+                        "lfdi": f"lfdi-{i}",
+                        "sfdi": 9000 + i,
+                        "device_category": DeviceCategory(0),
+                        "registration_pin": 1,
+                    }
+                    for i in range(5)
+                ]
+            )
+        )
+        assert await select_aggregator_site_count_from_counter(session, 3) == 5
+
+        await session.execute(update(Site).where(Site.sfdi.in_([9000, 9001])).values(aggregator_id=2))
+        assert await select_aggregator_site_count_from_counter(session, 2) == 3
+        assert await select_aggregator_site_count_from_counter(session, 3) == 3
+
+        await session.execute(update(Site).where(Site.aggregator_id == 3).values(nmi="123"))
+        assert await select_aggregator_site_count_from_counter(session, 3) == 3
+
+        await session.execute(delete(Site).where(Site.sfdi >= 9000))
+        assert await select_aggregator_site_count_from_counter(session, 1) == 3
+        assert await select_aggregator_site_count_from_counter(session, 2) == 1
+        assert await select_aggregator_site_count_from_counter(session, 3) == 0
+
+
+@pytest.mark.parametrize(
+    "aggregator_id, start, after, limit",
+    [
+        (1, 0, datetime.min, 100),
+        (1, 1, datetime.min, 1),
+        (1, 0, datetime(2022, 2, 3, 5, 0, 0, tzinfo=UTC), 100),
+        (2, 0, datetime.min, 100),
+        (3, 0, datetime.min, 100),
+        (1, 99, datetime.min, 2),
+        (1, 0, datetime.min, 0),
+    ],
+)
+@pytest.mark.anyio
+async def test_select_all_sites_with_aggregator_id_and_count(
+    pg_base_config, aggregator_id: int, start: int, after: datetime, limit: int
+):
+    """The windowed count version should return the same page as select_all_sites_with_aggregator_id and the same
+    count as select_aggregator_site_count (or None for an empty page)"""
+    async with generate_async_session(pg_base_config) as session:
+        expected_sites = await select_all_sites_with_aggregator_id(session, aggregator_id, start, after, limit)
+        expected_count = await select_aggregator_site_count(session, aggregator_id, after)
+
+        sites, count = await select_all_sites_with_aggregator_id_and_count(session, aggregator_id, start, after, limit)
+        assert [s.site_id for s in sites] == [s.site_id for s in expected_sites]
+        if expected_sites:
+            assert count == expected_count
+        else:
+            assert count is None
+
+
 @pytest.mark.anyio
 async def test_select_all_sites_with_aggregator_id_contents(pg_base_config):
     """Tests that the returned sites match what's in the DB"""
@@ -91,6 +171,23 @@ async def test_select_all_sites_with_aggregator_id_contents(pg_base_config):
         assert site_3.device_category == DeviceCategory(2)
 
 
+@pytest.mark.anyio
+async def test_select_all_sites_with_aggregator_id_keyset_pagination(pg_base_config):
+    """Tests that walking the list one page at a time (each page seeking past the row at start - 1) returns identical
+    results (and ordering) to fetching everything at once"""
+    async with generate_async_session(pg_base_config) as session:
+        all_sites = await select_all_sites_with_aggregator_id(session, 1, 0, datetime.min, 100)
+        assert len(all_sites) > 1
+
+        paged_ids: list[int] = []
+        for start in range(len(all_sites) + 1):
+            page = await select_all_sites_with_aggregator_id(session, 1, start, datetime.min, 1)
+            paged_ids.extend(s.site_id for s in page)
+
+        assert paged_ids == [s.site_id for s in all_sites]
+        assert await select_all_sites_with_aggregator_id(session, 1, len(all_sites) + 5, datetime.min, 1) == []
+
+
 @pytest.mark.anyio
 async def test_select_all_sites_with_aggregator_id_filters(pg_base_config):
     """Tests out the various ways sites can be filtered via the aggregator"""
@@ -451,6 +548,8 @@ async def test_upsert_site_for_aggregator_insert(pg_base_config):
         assert await select_aggregator_site_count(session, 1, datetime.min) == 4
         assert await select_aggregator_site_count(session, 2, datetime.min) == 1
         assert await select_aggregator_site_count(session, 3, datetime.min) == 0
+        assert await select_aggregator_site_count_from_counter(session, 1) == 4
+        assert await select_aggregator_site_count_from_counter(session, 2) == 1
 
         # This is a new row - therefore nothing should be copied to the archive
         assert (await session.execute(select(func.count()).select_from(ArchiveSite))).scalar_one() == 0
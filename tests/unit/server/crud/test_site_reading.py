@@ -1,12 +1,14 @@
 from collections.abc import Sequence
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from itertools import product
+from unittest import mock
 from zoneinfo import ZoneInfo
 
 import pytest
 from assertical.asserts.generator import assert_class_instance_equality
 from assertical.asserts.time import assert_datetime_equal, assert_nowish
 from assertical.asserts.type import assert_iterable_type, assert_list_type
+from assertical.fake.generator import generate_class_instance
 from assertical.fixtures.postgres import generate_async_session
 from envoy_schema.server.schema.sep2.types import QualityFlagsType
 from sqlalchemy import or_, select
@@ -14,13 +16,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from envoy.server.crud.site_reading import (
     GroupedSiteReadingTypeDetails,
+    copy_upsert_site_readings,
     count_grouped_site_reading_details,
     delete_site_reading_type_group,
     fetch_grouped_site_reading_details,
     fetch_site_reading_type_for_mrid,
     fetch_site_reading_types_for_group,
     fetch_site_reading_types_for_group_mrid,
+    fetch_site_reading_types_for_groups,
+    fetch_site_reading_types_for_mrids,
     generate_site_reading_type_group_id,
+    insert_site_reading_types,
     upsert_site_readings,
 )
 from envoy.server.manager.time import utc_now
@@ -74,6 +80,37 @@ async def test_fetch_site_reading_types_for_group(
         assert [r.site_reading_type_id for r in results] == expected_srt_ids
 
 
+@pytest.mark.parametrize(
+    "agg_id, site_id, group_ids, expected_srt_ids_by_group",
+    [
+        (1, 1, [1, 3], {1: [1, 5], 3: [3]}),
+        (1, None, [1, 3, 4], {1: [1, 5], 3: [3], 4: [4]}),
+        (1, 2, [1, 3, 4], {1: [], 3: [], 4: [4]}),
+        (1, 1, [2, 99], {2: [], 99: []}),
+        (3, None, [2, 1], {2: [2], 1: []}),
+        (1, 1, [], {}),
+    ],
+)
+@pytest.mark.anyio
+async def test_fetch_site_reading_types_for_groups(
+    pg_base_config,
+    agg_id: int,
+    site_id: int | None,
+    group_ids: list[int],
+    expected_srt_ids_by_group: dict[int, list[int]],
+):
+    """Should be equivalent to calling fetch_site_reading_types_for_group for each group"""
+    async with generate_async_session(pg_base_config) as session:
+        results = await fetch_site_reading_types_for_groups(session, agg_id, site_id, group_ids)
+        assert {
+            group_id: [srt.site_reading_type_id for srt in srts] for group_id, srts in results.items()
+        } == expected_srt_ids_by_group
+
+        for group_id in group_ids:
+            individual = await fetch_site_reading_types_for_group(session, agg_id, site_id, group_id)
+            assert sorted(srt.site_reading_type_id for srt in individual) == expected_srt_ids_by_group[group_id]
+
+
 @pytest.mark.parametrize(
     "agg_id, site_id, group_mrid, expected_srt_ids",
     [
@@ -354,6 +391,56 @@ async def test_fetch_site_reading_type_for_mrid(
             assert actual is None
 
 
+@pytest.mark.parametrize(
+    "agg_id, site_id, mrids, expected_srt_ids",
+    [
+        (1, 1, ["10000000000000000000000000000abc", "30000000000000000000000000000ABC"], [1, 3]),
+        (1, None, ["10000000000000000000000000000abc", "40000000000000000000000000000abc"], [1, 4]),
+        (1, 2, ["10000000000000000000000000000abc", "40000000000000000000000000000abc"], [4]),
+        (1, 1, ["20000000000000000000000000000abc", "200"], []),
+        (3, None, ["20000000000000000000000000000abc"], [2]),
+        (1, None, [], []),
+    ],
+)
+@pytest.mark.anyio
+async def test_fetch_site_reading_types_for_mrids(
+    pg_base_config, agg_id: int, site_id: int | None, mrids: list[str], expected_srt_ids: list[int]
+):
+    async with generate_async_session(pg_base_config) as session:
+        actual = await fetch_site_reading_types_for_mrids(session, agg_id, site_id, mrids)
+        assert_list_type(SiteReadingType, actual, count=len(expected_srt_ids))
+        assert sorted(srt.site_reading_type_id for srt in actual) == expected_srt_ids
+
+
+@pytest.mark.anyio
+async def test_insert_site_reading_types(pg_base_config):
+    """Inserts should return session attached instances with their newly assigned primary keys"""
+    new_srts = [
+        generate_class_instance(
+            SiteReadingType, seed=101 * i, aggregator_id=1, site_id=2, mrid=f"abc{i}", group_id=99, group_mrid="def"
+        )
+        for i in range(3)
+    ]
+
+    async with generate_async_session(pg_base_config) as session:
+        assert await insert_site_reading_types(session, []) == []
+
+        inserted = await insert_site_reading_types(session, new_srts)
+        assert_list_type(SiteReadingType, inserted, count=len(new_srts))
+        assert all(srt.site_reading_type_id > 5 for srt in inserted)
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        db_srts = await fetch_site_reading_types_for_group(session, 1, 2, 99)
+        assert len(db_srts) == len(new_srts)
+        for expected in new_srts:
+            actual = next(srt for srt in db_srts if srt.mrid == expected.mrid)
+            assert_class_instance_equality(
+                SiteReadingType, expected, actual, ignored_properties={"site_reading_type_id", "created_time"}
+            )
+            assert_nowish(actual.created_time)
+
+
 ########
 
 
@@ -389,9 +476,10 @@ async def fetch_site_readings(session) -> Sequence[SiteReading]:
     return resp.scalars().all()
 
 
+@pytest.mark.parametrize("copy_threshold", [1, 1000])
 @pytest.mark.anyio
-async def test_upsert_site_readings_mixed_insert_update(pg_base_config):
-    """Tests an upsert on site_readings with a mix of inserts/updates"""
+async def test_upsert_site_readings_mixed_insert_update(pg_base_config, copy_threshold: int):
+    """Tests an upsert on site_readings with a mix of inserts/updates (via both the COPY and INSERT paths)"""
     aest = ZoneInfo("Australia/Brisbane")
     deleted_time = datetime(2004, 5, 7, 1, 3, 4, 53151, tzinfo=UTC)
     site_readings: list[SiteReading] = [
@@ -431,9 +519,10 @@ async def test_upsert_site_readings_mixed_insert_update(pg_base_config):
     ]
 
     # Perform the upsert
-    async with generate_async_session(pg_base_config) as session:
-        await upsert_site_readings(session, deleted_time, site_readings)
-        await session.commit()
+    with mock.patch("envoy.server.crud.site_reading.SITE_READING_COPY_THRESHOLD", copy_threshold):
+        async with generate_async_session(pg_base_config) as session:
+            await upsert_site_readings(session, deleted_time, site_readings)
+            await session.commit()
 
     # Check the data persisted
     async with generate_async_session(pg_base_config) as session:
@@ -493,6 +582,58 @@ async def test_upsert_site_readings_mixed_insert_update(pg_base_config):
         assert_nowish(archive_records[0].archive_time)
 
 
+@pytest.mark.anyio
+async def test_copy_upsert_site_readings_bulk(pg_base_config):
+    """Tests a large upsert (staged via COPY) that overwrites itself in a subsequent transaction"""
+    reading_count = 5000
+    first_changed_time = datetime(2024, 1, 2, tzinfo=UTC)
+    second_changed_time = datetime(2024, 1, 3, tzinfo=UTC)
+    period_start = datetime(2024, 1, 1, tzinfo=UTC)
+
+    def generate_readings(changed_time: datetime, value_offset: int) -> list[SiteReading]:
+        return [
+            SiteReading(
+                site_reading_type_id=1 + (i % 2),
+                changed_time=changed_time,
+                local_id=None,
+                quality_flags=QualityFlagsType.VALID,
+                time_period_start=period_start + timedelta(minutes=5 * i),
+                time_period_seconds=300,
+                value=i + value_offset,
+            )
+            for i in range(reading_count)
+        ]
+
+    async with generate_async_session(pg_base_config) as session:
+        await copy_upsert_site_readings(session, first_changed_time, generate_readings(first_changed_time, 0))
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        await copy_upsert_site_readings(session, second_changed_time, generate_readings(second_changed_time, 100000))
+        await session.commit()
+
+    async with generate_async_session(pg_base_config) as session:
+        readings = (
+            (await session.execute(select(SiteReading).where(SiteReading.time_period_start >= period_start)))
+            .scalars()
+            .all()
+        )
+        assert len(readings) == reading_count
+        assert all(r.value >= 100000 and r.changed_time == second_changed_time for r in readings)
+
+        archive_records = (
+            (
+                await session.execute(
+                    select(ArchiveSiteReading).where(ArchiveSiteReading.time_period_start >= period_start)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        assert len(archive_records) == reading_count, "Every reading from the first upsert is replaced"
+        assert all(r.value < 100000 and r.deleted_time == second_changed_time for r in archive_records)
+
+
 async def snapshot_all_srt_tables(
     session: AsyncSession, agg_id: int, site_id: int | None, srt_ids: list[int]
 ) -> list[SnapshotTableCount]:
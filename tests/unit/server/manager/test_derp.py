@@ -26,7 +26,7 @@ from envoy.server.request_scope import SiteRequestScope
 @mock.patch("envoy.server.manager.derp.select_site_control_groups")
 @mock.patch("envoy.server.manager.derp.count_site_control_groups")
 @mock.patch("envoy.server.manager.derp.select_single_site_with_site_id")
-@mock.patch("envoy.server.manager.derp.count_active_does_include_deleted")
+@mock.patch("envoy.server.manager.derp.count_active_does_include_deleted_by_groups")
 @mock.patch("envoy.server.manager.derp.DERProgramMapper")
 @mock.patch("envoy.server.manager.derp.utc_now")
 @mock.patch("envoy.server.manager.derp.RuntimeServerConfigManager.fetch_current_config")
@@ -34,7 +34,7 @@ async def test_program_fetch_list_for_scope(
     mock_fetch_current_config: mock.MagicMock,
     mock_utc_now: mock.MagicMock,
     mock_DERProgramMapper: mock.MagicMock,
-    mock_count_active_does_include_deleted: mock.MagicMock,
+    mock_count_active_does_include_deleted_by_groups: mock.MagicMock,
     mock_select_single_site_with_site_id: mock.MagicMock,
     mock_count_site_control_groups: mock.MagicMock,
     mock_select_site_control_groups: mock.MagicMock,
@@ -61,9 +61,9 @@ async def test_program_fetch_list_for_scope(
     mock_count_site_control_groups.return_value = site_control_group_count
     mock_select_site_control_groups.return_value = site_control_groups
     mock_DERProgramMapper.doe_program_list_response = mock.Mock(return_value=mapped_list)
-    mock_count_active_does_include_deleted.side_effect = (
-        lambda session, site_control_group_id, site, now, changed_after: site_control_group_id + 1
-    )
+    mock_count_active_does_include_deleted_by_groups.return_value = {
+        g.site_control_group_id: g.site_control_group_id + 1 for g in site_control_groups
+    }
 
     config = RuntimeServerConfig()
     mock_fetch_current_config.return_value = config
@@ -79,21 +79,34 @@ async def test_program_fetch_list_for_scope(
         mock_session, start=start, limit=limit, changed_after=changed_after, fsa_id=fsa_id, include_defaults=True
     )
 
-    # One call to control count for each site control group
-    assert mock_count_active_does_include_deleted.call_count == len(site_control_groups)
+    # A single grouped control count for all site control groups
+    mock_count_active_does_include_deleted_by_groups.assert_called_once_with(
+        mock_session,
+        site_control_group_ids=[g.site_control_group_id for g in site_control_groups],
+        site=existing_site,
+        now=now,
+        changed_after=datetime.min,
+    )
 
     # The counts should be passed correctly to the mapper
+    mock_DERProgramMapper.doe_program_list_response.assert_called_once_with(
+        scope,
+        [(g, g.site_control_group_id + 1) for g in site_control_groups],
+        site_control_group_count,
+        config.derpl_pollrate_seconds,
+        fsa_id,
+    )
     assert_mock_session(mock_session)
     mock_utc_now.assert_called_once()
 
 
 @pytest.mark.anyio
 @mock.patch("envoy.server.manager.derp.select_single_site_with_site_id")
-@mock.patch("envoy.server.manager.derp.count_active_does_include_deleted")
+@mock.patch("envoy.server.manager.derp.count_active_does_include_deleted_by_groups")
 @mock.patch("envoy.server.manager.derp.DERProgramMapper")
 async def test_program_fetch_list_scope_dne(
     mock_DERProgramMapper: mock.MagicMock,
-    mock_count_active_does_include_deleted: mock.MagicMock,
+    mock_count_active_does_include_deleted_by_groups: mock.MagicMock,
     mock_select_single_site_with_site_id: mock.MagicMock,
 ):
     """Checks that if the crud layer indicates site doesn't exist then the manager will raise an exception"""
@@ -110,7 +123,7 @@ async def test_program_fetch_list_scope_dne(
 
     # Assert
     mock_select_single_site_with_site_id.assert_called_once_with(mock_session, scope.site_id, scope.aggregator_id)
-    mock_count_active_does_include_deleted.assert_not_called()
+    mock_count_active_does_include_deleted_by_groups.assert_not_called()
     mock_DERProgramMapper.doe_program_list_response.assert_not_called()
     assert_mock_session(mock_session)
 
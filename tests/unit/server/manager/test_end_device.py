@@ -1,6 +1,6 @@
 import os
 import unittest.mock as mock
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 
 import pytest
 from assertical.asserts.generator import assert_class_instance_equality
@@ -29,7 +29,7 @@ from envoy.server.manager.end_device import (
     RegistrationManager,
     fetch_sites_and_count_for_claims,
 )
-from envoy.server.model.aggregator import NULL_AGGREGATOR_ID
+from envoy.server.model.aggregator import NULL_AGGREGATOR_ID, SiteCountStrategy
 from envoy.server.model.config.server import RuntimeServerConfig
 from envoy.server.model.site import Site
 from envoy.server.model.subscription import SubscriptionResource
@@ -190,6 +190,71 @@ async def test_fetch_sites_and_count_for_claims(
         mock_select_aggregator_site_count.assert_called_once_with(session, scope.aggregator_id, AFTER_TIME)
 
 
+@pytest.mark.parametrize(
+    "count_strategy, after, window_result, expect_window, expect_counter, expect_exact, expected_count",
+    [
+        (SiteCountStrategy.EXACT, AFTER_TIME, None, False, False, True, 11),
+        (SiteCountStrategy.WINDOW, AFTER_TIME, 22, True, False, False, 22),
+        (SiteCountStrategy.WINDOW, AFTER_TIME, None, True, False, True, 11),  # Empty page - no window count
+        (SiteCountStrategy.COUNTER, datetime.min, None, False, True, False, 33),
+        (SiteCountStrategy.COUNTER, datetime.fromtimestamp(0, tz=UTC), None, False, True, False, 33),
+        (SiteCountStrategy.COUNTER, AFTER_TIME.replace(tzinfo=UTC), 22, True, False, False, 22),  # Filtered
+    ],
+)
+@pytest.mark.anyio
+@mock.patch("envoy.server.manager.end_device.select_all_sites_with_aggregator_id_and_count")
+@mock.patch("envoy.server.manager.end_device.select_aggregator_site_count_from_counter")
+@mock.patch("envoy.server.manager.end_device.select_all_sites_with_aggregator_id")
+@mock.patch("envoy.server.manager.end_device.select_aggregator_site_count")
+async def test_fetch_sites_and_count_for_claims_count_strategy(
+    mock_select_aggregator_site_count: mock.MagicMock,
+    mock_select_all_sites_with_aggregator_id: mock.MagicMock,
+    mock_select_aggregator_site_count_from_counter: mock.MagicMock,
+    mock_select_all_sites_with_aggregator_id_and_count: mock.MagicMock,
+    count_strategy: SiteCountStrategy,
+    after: datetime,
+    window_result: int | None,
+    expect_window: bool,
+    expect_counter: bool,
+    expect_exact: bool,
+    expected_count: int,
+):
+    """Checks each SiteCountStrategy only runs the queries it needs (and falls back where it must)"""
+    session = create_mock_session()
+    scope = generate_class_instance(
+        UnregisteredRequestScope, source=CertificateType.AGGREGATOR_CERTIFICATE, aggregator_id=987
+    )
+    sites = [generate_class_instance(Site, seed=4321)] if window_result is not None else []
+
+    mock_select_aggregator_site_count.return_value = 11
+    mock_select_all_sites_with_aggregator_id.return_value = sites
+    mock_select_all_sites_with_aggregator_id_and_count.return_value = (sites, window_result)
+    mock_select_aggregator_site_count_from_counter.return_value = 33
+
+    actual_sites, actual_count = await fetch_sites_and_count_for_claims(
+        session, scope, 5, after, 10, count_strategy=count_strategy
+    )
+
+    assert actual_count == expected_count
+    assert actual_sites == sites
+    if expect_window:
+        mock_select_all_sites_with_aggregator_id_and_count.assert_called_once_with(session, 987, 5, after, 10)
+        mock_select_all_sites_with_aggregator_id.assert_not_called()
+    else:
+        mock_select_all_sites_with_aggregator_id_and_count.assert_not_called()
+        mock_select_all_sites_with_aggregator_id.assert_called_once_with(session, 987, 5, after, 10)
+
+    if expect_counter:
+        mock_select_aggregator_site_count_from_counter.assert_called_once_with(session, 987)
+    else:
+        mock_select_aggregator_site_count_from_counter.assert_not_called()
+
+    if expect_exact:
+        mock_select_aggregator_site_count.assert_called_once_with(session, 987, after)
+    else:
+        mock_select_aggregator_site_count.assert_not_called()
+
+
 @pytest.mark.anyio
 @mock.patch("envoy.server.manager.end_device.select_single_site_with_sfdi")
 async def test_end_device_manager_generate_unique_device_id_bounded_attempts(
@@ -352,21 +417,31 @@ async def test_end_device_manager_fetch_missing_device(
 
 
 @pytest.mark.anyio
-@pytest.mark.parametrize("return_value", [True, False])
+@pytest.mark.parametrize(
+    "return_value, source",
+    [
+        (True, CertificateType.AGGREGATOR_CERTIFICATE),
+        (False, CertificateType.AGGREGATOR_CERTIFICATE),
+        (True, CertificateType.DEVICE_CERTIFICATE),
+    ],
+)
 @mock.patch("envoy.server.manager.end_device.delete_site_for_aggregator")
 @mock.patch("envoy.server.manager.end_device.utc_now")
 @mock.patch("envoy.server.manager.end_device.NotificationManager")
+@mock.patch("envoy.server.manager.end_device.device_site_cache")
 async def test_delete_enddevice_for_scope(
+    mock_device_site_cache: mock.MagicMock,
     mock_NotificationManager: mock.MagicMock,
     mock_utc_now: mock.MagicMock,
     mock_delete_site_for_aggregator: mock.MagicMock,
     return_value: bool,
+    source: CertificateType,
 ):
     """Check that the manager will handle interacting with the crud layer / managing the session transaction"""
 
     # Arrange
     mock_session = create_mock_session()
-    scope: SiteRequestScope = generate_class_instance(SiteRequestScope)
+    scope: SiteRequestScope = generate_class_instance(SiteRequestScope, source=source)
     delete_time = datetime(2021, 5, 6, 7, 8, 9)
     mock_NotificationManager.notify_changed_deleted_entities = mock.Mock(return_value=create_async_result(True))
 
@@ -388,6 +463,12 @@ async def test_delete_enddevice_for_scope(
         SubscriptionResource.SITE, delete_time
     )
 
+    # Device certs should have their cached site lookup invalidated
+    if source == CertificateType.DEVICE_CERTIFICATE:
+        mock_device_site_cache.remove.assert_called_once_with(scope.sfdi)
+    else:
+        mock_device_site_cache.remove.assert_not_called()
+
 
 @pytest.mark.parametrize(
     "lhs, rhs, expected",
@@ -680,7 +761,9 @@ async def test_fetch_enddevicelist_for_scope_aggregator_skipping_virtual_edev(
         total_fsa_links=len(fsa_ids),
         total_subscription_links=0,
     )
-    mock_fetch_sites_and_count_for_claims.assert_called_once_with(mock_session, scope, start - 1, after, limit)
+    mock_fetch_sites_and_count_for_claims.assert_called_once_with(
+        mock_session, scope, start - 1, after, limit, count_strategy=SiteCountStrategy.EXACT
+    )
     mock_count_subscriptions_for_site.assert_not_called()  # Don't need sub count if we are missing aggregator EndDevice
     mock_fetch_distinct_function_set_assignment_ids.assert_called_once_with(mock_session, datetime.min)
 
@@ -759,7 +842,7 @@ async def test_fetch_enddevicelist_for_scope_aggregator(
         total_subscription_links=expected_sub_count,
     )
     mock_fetch_sites_and_count_for_claims.assert_called_once_with(
-        mock_session, scope, start, after, expected_query_limit
+        mock_session, scope, start, after, expected_query_limit, count_strategy=SiteCountStrategy.EXACT
     )
 
     if includes_virtual_edev:
@@ -0,0 +1,79 @@
+import unittest.mock as mock
+from datetime import UTC, datetime
+
+import pytest
+from assertical.fake.generator import generate_class_instance
+from assertical.fake.sqlalchemy import assert_mock_session, create_mock_session
+
+from envoy.server.manager.etag import ETagDependency, ETagManager
+from envoy.server.model.config.server import RuntimeServerConfig
+from envoy.server.model.site import Site
+from envoy.server.request_scope import SiteRequestScope
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.manager.etag.select_single_site_with_site_id")
+async def test_fetch_etag_for_scope_no_site(mock_select_single_site_with_site_id: mock.MagicMock):
+    """If the site isn't accessible - no ETag should be generated"""
+    mock_session = create_mock_session()
+    mock_select_single_site_with_site_id.return_value = None
+    scope = generate_class_instance(SiteRequestScope)
+
+    assert await ETagManager.fetch_etag_for_scope(mock_session, scope, "/edev/1/derp", ETagDependency(0)) is None
+    mock_select_single_site_with_site_id.assert_called_once_with(mock_session, scope.site_id, scope.aggregator_id)
+    assert_mock_session(mock_session)
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.manager.etag.select_single_site_with_site_id")
+@mock.patch("envoy.server.manager.etag.select_site_control_group_version")
+@mock.patch("envoy.server.manager.etag.select_site_doe_version")
+@mock.patch("envoy.server.manager.etag.select_tariff_version")
+@mock.patch("envoy.server.manager.etag.select_site_rate_version")
+@mock.patch("envoy.server.manager.etag.utc_now")
+@mock.patch("envoy.server.manager.etag.RuntimeServerConfigManager.fetch_current_config")
+async def test_fetch_etag_for_scope(
+    mock_fetch_current_config: mock.MagicMock,
+    mock_utc_now: mock.MagicMock,
+    mock_select_site_rate_version: mock.MagicMock,
+    mock_select_tariff_version: mock.MagicMock,
+    mock_select_site_doe_version: mock.MagicMock,
+    mock_select_site_control_group_version: mock.MagicMock,
+    mock_select_single_site_with_site_id: mock.MagicMock,
+):
+    """Tests that only the requested dependencies are queried and that changes to their versions change the ETag"""
+    mock_session = create_mock_session()
+    now = datetime(2024, 1, 2, tzinfo=UTC)
+    site = generate_class_instance(Site)
+    scope = generate_class_instance(SiteRequestScope)
+    mock_utc_now.return_value = now
+    mock_select_single_site_with_site_id.return_value = site
+    mock_fetch_current_config.return_value = RuntimeServerConfig()
+    mock_select_site_control_group_version.return_value = (1, now)
+    mock_select_site_doe_version.return_value = (2, now)
+
+    deps = ETagDependency.SITE_CONTROL_GROUPS | ETagDependency.SITE_DOES
+    etag = await ETagManager.fetch_etag_for_scope(mock_session, scope, "/edev/1/derp", deps)
+    assert etag and etag.startswith('"') and etag.endswith('"')
+
+    mock_select_site_control_group_version.assert_called_once_with(mock_session)
+    mock_select_site_doe_version.assert_called_once_with(mock_session, site.site_id, now)
+    mock_select_tariff_version.assert_not_called()
+    mock_select_site_rate_version.assert_not_called()
+
+    # Stable for identical inputs
+    assert etag == await ETagManager.fetch_etag_for_scope(mock_session, scope, "/edev/1/derp", deps)
+
+    # Different resource
+    assert etag != await ETagManager.fetch_etag_for_scope(mock_session, scope, "/edev/1/derp?l=2", deps)
+
+    # Underlying data changes
+    mock_select_site_doe_version.return_value = (3, now)
+    assert etag != await ETagManager.fetch_etag_for_scope(mock_session, scope, "/edev/1/derp", deps)
+
+    # Config changes
+    mock_select_site_doe_version.return_value = (2, now)
+    mock_fetch_current_config.return_value = RuntimeServerConfig(derpl_pollrate_seconds=12345)
+    assert etag != await ETagManager.fetch_etag_for_scope(mock_session, scope, "/edev/1/derp", deps)
+
+    assert_mock_session(mock_session)
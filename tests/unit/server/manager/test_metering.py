@@ -860,7 +860,7 @@ async def test_delete_mirror_usage_point(
 
 
 @pytest.mark.anyio
-@mock.patch("envoy.server.manager.metering.fetch_site_reading_types_for_group")
+@mock.patch("envoy.server.manager.metering.fetch_site_reading_types_for_groups")
 @mock.patch("envoy.server.manager.metering.fetch_grouped_site_reading_details")
 @mock.patch("envoy.server.manager.metering.count_grouped_site_reading_details")
 @mock.patch("envoy.server.manager.metering.MirrorUsagePointListMapper")
@@ -879,7 +879,7 @@ async def test_list_mirror_usage_points(
     mock_MirrorUsagePointListMapper: mock.MagicMock,
     mock_count_grouped_site_reading_details: mock.MagicMock,
     mock_fetch_grouped_site_reading_details: mock.MagicMock,
-    mock_fetch_site_reading_types_for_group: mock.MagicMock,
+    mock_fetch_site_reading_types_for_groups: mock.MagicMock,
     scope: MUPListRequestScope,
 ):
     """Check that the manager will handle interacting with the DB and its responses"""
@@ -901,7 +901,10 @@ async def test_list_mirror_usage_points(
     ]
     mup_response = generate_class_instance(MirrorUsagePointListResponse)
 
-    mock_fetch_site_reading_types_for_group.side_effect = [srts_group_1, srts_group_2]
+    mock_fetch_site_reading_types_for_groups.return_value = {
+        groups[0].group_id: srts_group_1,
+        groups[1].group_id: srts_group_2,
+    }
     mock_count_grouped_site_reading_details.return_value = count
     mock_fetch_grouped_site_reading_details.return_value = groups
     mock_MirrorUsagePointListMapper.map_to_list_response = mock.Mock(return_value=mup_response)
@@ -926,21 +929,11 @@ async def test_list_mirror_usage_points(
     mock_count_grouped_site_reading_details.assert_called_once_with(
         mock_session, aggregator_id=scope.aggregator_id, site_id=scope.device_site_id, changed_after=changed_after
     )
-    mock_fetch_site_reading_types_for_group.assert_has_calls(
-        [
-            mock.call(
-                mock_session,
-                aggregator_id=scope.aggregator_id,
-                site_id=scope.device_site_id,
-                group_id=groups[0].group_id,
-            ),
-            mock.call(
-                mock_session,
-                aggregator_id=scope.aggregator_id,
-                site_id=scope.device_site_id,
-                group_id=groups[1].group_id,
-            ),
-        ]
+    mock_fetch_site_reading_types_for_groups.assert_called_once_with(
+        mock_session,
+        aggregator_id=scope.aggregator_id,
+        site_id=scope.device_site_id,
+        group_ids=[groups[0].group_id, groups[1].group_id],
     )
 
     mock_MirrorUsagePointListMapper.map_to_list_response.assert_called_once_with(
@@ -949,7 +942,7 @@ async def test_list_mirror_usage_points(
 
 
 @pytest.mark.anyio
-@mock.patch("envoy.server.manager.metering.fetch_site_reading_types_for_group")
+@mock.patch("envoy.server.manager.metering.fetch_site_reading_types_for_groups")
 @mock.patch("envoy.server.manager.metering.fetch_grouped_site_reading_details")
 @mock.patch("envoy.server.manager.metering.count_grouped_site_reading_details")
 @mock.patch("envoy.server.manager.metering.MirrorUsagePointListMapper")
@@ -959,7 +952,7 @@ async def test_list_mirror_usage_points_unregistered_device(
     mock_MirrorUsagePointListMapper: mock.MagicMock,
     mock_count_grouped_site_reading_details: mock.MagicMock,
     mock_fetch_grouped_site_reading_details: mock.MagicMock,
-    mock_fetch_site_reading_types_for_group: mock.MagicMock,
+    mock_fetch_site_reading_types_for_groups: mock.MagicMock,
 ):
     """Check that the manager will handle unregistered device certs"""
 
@@ -985,7 +978,7 @@ async def test_list_mirror_usage_points_unregistered_device(
     # No calls to the DB - this is simply dumping an empty list
     mock_fetch_grouped_site_reading_details.assert_not_called()
     mock_count_grouped_site_reading_details.assert_not_called()
-    mock_fetch_site_reading_types_for_group.assert_not_called()
+    mock_fetch_site_reading_types_for_groups.assert_not_called()
 
     mock_MirrorUsagePointListMapper.map_to_list_response.assert_called_once_with(
         scope, 0, [], config.mup_postrate_seconds
@@ -0,0 +1,145 @@
+import unittest.mock as mock
+from datetime import UTC, datetime
+
+import pytest
+from assertical.fake.sqlalchemy import assert_mock_session, create_mock_session
+
+from envoy.server.crud.partition import RangePartition, add_months
+from envoy.server.manager.partition import PartitionMaintenanceResult, SiteReadingPartitionManager
+
+
+def month(year: int, month: int) -> datetime:
+    return datetime(year, month, 1, tzinfo=UTC)
+
+
+def partitions(table_name: str, *months: datetime) -> list[RangePartition]:
+    return [RangePartition(f"{table_name}_p{m:%Y%m}", m, add_months(m, 1)) for m in months]
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.manager.partition.try_lock_partition_maintenance")
+@mock.patch("envoy.server.manager.partition.select_range_partitions")
+@mock.patch("envoy.server.manager.partition.create_range_partition")
+@mock.patch("envoy.server.manager.partition.detach_partition")
+@mock.patch("envoy.server.manager.partition.drop_partition")
+async def test_maintain_partitions_locked(
+    mock_drop_partition: mock.MagicMock,
+    mock_detach_partition: mock.MagicMock,
+    mock_create_range_partition: mock.MagicMock,
+    mock_select_range_partitions: mock.MagicMock,
+    mock_try_lock_partition_maintenance: mock.MagicMock,
+):
+    """If another instance is running maintenance - nothing should happen"""
+    mock_session = create_mock_session()
+    mock_try_lock_partition_maintenance.return_value = False
+
+    result = await SiteReadingPartitionManager.maintain_partitions(
+        mock_session, datetime(2024, 5, 6, tzinfo=UTC), months_ahead=3, retention_months=1, drop_expired=True
+    )
+
+    assert result is None
+    mock_try_lock_partition_maintenance.assert_called_once_with(mock_session)
+    mock_select_range_partitions.assert_not_called()
+    mock_create_range_partition.assert_not_called()
+    mock_detach_partition.assert_not_called()
+    mock_drop_partition.assert_not_called()
+    assert_mock_session(mock_session, committed=False)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "retention_months, drop_expired, expected_removed",
+    [
+        (None, False, []),
+        (None, True, []),
+        (2, False, ["p202401", "p202402"]),
+        (2, True, ["p202401", "p202402"]),
+        (3, True, ["p202401"]),
+        (12, True, []),
+    ],
+)
+@mock.patch("envoy.server.manager.partition.try_lock_partition_maintenance")
+@mock.patch("envoy.server.manager.partition.select_range_partitions")
+@mock.patch("envoy.server.manager.partition.create_range_partition")
+@mock.patch("envoy.server.manager.partition.detach_partition")
+@mock.patch("envoy.server.manager.partition.drop_partition")
+async def test_maintain_partitions(
+    mock_drop_partition: mock.MagicMock,
+    mock_detach_partition: mock.MagicMock,
+    mock_create_range_partition: mock.MagicMock,
+    mock_select_range_partitions: mock.MagicMock,
+    mock_try_lock_partition_maintenance: mock.MagicMock,
+    retention_months: int | None,
+    drop_expired: bool,
+    expected_removed: list[str],
+):
+    """Existing partitions cover Jan-May 2024 and it's currently 6 May 2024 (2 months ahead required)"""
+    mock_session = create_mock_session()
+    mock_try_lock_partition_maintenance.return_value = True
+    mock_select_range_partitions.side_effect = lambda session, table_name: partitions(
+        table_name, month(2024, 1), month(2024, 2), month(2024, 3), month(2024, 4), month(2024, 5)
+    )
+
+    result = await SiteReadingPartitionManager.maintain_partitions(
+        mock_session,
+        datetime(2024, 5, 6, 7, 8, tzinfo=UTC),
+        months_ahead=2,
+        retention_months=retention_months,
+        drop_expired=drop_expired,
+    )
+
+    assert isinstance(result, PartitionMaintenanceResult)
+    table_names = ["site_reading", "archive_site_reading"]
+    assert [c.args[1] for c in mock_select_range_partitions.call_args_list] == table_names
+
+    # May already exists - June/July will need creating for both tables
+    assert result.created_partitions == [f"{t}_p{m}" for t in table_names for m in ["202406", "202407"]]
+    mock_create_range_partition.assert_has_calls(
+        [
+            mock.call(mock_session, t, f"{t}_p{m:%Y%m}", "time_period_start", m, add_months(m, 1))
+            for t in table_names
+            for m in [month(2024, 6), month(2024, 7)]
+        ]
+    )
+
+    assert result.removed_partitions == [f"{t}_{p}" for t in table_names for p in expected_removed]
+    expected_removal_calls = [mock.call(mock_session, t, f"{t}_{p}") for t in table_names for p in expected_removed]
+    if drop_expired:
+        mock_drop_partition.assert_has_calls(expected_removal_calls)
+        assert mock_drop_partition.call_count == len(expected_removal_calls)
+        mock_detach_partition.assert_not_called()
+    else:
+        mock_detach_partition.assert_has_calls(expected_removal_calls)
+        assert mock_detach_partition.call_count == len(expected_removal_calls)
+        mock_drop_partition.assert_not_called()
+
+    assert_mock_session(mock_session, committed=True)
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.manager.partition.try_lock_partition_maintenance")
+@mock.patch("envoy.server.manager.partition.select_range_partitions")
+@mock.patch("envoy.server.manager.partition.create_range_partition")
+async def test_maintain_partitions_skips_overlapping(
+    mock_create_range_partition: mock.MagicMock,
+    mock_select_range_partitions: mock.MagicMock,
+    mock_try_lock_partition_maintenance: mock.MagicMock,
+):
+    """A (manually created) partition spanning several months shouldn't be overlapped by new monthly partitions"""
+    mock_session = create_mock_session()
+    mock_try_lock_partition_maintenance.return_value = True
+    mock_select_range_partitions.side_effect = lambda session, table_name: [
+        RangePartition(f"{table_name}_manual", month(2024, 4), month(2024, 7))
+    ]
+
+    result = await SiteReadingPartitionManager.maintain_partitions(
+        mock_session, datetime(2024, 5, 6, tzinfo=UTC), months_ahead=3, retention_months=None, drop_expired=False
+    )
+
+    assert result is not None
+    assert result.created_partitions == ["site_reading_p202407", "site_reading_p202408"] + [
+        "archive_site_reading_p202407",
+        "archive_site_reading_p202408",
+    ]
+    assert mock_create_range_partition.call_count == 4
+    assert_mock_session(mock_session, committed=True)
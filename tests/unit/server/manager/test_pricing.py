@@ -18,13 +18,13 @@ from envoy.server.request_scope import SiteRequestScope
 @mock.patch("envoy.server.manager.pricing.TariffProfileMapper.map_to_list_response")
 @mock.patch("envoy.server.manager.pricing.select_all_tariffs")
 @mock.patch("envoy.server.manager.pricing.select_tariff_count")
-@mock.patch("envoy.server.manager.pricing.count_tariff_components_by_tariff")
-@mock.patch("envoy.server.manager.pricing.count_active_rates_include_deleted")
+@mock.patch("envoy.server.manager.pricing.count_tariff_components_by_tariffs")
+@mock.patch("envoy.server.manager.pricing.count_active_rates_include_deleted_by_tariffs")
 @mock.patch("envoy.server.manager.pricing.RuntimeServerConfigManager.fetch_current_config")
 async def test_fetch_tariff_profile_list_counts_members(
     mock_fetch_current_config: mock.MagicMock,
-    mock_count_active_rates_include_deleted: mock.MagicMock,
-    mock_count_tariff_components_by_tariff: mock.MagicMock,
+    mock_count_active_rates_include_deleted_by_tariffs: mock.MagicMock,
+    mock_count_tariff_components_by_tariffs: mock.MagicMock,
     mock_select_tariff_count: mock.MagicMock,
     mock_select_all_tariffs: mock.MagicMock,
     mock_map_to_list_response: mock.MagicMock,
@@ -51,8 +51,13 @@ async def test_fetch_tariff_profile_list_counts_members(
     mock_select_all_tariffs.return_value = all_tariffs
     mock_select_tariff_count.return_value = tariff_count
 
-    mock_count_active_rates_include_deleted.side_effect = count_rates
-    mock_count_tariff_components_by_tariff.side_effect = count_components
+    # Return the counts in reverse order to ensure the manager is correctly keying on tariff_id
+    mock_count_active_rates_include_deleted_by_tariffs.return_value = {
+        t.tariff_id: c for t, c in reversed(list(zip(all_tariffs, count_rates, strict=True)))
+    }
+    mock_count_tariff_components_by_tariffs.return_value = {
+        t.tariff_id: c for t, c in reversed(list(zip(all_tariffs, count_components, strict=True)))
+    }
     mock_map_to_list_response.return_value = mapped_tariffs
     mock_fetch_current_config.return_value = server_config
 
@@ -65,8 +70,12 @@ async def test_fetch_tariff_profile_list_counts_members(
     mock_select_tariff_count.assert_called_once_with(mock_session, changed, fsa_id)
     assert_mock_session(mock_session)
 
-    assert mock_count_active_rates_include_deleted.call_count == n_tariffs
-    assert mock_count_tariff_components_by_tariff.call_count == n_tariffs
+    # The counts should be fetched for the whole page in a single call (instead of one call per tariff)
+    expected_tariff_ids = [t.tariff_id for t in all_tariffs]
+    mock_count_active_rates_include_deleted_by_tariffs.assert_called_once_with(
+        mock_session, expected_tariff_ids, scope.site_id, mock.ANY, datetime.min
+    )
+    mock_count_tariff_components_by_tariffs.assert_called_once_with(mock_session, expected_tariff_ids, None)
 
     # make sure we properly bundled up the resulting tariff + rate count tuples and passed it along to the mapper
     mock_map_to_list_response.assert_called_once()
@@ -84,9 +93,9 @@ async def test_fetch_tariff_profile_list_counts_members(
 @mock.patch("envoy.server.manager.pricing.RateComponentMapper.map_to_list_response")
 @mock.patch("envoy.server.manager.pricing.select_tariff_components_by_tariff")
 @mock.patch("envoy.server.manager.pricing.count_tariff_components_by_tariff")
-@mock.patch("envoy.server.manager.pricing.count_active_rates_include_deleted")
+@mock.patch("envoy.server.manager.pricing.count_active_rates_include_deleted_by_tariff_components")
 async def test_fetch_rate_component_list_counts_members(
-    mock_count_active_rates_include_deleted: mock.MagicMock,
+    mock_count_active_rates_include_deleted_by_tariff_components: mock.MagicMock,
     mock_count_tariff_components_by_tariff: mock.MagicMock,
     mock_select_tariff_components_by_tariff: mock.MagicMock,
     mock_map_to_list_response: mock.MagicMock,
@@ -111,7 +120,9 @@ async def test_fetch_rate_component_list_counts_members(
 
     mock_select_tariff_components_by_tariff.return_value = all_components
     mock_count_tariff_components_by_tariff.return_value = count_components
-    mock_count_active_rates_include_deleted.side_effect = count_rates
+    mock_count_active_rates_include_deleted_by_tariff_components.return_value = {
+        tc.tariff_component_id: c for tc, c in zip(all_components, count_rates, strict=True)
+    }
     mock_map_to_list_response.return_value = mapped_list
 
     list_response = await RateComponentManager.fetch_rate_component_list(
@@ -123,4 +134,11 @@ async def test_fetch_rate_component_list_counts_members(
     mock_map_to_list_response.assert_called_once_with(
         scope, tariff_id, list(zip(all_components, count_rates, strict=False)), count_components
     )
+    mock_count_active_rates_include_deleted_by_tariff_components.assert_called_once_with(
+        mock_session,
+        [tc.tariff_component_id for tc in all_components],
+        scope.site_id,
+        mock.ANY,
+        changed_after,
+    )
     assert_mock_session(mock_session)
@@ -249,10 +249,10 @@ async def test_fetch_response_for_scope_bad_type():
 @mock.patch("envoy.server.manager.response.count_doe_responses")
 @mock.patch("envoy.server.manager.response.select_tariff_generated_rate_responses")
 @mock.patch("envoy.server.manager.response.count_tariff_generated_rate_responses")
-@mock.patch("envoy.server.manager.response.select_doe_include_deleted")
+@mock.patch("envoy.server.manager.response.select_does_include_deleted")
 @pytest.mark.anyio
 async def test_fetch_response_list_for_scope_does(
-    mock_select_doe_include_deleted: mock.MagicMock,
+    mock_select_does_include_deleted: mock.MagicMock,
     mock_count_tariff_generated_rate_responses: mock.MagicMock,
     mock_select_tariff_generated_rate_responses: mock.MagicMock,
     mock_count_doe_responses: mock.MagicMock,
@@ -278,7 +278,7 @@ async def test_fetch_response_list_for_scope_does(
     mock_count_doe_responses.return_value = mock_count
     mock_select_doe_responses.return_value = response_objs
     mock_map_to_doe_response.return_value = mapped_obj
-    mock_select_doe_include_deleted.side_effect = snapshot_does
+    mock_select_does_include_deleted.return_value = {11: snapshot_does[0]}
 
     # Act
     result = await ResponseManager.fetch_response_list_for_scope(
@@ -288,12 +288,7 @@ async def test_fetch_response_list_for_scope_does(
     # Assert
     assert result is mapped_obj
     assert_mock_session(mock_session)
-    mock_select_doe_include_deleted.assert_has_calls(
-        [
-            mock.call(mock_session, scope.aggregator_id, scope.site_id, 11),
-            mock.call(mock_session, scope.aggregator_id, scope.site_id, 22),
-        ]
-    )
+    mock_select_does_include_deleted.assert_called_once_with(mock_session, scope.aggregator_id, scope.site_id, [11, 22])
     mock_select_tariff_generated_rate_responses.assert_not_called()
     mock_count_tariff_generated_rate_responses.assert_not_called()
     mock_map_to_price_response.assert_not_called()
@@ -317,7 +312,7 @@ async def test_fetch_response_list_for_scope_does(
 @mock.patch("envoy.server.manager.response.count_doe_responses")
 @mock.patch("envoy.server.manager.response.select_tariff_generated_rate_responses")
 @mock.patch("envoy.server.manager.response.count_tariff_generated_rate_responses")
-@mock.patch("envoy.server.manager.response.select_doe_include_deleted")
+@mock.patch("envoy.server.manager.response.select_does_include_deleted")
 @pytest.mark.anyio
 async def test_fetch_response_list_for_scope_rates(
     mock_select_doe_include_deleted: mock.MagicMock,
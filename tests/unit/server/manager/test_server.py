@@ -95,3 +95,54 @@ async def test_manager_fetch_current_config(pg_base_config):
     assert cfg.mup_postrate_seconds == 60
     assert cfg.site_control_pow10_encoding == -2
     assert cfg.disable_edev_registration is False
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.manager.server.select_server_config")
+async def test_manager_fetch_current_config_cache_disabled(mock_select_server_config: mock.MagicMock):
+    """With the cache disabled - every fetch should go to the database"""
+    # Arrange
+    RuntimeServerConfigManager.disable_cache()
+    mock_session = mock.Mock()
+    mock_select_server_config.return_value = entity_mdl(runtime_server_config_id=1, dcap_pollrate_seconds=123)
+
+    # Act
+    cfg1 = await RuntimeServerConfigManager.fetch_current_config(mock_session)
+    cfg2 = await RuntimeServerConfigManager.fetch_current_config(mock_session)
+
+    # Assert
+    assert cfg1.dcap_pollrate_seconds == 123
+    assert cfg2 == cfg1
+    assert mock_select_server_config.call_count == 2
+    mock_select_server_config.assert_called_with(mock_session)
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.manager.server.select_server_config")
+async def test_manager_fetch_current_config_cache_enabled(mock_select_server_config: mock.MagicMock):
+    """With the cache enabled - fetches should only go to the database after an invalidation"""
+    # Arrange
+    mock_session = mock.Mock()
+    mock_select_server_config.side_effect = [
+        entity_mdl(runtime_server_config_id=1, dcap_pollrate_seconds=123),
+        entity_mdl(runtime_server_config_id=1, dcap_pollrate_seconds=456),
+    ]
+
+    try:
+        RuntimeServerConfigManager.enable_cache()
+
+        # Act
+        cfg1 = await RuntimeServerConfigManager.fetch_current_config(mock_session)
+        cfg2 = await RuntimeServerConfigManager.fetch_current_config(mock_session)
+        await RuntimeServerConfigManager.invalidate_cache()
+        cfg3 = await RuntimeServerConfigManager.fetch_current_config(mock_session)
+        cfg4 = await RuntimeServerConfigManager.fetch_current_config(mock_session)
+    finally:
+        RuntimeServerConfigManager.disable_cache()
+
+    # Assert
+    assert cfg1.dcap_pollrate_seconds == 123
+    assert cfg2 == cfg1
+    assert cfg3.dcap_pollrate_seconds == 456
+    assert cfg4 == cfg3
+    assert mock_select_server_config.call_count == 2
@@ -1,5 +1,5 @@
 import inspect
-from typing import get_type_hints
+from typing import Any, get_args, get_origin, get_type_hints
 
 import pytest
 from assertical.fake.generator import (
@@ -10,7 +10,8 @@ from assertical.fake.generator import (
     is_member_public,
     is_optional_type,
 )
-from sqlalchemy.orm import ColumnProperty, MappedColumn
+from sqlalchemy import ARRAY
+from sqlalchemy.orm import ColumnProperty, Mapped, MappedColumn
 
 import envoy.server.model as all_models
 import envoy.server.model.archive as all_archive_models
@@ -29,6 +30,17 @@ BASE_MODELS.sort(key=lambda t: t.__name__)
 ARCHIVE_MODELS.sort(key=lambda t: t.__name__)
 
 
+def is_array_of_generatable_type(column_property: ColumnProperty, member_type: Any) -> bool:
+    """ARRAY columns are the only non primitive (non relationship) type we permit - so long as the type hint is a
+    list of a primitive type"""
+    if not isinstance(column_property.columns[0].type, ARRAY):
+        return False
+
+    if get_origin(member_type) is Mapped:
+        member_type = get_args(member_type)[0]
+    return get_origin(member_type) is list and is_generatable_type(get_args(member_type)[0])
+
+
 @pytest.mark.parametrize("model_type", BASE_MODELS + ARCHIVE_MODELS)
 def test_validate_model_definitions(model_type: type):
     """Runs some high level reflection checks on all model types to look for things that are "off" """
@@ -54,7 +66,10 @@ def test_validate_model_definitions(model_type: type):
         # Check the type is "simple" and that we haven't accidentally typed it with some complex type
         if isinstance(mapped_column_details.property, ColumnProperty):  # ty:ignore[unresolved-attribute]
             # We have a "simple type" that sqlalchemy has mapped into a column
-            if not is_generatable_type(member_type):
+            if not is_generatable_type(member_type) and not is_array_of_generatable_type(
+                mapped_column_details.property,  # ty:ignore[unresolved-attribute]
+                member_type,
+            ):
                 # And then the typehint doesn't appear to be simple. Is the type hint appropriate?
                 errors.append(
                     f"'{member_name}' has type hint '{member_type}' that appears incorrect. "
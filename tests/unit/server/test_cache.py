@@ -6,7 +6,8 @@ from datetime import UTC, datetime, timedelta
 import pytest
 from assertical.fake.asyncio import create_async_result
 
-from envoy.server.cache import AsyncCache, ExpiringValue
+from envoy.server.cache import AsyncCache, ExpiringValue, LRUCache
+from envoy.server.manager.time import utc_now
 
 
 @dataclass
@@ -229,3 +230,106 @@ async def test_get_value_sync():
     assert c.get_value_sync(update_arg, "key1") == "val1", "This should've been updated in the background"
     assert c.get_value_sync(update_arg, "key2") == "val2", "This should've been updated in the background"
     assert mock_update_fn.call_count == 1
+
+
+@pytest.mark.anyio
+async def test_fetch_fn_and_negative_entries():
+    """Once fully loaded - misses should fetch a single key and unknown keys should be negatively cached"""
+    updated_cache = {"key1": ExpiringValue(None, "val1")}
+    update_arg = MyCustomArgument("abc123", 456)
+    mock_update_fn = mock.Mock(return_value=create_async_result(updated_cache))
+    mock_fetch_fn = mock.Mock(
+        side_effect=lambda arg, key: create_async_result(ExpiringValue(None, "val2") if key == "key2" else None)
+    )
+    c = AsyncCache(mock_update_fn, fetch_fn=mock_fetch_fn, negative_ttl_seconds=60)
+
+    # Initial load is always a full update
+    assert (await c.get_value(update_arg, "key1")) == "val1"
+    mock_update_fn.assert_called_once_with(update_arg)
+    mock_fetch_fn.assert_not_called()
+
+    # Misses now only fetch the single key
+    assert (await c.get_value(update_arg, "key2")) == "val2"
+    assert (await c.get_value(update_arg, "key2")) == "val2"
+    mock_fetch_fn.assert_called_once_with(update_arg, "key2")
+
+    # Unknown keys are negatively cached
+    assert (await c.get_value(update_arg, "key3")) is None
+    assert (await c.get_value(update_arg, "key3")) is None
+    assert mock_fetch_fn.call_count == 2
+    mock_fetch_fn.assert_called_with(update_arg, "key3")
+
+    # Until they expire
+    with mock.patch("envoy.server.cache.utc_now") as mock_utc_now:
+        mock_utc_now.return_value = utc_now() + timedelta(seconds=61)
+        assert (await c.get_value(update_arg, "key3")) is None
+        assert mock_fetch_fn.call_count == 3
+
+    mock_update_fn.assert_called_once()
+    assert c.stats.reloads == 1
+    assert c.stats.key_fetches == 3
+    assert c.stats.misses == 4
+    assert c.stats.hits == 2
+    assert c.stats.negative_hits == 1
+
+    # Clearing the cache means the next miss will be a full update again
+    await c.clear()
+    assert (await c.get_value(update_arg, "key3")) is None
+    assert mock_update_fn.call_count == 2
+    assert mock_fetch_fn.call_count == 3
+
+
+@pytest.mark.anyio
+async def test_refresh_after_serves_stale():
+    """Once a full load is older than refresh_after_seconds - values are served while a background reload runs"""
+    update_arg = MyCustomArgument("abc123", 456)
+    mock_update_fn = mock.Mock(
+        side_effect=[
+            create_async_result({"key1": ExpiringValue(None, "val1")}),
+            create_async_result({"key1": ExpiringValue(None, "val1-updated")}),
+        ]
+    )
+    c = AsyncCache(mock_update_fn, refresh_after_seconds=60)
+
+    assert (await c.get_value(update_arg, "key1")) == "val1"
+    assert (await c.get_value(update_arg, "key1")) == "val1"
+    assert mock_update_fn.call_count == 1
+
+    with mock.patch("envoy.server.cache.utc_now") as mock_utc_now:
+        mock_utc_now.return_value = utc_now() + timedelta(seconds=61)
+        assert (await c.get_value(update_arg, "key1")) == "val1", "Stale value served while refreshing"
+        await sleep(0.1)  # Let the background refresh run
+
+    assert mock_update_fn.call_count == 2
+    assert (await c.get_value(update_arg, "key1")) == "val1-updated"
+    assert mock_update_fn.call_count == 2
+    assert c.stats.reloads == 2
+
+
+def test_lru_cache_get_put():
+    cache: LRUCache[str, int] = LRUCache(max_entries=2)
+
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.put("c", 3)  # Evicts "b"
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.hits == 3
+    assert cache.misses == 2
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get("a") is None
+    assert cache.misses == 3
+
+
+def test_lru_cache_disabled():
+    cache: LRUCache[str, int] = LRUCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,76 @@
+import asyncio
+import unittest.mock as mock
+
+import pytest
+
+from envoy.server.database import install_notify_listener, remove_notify_listener
+
+
+def mock_listener_connection() -> tuple[mock.MagicMock, mock.MagicMock]:
+    """Returns a (AsyncConnection, asyncpg connection) pair of mocks"""
+    driver_connection = mock.MagicMock()
+    driver_connection.add_listener = mock.AsyncMock()
+    raw_connection = mock.MagicMock()
+    raw_connection.driver_connection = driver_connection
+    connection = mock.MagicMock()
+    connection.get_raw_connection = mock.AsyncMock(return_value=raw_connection)
+    connection.invalidate = mock.AsyncMock()
+    connection.close = mock.AsyncMock()
+    return connection, driver_connection
+
+
+@pytest.mark.anyio
+@mock.patch("envoy.server.database.sleep")
+@mock.patch("envoy.server.database.create_async_engine")
+async def test_notify_listener_reconnects(mock_create_async_engine: mock.MagicMock, mock_sleep: mock.MagicMock):
+    """A lost listener connection should be re-established (with back-off) rather than permanently disabling things"""
+    first_connection, first_driver = mock_listener_connection()
+    second_connection, second_driver = mock_listener_connection()
+    engine = mock.MagicMock()
+    engine.connect = mock.AsyncMock(side_effect=[first_connection, ConnectionError("db down"), second_connection])
+    engine.dispose = mock.AsyncMock()
+    mock_create_async_engine.return_value = engine
+    mock_sleep.side_effect = mock.AsyncMock()
+
+    on_notify = mock.AsyncMock()
+    on_listening = mock.Mock()
+    on_lost = mock.Mock()
+
+    details = await install_notify_listener(
+        "postgresql+asyncpg://fake", "my_channel", on_notify, on_listening, on_lost, {"connect_args": {"ssl": True}}
+    )
+    mock_create_async_engine.assert_called_once_with("postgresql+asyncpg://fake", connect_args={"ssl": True})
+    first_driver.add_listener.assert_awaited_once()
+    assert first_driver.add_listener.call_args.args[0] == "my_channel"
+    assert details.connection is first_connection
+    on_listening.assert_called_once()
+    on_lost.assert_not_called()
+
+    # Notifications are forwarded to on_notify
+    on_notification = first_driver.add_listener.call_args.args[1]
+    on_notification(first_driver, 123, "my_channel", "payload")
+    await asyncio.sleep(0)
+    on_notify.assert_awaited_once()
+
+    # Lose the connection - first reconnect attempt fails, the second succeeds
+    on_terminated = first_driver.add_termination_listener.call_args.args[0]
+    on_terminated(first_driver)
+    on_lost.assert_called_once()
+    assert details.connection is None
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert not details.pending_tasks
+
+    first_connection.invalidate.assert_awaited_once()
+    assert engine.connect.await_count == 3
+    mock_sleep.assert_awaited_once()
+    second_driver.add_listener.assert_awaited_once()
+    assert details.connection is second_connection
+    assert on_listening.call_count == 2
+
+    # Removing shouldn't attempt any further reconnects
+    await remove_notify_listener(details)
+    second_connection.close.assert_awaited_once()
+    engine.dispose.assert_awaited_once()
+    assert on_lost.call_count == 2
+    assert not details.active